@@ -3,16 +3,21 @@
 Automated price collection script.
 Reads products from database and collects prices from all configured retailers.
 """
+import logging
 import sys
 from pathlib import Path
 from datetime import datetime
+from typing import Optional
 
 # Add src to path
 sys.path.insert(0, str(Path(__file__).parent))
 
 from src.database import PriceDatabase
+from src.snapshot import write_snapshot
 from src.scraper import WalmartScraper, TargetScraper, CVSScraper, WalgreensScraper, AmazonScraper
 
+logger = logging.getLogger(__name__)
+
 
 def collect_prices_for_all_products():
     """Collect prices for all products in the database."""
@@ -32,8 +37,8 @@ def collect_prices_for_all_products():
         'amazon': AmazonScraper()
     }
 
-    # Get all products
-    products = db.get_all_products()
+    # Get all products still in the catalog
+    products = db.get_all_products(active_only=True)
 
     if not products:
         print("\n⚠️  No products found in database")
@@ -43,67 +48,156 @@ def collect_prices_for_all_products():
 
     print(f"\nFound {len(products)} product(s) to track\n")
 
+    # Publish run progress on the change feed for live dashboards
+    run_id = datetime.now().isoformat()
+    db.prune_events()
+    db.record_event('run', {'runId': run_id, 'status': 'started', 'total': len(products)})
+
     total_attempts = 0
     total_successes = 0
     total_failures = 0
-
-    # Process each product
-    for product in products:
-        print("=" * 70)
-        print(f"Product: {product.name} ({product.size})")
-        print(f"ID: {product.id}")
-        print(f"UPC: {product.upc}")
-        print("=" * 70)
-
-        product_successes = 0
-        product_failures = 0
-
-        # Try each retailer
-        for retailer_id, scraper in scrapers.items():
-            url = product.get_retailer_url(retailer_id)
-
-            if not url:
-                print(f"\n⊘ {retailer_id.capitalize():<12} - No URL configured (skipping)")
-                continue
-
-            print(f"\n→ {retailer_id.capitalize():<12} - Scraping...")
-            total_attempts += 1
-
-            try:
-                price_point = scraper.fetch_price(product.id, url)
-
-                if price_point:
-                    # Save to database
-                    db.add_price_point(price_point)
-                    print(f"  ✓ SUCCESS: ${price_point.price:.2f} (saved to database)")
-                    product_successes += 1
-                    total_successes += 1
-                else:
-                    print(f"  ✗ FAILED: No price returned")
+    error = None
+
+    try:
+        # Process each product
+        for index, product in enumerate(products, start=1):
+            print("=" * 70)
+            print(f"Product: {product.name} ({product.size})")
+            print(f"ID: {product.id}")
+            print(f"UPC: {product.upc}")
+            print("=" * 70)
+
+            product_successes = 0
+            product_failures = 0
+
+            # Try each retailer
+            for retailer_id, scraper in scrapers.items():
+                url = product.get_retailer_url(retailer_id)
+
+                if not url:
+                    print(f"\n⊘ {retailer_id.capitalize():<12} - No URL configured (skipping)")
+                    continue
+
+                print(f"\n→ {retailer_id.capitalize():<12} - Scraping...")
+                total_attempts += 1
+
+                try:
+                    price_point = scraper.fetch_price(product.id, url)
+
+                    if price_point:
+                        # Save to database
+                        db.add_price_point(price_point)
+                        print(f"  ✓ SUCCESS: ${price_point.price:.2f} (saved to database)")
+                        product_successes += 1
+                        total_successes += 1
+                    else:
+                        print(f"  ✗ FAILED: No price returned")
+                        product_failures += 1
+                        total_failures += 1
+
+                except Exception as e:
+                    print(f"  ✗ ERROR: {e}")
                     product_failures += 1
                     total_failures += 1
 
-            except Exception as e:
-                print(f"  ✗ ERROR: {e}")
-                product_failures += 1
-                total_failures += 1
+            # Product summary
+            print(f"\n{'-' * 70}")
+            print(f"Product Summary: {product_successes} successful, {product_failures} failed")
+            print(f"{'-' * 70}\n")
 
-        # Product summary
-        print(f"\n{'-' * 70}")
-        print(f"Product Summary: {product_successes} successful, {product_failures} failed")
-        print(f"{'-' * 70}\n")
+            db.record_event('run', {
+                'runId': run_id, 'status': 'progress', 'done': index, 'total': len(products),
+                'successes': total_successes, 'failures': total_failures
+            }, product_id=product.id)
 
-    # Overall summary
-    print("\n" + "=" * 70)
-    print("COLLECTION COMPLETE")
-    print("=" * 70)
-    print(f"Total attempts: {total_attempts}")
-    print(f"Successful: {total_successes} ({total_successes/total_attempts*100:.1f}%)" if total_attempts > 0 else "Successful: 0")
-    print(f"Failed: {total_failures} ({total_failures/total_attempts*100:.1f}%)" if total_attempts > 0 else "Failed: 0")
-    print(f"Completed: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
-    print("=" * 70)
-
-    db.close()
+        # Overall summary
+        print("\n" + "=" * 70)
+        print("COLLECTION COMPLETE")
+        print("=" * 70)
+        print(f"Total attempts: {total_attempts}")
+        print(f"Successful: {total_successes} ({total_successes/total_attempts*100:.1f}%)" if total_attempts > 0 else "Successful: 0")
+        print(f"Failed: {total_failures} ({total_failures/total_attempts*100:.1f}%)" if total_attempts > 0 else "Failed: 0")
+        print(f"Completed: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
+        print("=" * 70)
+    except BaseException as e:
+        error = e
+        raise
+    finally:
+        # Close the run on the feed even if it crashed or was interrupted,
+        # so dashboards don't show it as still collecting; a failure to record
+        # it is logged rather than replacing the run's own error
+        try:
+            try:
+                db.record_event('run', {
+                    'runId': run_id, 'status': 'finished', 'total': len(products),
+                    'attempts': total_attempts, 'successes': total_successes, 'failures': total_failures,
+                    'error': (str(error) or type(error).__name__) if error is not None else None
+                })
+            except Exception:
+                logger.exception("Could not record the end of run %s", run_id)
+            if error is None:
+                refresh_derived_data(db)
+        finally:
+            db.close()
+
+
+def update_analytics(db: PriceDatabase) -> str:
+    """Recompute analytics for series with new prices."""
+    summary = db.refresh_analytics()
+    return f"Analytics: {summary['series']} series updated in {summary['seconds']:.2f}s"
+
+
+def check_sales(db: PriceDatabase) -> Optional[str]:
+    """Check new advertised discounts."""
+    summary = db.refresh_sale_verdicts()
+    if not summary['evaluated']:
+        return None
+    counts = ', '.join(f"{n} {verdict}" for verdict, n in summary['verdicts'].items() if n)
+    return f"Checked {summary['evaluated']} advertised discount(s): {counts}"
+
+
+def update_seasonality(db: PriceDatabase) -> str:
+    """Recompute seasonality for series with new prices."""
+    summary = db.refresh_seasonality()
+    return (f"Seasonality: {summary['series']} series, {summary['categories']} categories "
+            f"updated in {summary['seconds']:.2f}s")
+
+
+def update_forecasts(db: PriceDatabase) -> str:
+    """Update buy-or-wait forecasts with the new prices."""
+    summary = db.refresh_forecasts()
+    return (f"Forecasts: {summary['series']} series updated ({summary['refits']} refit) "
+            f"in {summary['seconds']:.2f}s")
+
+
+def publish_snapshot(db: PriceDatabase) -> str:
+    """Write the static dashboard snapshot."""
+    manifest = write_snapshot(db)
+    stats = manifest['stats']
+    return (f"Dashboard snapshot: {len(manifest['products'])} product(s), "
+            f"{stats['written']} file(s) written in {stats['seconds']:.2f}s")
+
+
+# Run after new prices are saved, in order; each returns a summary line (or None)
+POST_RUN_STEPS = (
+    ("Analytics", update_analytics),
+    ("Discount claims", check_sales),
+    ("Seasonality", update_seasonality),
+    ("Forecasts", update_forecasts),
+    ("Dashboard snapshot", publish_snapshot),
+)
+
+
+def refresh_derived_data(db: PriceDatabase):
+    """Refresh derived data after a run; a failing step doesn't fail the run."""
+    for name, step in POST_RUN_STEPS:
+        try:
+            message = step(db)
+        except Exception as e:
+            print(f"⚠️  {name} not updated: {e}")
+            continue
+        if message:
+            print(f"✓ {message}")
 
 
 def collect_prices_for_product(product_id: str):
@@ -166,6 +260,8 @@ def collect_prices_for_product(product_id: str):
     print(f"Results: {successes} successful, {failures} failed")
     print(f"{'-' * 70}")
 
+    if successes:
+        refresh_derived_data(db)
     db.close()
 
 
@@ -0,0 +1,31 @@
+"""Shared test helpers"""
+import sys
+from contextlib import contextmanager
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent))
+
+
+@contextmanager
+def api_client(db_path):
+    """
+    Flask test client for the dashboard API serving the given database.
+
+    On exit the API's DB_PATH is restored, its response cache cleared and
+    the connections its handlers opened on this thread closed, so no test
+    sees another's database. A context manager rather than a pytest
+    fixture, so the test modules still run directly with python.
+    """
+    from dashboard import api
+
+    previous = api.DB_PATH
+    api.DB_PATH = str(db_path)
+    api._response_cache.clear()
+    try:
+        yield api.app.test_client()
+    finally:
+        for conn in getattr(api._thread_local, 'connections', {}).values():
+            conn.close()
+        api._thread_local.connections = {}
+        api._response_cache.clear()
+        api.DB_PATH = previous
@@ -4,12 +4,35 @@ Simple Flask API server for the Price Intelligence Dashboard.
 Serves price data from the SQLite database.
 """
 
-from flask import Flask, jsonify, send_from_directory
+from flask import Flask, Response, jsonify, request, send_from_directory
 from flask_cors import CORS
+from collections import OrderedDict
+import hashlib
 import sqlite3
 import os
+import sys
+import threading
+import time
 from datetime import datetime
-from collections import defaultdict
+
+# Make the shared src/ package importable
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src import query_profiler
+from src.analytics import analytics_version
+from src.change_feed import latest_event_id, read_events
+from src.dashboard_data import (CATALOG_SORTS, MAX_UPDATE_ROWS, build_analytics, build_best_prices,
+                                build_catalog, build_dashboard_data, build_forecasts, build_history,
+                                build_product_detail, build_sale_report, build_seasonality,
+                                build_unit_prices, build_updates, data_version)
+from src.database import BUCKETS
+from src.downsample import MIN_BUDGET
+from src.fake_sales import VERDICTS
+from src.forecasts import HORIZONS, RECOMMENDATIONS, forecast_version
+from src.history_blocks import latest_cursor
+from src.serialization import FORMATS, compress, dumps, encodings
+from src.units import UNITS
+from src.series_store import SeriesStore
 
 app = Flask(__name__)
 CORS(app)
@@ -22,139 +45,739 @@ else:
     # Running locally
     DB_PATH = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'data', 'prices.db')
 
+# Each worker thread keeps one read-only connection per database and reuses
+# it across requests. The collector writes through its own connection; with
+# WAL enabled (see PriceDatabase) readers never wait for it.
+_thread_local = threading.local()
+
 def get_db_connection():
-    """Create a database connection."""
-    conn = sqlite3.connect(DB_PATH)
-    conn.row_factory = sqlite3.Row
+    """Get this thread's read-only database connection, opening it on first use."""
+    connections = getattr(_thread_local, 'connections', None)
+    if connections is None:
+        connections = _thread_local.connections = {}
+    conn = connections.get(DB_PATH)
+    if conn is None:
+        conn = query_profiler.connect(DB_PATH)
+        conn.row_factory = sqlite3.Row
+        conn.execute("PRAGMA query_only = ON")
+        connections[DB_PATH] = conn
     return conn
 
+# Optional in-memory series (see src/series_store.py): loaded once per
+# process on first use, then refreshed with new rows before each build
+SERIES_STORE_ENABLED = os.environ.get('DASHBOARD_SERIES_STORE') == '1'
+_series_stores = {}
+_series_stores_lock = threading.Lock()
+
+def get_series_store(conn):
+    """This process's SeriesStore for DB_PATH, or None when disabled."""
+    if not SERIES_STORE_ENABLED:
+        return None
+    with _series_stores_lock:
+        store = _series_stores.get(DB_PATH)
+        if store is None:
+            store = _series_stores[DB_PATH] = SeriesStore.load(conn)
+            info = store.describe()
+            app.logger.info("Series store: %s observations in %s series, loaded in %.2fs, %.1f MB",
+                            f"{info['observations']:,}", f"{info['series']:,}",
+                            info['loadSeconds'], info['memoryBytes'] / 1e6)
+    return store
+
+def with_series_store(build):
+    """
+    Adapt build(conn, store) for cached_json_response().
+
+    With the store enabled, it is brought up to date and locked for the
+    duration of the build; otherwise build gets None and reads SQLite.
+    """
+    def build_payload(conn):
+        store = get_series_store(conn)
+        if store is None:
+            return build(conn, None)
+        with store.lock:
+            store.refresh(conn)
+            return build(conn, store)
+    return build_payload
+
+# Encoded responses keyed by endpoint, valid while data_version() is unchanged
+RESPONSE_CACHE_SIZE = 64
+_response_cache = OrderedDict()
+_response_cache_lock = threading.Lock()
+
+def _encode_entry(version, payload):
+    """Serialize a payload once and precompute its compressed forms."""
+    body = dumps(payload)
+    entry = {
+        'version': version,
+        'etag': '"' + hashlib.sha1(body).hexdigest()[:20] + '"',
+        'identity': body,
+    }
+    for encoding in encodings():
+        entry[encoding] = compress(body, encoding)
+    return entry
+
+def _etag_matches(etag):
+    """Check the request's If-None-Match header against an ETag."""
+    header = request.headers.get('If-None-Match', '')
+    candidates = {tag.strip() for tag in header.split(',')}
+    return '*' in candidates or etag in candidates or f'W/{etag}' in candidates
+
+def _preferred_encoding(available):
+    """
+    Pick the best precomputed encoding the client accepts.
+
+    Accept-Encoding q-values decide (q=0 refuses an encoding, '*' matches
+    any); ties go to br, then gzip, then the uncompressed body.
+
+    Args:
+        available: Container of the encodings on hand (e.g. a cache entry)
+    """
+    offered = [encoding for encoding in ('br', 'gzip') if encoding in available]
+    return request.accept_encodings.best_match(offered + ['identity']) or 'identity'
+
+def cached_json_response(cache_key, build):
+    """
+    Serve a JSON payload from the response cache.
+
+    The cache entry is rebuilt only when the database's data version changes
+    (new prices or product edits). Clients sending a matching If-None-Match
+    get a 304 without a body.
+
+    Args:
+        cache_key: Identifies the endpoint and its parameters
+        build: Callable taking a connection and returning the payload
+    """
+    conn = get_db_connection()
+    version = data_version(conn)
+    with _response_cache_lock:
+        entry = _response_cache.get(cache_key)
+        if entry is not None:
+            _response_cache.move_to_end(cache_key)
+
+    if entry is None or entry['version'] != version:
+        entry = _encode_entry(version, build(conn))
+        with _response_cache_lock:
+            _response_cache[cache_key] = entry
+            _response_cache.move_to_end(cache_key)
+            while len(_response_cache) > RESPONSE_CACHE_SIZE:
+                _response_cache.popitem(last=False)
+
+    headers = {
+        'ETag': entry['etag'],
+        'Cache-Control': 'no-cache',
+        'Vary': 'Accept-Encoding',
+    }
+    if _etag_matches(entry['etag']):
+        return Response(status=304, headers=headers)
+
+    encoding = _preferred_encoding(entry)
+    if encoding != 'identity':
+        headers['Content-Encoding'] = encoding
+    return Response(entry[encoding], mimetype='application/json', headers=headers)
+
+@app.route('/api/debug/query-stats')
+def get_query_stats():
+    """
+    Per-statement SQL timings collected since startup.
+    Only available when profiling is enabled (PRICE_DB_PROFILE=1).
+    Pass ?reset=1 to clear the counters after reading them.
+    """
+    if not query_profiler.profiling_enabled():
+        return jsonify({'error': 'Query profiling is disabled'}), 404
+
+    profiler = query_profiler.get_profiler()
+    queries = profiler.summary()
+    if request.args.get('reset'):
+        profiler.reset()
+
+    return jsonify({'slowMs': profiler.slow_ms, 'queries': queries})
+
+@app.route('/api/debug/series-store')
+def get_series_store_stats():
+    """
+    Load time and memory of the in-memory series store.
+    Only available when it is enabled (DASHBOARD_SERIES_STORE=1).
+    """
+    store = get_series_store(get_db_connection())
+    if store is None:
+        return jsonify({'error': 'Series store is disabled'}), 404
+    return jsonify(store.describe())
+
+class BadRequest(ValueError):
+    """Invalid query parameter."""
+
+class NotFound(LookupError):
+    """Requested item doesn't exist."""
+
+def _int_arg(name, default=None, minimum=None):
+    """Read an optional integer query parameter."""
+    value = request.args.get(name)
+    if value in (None, ''):
+        return default
+    try:
+        value = int(value)
+    except ValueError:
+        raise BadRequest(f"'{name}' must be an integer")
+    if minimum is not None and value < minimum:
+        raise BadRequest(f"'{name}' must be at least {minimum}")
+    return value
+
+def _format_arg():
+    """Read the optional 'format' query parameter (rows or columnar)."""
+    fmt = request.args.get('format') or 'rows'
+    if fmt not in FORMATS:
+        raise BadRequest(f"'format' must be one of {', '.join(FORMATS)}")
+    return fmt
+
+def _date_arg(name):
+    """Read an optional ISO date/time query parameter."""
+    value = request.args.get(name)
+    if not value:
+        return None
+    try:
+        datetime.fromisoformat(value)
+    except ValueError:
+        raise BadRequest(f"'{name}' must be an ISO date, e.g. 2025-01-31")
+    return value
+
 @app.route('/api/dashboard-data')
 def get_dashboard_data():
     """
     Get all price data formatted for the dashboard.
     Returns products grouped by brand with price history and statistics.
+
+    Query parameters:
+        points: Downsample each chart series to at most this many points
+                (LTTB, always keeping the true high and low)
+        from, to: Only chart observations within this ISO date range
+        format: rows (default) or columnar - chart series as parallel
+                't' (epoch ms) and 'price' arrays
+    """
+    try:
+        points = _int_arg('points', minimum=MIN_BUDGET)
+        start = _date_arg('from')
+        end = _date_arg('to')
+        columnar = _format_arg() == 'columnar'
+        return cached_json_response(
+            ('dashboard-data', points, start, end, columnar),
+            with_series_store(lambda conn, store: build_dashboard_data(
+                conn, points, start, end, columnar, store=store))
+        )
+
+    except BadRequest as e:
+        return jsonify({'error': str(e)}), 400
+
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+MAX_PER_PAGE = 200
+
+@app.route('/api/catalog')
+def get_catalog():
+    """
+    Lightweight product list: summary stats only, no charts or retailer tables.
+
+    Query parameters:
+        brand, category: Only products of this brand / category
+        q: Search product names, IDs and UPCs
+        sort: savings (default, highest first), price (lowest first) or name
+        order: asc or desc, overriding the sort's default direction
+        page, per_page: Pagination (per_page defaults to 50, max 200)
+    """
+    try:
+        brand = request.args.get('brand') or None
+        category = request.args.get('category') or None
+        search = (request.args.get('q') or '').strip() or None
+        sort = request.args.get('sort') or 'savings'
+        if sort not in CATALOG_SORTS:
+            raise BadRequest(f"'sort' must be one of {', '.join(CATALOG_SORTS)}")
+        order = request.args.get('order')
+        if order not in (None, '', 'asc', 'desc'):
+            raise BadRequest("'order' must be asc or desc")
+        descending = None if not order else order == 'desc'
+        page = _int_arg('page', default=1, minimum=1)
+        per_page = min(_int_arg('per_page', default=50, minimum=1), MAX_PER_PAGE)
+        return cached_json_response(
+            ('catalog', brand, category, search, sort, descending, page, per_page),
+            with_series_store(lambda conn, store: build_catalog(
+                conn, brand, category, search, sort, descending, page, per_page, store=store))
+        )
+
+    except BadRequest as e:
+        return jsonify({'error': str(e)}), 400
+
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/api/products/<product_id>')
+def get_product_detail(product_id):
+    """
+    Retailer stats and chart series for one product.
+
+    Query parameters:
+        points, from, to, format: As for /api/dashboard-data
+    """
+    try:
+        points = _int_arg('points', minimum=MIN_BUDGET)
+        start = _date_arg('from')
+        end = _date_arg('to')
+        columnar = _format_arg() == 'columnar'
+
+        def build(conn, store):
+            product = build_product_detail(conn, product_id, points, start, end,
+                                           columnar=columnar, store=store)
+            if product is None:
+                raise NotFound(f"No price data for product '{product_id}'")
+            return {'product': product}
+
+        return cached_json_response(('product', product_id, points, start, end, columnar),
+                                    with_series_store(build))
+
+    except BadRequest as e:
+        return jsonify({'error': str(e)}), 400
+
+    except NotFound as e:
+        return jsonify({'error': str(e)}), 404
+
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/api/updates')
+def get_updates():
+    """
+    Observations added since a cursor, for dashboards that stay open.
+
+    Query parameters:
+        since: Cursor from /api/catalog or a previous /api/updates response
+               (a price_history rowid), or an ISO timestamp for a first sync
+               from a point in time. Required.
+        limit: Max observations per response (default and max 5000); when
+               'more' is true, call again with the new cursor right away
     """
     try:
-        conn = get_db_connection()
-        cursor = conn.cursor()
-
-        # Get all products
-        cursor.execute('SELECT * FROM products')
-        products = cursor.fetchall()
-
-        if not products:
-            return jsonify({'brands': []})
-
-        brands_data = defaultdict(lambda: {'name': '', 'products': [], 'bestRetailer': ''})
-
-        for product in products:
-            product_id = product['id']
-            product_name = product['name']
-
-            # Get brand name from brand field, fallback to first word of product name
-            brand_name = product['brand'] if product['brand'] else product_name.split()[0]
-
-            # Get price history for this product
-            cursor.execute('''
-                SELECT retailer_id, price, timestamp
-                FROM price_history
-                WHERE product_id = ?
-                ORDER BY timestamp ASC
-            ''', (product_id,))
-            price_history = cursor.fetchall()
-
-            if not price_history:
-                continue
-
-            # Group prices by retailer
-            retailer_prices = defaultdict(list)
-            for record in price_history:
-                retailer_prices[record['retailer_id']].append({
-                    'price': record['price'],
-                    'date': record['timestamp']
-                })
-
-            # Calculate statistics for each retailer
-            retailers_stats = []
-            chart_data = []
-
-            for retailer_id, prices in retailer_prices.items():
-                if not prices:
-                    continue
-
-                price_values = [p['price'] for p in prices]
-                high_price = max(price_values)
-                low_price = min(price_values)
-                avg_price = sum(price_values) / len(price_values)
-
-                # Get dates for high and low prices
-                high_date = next(p['date'] for p in prices if p['price'] == high_price)
-                low_date = next(p['date'] for p in prices if p['price'] == low_price)
-
-                # Get retailer URL
-                url_column = f'{retailer_id}_url'
-                retailer_url = product[url_column] if url_column in product.keys() else '#'
-
-                retailers_stats.append({
-                    'name': retailer_id,
-                    'high': high_price,
-                    'highDate': high_date,
-                    'low': low_price,
-                    'lowDate': low_date,
-                    'avg': avg_price,
-                    'url': retailer_url or '#'
-                })
-
-                # Add to chart data
-                chart_data.append({
-                    'retailer': retailer_id,
-                    'prices': [{'date': p['date'], 'price': p['price']} for p in prices]
-                })
-
-            # Find best average price
-            if retailers_stats:
-                best_retailer = min(retailers_stats, key=lambda x: x['avg'])
-
-                product_data = {
-                    'id': product_id,
-                    'name': product_name,
-                    'brand': brand_name,
-                    'bestAvgPrice': best_retailer['avg'],
-                    'bestRetailer': best_retailer['name'].capitalize(),
-                    'retailers': sorted(retailers_stats, key=lambda x: x['avg']),
-                    'chartData': chart_data
-                }
-
-                brands_data[brand_name]['name'] = brand_name
-                brands_data[brand_name]['products'].append(product_data)
-
-                # Determine overall best retailer for the brand
-                # (for simplicity, using the best for this product)
-                if not brands_data[brand_name]['bestRetailer']:
-                    brands_data[brand_name]['bestRetailer'] = best_retailer['name'].capitalize()
-
-        conn.close()
-
-        # Convert to list format
-        brands_list = list(brands_data.values())
-
-        return jsonify({'brands': brands_list})
+        since = request.args.get('since', '').strip()
+        if not since:
+            raise BadRequest("'since' is required")
+        if since.isdigit():
+            since_id, since_time = int(since), None
+        else:
+            since_id, since_time = None, _date_arg('since')
+        limit = min(_int_arg('limit', default=MAX_UPDATE_ROWS, minimum=1), MAX_UPDATE_ROWS)
+
+        build = with_series_store(lambda conn, store: build_updates(conn, since_id, since_time, limit,
+                                                                    store=store))
+        return jsonify(build(get_db_connection()))
+
+    except BadRequest as e:
+        return jsonify({'error': str(e)}), 400
 
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
+@app.route('/api/products/<product_id>/history')
+def get_product_history(product_id):
+    """
+    A product's price history aggregated into time buckets.
+
+    Query parameters:
+        bucket: raw, hour, day (default), week or month
+        from, to: Only observations within this ISO date range
+        retailer: Only this retailer
+        format: rows (default) or columnar
+    """
+    try:
+        bucket = request.args.get('bucket') or 'day'
+        if bucket not in BUCKETS:
+            raise BadRequest(f"'bucket' must be one of {', '.join(BUCKETS)}")
+        start = _date_arg('from')
+        end = _date_arg('to')
+        retailer_id = (request.args.get('retailer') or '').strip().lower() or None
+        columnar = _format_arg() == 'columnar'
+
+        def build(conn):
+            if conn.execute("SELECT 1 FROM products WHERE id = ?", (product_id,)).fetchone() is None:
+                raise NotFound(f"Unknown product '{product_id}'")
+            return build_history(conn, product_id, retailer_id, start, end, bucket, columnar)
+
+        return cached_json_response(
+            ('history', product_id, retailer_id, start, end, bucket, columnar), build)
+
+    except BadRequest as e:
+        return jsonify({'error': str(e)}), 400
+
+    except NotFound as e:
+        return jsonify({'error': str(e)}), 404
+
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/api/products/<product_id>/best-price')
+def get_product_best_price(product_id):
+    """
+    The cheapest retailer and price over time, with the spread between
+    retailers and each retailer's share of time as the cheapest. Every
+    retailer's last known price is carried forward onto a shared grid.
+
+    Query parameters:
+        bucket: raw, hour, day (default), week or month
+        from, to: Only grid points within this ISO date range
+        format: rows (default) or columnar
+    """
+    try:
+        bucket = request.args.get('bucket') or 'day'
+        if bucket not in BUCKETS:
+            raise BadRequest(f"'bucket' must be one of {', '.join(BUCKETS)}")
+        start = _date_arg('from')
+        end = _date_arg('to')
+        columnar = _format_arg() == 'columnar'
+
+        def build(conn):
+            if conn.execute("SELECT 1 FROM products WHERE id = ?", (product_id,)).fetchone() is None:
+                raise NotFound(f"Unknown product '{product_id}'")
+            return build_best_prices(conn, product_id, start, end, bucket, columnar)
+
+        return cached_json_response(('best-price', product_id, start, end, bucket, columnar), build)
+
+    except BadRequest as e:
+        return jsonify({'error': str(e)}), 400
+
+    except NotFound as e:
+        return jsonify({'error': str(e)}), 404
+
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/api/analytics')
+def get_analytics():
+    """
+    Rolling means, volatility, percentiles and time-at-price per series,
+    as of the last analytics refresh (see src/analytics.py).
+
+    Query parameters:
+        product: Only this product
+        retailer: Only this retailer
+        cheap: 1 to list only series priced within their cheapest 10% of days
+    """
+    try:
+        product_id = (request.args.get('product') or '').strip() or None
+        retailer_id = (request.args.get('retailer') or '').strip().lower() or None
+        cheap_only = request.args.get('cheap') in ('1', 'true')
+
+        def build(conn):
+            if product_id is not None and conn.execute(
+                    "SELECT 1 FROM products WHERE id = ?", (product_id,)).fetchone() is None:
+                raise NotFound(f"Unknown product '{product_id}'")
+            return build_analytics(conn, product_id, retailer_id, cheap_only)
+
+        # The table is refreshed after collection runs, independently of data_version()
+        version = analytics_version(get_db_connection())
+        return cached_json_response(('analytics', version, product_id, retailer_id, cheap_only), build)
+
+    except NotFound as e:
+        return jsonify({'error': str(e)}), 404
+
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+MAX_SALE_CLAIMS = 1000
+
+@app.route('/api/sales')
+def get_sales():
+    """
+    Advertised discounts checked against trailing 30/60/90-day median and
+    modal prices (see src/fake_sales.py), with verdict counts per retailer.
+
+    Query parameters:
+        product: Only this product
+        retailer: Only this retailer
+        verdict: genuine, inflated, fictitious or unverified
+        limit: Max claims listed, newest first (default 100, max 1000)
+    """
+    try:
+        product_id = (request.args.get('product') or '').strip() or None
+        retailer_id = (request.args.get('retailer') or '').strip().lower() or None
+        verdict = request.args.get('verdict') or None
+        if verdict is not None and verdict not in VERDICTS:
+            raise BadRequest(f"'verdict' must be one of {', '.join(VERDICTS)}")
+        limit = min(_int_arg('limit', default=100, minimum=1), MAX_SALE_CLAIMS)
+
+        def build(conn):
+            if product_id is not None and conn.execute(
+                    "SELECT 1 FROM products WHERE id = ?", (product_id,)).fetchone() is None:
+                raise NotFound(f"Unknown product '{product_id}'")
+            return build_sale_report(conn, product_id, retailer_id, verdict, limit)
+
+        return cached_json_response(('sales', product_id, retailer_id, verdict, limit), build)
+
+    except BadRequest as e:
+        return jsonify({'error': str(e)}), 400
+
+    except NotFound as e:
+        return jsonify({'error': str(e)}), 404
+
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/api/seasonality')
+def get_seasonality():
+    """
+    Recurring low-price months and weekdays per series and per category,
+    as of the last seasonality refresh (see src/seasonality.py).
+
+    Query parameters:
+        product: Only this product's series (and its category)
+        category: Only this category
+    """
+    try:
+        product_id = (request.args.get('product') or '').strip() or None
+        category = (request.args.get('category') or '').strip() or None
+
+        def build(conn):
+            if product_id is not None and conn.execute(
+                    "SELECT 1 FROM products WHERE id = ?", (product_id,)).fetchone() is None:
+                raise NotFound(f"Unknown product '{product_id}'")
+            return build_seasonality(conn, product_id, category)
+
+        return cached_json_response(('seasonality', product_id, category), build)
+
+    except NotFound as e:
+        return jsonify({'error': str(e)}), 404
+
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/api/forecasts')
+def get_forecasts():
+    """
+    "Buy now or wait?" per series: expected price and the chance of a
+    lower one within 7, 30 and 60 days, with the accuracy of past
+    forecasts, as of the last forecast refresh (see src/forecasts.py).
+
+    Query parameters:
+        product: Only this product
+        retailer: Only this retailer
+        horizon: Only this horizon (7, 30 or 60 days)
+        recommendation: buy or wait
+    """
+    try:
+        product_id = (request.args.get('product') or '').strip() or None
+        retailer_id = (request.args.get('retailer') or '').strip().lower() or None
+        horizon = _int_arg('horizon', default=None, minimum=1)
+        if horizon is not None and horizon not in HORIZONS:
+            raise BadRequest(f"'horizon' must be one of {', '.join(map(str, HORIZONS))}")
+        recommendation = request.args.get('recommendation') or None
+        if recommendation is not None and recommendation not in RECOMMENDATIONS:
+            raise BadRequest(f"'recommendation' must be one of {', '.join(RECOMMENDATIONS)}")
+
+        def build(conn):
+            if product_id is not None and conn.execute(
+                    "SELECT 1 FROM products WHERE id = ?", (product_id,)).fetchone() is None:
+                raise NotFound(f"Unknown product '{product_id}'")
+            return build_forecasts(conn, product_id, retailer_id, horizon, recommendation)
+
+        # Forecasts are refreshed after collection runs, independently of data_version()
+        version = forecast_version(get_db_connection())
+        return cached_json_response(('forecasts', version, product_id, retailer_id, horizon,
+                                     recommendation), build)
+
+    except BadRequest as e:
+        return jsonify({'error': str(e)}), 400
+
+    except NotFound as e:
+        return jsonify({'error': str(e)}), 404
+
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+MAX_UNIT_PRICE_OFFERS = 200
+
+@app.route('/api/unit-prices')
+def get_unit_prices():
+    """
+    Cheapest current offers per unit of size across all products and
+    retailers, e.g. the best value per ounce.
+
+    Query parameters:
+        unit: oz (default), fl oz, lb, g, kg, mg, ml, l or ct
+        category: Only this category
+        limit: Offers returned (default 20, max 200)
+    """
+    try:
+        unit = (request.args.get('unit') or 'oz').strip().lower()
+        if unit not in UNITS:
+            raise BadRequest(f"'unit' must be one of {', '.join(UNITS)}")
+        category = (request.args.get('category') or '').strip() or None
+        limit = min(_int_arg('limit', default=20, minimum=1), MAX_UNIT_PRICE_OFFERS)
+
+        return cached_json_response(('unit-prices', unit, category, limit),
+                                    lambda conn: build_unit_prices(conn, unit, category, limit))
+
+    except BadRequest as e:
+        return jsonify({'error': str(e)}), 400
+
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+# Live stream: how often each connection checks the change feed, and how
+# long it may stay silent before sending a keep-alive comment
+STREAM_POLL_SECONDS = 1.0
+STREAM_HEARTBEAT_SECONDS = 15.0
+
+def _sse(event, data, event_id):
+    """Format one Server-Sent Events message."""
+    payload = dumps(data).decode('utf-8')
+    return f"id: {event_id}\nevent: {event}\ndata: {payload}\n\n"
+
+def _stream_cursors():
+    """
+    Starting (price, event) cursors for a stream.
+
+    A reconnecting EventSource sends the last message ID it received
+    ("<price cursor>-<event cursor>"); otherwise ?since= gives the price
+    cursor. Missing cursors mean "from now".
+    """
+    last_event_id = request.headers.get('Last-Event-ID', '')
+    if last_event_id:
+        price_cursor, _, event_cursor = last_event_id.partition('-')
+        if price_cursor.isdigit() and event_cursor.isdigit():
+            return int(price_cursor), int(event_cursor)
+    since = request.args.get('since', '').strip()
+    if since and not since.isdigit():
+        raise BadRequest("'since' must be a cursor from /api/catalog or /api/updates")
+    return (int(since) if since else None), None
+
+def stream_changes(price_cursor=None, event_cursor=None):
+    """
+    Yield SSE messages for new prices, deal flag changes and run progress.
+
+    'prices' messages carry the same payload as /api/updates; 'deal' and
+    'run' messages carry change feed events (see src/change_feed.py).
+    """
+    # The stream occupies its worker thread, so it uses that thread's connection
+    conn = get_db_connection()
+    if price_cursor is None:
+        price_cursor = latest_cursor(conn)
+    if event_cursor is None:
+        event_cursor = latest_event_id(conn)
+
+    yield "retry: 5000\n\n"
+    silent = 0.0
+    while True:
+        updates = with_series_store(
+            lambda conn, store: build_updates(conn, since_id=price_cursor, store=store))(conn)
+        price_cursor = updates['cursor']
+        if updates['series']:
+            yield _sse('prices', updates, f"{price_cursor}-{event_cursor}")
+
+        events = read_events(conn, event_cursor)
+        for event in events:
+            event_cursor = event['id']
+            yield _sse(event['kind'], event, f"{price_cursor}-{event_cursor}")
+
+        if updates['series'] or events:
+            silent = 0.0
+        elif silent >= STREAM_HEARTBEAT_SECONDS:
+            yield ": keep-alive\n\n"
+            silent = 0.0
+
+        if not updates['more']:
+            time.sleep(STREAM_POLL_SECONDS)
+            silent += STREAM_POLL_SECONDS
+
+@app.route('/api/stream')
+def get_stream():
+    """
+    Server-Sent Events stream of changes, replacing polling and reloads.
+
+    Query parameters:
+        since: Price cursor from /api/catalog to start from (defaults to now)
+    """
+    try:
+        price_cursor, event_cursor = _stream_cursors()
+    except BadRequest as e:
+        return jsonify({'error': str(e)}), 400
+
+    return Response(stream_changes(price_cursor, event_cursor), mimetype='text/event-stream',
+                    headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
+STATIC_DIR = os.path.dirname(os.path.abspath(__file__))
+# Versioned assets (?v=<content hash>) never change, so browsers may keep
+# them for a year; anything else (logos) is revalidated daily
+VERSIONED_MAX_AGE = 365 * 24 * 3600
+STATIC_MAX_AGE = 24 * 3600
+VERSIONED_ASSETS = ('styles.css', 'app.js')
+
+_index_cache = {}
+
+def _asset_version(filename):
+    """Short content hash of a static file."""
+    with open(os.path.join(STATIC_DIR, filename), 'rb') as f:
+        return hashlib.sha1(f.read()).hexdigest()[:12]
+
+def render_index():
+    """index.html with versioned asset URLs, rebuilt when any file changes."""
+    paths = ('index.html',) + VERSIONED_ASSETS
+    key = tuple(os.path.getmtime(os.path.join(STATIC_DIR, path)) for path in paths)
+    html = _index_cache.get(key)
+    if html is None:
+        with open(os.path.join(STATIC_DIR, 'index.html'), encoding='utf-8') as f:
+            html = f.read()
+        for asset in VERSIONED_ASSETS:
+            versioned = f'{asset}?v={_asset_version(asset)}'
+            html = html.replace(f'href="{asset}"', f'href="{versioned}"')
+            html = html.replace(f'src="{asset}"', f'src="{versioned}"')
+        _index_cache.clear()
+        _index_cache[key] = html
+    return html
+
 @app.route('/')
 def serve_index():
     """Serve the dashboard HTML."""
-    return send_from_directory(os.path.dirname(__file__), 'index.html')
+    return Response(render_index(), mimetype='text/html',
+                    headers={'Cache-Control': 'no-cache'})
+
+# Snapshot files (see src/snapshot.py) are content-hashed like versioned
+# assets; only the manifest changes in place
+SNAPSHOT_PREFIX = 'snapshot/'
+SNAPSHOT_MANIFEST = SNAPSHOT_PREFIX + 'manifest.json'
+_PRECOMPRESSED = (('br', '.br'), ('gzip', '.gz'))
+
+def serve_snapshot(path):
+    """Serve a snapshot file, using its precompressed copy when accepted."""
+    if path == SNAPSHOT_MANIFEST:
+        response = send_from_directory(STATIC_DIR, path, max_age=0)
+        response.headers['Cache-Control'] = 'no-cache'
+        return response
+
+    suffixes = {encoding: suffix for encoding, suffix in _PRECOMPRESSED
+                if os.path.isfile(os.path.join(STATIC_DIR, path + suffix))}
+    encoding = _preferred_encoding(suffixes)
+    if encoding != 'identity':
+        response = send_from_directory(STATIC_DIR, path + suffixes[encoding], mimetype='application/json',
+                                       max_age=VERSIONED_MAX_AGE)
+        response.headers['Content-Encoding'] = encoding
+    else:
+        response = send_from_directory(STATIC_DIR, path, max_age=VERSIONED_MAX_AGE)
+    response.headers['Vary'] = 'Accept-Encoding'
+    response.cache_control.immutable = True
+    return response
 
 @app.route('/<path:path>')
 def serve_static(path):
-    """Serve static files (CSS, JS)."""
-    return send_from_directory(os.path.dirname(__file__), path)
+    """Serve static files (CSS, JS, images) and the data snapshot."""
+    if path.startswith(SNAPSHOT_PREFIX):
+        return serve_snapshot(path)
+    if request.args.get('v'):
+        response = send_from_directory(STATIC_DIR, path, max_age=VERSIONED_MAX_AGE)
+        response.cache_control.immutable = True
+        return response
+    return send_from_directory(STATIC_DIR, path, max_age=STATIC_MAX_AGE)
 
 if __name__ == '__main__':
-    print(f"Starting Price Intelligence Dashboard API...")
+    # Development server. For production use the WSGI entry point:
+    #     gunicorn -c gunicorn.conf.py wsgi:application
+    debug = os.environ.get('DASHBOARD_DEBUG') == '1'
+    print(f"Starting Price Intelligence Dashboard API (development server)...")
     print(f"Database: {DB_PATH}")
     print(f"Dashboard will be available at: http://localhost:5001")
-    app.run(debug=True, host='0.0.0.0', port=5001)
+    app.run(debug=debug, host='0.0.0.0', port=5001, threaded=True)
@@ -7,49 +7,155 @@ const RETAILER_COLORS = {
     'walmart': '#0071CE'
 };
 
+// Max points per chart line; the API downsamples longer histories
+// while keeping each retailer's true high and low
+const CHART_POINTS_BUDGET = 200;
+
+// How often an open dashboard polls for new prices when the browser
+// doesn't support Server-Sent Events
+const UPDATE_INTERVAL_MS = 60000;
+
 // Store chart instances for cleanup
 const chartInstances = {};
 
+// Rendered product rows by product ID, for merging updates in place
+const productViews = {};
+
+// Delta sync cursor (a price_history rowid) from the catalog / last update
+let syncCursor = null;
+
 // Initialize dashboard on page load
 document.addEventListener('DOMContentLoaded', async () => {
     await loadDashboard();
     setupModalListeners();
+    if (window.EventSource) {
+        openChangeStream();
+    } else {
+        scheduleUpdates();
+    }
 });
 
-// Load dashboard data
+// Catalog page size; the dashboard walks every page on load
+const CATALOG_PAGE_SIZE = 200;
+
+// Static snapshot written by collect_prices.py (see src/snapshot.py). When
+// present, the page loads from these files and needs no API.
+const SNAPSHOT_URL = 'snapshot/';
+
+// The snapshot manifest, or null to load everything from the API
+let snapshot = null;
+
+// Load the product catalog (summaries only) and render collapsed brands
 async function loadDashboard() {
     const dashboard = document.getElementById('dashboard');
     dashboard.innerHTML = '<div class="loading">Loading price data...</div>';
 
     try {
-        const response = await fetch('/api/dashboard-data');
-
-        if (!response.ok) {
-            throw new Error(`HTTP error! status: ${response.status}`);
-        }
-
-        const data = await response.json();
+        snapshot = await fetchSnapshotManifest();
+        const products = snapshot ? await fetchSnapshotCatalog() : await fetchCatalog();
 
         dashboard.innerHTML = '';
 
-        if (!data.brands || data.brands.length === 0) {
+        if (products.length === 0) {
             dashboard.innerHTML = '<div class="loading">No price data available yet. Please check back after the first data collection run.</div>';
             return;
         }
 
-        // Render each brand container
-        data.brands.forEach(brand => {
-            renderBrandContainer(brand, dashboard);
+        // Group by brand, keeping the catalog's savings order
+        const brands = new Map();
+        products.forEach(product => {
+            if (!brands.has(product.brand)) {
+                brands.set(product.brand, { name: product.brand, products: [] });
+            }
+            brands.get(product.brand).products.push(product);
+        });
+
+        // Render each brand container; only the first starts expanded
+        let first = true;
+        brands.forEach(brand => {
+            renderBrandContainer(brand, dashboard, first);
+            first = false;
         });
 
     } catch (error) {
         console.error('Error loading dashboard:', error);
-        dashboard.innerHTML = `<div class="loading" style="color: #d32f2f;">Error loading data: ${error.message}<br><br>Make sure the API server is running.</div>`;
+        dashboard.innerHTML = `<div class="loading" style="color: #d32f2f;">Error loading data: ${error.message}<br><br>Make sure the API server is running or a snapshot has been written (python -m src.snapshot).</div>`;
+    }
+}
+
+// Fetch JSON, failing on HTTP errors
+async function fetchJson(url, options) {
+    const response = await fetch(url, options);
+    if (!response.ok) {
+        throw new Error(`HTTP error! status: ${response.status}`);
     }
+    return response.json();
+}
+
+// The snapshot manifest, or null if no snapshot has been written
+async function fetchSnapshotManifest() {
+    try {
+        return await fetchJson(`${SNAPSHOT_URL}manifest.json`, { cache: 'no-cache' });
+    } catch (error) {
+        return null;
+    }
+}
+
+// Every product summary from the snapshot, in one file
+async function fetchSnapshotCatalog() {
+    const data = await fetchJson(SNAPSHOT_URL + snapshot.files.catalog);
+    syncCursor = data.cursor;
+    return data.products;
+}
+
+// Fetch every page of the catalog
+async function fetchCatalog() {
+    const products = [];
+    let page = 1;
+    let pages = 1;
+    do {
+        const data = await fetchJson(`/api/catalog?per_page=${CATALOG_PAGE_SIZE}&page=${page}`);
+        products.push(...data.products);
+        pages = data.pages;
+        if (page === 1) {
+            syncCursor = data.cursor;
+        }
+        page++;
+    } while (page <= pages);
+    return products;
 }
 
-// Render a brand container with its products
-function renderBrandContainer(brand, container) {
+// Fetch chart and retailer data for one product
+async function fetchProductDetail(productId) {
+    const file = snapshot && snapshot.products[productId];
+    const data = file
+        ? await fetchJson(SNAPSHOT_URL + file.split('/').map(encodeURIComponent).join('/'))
+        : await fetchJson(`/api/products/${encodeURIComponent(productId)}?points=${CHART_POINTS_BUDGET}&format=columnar`);
+    return expandColumnar(data.product);
+}
+
+// Turn columnar chart series ('t' epoch ms + 'price' arrays) back into
+// {date, price} points. Epoch values encode the stored wall-clock time as
+// UTC, so the ISO string is rebuilt in UTC without a zone suffix.
+function expandColumnar(product) {
+    product.chartData = product.chartData.map(series => ({
+        retailer: series.retailer,
+        prices: series.t.map((t, i) => ({
+            date: new Date(t).toISOString().slice(0, 23),
+            price: series.price[i]
+        }))
+    }));
+    return product;
+}
+
+// Millisecond-precision key for an ISO date, so points from columnar and
+// row payloads compare equal
+function dateKey(date) {
+    return (date + '.000').slice(0, 23);
+}
+
+// Render a brand container; its products load the first time it is expanded
+function renderBrandContainer(brand, container, expanded) {
     const template = document.getElementById('brand-container-template');
     const brandElement = template.content.cloneNode(true);
 
@@ -59,19 +165,171 @@ function renderBrandContainer(brand, container) {
 
     brandName.textContent = brand.name;
 
+    let loaded = false;
+    const expand = () => {
+        productsWrapper.classList.remove('collapsed');
+        collapseToggle.classList.remove('collapsed');
+        if (!loaded) {
+            loaded = true;
+            loadBrandProducts(brand, productsWrapper);
+        }
+    };
+
     // Add collapse functionality
     const brandHeader = brandElement.querySelector('.brand-header');
     brandHeader.addEventListener('click', () => {
-        productsWrapper.classList.toggle('collapsed');
-        collapseToggle.classList.toggle('collapsed');
+        if (productsWrapper.classList.contains('collapsed')) {
+            expand();
+        } else {
+            productsWrapper.classList.add('collapsed');
+            collapseToggle.classList.add('collapsed');
+        }
+    });
+
+    container.appendChild(brandElement);
+
+    if (expanded) {
+        expand();
+    } else {
+        productsWrapper.classList.add('collapsed');
+        collapseToggle.classList.add('collapsed');
+    }
+}
+
+// Fetch a brand's product details in parallel and render them in catalog order
+async function loadBrandProducts(brand, productsWrapper) {
+    productsWrapper.innerHTML = '<div class="loading">Loading products...</div>';
+    try {
+        const details = await Promise.all(brand.products.map(p => fetchProductDetail(p.id)));
+        productsWrapper.innerHTML = '';
+        details.forEach(product => {
+            renderProduct(product, productsWrapper);
+        });
+    } catch (error) {
+        console.error(`Error loading ${brand.name} products:`, error);
+        productsWrapper.innerHTML = `<div class="loading" style="color: #d32f2f;">Error loading products: ${error.message}</div>`;
+    }
+}
+
+// Subscribe to live changes. EventSource reconnects by itself and resumes
+// from the last message it received.
+function openChangeStream() {
+    if (syncCursor === null) {
+        return;
+    }
+    const stream = new EventSource(`/api/stream?since=${syncCursor}`);
+
+    stream.addEventListener('prices', (e) => {
+        const updates = JSON.parse(e.data);
+        applyUpdates(updates);
+        syncCursor = updates.cursor;
     });
 
-    // Render products
-    brand.products.forEach(product => {
-        renderProduct(product, productsWrapper);
+    stream.addEventListener('deal', (e) => {
+        const event = JSON.parse(e.data);
+        const view = productViews[event.productId];
+        if (view) {
+            view.deals[event.retailer] = event.isDeal;
+            renderRetailerRows(view);
+        }
     });
 
-    container.appendChild(brandElement);
+    stream.addEventListener('run', (e) => {
+        showRunStatus(JSON.parse(e.data));
+    });
+}
+
+// Show collection run progress in the header
+function showRunStatus(run) {
+    const status = document.getElementById('run-status');
+    if (run.status === 'started') {
+        status.textContent = `Collecting prices for ${run.total} products...`;
+    } else if (run.status === 'progress') {
+        status.textContent = `Collecting prices: ${run.done} of ${run.total} products`;
+    } else if (run.error) {
+        status.textContent = `Price collection failed ${formatDate(run.createdAt)} after ${run.attempts} prices: ${run.error}`;
+    } else {
+        status.textContent = `Prices updated ${formatDate(run.createdAt)}: ${run.successes} of ${run.attempts} prices collected`;
+    }
+    status.classList.remove('hidden');
+}
+
+// Poll for observations added since the last sync
+function scheduleUpdates() {
+    setTimeout(async () => {
+        try {
+            await fetchUpdates();
+        } catch (error) {
+            console.error('Error fetching updates:', error);
+        }
+        scheduleUpdates();
+    }, UPDATE_INTERVAL_MS);
+}
+
+// Fetch updates (following 'more' pages) and merge them into rendered products
+async function fetchUpdates() {
+    if (syncCursor === null) {
+        return;
+    }
+    let more;
+    do {
+        const response = await fetch(`/api/updates?since=${syncCursor}`);
+        if (!response.ok) {
+            throw new Error(`HTTP error! status: ${response.status}`);
+        }
+        const updates = await response.json();
+        applyUpdates(updates);
+        syncCursor = updates.cursor;
+        more = updates.more;
+    } while (more);
+}
+
+// Merge new chart points and refreshed stats into products already on screen.
+// Collapsed brands fetch fresh details when expanded, so they are skipped.
+function applyUpdates(updates) {
+    const touched = new Set();
+
+    updates.series.forEach(series => {
+        const view = productViews[series.productId];
+        if (!view) {
+            return;
+        }
+        let chartSeries = view.product.chartData.find(s => s.retailer === series.retailer);
+        if (!chartSeries) {
+            chartSeries = { retailer: series.retailer, prices: [] };
+            view.product.chartData.push(chartSeries);
+        }
+        // Details fetched after the cursor was issued may already hold these points
+        const known = new Set(chartSeries.prices.map(p => dateKey(p.date)));
+        series.prices.forEach(p => {
+            if (!known.has(dateKey(p.date))) {
+                chartSeries.prices.push(p);
+            }
+        });
+        chartSeries.prices.sort((a, b) => a.date.localeCompare(b.date));
+        touched.add(series.productId);
+    });
+
+    updates.products.forEach(stats => {
+        const view = productViews[stats.id];
+        if (!view) {
+            return;
+        }
+        Object.assign(view.product, stats);
+        view.bestPriceText.textContent = `$${stats.bestAvgPrice.toFixed(2)} at ${stats.bestRetailer}`;
+        view.productBestValue.textContent = `Overall best value: ${stats.bestRetailer} - consistently lowest average price`;
+        renderRetailerRows(view);
+        touched.add(stats.id);
+    });
+
+    touched.forEach(productId => {
+        const view = productViews[productId];
+        const chart = chartInstances[productId];
+        if (view && chart) {
+            chart.data.datasets = chartDatasets(view.product);
+            chart.update('none');
+        }
+    });
 }
 
 // Render a single product row
@@ -101,6 +359,16 @@ function renderProduct(product, container) {
     const bestPriceText = productElement.querySelector('.best-price-text');
     bestPriceText.textContent = `$${product.bestAvgPrice.toFixed(2)} at ${product.bestRetailer}`;
 
+    // Typical low season, precomputed by src/seasonality.py
+    const season = product.lowSeason;
+    if (season && season.label) {
+        const lowSeasonText = productElement.querySelector('.low-season-text');
+        const confidence = Math.max(season.monthConfidence || 0, season.weekdayConfidence || 0);
+        const scope = season.source === 'category' ? ' (category trend)' : '';
+        lowSeasonText.textContent = `Typical low season: ${season.label}${scope} · ${Math.round(confidence * 100)}% confidence`;
+        lowSeasonText.classList.remove('hidden');
+    }
+
     // Add savings calculator link
     const savingsLink = productElement.querySelector('.savings-link');
     savingsLink.addEventListener('click', (e) => {
@@ -129,6 +397,8 @@ function renderProduct(product, container) {
     // Get reference to the canvas before appending
     const canvas = productElement.querySelector('.price-chart');
 
+    productViews[product.id] = { product, bestPriceText, productBestValue, statsBody, deals: {} };
+
     // Append to DOM first
     container.appendChild(productElement);
 
@@ -153,18 +423,7 @@ function renderChart(canvas, product) {
     }
 
     // Prepare datasets for each retailer
-    const datasets = product.chartData.map(retailerData => ({
-        label: capitalizeFirst(retailerData.retailer),
-        data: retailerData.prices.map(p => ({
-            x: new Date(p.date),
-            y: p.price
-        })),
-        borderColor: RETAILER_COLORS[retailerData.retailer] || '#666',
-        backgroundColor: RETAILER_COLORS[retailerData.retailer] || '#666',
-        tension: 0.1,
-        pointRadius: 4,
-        pointHoverRadius: 6
-    }));
+    const datasets = chartDatasets(product);
 
     // Create chart
     let chart;
@@ -239,12 +498,37 @@ function renderChart(canvas, product) {
     }
 }
 
+// Chart.js datasets, one line per retailer
+function chartDatasets(product) {
+    return product.chartData.map(retailerData => ({
+        label: capitalizeFirst(retailerData.retailer),
+        data: retailerData.prices.map(p => ({
+            x: new Date(p.date),
+            y: p.price
+        })),
+        borderColor: RETAILER_COLORS[retailerData.retailer] || '#666',
+        backgroundColor: RETAILER_COLORS[retailerData.retailer] || '#666',
+        tension: 0.1,
+        pointRadius: 4,
+        pointHoverRadius: 6
+    }));
+}
+
+// Re-render a product's retailer table from its current stats
+function renderRetailerRows(view) {
+    view.statsBody.innerHTML = '';
+    view.product.retailers.forEach(retailer => {
+        renderRetailerRow(retailer, view.statsBody, view.deals[retailer.name]);
+    });
+}
+
 // Render retailer statistics row
-function renderRetailerRow(retailer, tbody) {
+function renderRetailerRow(retailer, tbody, isDeal) {
     const row = document.createElement('tr');
+    const dealBadge = isDeal ? ' <span class="deal-badge">Deal</span>' : '';
 
     row.innerHTML = `
-        <td><span class="retailer-name ${retailer.name.toLowerCase()}">${capitalizeFirst(retailer.name)}</span></td>
+        <td><span class="retailer-name ${retailer.name.toLowerCase()}">${capitalizeFirst(retailer.name)}</span>${dealBadge}</td>
         <td>
             $${retailer.high.toFixed(2)}
             <span class="price-date">${formatDate(retailer.highDate)}</span>
@@ -0,0 +1,45 @@
+"""
+Gunicorn settings for the dashboard API.
+
+    gunicorn -c gunicorn.conf.py wsgi:application
+
+Environment overrides:
+    DASHBOARD_BIND      Address to listen on (default 0.0.0.0:5001)
+    DASHBOARD_WORKERS   Worker processes (default 2 x CPUs + 1)
+    DASHBOARD_THREADS   Threads per worker (default 8)
+    DASHBOARD_PIDFILE   Write the master PID here, for reloads
+
+Graceful reload (new code, no dropped requests):
+    kill -HUP $(cat $DASHBOARD_PIDFILE)
+Workers finish their in-flight requests (up to graceful_timeout) before
+being replaced.
+"""
+import multiprocessing
+import os
+
+bind = os.environ.get('DASHBOARD_BIND', '0.0.0.0:5001')
+workers = int(os.environ.get('DASHBOARD_WORKERS', multiprocessing.cpu_count() * 2 + 1))
+
+# Threaded workers: each thread keeps its own read-only SQLite connection
+# (see get_db_connection in api.py). Every open /api/stream holds a thread,
+# so threads x workers should exceed the number of live dashboards.
+worker_class = 'gthread'
+threads = int(os.environ.get('DASHBOARD_THREADS', 8))
+
+chdir = os.path.dirname(os.path.abspath(__file__))
+pidfile = os.environ.get('DASHBOARD_PIDFILE')
+
+timeout = 60
+graceful_timeout = 30
+keepalive = 5
+
+# Recycle workers now and then to guard against slow memory growth
+max_requests = 2000
+max_requests_jitter = 200
+
+# Import the app in each worker (not the master) so a HUP reload picks up
+# new code and no SQLite handle is ever shared across a fork
+preload_app = False
+
+accesslog = '-'
+errorlog = '-'
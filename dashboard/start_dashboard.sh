@@ -36,14 +36,22 @@ fi
 # Install dashboard dependencies if needed
 echo "Checking dependencies..."
 pip install -q flask flask-cors
+if [ "$1" == "--production" ]; then
+    pip install -q gunicorn
+fi
 
 echo ""
 echo "Starting dashboard API server..."
-echo "Dashboard will be available at: http://localhost:5000"
+echo "Dashboard will be available at: http://localhost:5001"
 echo ""
 echo "Press Ctrl+C to stop the server"
 echo ""
 
-# Start the Flask server
 cd "$SCRIPT_DIR"
-python3 api.py
+if [ "$1" == "--production" ]; then
+    # Multi-worker server; see gunicorn.conf.py for settings and reloads
+    exec gunicorn -c gunicorn.conf.py wsgi:application
+else
+    # Flask development server
+    python3 api.py
+fi
@@ -0,0 +1,18 @@
+"""
+WSGI entry point for serving the dashboard in production.
+
+    cd dashboard
+    gunicorn -c gunicorn.conf.py wsgi:application
+
+On PythonAnywhere, point the web app's WSGI file at this module instead:
+
+    import sys
+    sys.path.insert(0, '/home/smugsock/price-intelligence-tracker/dashboard')
+    from wsgi import application
+"""
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from api import app as application  # noqa: E402
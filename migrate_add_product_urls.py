@@ -1,67 +1,30 @@
 #!/usr/bin/env python3
 """
 Migration script to add retailer URL columns to products table and insert Eucerin product.
+Schema changes are applied through the versioned migrations in src/migrations.py.
 """
 import sqlite3
 import sys
 from pathlib import Path
-from datetime import datetime
 
 # Add src to path
 sys.path.insert(0, str(Path(__file__).parent))
 
 from src.models import Product
 from src.database import PriceDatabase
+from src import migrations
 
 
 def migrate_database():
-    """Migrate the database to add new product fields."""
+    """Bring the database schema up to date (adds the product URL columns)."""
     db_path = "data/prices.db"
 
     print(f"Migrating database: {db_path}")
 
-    # Connect directly to check if migration is needed
     conn = sqlite3.connect(db_path)
-    cursor = conn.cursor()
-
-    # Check current schema
-    cursor.execute("PRAGMA table_info(products)")
-    columns = {row[1] for row in cursor.fetchall()}
-
-    print(f"Current columns: {columns}")
-
-    # Check if migration needed
-    new_columns = {'upc', 'target_url', 'walmart_url', 'cvs_url', 'walgreens_url', 'amazon_url', 'created_at', 'updated_at'}
-    missing_columns = new_columns - columns
-
-    if missing_columns:
-        print(f"Adding missing columns: {missing_columns}")
-
-        # Add columns one by one (SQLite doesn't support adding multiple columns at once)
-        now = datetime.now().isoformat()
-
-        if 'upc' in missing_columns:
-            cursor.execute("ALTER TABLE products ADD COLUMN upc TEXT")
-        if 'target_url' in missing_columns:
-            cursor.execute("ALTER TABLE products ADD COLUMN target_url TEXT")
-        if 'walmart_url' in missing_columns:
-            cursor.execute("ALTER TABLE products ADD COLUMN walmart_url TEXT")
-        if 'cvs_url' in missing_columns:
-            cursor.execute("ALTER TABLE products ADD COLUMN cvs_url TEXT")
-        if 'walgreens_url' in missing_columns:
-            cursor.execute("ALTER TABLE products ADD COLUMN walgreens_url TEXT")
-        if 'amazon_url' in missing_columns:
-            cursor.execute("ALTER TABLE products ADD COLUMN amazon_url TEXT")
-        if 'created_at' in missing_columns:
-            cursor.execute("ALTER TABLE products ADD COLUMN created_at TEXT")
-            # Set created_at for existing products
-            cursor.execute("UPDATE products SET created_at = ? WHERE created_at IS NULL", (now,))
-        if 'updated_at' in missing_columns:
-            cursor.execute("ALTER TABLE products ADD COLUMN updated_at TEXT")
-            # Set updated_at for existing products
-            cursor.execute("UPDATE products SET updated_at = ? WHERE updated_at IS NULL", (now,))
-
-        conn.commit()
+    applied = migrations.migrate(conn, report=print)
+
+    if applied:
         print("✓ Migration completed")
     else:
         print("✓ Database already has all required columns")
@@ -93,6 +93,7 @@ def main():
         print("  Interactive mode:  python add_price.py")
         print("  Quick add:        python add_price.py <product_id> <retailer_id> <price> <url>")
         print("  Show prices:      python add_price.py show")
+        print("  Bulk import:      python -m src.import_prices <file.csv|file.ndjson|export.json>")
         print("\nExample:")
         print('  python add_price.py eucerin-eczema-5oz walmart 12.97 "https://walmart.com/..."')
 
@@ -0,0 +1,453 @@
+"""
+Batch price analytics for every product × retailer series.
+
+PriceStats only knows min/max/avg and a fixed 5% deal threshold. This module
+computes richer statistics for all series at once and stores them in the
+price_analytics table, which the API (/api/analytics) and CLI
+(view_prices.py analytics) read.
+
+Each series is first resampled to one price per day: the day's last
+observation, carried forward over days without one, up to the series' last
+observed day. Windows end on that day. Per series it stores:
+
+    mean_7d, mean_30d          Rolling means over the last 7 / 30 days
+    min_30d, max_30d           Rolling low / high over the last 30 days
+    volatility_30d             Std. deviation of day-over-day relative
+                               changes over the last 30 days
+    p10, p25, p50, p90         Percentiles of the daily price over all days
+                               (current_price <= p10: "cheapest 10% of days")
+    share_cheaper              Fraction of days priced below today's price
+    days_at_current            Days the price has been at its current level
+    share_at_low               Fraction of days spent at the all-time low
+
+Series are processed in batches of flat arrays, so the per-series cost is a
+few array operations rather than a query each. NumPy is used when it is
+installed; otherwise an equivalent pure-Python engine gives the same stored
+values, about 2-3× slower (`python -m src.analytics bench` compares them).
+
+Refreshes are incremental: only products with rows added since the last run
+are recomputed, since nothing else about a series' statistics can change.
+
+Usage:
+    python -m src.analytics refresh [db_path]    # recompute changed series
+    python -m src.analytics full [db_path]       # recompute everything
+    python -m src.analytics bench [series]       # time the engines
+"""
+import argparse
+import random
+import sqlite3
+import time
+from datetime import date, datetime
+from itertools import chain, repeat
+from typing import Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
+
+from src.history_blocks import iter_history_rows, latest_cursor
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+CREATE_ANALYTICS_TABLE = """
+    CREATE TABLE IF NOT EXISTS price_analytics (
+        product_id TEXT NOT NULL,
+        retailer_id TEXT NOT NULL,
+        first_day TEXT NOT NULL,
+        last_day TEXT NOT NULL,
+        days INTEGER NOT NULL,
+        current_price REAL NOT NULL,
+        mean_7d REAL NOT NULL,
+        mean_30d REAL NOT NULL,
+        min_30d REAL NOT NULL,
+        max_30d REAL NOT NULL,
+        volatility_30d REAL,
+        p10 REAL NOT NULL,
+        p25 REAL NOT NULL,
+        p50 REAL NOT NULL,
+        p90 REAL NOT NULL,
+        share_cheaper REAL NOT NULL,
+        days_at_current INTEGER NOT NULL,
+        share_at_low REAL NOT NULL,
+        cursor INTEGER NOT NULL,
+        computed_at TEXT NOT NULL,
+        PRIMARY KEY (product_id, retailer_id)
+    )
+"""
+
+# Statistics computed by both engines, in table column order
+METRIC_COLUMNS = ('days', 'current_price', 'mean_7d', 'mean_30d', 'min_30d', 'max_30d',
+                  'volatility_30d', 'p10', 'p25', 'p50', 'p90', 'share_cheaper',
+                  'days_at_current', 'share_at_low')
+COLUMNS = (('product_id', 'retailer_id', 'first_day', 'last_day') + METRIC_COLUMNS
+           + ('cursor', 'computed_at'))
+
+SHORT_WINDOW = 7
+LONG_WINDOW = 30
+PERCENTILES = (10, 25, 50, 90)
+ENGINES = ('numpy', 'python')
+# Resampled days per batch: bounds memory (a few arrays of this length)
+BATCH_DAYS = 1_000_000
+# Stored statistics are rounded to 6 decimals (as round-half-even of
+# value × SCALE, which both engines compute identically) so they agree exactly
+SCALE = 1e6
+
+# (day ordinals of the days with observations, that day's closing price)
+DailySeries = Tuple[List[int], List[float]]
+
+
+def default_engine() -> str:
+    """'numpy' when NumPy is installed, else 'python'."""
+    return 'numpy' if np is not None else 'python'
+
+
+def _round(value):
+    return round(value * SCALE) / SCALE if isinstance(value, float) else value
+
+
+# ---------------------------------------------------------------------------
+# Engines
+#
+# Both take a batch of DailySeries and return one tuple of METRIC_COLUMNS
+# values per series.
+# ---------------------------------------------------------------------------
+
+def fill_days(days: List[int], closes: List[float]) -> List[float]:
+    """Daily prices from first to last observed day, carrying prices forward."""
+    filled = []
+    for i in range(len(days) - 1):
+        filled.extend(repeat(closes[i], days[i + 1] - days[i]))
+    filled.append(closes[-1])
+    return filled
+
+
+def _quantile(ordered: Sequence[float], q: float) -> float:
+    """Linearly interpolated quantile of sorted values (NumPy's default)."""
+    position = q * (len(ordered) - 1)
+    lo = int(position)
+    hi = min(lo + 1, len(ordered) - 1)
+    return ordered[lo] + (ordered[hi] - ordered[lo]) * (position - lo)
+
+
+def _volatility(window: List[float]) -> Optional[float]:
+    """Population std. deviation of relative day-over-day changes."""
+    changes = [(b / a - 1.0) if a else 0.0 for a, b in zip(window, window[1:])]
+    if not changes:
+        return None
+    mean = sum(changes) / len(changes)
+    return (sum((c - mean) ** 2 for c in changes) / len(changes)) ** 0.5
+
+
+def _compute_python(batch: List[DailySeries]) -> List[tuple]:
+    results = []
+    for days, closes in batch:
+        filled = fill_days(days, closes)
+        length = len(filled)
+        current = filled[-1]
+        short = filled[-SHORT_WINDOW:]
+        long = filled[-LONG_WINDOW:]
+        ordered = sorted(filled)
+        low = ordered[0]
+
+        run = 1
+        while run < length and filled[-run - 1] == current:
+            run += 1
+
+        results.append((
+            length,
+            current,
+            sum(short) / len(short),
+            sum(long) / len(long),
+            min(long),
+            max(long),
+            _volatility(long),
+            *(_quantile(ordered, p / 100) for p in PERCENTILES),
+            sum(1 for price in filled if price < current) / length,
+            run,
+            sum(1 for price in filled if price == low) / length,
+        ))
+    return results
+
+
+def _compute_numpy(batch: List[DailySeries]) -> List[tuple]:
+    n = len(batch)
+    counts = np.fromiter((len(days) for days, _ in batch), np.int64, n)
+    total = int(counts.sum())
+    days = np.fromiter(chain.from_iterable(d for d, _ in batch), np.int64, total)
+    closes = np.fromiter(chain.from_iterable(c for _, c in batch), np.float64, total)
+
+    # Each close lasts until the series' next observed day; the last for one day
+    last_obs = np.cumsum(counts) - 1
+    following = np.empty_like(days)
+    following[:-1] = days[1:]
+    following[last_obs] = days[last_obs] + 1
+    spans = following - days
+    flat = np.repeat(closes, spans)
+
+    lengths = np.add.reduceat(spans, last_obs - counts + 1)
+    ends = np.cumsum(lengths)
+    starts = ends - lengths
+    series_of = np.repeat(np.arange(n), lengths)
+    current = flat[ends - 1]
+    current_of = current[series_of]
+
+    def window(size):
+        # The last `size` days of every series as rows of an n × size matrix
+        index = ends[:, None] - size + np.arange(size)
+        valid = index >= starts[:, None]
+        return flat[np.maximum(index, 0)], valid
+
+    def window_mean(values, valid):
+        return np.where(valid, values, 0.0).sum(axis=1) / valid.sum(axis=1)
+
+    short, short_valid = window(SHORT_WINDOW)
+    long, long_valid = window(LONG_WINDOW)
+    mean_short = window_mean(short, short_valid)
+    mean_long = window_mean(long, long_valid)
+    min_long = np.where(long_valid, long, np.inf).min(axis=1)
+    max_long = np.where(long_valid, long, -np.inf).max(axis=1)
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        changes = np.where(long[:, :-1] != 0, long[:, 1:] / long[:, :-1] - 1.0, 0.0)
+        changes_valid = long_valid[:, :-1]
+        m = changes_valid.sum(axis=1)
+        mean_change = window_mean(changes, changes_valid)
+        deviations = np.where(changes_valid, changes - mean_change[:, None], 0.0)
+        volatility = np.sqrt((deviations * deviations).sum(axis=1) / m)
+
+    # Sort each series' days by price in one pass: rank the distinct prices,
+    # then sort a single integer key (much faster than np.lexsort)
+    distinct, rank = np.unique(flat, return_inverse=True)
+    keys = np.sort(series_of * len(distinct) + rank.reshape(-1))
+    ordered = distinct[keys % len(distinct)]
+    quantiles = []
+    for p in PERCENTILES:
+        position = starts + (p / 100) * (lengths - 1)
+        lo = position.astype(np.int64)
+        hi = np.minimum(lo + 1, ends - 1)
+        quantiles.append(ordered[lo] + (ordered[hi] - ordered[lo]) * (position - lo))
+
+    low_of = ordered[starts][series_of]
+    share_cheaper = np.add.reduceat((flat < current_of).astype(np.int64), starts) / lengths
+    share_at_low = np.add.reduceat((flat == low_of).astype(np.int64), starts) / lengths
+    last_change = np.maximum.reduceat(
+        np.where(flat != current_of, np.arange(len(flat)), -1), starts)
+    days_at_current = ends - 1 - np.maximum(last_change, starts - 1)
+
+    columns = [lengths, current, mean_short, mean_long, min_long, max_long, volatility,
+               *quantiles, share_cheaper, days_at_current, share_at_low]
+    columns = [column if column.dtype.kind == 'i' else np.rint(column * SCALE) / SCALE
+               for column in columns]
+    rows = list(zip(*(column.tolist() for column in columns)))
+    return [row if m_i > 0 else row[:6] + (None,) + row[7:] for row, m_i in zip(rows, m.tolist())]
+
+
+def compute_batch(batch: List[DailySeries], engine: Optional[str] = None) -> List[tuple]:
+    """
+    Statistics for a batch of daily series.
+
+    Returns:
+        One tuple of METRIC_COLUMNS values (rounded to 6 decimals) per series
+    """
+    engine = engine or default_engine()
+    if engine not in ENGINES:
+        raise ValueError(f"engine must be one of {', '.join(ENGINES)}")
+    if engine == 'numpy' and np is None:
+        raise ValueError("NumPy is not installed")
+    if not batch:
+        return []
+    if engine == 'numpy':
+        return _compute_numpy(batch)
+    return [tuple(_round(value) for value in row) for row in _compute_python(batch)]
+
+
+# ---------------------------------------------------------------------------
+# Loading and storing
+# ---------------------------------------------------------------------------
+
+def iter_daily_series(rows: Iterable[tuple]) -> Iterator[Tuple[str, str, DailySeries]]:
+    """
+    Group rows ordered by product, retailer and timestamp into daily series.
+
+    Yields:
+        (product_id, retailer_id, (day ordinals, closing prices))
+    """
+    ordinals: Dict[str, int] = {}
+    key = None
+    days: List[int] = []
+    closes: List[float] = []
+    for row in rows:
+        product_id, retailer_id, price, timestamp = row[1], row[2], row[3], row[4]
+        if (product_id, retailer_id) != key:
+            if key is not None:
+                yield key[0], key[1], (days, closes)
+            key = (product_id, retailer_id)
+            days, closes = [], []
+        day_text = timestamp[:10]
+        day = ordinals.get(day_text)
+        if day is None:
+            day = ordinals[day_text] = date.fromisoformat(day_text).toordinal()
+        if days and days[-1] == day:
+            closes[-1] = price
+        else:
+            days.append(day)
+            closes.append(price)
+    if key is not None:
+        yield key[0], key[1], (days, closes)
+
+
+def changed_products(conn: sqlite3.Connection, since: int) -> List[str]:
+    """Products with rows (or sealed blocks holding rows) above a cursor."""
+    cursor = conn.cursor()
+    cursor.row_factory = None
+    rows = cursor.execute("""
+        SELECT DISTINCT product_id FROM price_history WHERE id > ?
+        UNION
+        SELECT DISTINCT product_id FROM price_history_blocks WHERE last_id > ?
+    """, (since, since)).fetchall()
+    return sorted(row[0] for row in rows)
+
+
+def analytics_cursor(conn: sqlite3.Connection) -> Optional[int]:
+    """Price cursor of the last analytics run (None before the first)."""
+    return conn.execute("SELECT MAX(cursor) FROM price_analytics").fetchone()[0]
+
+
+def analytics_version(conn: sqlite3.Connection) -> str:
+    """Fingerprint of the analytics table, for response caching."""
+    row = conn.execute("SELECT MAX(computed_at), COUNT(*) FROM price_analytics").fetchone()
+    return f"{row[0] or ''}-{row[1]}"
+
+
+def refresh_analytics(conn: sqlite3.Connection, full: bool = False,
+                      engine: Optional[str] = None) -> dict:
+    """
+    Recompute analytics for series with new data (or all series).
+
+    Each batch is committed as it is written, so the collector is never
+    blocked for the whole run.
+
+    Args:
+        conn: Writable database connection
+        full: Recompute every series instead of only changed products
+        engine: 'numpy' or 'python' (defaults to default_engine())
+
+    Returns:
+        Summary dict with 'series', 'products', 'full', 'engine' and 'seconds'
+    """
+    engine = engine or default_engine()
+    started = time.perf_counter()
+    computed_at = datetime.now().isoformat()
+    cursor = latest_cursor(conn)
+    previous = analytics_cursor(conn)
+    full = full or previous is None
+
+    if full:
+        product_ids = None
+        rows = iter_history_rows(conn)
+    else:
+        product_ids = changed_products(conn, previous)
+        rows = chain.from_iterable(iter_history_rows(conn, pid) for pid in product_ids)
+
+    insert = f"""
+        INSERT OR REPLACE INTO price_analytics ({', '.join(COLUMNS)})
+        VALUES ({', '.join('?' * len(COLUMNS))})
+    """
+    written = 0
+    keys: List[Tuple[str, str]] = []
+    batch: List[DailySeries] = []
+    batch_days = 0
+
+    def flush():
+        nonlocal written, batch_days
+        records = []
+        for (product_id, retailer_id), (days, _), metrics in zip(keys, batch, compute_batch(batch, engine)):
+            records.append((product_id, retailer_id, date.fromordinal(days[0]).isoformat(),
+                            date.fromordinal(days[-1]).isoformat(), *metrics, cursor, computed_at))
+        conn.executemany(insert, records)
+        conn.commit()
+        written += len(records)
+        keys.clear()
+        batch.clear()
+        batch_days = 0
+
+    products = set()
+    for product_id, retailer_id, series in iter_daily_series(rows):
+        products.add(product_id)
+        keys.append((product_id, retailer_id))
+        batch.append(series)
+        batch_days += series[0][-1] - series[0][0] + 1
+        if batch_days >= BATCH_DAYS:
+            flush()
+    flush()
+
+    # Drop series that no longer have any rows
+    if product_ids is None:
+        conn.execute("DELETE FROM price_analytics WHERE computed_at != ?", (computed_at,))
+    else:
+        for product_id in product_ids:
+            conn.execute("DELETE FROM price_analytics WHERE product_id = ? AND computed_at != ?",
+                         (product_id, computed_at))
+    conn.commit()
+
+    return {
+        'series': written,
+        'products': len(products),
+        'full': full,
+        'engine': engine,
+        'seconds': time.perf_counter() - started,
+    }
+
+
+def synthetic_series(count: int, days: int) -> List[DailySeries]:
+    """Random-walk daily series with gaps, for benchmarking."""
+    rng = random.Random(42)
+    batch = []
+    for _ in range(count):
+        day = 738000
+        price = rng.uniform(5, 30)
+        ordinals, closes = [], []
+        for _ in range(days):
+            ordinals.append(day)
+            closes.append(round(price, 2))
+            day += rng.choice((1, 1, 1, 2, 3))
+            if rng.random() < 0.2:
+                price *= rng.uniform(0.85, 1.15)
+        batch.append((ordinals, closes))
+    return batch
+
+
+def main():
+    """CLI entry point."""
+    parser = argparse.ArgumentParser(description="Compute price analytics for all series.")
+    parser.add_argument('command', choices=('refresh', 'full', 'bench'), nargs='?', default='refresh')
+    parser.add_argument('target', nargs='?',
+                        help="Database path (default data/prices.db), or series count for bench")
+    parser.add_argument('--engine', choices=ENGINES, help="Default: numpy when installed")
+    args = parser.parse_args()
+
+    if args.command == 'bench':
+        count = int(args.target or 10000)
+        batch = synthetic_series(count, 365)
+        print(f"{count:,} series × 365 observations")
+        for engine in ENGINES:
+            if engine == 'numpy' and np is None:
+                print("  numpy: not installed")
+                continue
+            started = time.perf_counter()
+            for i in range(0, count, 2000):
+                compute_batch(batch[i:i + 2000], engine)
+            seconds = time.perf_counter() - started
+            print(f"  {engine}: {seconds:.2f}s ({count / seconds:,.0f} series/s)")
+        return
+
+    from src.database import PriceDatabase
+    db = PriceDatabase(args.target or "data/prices.db")
+    summary = refresh_analytics(db.conn, args.command == 'full', args.engine)
+    db.close()
+    kind = "full" if summary['full'] else "incremental"
+    print(f"✓ Analytics ({kind}, {summary['engine']}): {summary['series']:,} series "
+          f"in {summary['products']:,} product(s), {summary['seconds']:.2f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,188 @@
+"""
+Catalog sync: make the products table match a product manifest.
+
+The manifest is the source of truth for which products are tracked. Sync
+compares it with the products table and applies all inserts, updates and
+deactivations in one transaction. Products missing from the manifest are
+deactivated rather than deleted, so their price history is kept and the
+collector simply stops scraping them.
+
+Manifest formats (detected from the file extension):
+    .csv          Header row with the Product fields (id, name, size,
+                  category, brand, upc, target_url, ...)
+    .json         A list of product objects, or {"products": [...]}
+    .yaml / .yml  Same shape as JSON (requires PyYAML)
+
+Usage:
+    python -m src.catalog_sync products.csv [--dry-run] [--keep-missing]
+"""
+import argparse
+import csv
+import json
+import sys
+import time
+from pathlib import Path
+from typing import Dict, List
+
+from src.database import PriceDatabase
+from src.models import Product
+
+REQUIRED_FIELDS = ('id', 'name', 'size', 'category')
+OPTIONAL_FIELDS = ('brand', 'upc', 'target_url', 'walmart_url', 'cvs_url',
+                   'walgreens_url', 'amazon_url')
+COMPARED_FIELDS = REQUIRED_FIELDS[1:] + OPTIONAL_FIELDS + ('active',)
+
+
+def _clean(value):
+    if value is None:
+        return None
+    value = str(value).strip()
+    return value or None
+
+
+def load_manifest(path: str) -> List[Product]:
+    """
+    Read a product manifest.
+
+    Raises:
+        ValueError: If the file can't be parsed or an entry is invalid
+    """
+    suffix = Path(path).suffix.lower()
+    with open(path, newline='', encoding='utf-8') as f:
+        if suffix == '.csv':
+            entries = list(csv.DictReader(f))
+        elif suffix == '.json':
+            entries = json.load(f)
+        elif suffix in ('.yaml', '.yml'):
+            try:
+                import yaml
+            except ImportError:
+                raise ValueError("PyYAML is required for YAML manifests: pip install pyyaml")
+            entries = yaml.safe_load(f)
+        else:
+            raise ValueError(f"Unsupported manifest format: {suffix}")
+
+    if isinstance(entries, dict):
+        entries = entries.get('products', [])
+    if not isinstance(entries, list):
+        raise ValueError("Manifest must be a list of products")
+
+    products = []
+    seen = set()
+    for index, entry in enumerate(entries, start=1):
+        values = {field: _clean(entry.get(field)) for field in REQUIRED_FIELDS + OPTIONAL_FIELDS}
+        missing = [field for field in REQUIRED_FIELDS if not values[field]]
+        if missing:
+            raise ValueError(f"Entry {index}: missing {', '.join(missing)}")
+        if values['id'] in seen:
+            raise ValueError(f"Entry {index}: duplicate id {values['id']}")
+        seen.add(values['id'])
+        products.append(Product(**values))
+    return products
+
+
+def diff_catalog(current: Dict[str, Product], manifest: List[Product],
+                 deactivate_missing: bool = True) -> dict:
+    """
+    Compare manifest products with the current catalog.
+
+    Returns:
+        Dict with 'insert' and 'update' (lists of Products), 'changes'
+        (product id -> changed field names), 'deactivate' (ids) and
+        'unchanged' (count)
+    """
+    plan = {'insert': [], 'update': [], 'changes': {}, 'deactivate': [], 'unchanged': 0}
+
+    for product in manifest:
+        existing = current.get(product.id)
+        if existing is None:
+            plan['insert'].append(product)
+            continue
+        changed = [field for field in COMPARED_FIELDS
+                   if getattr(existing, field) != getattr(product, field)]
+        if changed:
+            plan['update'].append(product)
+            plan['changes'][product.id] = changed
+        else:
+            plan['unchanged'] += 1
+
+    if deactivate_missing:
+        listed = {product.id for product in manifest}
+        plan['deactivate'] = sorted(
+            product_id for product_id, product in current.items()
+            if product.active and product_id not in listed
+        )
+    return plan
+
+
+def sync_catalog(path: str, db: PriceDatabase, dry_run: bool = False,
+                 deactivate_missing: bool = True, verbose: bool = True) -> dict:
+    """
+    Apply a product manifest to the database in a single transaction.
+
+    Args:
+        path: Manifest file
+        db: Database to sync
+        dry_run: Report changes without applying them
+        deactivate_missing: Deactivate active products absent from the manifest
+        verbose: Print a change report
+
+    Returns:
+        The change plan from diff_catalog(), plus 'seconds'
+    """
+    started = time.perf_counter()
+    manifest = load_manifest(path)
+    current = {product.id: product for product in db.iter_products()}
+    plan = diff_catalog(current, manifest, deactivate_missing)
+
+    if not dry_run:
+        try:
+            db.add_products(plan['insert'] + plan['update'], commit=False)
+            db.set_products_active(plan['deactivate'], False, commit=False)
+            db.conn.commit()
+        except BaseException:
+            db.conn.rollback()
+            raise
+
+    plan['seconds'] = time.perf_counter() - started
+    if verbose:
+        _print_report(path, plan, dry_run)
+    return plan
+
+
+def _print_report(path: str, plan: dict, dry_run: bool):
+    print(f"{'Dry run: ' if dry_run else ''}Catalog sync from {path}")
+    for product in plan['insert']:
+        print(f"  + {product.id}")
+    for product in plan['update']:
+        print(f"  ~ {product.id} ({', '.join(plan['changes'][product.id])})")
+    for product_id in plan['deactivate']:
+        print(f"  - {product_id} (deactivated)")
+    print(f"\n✓ {len(plan['insert'])} added, {len(plan['update'])} updated, "
+          f"{len(plan['deactivate'])} deactivated, {plan['unchanged']} unchanged "
+          f"in {plan['seconds'] * 1000:.0f} ms")
+
+
+def main():
+    """CLI entry point."""
+    parser = argparse.ArgumentParser(description="Sync the product catalog from a manifest.")
+    parser.add_argument('manifest', help="CSV, JSON or YAML product manifest")
+    parser.add_argument('--db', default="data/prices.db", help="Database path")
+    parser.add_argument('--dry-run', action='store_true', help="Show changes without applying them")
+    parser.add_argument('--keep-missing', action='store_true',
+                        help="Don't deactivate products missing from the manifest")
+    args = parser.parse_args()
+
+    db = PriceDatabase(args.db)
+    try:
+        sync_catalog(args.manifest, db, dry_run=args.dry_run,
+                     deactivate_missing=not args.keep_missing)
+    except (OSError, ValueError) as e:
+        print(f"✗ Error: {e}")
+        sys.exit(1)
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    main()
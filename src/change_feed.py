@@ -0,0 +1,102 @@
+"""
+Lightweight change feed for live dashboards.
+
+New prices need no extra bookkeeping: price_history rowids only grow, so a
+reader remembers the last rowid it saw and asks for anything newer. Other
+changes worth pushing - deal flags flipping and collection run progress -
+are appended to the small change_events table by the writer. A reader
+tails both with two cursors; the collector and the dashboard can be
+separate processes.
+
+Events are pruned after a week (see prune_events()), which only affects
+clients that have been disconnected for longer than that.
+"""
+import json
+import sqlite3
+from datetime import datetime, timedelta
+from typing import List, Optional
+
+CREATE_EVENTS_TABLE = """
+    CREATE TABLE IF NOT EXISTS change_events (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        kind TEXT NOT NULL,
+        product_id TEXT,
+        retailer_id TEXT,
+        payload TEXT NOT NULL,
+        created_at TEXT NOT NULL
+    )
+"""
+
+EVENT_KINDS = ('deal', 'run')
+DEFAULT_KEEP_DAYS = 7
+DEFAULT_LIMIT = 1000
+
+
+def record_event(conn: sqlite3.Connection, kind: str, payload: dict,
+                 product_id: Optional[str] = None, retailer_id: Optional[str] = None,
+                 commit: bool = True) -> int:
+    """
+    Append an event to the feed.
+
+    Args:
+        conn: Open database connection
+        kind: One of EVENT_KINDS
+        payload: JSON-serializable event data
+        product_id, retailer_id: What the event is about, if anything
+        commit: Commit afterwards
+
+    Returns:
+        The event's ID
+    """
+    if kind not in EVENT_KINDS:
+        raise ValueError(f"Unknown event kind {kind}; expected one of {', '.join(EVENT_KINDS)}")
+    cursor = conn.execute("""
+        INSERT INTO change_events (kind, product_id, retailer_id, payload, created_at)
+        VALUES (?, ?, ?, ?, ?)
+    """, (kind, product_id, retailer_id, json.dumps(payload), datetime.now().isoformat()))
+    if commit:
+        conn.commit()
+    return cursor.lastrowid
+
+
+def latest_event_id(conn: sqlite3.Connection) -> int:
+    """Highest event ID ever assigned (0 if none)."""
+    row = conn.execute(
+        "SELECT seq FROM sqlite_sequence WHERE name = 'change_events'"
+    ).fetchone()
+    return row[0] if row else 0
+
+
+def read_events(conn: sqlite3.Connection, since_id: int,
+                limit: int = DEFAULT_LIMIT) -> List[dict]:
+    """
+    Events after `since_id`, oldest first.
+
+    Returns:
+        Dicts with 'id', 'kind', 'productId', 'retailer', 'createdAt' and
+        the payload's fields
+    """
+    cursor = conn.cursor()
+    cursor.row_factory = None
+    rows = cursor.execute("""
+        SELECT id, kind, product_id, retailer_id, payload, created_at
+        FROM change_events
+        WHERE id > ?
+        ORDER BY id
+        LIMIT ?
+    """, (since_id, limit)).fetchall()
+    events = []
+    for event_id, kind, product_id, retailer_id, payload, created_at in rows:
+        event = json.loads(payload)
+        event.update(id=event_id, kind=kind, productId=product_id,
+                     retailer=retailer_id, createdAt=created_at)
+        events.append(event)
+    return events
+
+
+def prune_events(conn: sqlite3.Connection, keep_days: int = DEFAULT_KEEP_DAYS) -> int:
+    """Delete events older than `keep_days`; returns the number deleted."""
+    cutoff = (datetime.now() - timedelta(days=keep_days)).isoformat()
+    cursor = conn.execute("DELETE FROM change_events WHERE created_at < ?", (cutoff,))
+    conn.commit()
+    return cursor.rowcount
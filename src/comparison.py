@@ -0,0 +1,320 @@
+"""
+Cross-retailer price comparison over time.
+
+The dashboard's bestRetailer is the lowest lifetime average, which hides
+who was actually cheapest on a given day. Here all of a product's
+retailer series are as-of joined on a shared time grid: at every grid
+point each retailer's price is its last observation at or before that
+point (forward-filled), and from those come the best price and retailer,
+the spread between the dearest and the cheapest, and each retailer's
+share of time as the cheapest.
+
+    grid      'raw'      every observation time
+              bucket     every hour/day/week/month start from the first
+                         observation to the last; a point takes each
+                         retailer's last price before the bucket ends
+    stale     a price older than MAX_AGE no longer counts as available
+              (the retailer dropped the product or stopped being collected)
+    shares    weighted by the time until the next grid point; tied
+              retailers split the point
+
+The join is a single merge: each retailer's history is already ordered by
+time, so heapq.merge interleaves them in O(n log r) and the grid is swept
+once, O(n + points × r) for r retailers.
+
+Joined grids are cached per product and bucket for the whole history;
+ranges are sliced out of the cached grid (an as-of value needs the prices
+before the range anyway). A cache entry is reused until the product gains
+rows - its live and sealed row count and highest rowid are checked on
+every call with two indexed lookups - so new prices for one product leave
+the others' grids in place.
+
+Usage:
+    python -m src.comparison bench [observations]   # time synthetic joins
+"""
+import heapq
+import random
+import sqlite3
+import sys
+import threading
+import time
+from bisect import bisect_left, bisect_right
+from collections import OrderedDict
+from datetime import date, datetime, timedelta
+from itertools import groupby
+from operator import itemgetter
+from typing import Dict, List, NamedTuple, Optional, Tuple
+
+from src import history_blocks
+from src.models import BestPrice, RetailerComparison
+
+GRIDS = ('raw', 'hour', 'day', 'week', 'month')
+
+MAX_AGE = timedelta(days=30)
+
+CACHE_SIZE = 256
+
+_STEPS = {'hour': timedelta(hours=1), 'day': timedelta(days=1), 'week': timedelta(days=7)}
+
+_cache: 'OrderedDict[tuple, Tuple[tuple, Grid]]' = OrderedDict()
+_cache_lock = threading.Lock()
+
+
+class Grid(NamedTuple):
+    """A joined history, one entry per grid point in each list."""
+    retailers: List[str]
+    times: List[str]  # ISO grid times, ascending
+    prices: List[Optional[float]]
+    cheapest: List[Tuple[str, ...]]
+    spreads: List[Optional[float]]
+    counts: List[int]
+    spans: List[float]  # Seconds until the next grid point
+
+
+def _bucket_start(moment: datetime, bucket: str) -> datetime:
+    if bucket == 'hour':
+        return moment.replace(minute=0, second=0, microsecond=0)
+    day = datetime(moment.year, moment.month, moment.day)
+    if bucket == 'week':
+        return day - timedelta(days=day.weekday())
+    if bucket == 'month':
+        return day.replace(day=1)
+    return day
+
+
+def _next_start(start: datetime, bucket: str) -> datetime:
+    if bucket == 'month':
+        return start.replace(year=start.year + start.month // 12, month=start.month % 12 + 1)
+    return start + _STEPS[bucket]
+
+
+def _tagged(rows: List[Tuple[str, float]], retailer: str):
+    for timestamp, price in rows:
+        yield timestamp, price, retailer
+
+
+def _best(current: Dict[str, Tuple[str, float]], threshold: str):
+    """(price, cheapest, spread, count) over prices observed at or after threshold."""
+    low = high = None
+    cheapest = []
+    count = 0
+    for retailer, (timestamp, price) in current.items():
+        if timestamp < threshold:
+            continue
+        count += 1
+        if low is None or price < low:
+            low = price
+            cheapest = [retailer]
+        elif price == low:
+            cheapest.append(retailer)
+        if high is None or price > high:
+            high = price
+    if len(cheapest) > 1:
+        cheapest.sort()
+    spread = round(high - low, 2) if count > 1 else None
+    return low, tuple(cheapest), spread, count
+
+
+def as_of_join(series: Dict[str, List[Tuple[str, float]]], bucket: str = 'day',
+               max_age: timedelta = MAX_AGE) -> Grid:
+    """
+    Join retailer series on a shared grid.
+
+    Args:
+        series: retailer -> [(ISO timestamp, price)], each ordered by time
+        bucket: One of GRIDS
+        max_age: How long a price stays available without a newer one
+
+    Returns:
+        Grid over the whole history (empty lists if there are no prices)
+    """
+    if bucket not in GRIDS:
+        raise ValueError(f"bucket must be one of {', '.join(GRIDS)}")
+    grid = Grid(sorted(series), [], [], [], [], [], [])
+    events = heapq.merge(*(_tagged(rows, retailer) for retailer, rows in series.items()))
+    current = {}
+    moments = []
+
+    def emit(moment: datetime, time_text: str):
+        price, cheapest, spread, count = _best(current, (moment - max_age).isoformat())
+        moments.append(moment)
+        grid.times.append(time_text)
+        grid.prices.append(price)
+        grid.cheapest.append(cheapest)
+        grid.spreads.append(spread)
+        grid.counts.append(count)
+
+    if bucket == 'raw':
+        for timestamp, group in groupby(events, key=itemgetter(0)):
+            for _, price, retailer in group:
+                current[retailer] = (timestamp, price)
+            emit(datetime.fromisoformat(timestamp), timestamp)
+        spans = [(later - earlier).total_seconds() for earlier, later in zip(moments, moments[1:])]
+        grid.spans.extend(spans + [0.0] * bool(moments))
+        return grid
+
+    event = next(events, None)
+    if event is None:
+        return grid
+    last = max(rows[-1][0] for rows in series.values() if rows)
+    start = _bucket_start(datetime.fromisoformat(event[0]), bucket)
+    final = _bucket_start(datetime.fromisoformat(last), bucket)
+    while start <= final:
+        end = _next_start(start, bucket)
+        cutoff = end.isoformat()
+        while event is not None and event[0] < cutoff:
+            current[event[2]] = (event[0], event[1])
+            event = next(events, None)
+        # Prices count as of the end of the bucket
+        emit(end - timedelta(microseconds=1), start.isoformat())
+        grid.spans.append((end - start).total_seconds())
+        start = end
+    return grid
+
+
+def _load_series(conn: sqlite3.Connection, product_id: str) -> Dict[str, List[Tuple[str, float]]]:
+    series = {}
+    for retailer_id, rows in groupby(history_blocks.iter_history_rows(conn, product_id), key=itemgetter(2)):
+        series[retailer_id] = [(row[4], row[3]) for row in rows]
+    return series
+
+
+def product_version(conn: sqlite3.Connection, product_id: str) -> tuple:
+    """(row count, highest rowid) of a product's live and sealed history."""
+    cursor = conn.cursor()
+    cursor.row_factory = None
+    count, last_id = cursor.execute(
+        "SELECT COUNT(*), MAX(id) FROM price_history WHERE product_id = ?", (product_id,)
+    ).fetchone()
+    if history_blocks.has_blocks(conn):
+        sealed, sealed_last = cursor.execute(
+            "SELECT SUM(row_count), MAX(last_id) FROM price_history_blocks WHERE product_id = ?",
+            (product_id,)
+        ).fetchone()
+        count += sealed or 0
+        last_id = max(last_id or 0, sealed_last or 0)
+    return count, last_id
+
+
+def _database_key(conn: sqlite3.Connection):
+    path = conn.execute("PRAGMA database_list").fetchone()[2]
+    return path or id(conn)
+
+
+def product_grid(conn: sqlite3.Connection, product_id: str, bucket: str = 'day') -> Grid:
+    """A product's joined grid over its whole history, from the cache when current."""
+    key = (_database_key(conn), product_id, bucket)
+    version = product_version(conn, product_id)
+    with _cache_lock:
+        entry = _cache.get(key)
+        if entry is not None:
+            _cache.move_to_end(key)
+    if entry is not None and entry[0] == version:
+        return entry[1]
+
+    grid = as_of_join(_load_series(conn, product_id), bucket)
+    with _cache_lock:
+        _cache[key] = (version, grid)
+        _cache.move_to_end(key)
+        while len(_cache) > CACHE_SIZE:
+            _cache.popitem(last=False)
+    return grid
+
+
+def compare_retailers(conn: sqlite3.Connection, product_id: str, bucket: str = 'day',
+                      start: Optional[str] = None, end: Optional[str] = None
+                      ) -> Optional[RetailerComparison]:
+    """
+    Best price and retailer over time for one product.
+
+    Args:
+        conn: Open database connection
+        product_id: Product identifier
+        bucket: One of GRIDS
+        start: Only grid points on or after this ISO date/time
+        end: Only grid points on or before this ISO date/time (a date
+             covers that whole day)
+
+    Returns:
+        RetailerComparison, or None if the product has no prices
+    """
+    grid = product_grid(conn, product_id, bucket)
+    if not grid.retailers:
+        return None
+    low = bisect_left(grid.times, start) if start else 0
+    if not end:
+        high = len(grid.times)
+    elif len(end) == 10:
+        high = bisect_left(grid.times, (date.fromisoformat(end) + timedelta(days=1)).isoformat())
+    else:
+        high = bisect_right(grid.times, end)
+
+    shares = dict.fromkeys(grid.retailers, 0.0)
+    points = []
+    for i in range(low, high):
+        cheapest = grid.cheapest[i]
+        points.append(BestPrice(
+            time=datetime.fromisoformat(grid.times[i]),
+            price=grid.prices[i],
+            retailer_id=cheapest[0] if cheapest else None,
+            cheapest=list(cheapest),
+            spread=grid.spreads[i],
+            retailers=grid.counts[i],
+        ))
+        for retailer in cheapest:
+            shares[retailer] += grid.spans[i] / len(cheapest)
+    total = sum(shares.values())
+    if total == 0:
+        # A single raw point, or only the last one: weigh points equally
+        for point in points:
+            for retailer in point.cheapest:
+                shares[retailer] += 1 / len(point.cheapest)
+        total = sum(shares.values())
+    cheapest_share = {
+        retailer: round(share / total, 4) if total else 0.0
+        for retailer, share in sorted(shares.items(), key=lambda item: (-item[1], item[0]))
+    }
+    return RetailerComparison(product_id, bucket, grid.retailers, points, cheapest_share)
+
+
+def clear_cache():
+    """Drop every cached grid."""
+    with _cache_lock:
+        _cache.clear()
+
+
+def synthetic_retailers(retailers: int, observations: int) -> Dict[str, List[Tuple[str, float]]]:
+    """Random-walk series for several retailers of one product, for benchmarking."""
+    rng = random.Random(42)
+    series = {}
+    for r in range(retailers):
+        moment = datetime(2024, 1, 1) + timedelta(minutes=rng.randrange(600))
+        price = rng.uniform(8, 12)
+        rows = []
+        for _ in range(observations):
+            rows.append((moment.isoformat(), round(price, 2)))
+            moment += timedelta(hours=rng.choice((6, 12, 24, 24, 48)))
+            if rng.random() < 0.2:
+                price *= rng.uniform(0.9, 1.1)
+        series[f"retailer-{r}"] = rows
+    return series
+
+
+def main():
+    """CLI entry point."""
+    if len(sys.argv) < 2 or sys.argv[1] != 'bench':
+        print("Usage: python -m src.comparison bench [observations]")
+        return
+    observations = int(sys.argv[2]) if len(sys.argv) > 2 else 100000
+    series = synthetic_retailers(5, observations // 5)
+    print(f"5 retailers × {observations // 5:,} observations")
+    for bucket in ('raw', 'day'):
+        started = time.perf_counter()
+        grid = as_of_join(series, bucket)
+        seconds = time.perf_counter() - started
+        print(f"  {bucket:<4} {len(grid.times):>8,} points in {seconds:6.3f}s "
+              f"({observations / seconds:,.0f} observations/s)")
+
+
+if __name__ == "__main__":
+    main()
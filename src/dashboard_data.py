@@ -0,0 +1,802 @@
+"""
+Builds the dashboard payload served by dashboard/api.py.
+
+All products are aggregated in one ordered pass over price history (live
+rows merged with sealed blocks), instead of one query per product followed
+by several passes per retailer. Kept free of Flask so other tools can
+produce the same payload.
+"""
+import sqlite3
+from typing import List, NamedTuple, Optional
+
+from src import history_blocks
+from src.database import PriceDatabase
+from src.history_blocks import iter_history_rows, latest_cursor
+from src.downsample import downsample_prices, in_range
+from src.fake_sales import latest_verdicts
+from src.seasonality import describe_season, low_seasons
+from src.serialization import columnar as to_columnar
+
+
+def data_version(conn: sqlite3.Connection) -> str:
+    """
+    Cheap fingerprint of everything the dashboard shows.
+
+    Combines the price_history AUTOINCREMENT counter (grows with every new
+    observation and is unaffected by sealing rows into blocks) with the
+    product count, latest product update and the sale verdict and
+    seasonality run counters (both are written after the prices they use).
+    """
+    row = conn.execute("""
+        SELECT
+            (SELECT seq FROM sqlite_sequence WHERE name = 'price_history'),
+            (SELECT COUNT(*) FROM products),
+            (SELECT MAX(updated_at) FROM products),
+            (SELECT seq FROM sqlite_sequence WHERE name = 'sale_verdict_runs'),
+            (SELECT seq FROM sqlite_sequence WHERE name = 'seasonality_runs')
+    """).fetchone()
+    return f"{row[0] or 0}-{row[1]}-{row[2] or ''}-{row[3] or 0}-{row[4] or 0}"
+
+
+class SeriesStats:
+    """Running high/low/average and chart points for one product × retailer."""
+    __slots__ = ('retailer_id', 'high', 'high_date', 'low', 'low_date',
+                 'total', 'count', 'prices')
+
+    def __init__(self, retailer_id: str, price: float, date: str):
+        self.retailer_id = retailer_id
+        self.high = self.low = price
+        self.high_date = self.low_date = date
+        self.total = 0.0
+        self.count = 0
+        self.prices = []
+
+    def add(self, price: float, date: str):
+        # Strict comparisons keep the first date a high/low was seen
+        if price > self.high:
+            self.high, self.high_date = price, date
+        elif price < self.low:
+            self.low, self.low_date = price, date
+        self.total += price
+        self.count += 1
+        self.prices.append({'date': date, 'price': price})
+
+    @property
+    def avg(self) -> float:
+        return self.total / self.count
+
+    @property
+    def first_date(self) -> str:
+        return self.prices[0]['date']
+
+    def chart(self, points: Optional[int] = None, start: Optional[str] = None,
+              end: Optional[str] = None) -> list:
+        return chart_prices(self.prices, points, start, end)
+
+
+def aggregate_series(rows) -> dict:
+    """
+    Aggregate ordered history rows in a single pass.
+
+    Returns:
+        Dict of product_id -> list of SeriesStats
+    """
+    by_product = {}
+    current_key = None
+    series = None
+    for row in rows:
+        product_id, retailer_id, price, date = row[1], row[2], row[3], row[4]
+        if (product_id, retailer_id) != current_key:
+            current_key = (product_id, retailer_id)
+            series = SeriesStats(retailer_id, price, date)
+            by_product.setdefault(product_id, []).append(series)
+        series.add(price, date)
+    return by_product
+
+
+def chart_prices(prices: list, points: Optional[int] = None,
+                 start: Optional[str] = None, end: Optional[str] = None) -> list:
+    """Limit a chart series to a date range and downsample it to `points`."""
+    if start or end:
+        prices = [p for p in prices if in_range(p['date'], start, end)]
+    if points:
+        prices = downsample_prices(prices, points)
+    return prices
+
+
+def build_product_data(product, series_list, points: Optional[int] = None,
+                       start: Optional[str] = None, end: Optional[str] = None,
+                       charts: bool = True, columnar: bool = False,
+                       verdicts: Optional[dict] = None, season: Optional[dict] = None) -> dict:
+    """
+    Build one product's dashboard entry from its aggregated series
+    (SeriesStats, or StoredSeries from src/series_store.py).
+
+    Retailer stats always cover the full history; `points`, `start` and
+    `end` only shape the chart series. With `charts=False` the entry has
+    no chartData. With `columnar=True` each chart series is
+    {'retailer', 't': [epoch ms], 'price': [...]} instead of a list of
+    {'date', 'price'} points (see src/serialization.py). `verdicts` maps
+    retailer IDs to their latest checked discount claim (saleVerdict);
+    `season` is the product's typical low season (lowSeason, see
+    src/seasonality.low_seasons).
+    """
+    verdicts = verdicts or {}
+    # Retailers appear in the chart in the order they were first observed
+    series_list = sorted(series_list, key=lambda s: s.first_date)
+    keys = product.keys()
+
+    retailers_stats = []
+    for series in series_list:
+        url_column = f'{series.retailer_id}_url'
+        retailer_url = product[url_column] if url_column in keys else '#'
+        retailers_stats.append({
+            'name': series.retailer_id,
+            'high': series.high,
+            'highDate': series.high_date,
+            'low': series.low,
+            'lowDate': series.low_date,
+            'avg': series.avg,
+            'url': retailer_url or '#',
+            'saleVerdict': verdicts.get(series.retailer_id),
+        })
+
+    best_retailer = min(retailers_stats, key=lambda x: x['avg'])
+    product_data = {
+        'id': product['id'],
+        'name': product['name'],
+        'brand': brand_name(product),
+        'bestAvgPrice': best_retailer['avg'],
+        'bestRetailer': best_retailer['name'].capitalize(),
+        'retailers': sorted(retailers_stats, key=lambda x: x['avg']),
+        'lowSeason': season,
+    }
+    if charts:
+        product_data['chartData'] = []
+        for series in series_list:
+            prices = series.chart(points, start, end)
+            if columnar:
+                product_data['chartData'].append({'retailer': series.retailer_id, **to_columnar(prices)})
+            else:
+                product_data['chartData'].append({'retailer': series.retailer_id, 'prices': prices})
+    return product_data
+
+
+def brand_name(product) -> str:
+    """Brand from the brand field, falling back to the first word of the name."""
+    brand = product['brand'] if 'brand' in product.keys() else None
+    return brand if brand else product['name'].split()[0]
+
+
+def build_dashboard_data(conn: sqlite3.Connection, points: Optional[int] = None,
+                         start: Optional[str] = None, end: Optional[str] = None,
+                         columnar: bool = False, store=None) -> dict:
+    """
+    Get all price data formatted for the dashboard.
+
+    Args:
+        conn: Connection with sqlite3.Row as row_factory
+        points: Downsample each chart series to at most this many points
+        start: Only chart observations on or after this ISO date/time
+        end: Only chart observations on or before this ISO date/time
+        columnar: Chart series as parallel arrays (see build_product_data)
+        store: Read series from this SeriesStore instead of price_history
+
+    Returns:
+        {'brands': [...]} with products grouped by brand
+    """
+    cursor = conn.cursor()
+    cursor.execute('SELECT * FROM products')
+    products = cursor.fetchall()
+    if not products:
+        return {'brands': []}
+
+    if store is not None:
+        by_product = store.series_by_product()
+    else:
+        by_product = aggregate_series(iter_history_rows(conn))
+    verdicts = latest_verdicts(conn)
+    seasons = low_seasons(conn)
+
+    brands_data = {}
+    for product in products:
+        series_list = by_product.get(product['id'])
+        if not series_list:
+            continue
+
+        product_data = build_product_data(product, series_list, points, start, end,
+                                          columnar=columnar, verdicts=verdicts.get(product['id']),
+                                          season=seasons.get(product['id']))
+        brand = brands_data.setdefault(product_data['brand'], {
+            'name': product_data['brand'],
+            'products': [],
+            # For simplicity, the brand's first product decides its best retailer
+            'bestRetailer': product_data['bestRetailer']
+        })
+        brand['products'].append(product_data)
+
+    return {'brands': list(brands_data.values())}
+
+
+# ---------------------------------------------------------------------------
+# Catalog summaries and per-product detail
+# ---------------------------------------------------------------------------
+
+CATALOG_SORTS = {
+    # sort name -> (key, default descending)
+    'savings': (lambda p: p['savings'], True),
+    'price': (lambda p: p['bestAvgPrice'], False),
+    'name': (lambda p: p['name'].lower(), False),
+}
+
+
+def series_totals(conn: sqlite3.Connection) -> dict:
+    """
+    Sum and count of prices per product × retailer, set-based.
+
+    Sealed blocks contribute their stored totals without being decoded.
+
+    Returns:
+        Dict of product_id -> {retailer_id: [sum, count]}
+    """
+    totals = {}
+    queries = ["""
+        SELECT product_id, retailer_id, SUM(price), COUNT(*)
+        FROM price_history
+        GROUP BY product_id, retailer_id
+    """]
+    if history_blocks.has_blocks(conn):
+        queries.append("""
+            SELECT product_id, retailer_id, SUM(sum_price), SUM(row_count)
+            FROM price_history_blocks
+            GROUP BY product_id, retailer_id
+        """)
+    for query in queries:
+        for product_id, retailer_id, total, count in conn.execute(query):
+            entry = totals.setdefault(product_id, {}).setdefault(retailer_id, [0.0, 0])
+            entry[0] += total
+            entry[1] += count
+    return totals
+
+
+class SeriesSummary(NamedTuple):
+    """Retailer stats of one series without its chart points (see series_summaries)."""
+    retailer_id: str
+    high: float
+    high_date: str
+    low: float
+    low_date: str
+    avg: float
+    first_date: str
+
+
+def series_summaries(conn: sqlite3.Connection, product_id: str) -> List[SeriesSummary]:
+    """
+    One product's retailer stats, set-based.
+
+    Totals and extremes are aggregated over the covering
+    idx_price_history_series index plus the sealed blocks' stored
+    summaries. A block is decoded only when it holds the first occurrence
+    of a series' high or low. Same stats as aggregate_series().
+    """
+    cursor = conn.cursor()
+    cursor.row_factory = None
+    queries = ["""
+        SELECT retailer_id, SUM(price), COUNT(*), MAX(price), MIN(price), MIN(timestamp)
+        FROM price_history
+        WHERE product_id = ?
+        GROUP BY retailer_id
+    """]
+    blocks = history_blocks.has_blocks(conn)
+    if blocks:
+        queries.append("""
+            SELECT retailer_id, SUM(sum_price), SUM(row_count), MAX(max_price), MIN(min_price),
+                   MIN(first_timestamp)
+            FROM price_history_blocks
+            WHERE product_id = ?
+            GROUP BY retailer_id
+        """)
+    series = {}
+    for query in queries:
+        for retailer_id, total, count, high, low, first in cursor.execute(query, (product_id,)).fetchall():
+            entry = series.get(retailer_id)
+            if entry is None:
+                series[retailer_id] = [total, count, high, low, first]
+            else:
+                entry[0] += total
+                entry[1] += count
+                entry[2] = max(entry[2], high)
+                entry[3] = min(entry[3], low)
+                entry[4] = min(entry[4], first)
+
+    return [
+        SeriesSummary(retailer_id,
+                      high, _first_seen(cursor, product_id, retailer_id, high, 'max_price', blocks),
+                      low, _first_seen(cursor, product_id, retailer_id, low, 'min_price', blocks),
+                      total / count, first)
+        for retailer_id, (total, count, high, low, first) in series.items()
+    ]
+
+
+def _first_seen(cursor: sqlite3.Cursor, product_id: str, retailer_id: str, price: float,
+                block_column: str, blocks: bool) -> str:
+    """Earliest timestamp of a series' high or low price."""
+    first = cursor.execute("""
+        SELECT MIN(timestamp) FROM price_history
+        WHERE product_id = ? AND retailer_id = ? AND price = ?
+    """, (product_id, retailer_id, price)).fetchone()[0]
+    if blocks:
+        # Months don't overlap, so only the earliest block reaching the price matters
+        row = cursor.execute(f"""
+            SELECT payload FROM price_history_blocks
+            WHERE product_id = ? AND retailer_id = ? AND {block_column} = ?
+            ORDER BY month
+            LIMIT 1
+        """, (product_id, retailer_id, price)).fetchone()
+        if row is not None:
+            dates = [r[4] for r in history_blocks.decode_block(product_id, retailer_id, row[0])
+                     if r[3] == price]
+            first = min(dates + ([first] if first is not None else []))
+    return first
+
+
+def build_product_summary(product, retailer_totals: dict) -> dict:
+    """Lightweight catalog entry: best/worst average price, no chart data."""
+    averages = {retailer_id: total / count
+                for retailer_id, (total, count) in retailer_totals.items()}
+    best_retailer = min(averages, key=averages.get)
+    worst_avg = max(averages.values())
+    return {
+        'id': product['id'],
+        'name': product['name'],
+        'brand': brand_name(product),
+        'size': product['size'],
+        'category': product['category'],
+        'bestAvgPrice': averages[best_retailer],
+        'bestRetailer': best_retailer.capitalize(),
+        'worstAvgPrice': worst_avg,
+        'savings': worst_avg - averages[best_retailer],
+        'retailerCount': len(averages),
+        'observationCount': sum(count for _, count in retailer_totals.values()),
+    }
+
+
+def build_catalog(conn: sqlite3.Connection, brand: Optional[str] = None,
+                  category: Optional[str] = None, search: Optional[str] = None,
+                  sort: str = 'savings', descending: Optional[bool] = None,
+                  page: int = 1, per_page: int = 50, store=None) -> dict:
+    """
+    Filtered, sorted and paginated product summaries.
+
+    Args:
+        conn: Connection with sqlite3.Row as row_factory
+        brand: Only this brand (case-insensitive)
+        category: Only this category (case-insensitive)
+        search: Substring match on product name, ID or UPC
+        sort: One of CATALOG_SORTS
+        descending: Sort direction (defaults per sort: savings high to low,
+                    price low to high, name A-Z)
+        page: 1-based page number
+        per_page: Products per page
+        store: Read totals from this SeriesStore instead of price_history
+
+    Returns:
+        Dict with the page's 'products', paging info, and 'brands' /
+        'categories' facets with product counts
+    """
+    if sort not in CATALOG_SORTS:
+        raise ValueError(f"sort must be one of {', '.join(CATALOG_SORTS)}")
+    sort_key, default_descending = CATALOG_SORTS[sort]
+    if descending is None:
+        descending = default_descending
+
+    totals = store.totals() if store is not None else series_totals(conn)
+    summaries = []
+    for product in conn.execute('SELECT * FROM products'):
+        if product['id'] in totals:
+            summaries.append((product, build_product_summary(product, totals[product['id']])))
+
+    brand_counts = {}
+    category_counts = {}
+    for _, summary in summaries:
+        brand_counts[summary['brand']] = brand_counts.get(summary['brand'], 0) + 1
+        category_counts[summary['category']] = category_counts.get(summary['category'], 0) + 1
+
+    search = search.lower() if search else None
+    matches = [
+        summary for product, summary in summaries
+        if (not brand or summary['brand'].lower() == brand.lower())
+        and (not category or summary['category'].lower() == category.lower())
+        and (not search or search in summary['name'].lower()
+             or search in summary['id'].lower()
+             or search in (product['upc'] or ''))
+    ]
+    matches.sort(key=sort_key, reverse=descending)
+
+    total = len(matches)
+    offset = (page - 1) * per_page
+    return {
+        'cursor': latest_cursor(conn),
+        'products': matches[offset:offset + per_page],
+        'page': page,
+        'perPage': per_page,
+        'total': total,
+        'pages': (total + per_page - 1) // per_page,
+        'brands': [{'name': name, 'count': count} for name, count in sorted(brand_counts.items())],
+        'categories': [{'name': name, 'count': count} for name, count in sorted(category_counts.items())],
+    }
+
+
+def build_product_detail(conn: sqlite3.Connection, product_id: str,
+                         points: Optional[int] = None, start: Optional[str] = None,
+                         end: Optional[str] = None, charts: bool = True,
+                         columnar: bool = False, store=None) -> Optional[dict]:
+    """
+    Full dashboard entry (retailer table and chart series) for one product.
+
+    With a SeriesStore, its in-memory series are used instead of reading
+    price_history. Without charts, the retailer stats come from
+    series_summaries(), so the history isn't read row by row.
+
+    Returns:
+        Same shape as a product in build_dashboard_data(), or None if the
+        product doesn't exist or has no price history
+    """
+    product = conn.execute('SELECT * FROM products WHERE id = ?', (product_id,)).fetchone()
+    if product is None:
+        return None
+    if store is not None:
+        series_list = store.product_series(product_id)
+    elif not charts:
+        series_list = series_summaries(conn, product_id)
+    else:
+        series_list = aggregate_series(iter_history_rows(conn, product_id)).get(product_id)
+    if not series_list:
+        return None
+    verdicts = latest_verdicts(conn, product_id).get(product_id)
+    season = low_seasons(conn, product_id).get(product_id)
+    return build_product_data(product, series_list, points, start, end, charts, columnar,
+                              verdicts, season)
+
+
+def build_history(conn: sqlite3.Connection, product_id: str, retailer_id: Optional[str] = None,
+                  start: Optional[str] = None, end: Optional[str] = None,
+                  bucket: str = 'day', columnar: bool = False) -> dict:
+    """
+    One product's bucketed price history (see PriceDatabase.get_price_buckets).
+
+    Returns:
+        {'productId', 'bucket', 'from', 'to', 'series': [{'retailer',
+        'buckets': [{'start', 'open', 'high', 'low', 'close', 'avg',
+        'count'}]}]}, or with `columnar` each series as {'retailer', 't',
+        'open', ...} arrays
+    """
+    by_retailer = {}
+    for b in PriceDatabase.from_connection(conn).get_price_buckets(
+            product_id, retailer_id, start, end, bucket):
+        by_retailer.setdefault(b.retailer_id, []).append({
+            'start': b.start.isoformat(),
+            'open': b.open,
+            'high': b.high,
+            'low': b.low,
+            'close': b.close,
+            'avg': b.avg,
+            'count': b.count,
+        })
+
+    return {
+        'productId': product_id,
+        'bucket': bucket,
+        'from': start,
+        'to': end,
+        'series': [
+            {'retailer': retailer, **to_columnar(points, 'start')} if columnar
+            else {'retailer': retailer, 'buckets': points}
+            for retailer, points in by_retailer.items()
+        ],
+    }
+
+
+def build_best_prices(conn: sqlite3.Connection, product_id: str, start: Optional[str] = None,
+                      end: Optional[str] = None, bucket: str = 'day', columnar: bool = False) -> dict:
+    """
+    Who was cheapest over time (see PriceDatabase.get_retailer_comparison).
+
+    Returns:
+        {'productId', 'bucket', 'from', 'to', 'retailers', 'cheapestShare':
+        {retailer: share}, 'mostOftenCheapest', 'points': [{'time', 'price',
+        'retailer', 'cheapest', 'spread', 'retailers'}]}, or with
+        `columnar` the points as {'t', 'price', ...} arrays
+    """
+    result = PriceDatabase.from_connection(conn).get_retailer_comparison(product_id, bucket, start, end)
+    points = [{
+        'time': p.time.isoformat(),
+        'price': p.price,
+        'retailer': p.retailer_id,
+        'cheapest': p.cheapest,
+        'spread': p.spread,
+        'retailers': p.retailers,
+    } for p in (result.points if result else [])]
+    return {
+        'productId': product_id,
+        'bucket': bucket,
+        'from': start,
+        'to': end,
+        'retailers': result.retailers if result else [],
+        'cheapestShare': result.cheapest_share if result else {},
+        'mostOftenCheapest': result.most_often_cheapest() if result else None,
+        'points': to_columnar(points, 'time') if columnar else points,
+    }
+
+
+def build_analytics(conn: sqlite3.Connection, product_id: Optional[str] = None,
+                    retailer_id: Optional[str] = None, cheap_only: bool = False) -> dict:
+    """
+    Stored series analytics (see src/analytics.py and PriceDatabase.get_price_analytics).
+
+    Returns:
+        {'computedAt', 'series': [{'productId', 'retailer', 'firstDay',
+        'lastDay', 'days', 'currentPrice', 'mean7d', 'mean30d', 'min30d',
+        'max30d', 'volatility30d', 'percentiles': {'p10', 'p25', 'p50',
+        'p90'}, 'shareCheaper', 'daysAtCurrent', 'shareAtLow', 'isCheap'}]}
+    """
+    rows = PriceDatabase.from_connection(conn).get_price_analytics(product_id, retailer_id, cheap_only)
+    return {
+        'computedAt': max(a.computed_at for a in rows).isoformat() if rows else None,
+        'series': [
+            {
+                'productId': a.product_id,
+                'retailer': a.retailer_id,
+                'firstDay': a.first_day.isoformat(),
+                'lastDay': a.last_day.isoformat(),
+                'days': a.days,
+                'currentPrice': a.current_price,
+                'mean7d': a.mean_7d,
+                'mean30d': a.mean_30d,
+                'min30d': a.min_30d,
+                'max30d': a.max_30d,
+                'volatility30d': a.volatility_30d,
+                'percentiles': {'p10': a.p10, 'p25': a.p25, 'p50': a.p50, 'p90': a.p90},
+                'shareCheaper': a.share_cheaper,
+                'daysAtCurrent': a.days_at_current,
+                'shareAtLow': a.share_at_low,
+                'isCheap': a.is_cheap(),
+            }
+            for a in rows
+        ],
+    }
+
+
+def build_sale_report(conn: sqlite3.Connection, product_id: Optional[str] = None,
+                      retailer_id: Optional[str] = None, verdict: Optional[str] = None,
+                      limit: int = 100) -> dict:
+    """
+    Checked discount claims (see src/fake_sales.py), newest first.
+
+    Returns:
+        {'summary': {retailer: {verdict: count}}, 'claims': [{'productId',
+        'retailer', 'timestamp', 'price', 'advertisedSavings', 'claimedWas',
+        'referencePrice', 'actualSavings', 'medians': {'30d', '60d', '90d'},
+        'modes': {...}, 'verdict'}]}
+    """
+    db = PriceDatabase.from_connection(conn)
+    summary = db.get_sale_verdict_counts(product_id, retailer_id)
+    claims = db.get_sale_verdicts(product_id, retailer_id, verdict, limit)
+    return {
+        'summary': summary,
+        'claims': [
+            {
+                'productId': v.product_id,
+                'retailer': v.retailer_id,
+                'timestamp': v.timestamp.isoformat(),
+                'price': v.price,
+                'advertisedSavings': v.advertised_savings,
+                'claimedWas': v.claimed_was,
+                'referencePrice': v.reference_price,
+                'actualSavings': v.actual_savings,
+                'medians': {'30d': v.median_30d, '60d': v.median_60d, '90d': v.median_90d},
+                'modes': {'30d': v.mode_30d, '60d': v.mode_60d, '90d': v.mode_90d},
+                'verdict': v.verdict,
+            }
+            for v in claims
+        ],
+    }
+
+
+def build_seasonality(conn: sqlite3.Connection, product_id: Optional[str] = None,
+                      category: Optional[str] = None) -> dict:
+    """
+    Stored seasonality (see src/seasonality.py) for series and categories.
+
+    Returns:
+        {'series': [{'productId', 'retailer', 'days', 'monthIndex',
+        'weekdayIndex', 'lowMonths', 'lowWeekdays', 'monthConfidence',
+        'weekdayConfidence', 'cycleDays', 'cycleStrength', 'label'}],
+        'categories': [{'category', 'series', 'monthIndex', ...}]}
+    """
+    db = PriceDatabase.from_connection(conn)
+    series = db.get_seasonality(product_id, category=category)
+    if product_id is not None:
+        product = conn.execute("SELECT category FROM products WHERE id = ?", (product_id,)).fetchone()
+        category = product[0] if product else category
+    categories = db.get_category_seasonality(category) if category or product_id is None else []
+
+    def profile(s):
+        return {
+            'monthIndex': s.month_index,
+            'weekdayIndex': s.weekday_index,
+            'lowMonths': s.low_months,
+            'lowWeekdays': s.low_weekdays,
+            'monthConfidence': s.month_confidence,
+            'weekdayConfidence': s.weekday_confidence,
+            'label': describe_season(s.low_months, s.low_weekdays),
+        }
+
+    return {
+        'series': [
+            {'productId': s.product_id, 'retailer': s.retailer_id, 'days': s.days, **profile(s),
+             'cycleDays': s.cycle_days, 'cycleStrength': s.cycle_strength}
+            for s in series
+        ],
+        'categories': [{'category': c.category, 'series': c.series, **profile(c)} for c in categories],
+    }
+
+
+def build_forecasts(conn: sqlite3.Connection, product_id: Optional[str] = None,
+                    retailer_id: Optional[str] = None, horizon: Optional[int] = None,
+                    recommendation: Optional[str] = None) -> dict:
+    """
+    Current buy-or-wait forecasts (see src/forecasts.py), grouped by series.
+
+    Returns:
+        {'computedAt', 'series': [{'productId', 'retailer', 'asOf',
+        'currentPrice', 'forecasts': [{'horizon', 'expectedPrice',
+        'expectedSavings', 'pLower', 'recommendation', 'accuracy':
+        {'evaluated', 'mae', 'mape', 'brier'}}]}]}
+    """
+    rows = PriceDatabase.from_connection(conn).get_forecasts(product_id, retailer_id, horizon,
+                                                             recommendation)
+    series = {}
+    for f in rows:
+        entry = series.setdefault((f.product_id, f.retailer_id), {
+            'productId': f.product_id,
+            'retailer': f.retailer_id,
+            'asOf': f.as_of.isoformat(),
+            'currentPrice': f.current_price,
+            'forecasts': [],
+        })
+        entry['forecasts'].append({
+            'horizon': f.horizon,
+            'expectedPrice': f.expected_price,
+            'expectedSavings': f.expected_savings(),
+            'pLower': f.p_lower,
+            'recommendation': f.recommendation,
+            'accuracy': {'evaluated': f.evaluated, 'mae': f.mae, 'mape': f.mape, 'brier': f.brier},
+        })
+    return {
+        'computedAt': max(f.computed_at for f in rows).isoformat() if rows else None,
+        'series': list(series.values()),
+    }
+
+
+def build_unit_prices(conn: sqlite3.Connection, unit: str = 'oz', category: Optional[str] = None,
+                      limit: int = 20) -> dict:
+    """
+    Best value per unit of size across all products and retailers (see
+    PriceDatabase.get_best_unit_prices).
+
+    Returns:
+        {'unit', 'offers': [{'productId', 'name', 'size', 'retailer',
+        'timestamp', 'price', 'packSize', 'unitPrice'}]}
+    """
+    offers = PriceDatabase.from_connection(conn).get_best_unit_prices(unit, category, limit=limit)
+    return {
+        'unit': unit,
+        'offers': [{
+            'productId': o.product_id,
+            'name': o.name,
+            'size': o.size,
+            'retailer': o.retailer_id,
+            'timestamp': o.timestamp.isoformat(),
+            'price': o.price,
+            'packSize': o.pack_size,
+            'unitPrice': round(o.unit_price, 4),
+        } for o in offers],
+    }
+
+
+# ---------------------------------------------------------------------------
+# Delta sync
+# ---------------------------------------------------------------------------
+
+MAX_UPDATE_ROWS = 5000
+
+
+def _rows_since(conn: sqlite3.Connection, since_id: Optional[int],
+                since_time: Optional[str], limit: int, upto_id: int) -> list:
+    """Up to `limit` + 1 observations after a cursor and at most upto_id, in rowid order."""
+    if since_time is not None:
+        condition, block_condition, param = "timestamp > ?", "last_timestamp > ?", since_time
+    else:
+        condition, block_condition, param = "id > ?", "last_id > ?", since_id or 0
+
+    cursor = conn.cursor()
+    cursor.row_factory = None
+    rows = cursor.execute(f"""
+        SELECT id, product_id, retailer_id, price, timestamp
+        FROM price_history
+        WHERE {condition} AND id <= ?
+        ORDER BY id
+        LIMIT ?
+    """, (param, upto_id, limit + 1)).fetchall()
+
+    # Rows sealed since the client's last sync are only in blocks
+    if history_blocks.has_blocks(conn):
+        column = 4 if since_time is not None else 0
+        blocks = cursor.execute(f"""
+            SELECT product_id, retailer_id, payload
+            FROM price_history_blocks
+            WHERE {block_condition}
+        """, (param,)).fetchall()
+        for product_id, retailer_id, payload in blocks:
+            rows.extend(row[:5] for row in history_blocks.decode_block(product_id, retailer_id, payload)
+                        if row[column] > param and row[0] <= upto_id)
+        rows.sort()
+    return rows[:limit + 1]
+
+
+def build_updates(conn: sqlite3.Connection, since_id: Optional[int] = None,
+                  since_time: Optional[str] = None, limit: int = MAX_UPDATE_ROWS,
+                  store=None) -> dict:
+    """
+    Observations added after a client's cursor, with refreshed stats.
+
+    Price history is append-only, so new rows are the only changes. Work
+    is proportional to what changed: the new rows are read by rowid, and
+    retailer stats are refreshed only for the products they touch, from
+    set-based aggregates (see series_summaries) or the series store
+    rather than by re-reading their history.
+
+    Args:
+        conn: Connection with sqlite3.Row as row_factory
+        since_id: Rowid cursor from a previous response
+        since_time: ISO timestamp cursor, for a first sync from a known
+                    point in time (used when since_id is None)
+        limit: Max observations per response
+        store: Read retailer stats from this SeriesStore
+
+    Returns:
+        {'cursor': next rowid cursor, 'more': whether to fetch again right
+        away, 'series': new points grouped like chartData with a
+        'productId', 'products': stats (no charts) for touched products}
+    """
+    # Fix the upper bound before reading rows: the collector commits from
+    # another connection, and a row committed between the two reads must
+    # not end up below the returned cursor without having been sent
+    upto_id = latest_cursor(conn)
+    rows = _rows_since(conn, since_id, since_time, limit, upto_id)
+    more = len(rows) > limit
+    rows = rows[:limit]
+    # A full page stops at its last row; otherwise the client is caught up
+    cursor = rows[-1][0] if more else max(upto_id, since_id or 0)
+
+    series = {}
+    for _, product_id, retailer_id, price, timestamp in rows:
+        series.setdefault((product_id, retailer_id), []).append({'date': timestamp, 'price': price})
+
+    products = []
+    for product_id in sorted({product_id for product_id, _ in series}):
+        stats = build_product_detail(conn, product_id, charts=False, store=store)
+        if stats is not None:
+            products.append(stats)
+
+    return {
+        'cursor': cursor,
+        'more': more,
+        'series': [
+            {'productId': product_id, 'retailer': retailer_id,
+             'prices': sorted(prices, key=lambda p: p['date'])}
+            for (product_id, retailer_id), prices in series.items()
+        ],
+        'products': products,
+    }
@@ -2,112 +2,201 @@
 Database layer for storing price history.
 Uses SQLite for simplicity in the prototype.
 """
+import heapq
+import json
+import os
 import sqlite3
-from datetime import datetime
-from typing import List, Optional
+from datetime import date, datetime, timedelta
+from typing import Iterable, Iterator, List, Optional
 from pathlib import Path
 
-from src.models import Product, Retailer, PricePoint, PriceStats
+from src.models import (Product, Retailer, PricePoint, PriceStats, PriceBucket, PriceAnalytics,
+                        SaleVerdict, SeriesSeasonality, CategorySeasonality, PriceForecast, UnitPrice,
+                        RetailerComparison, ProductRecord, PricePointRecord, PriceStatsRecord)
+from src import (analytics, change_feed, comparison, fake_sales, forecasts, history_blocks,
+                 migrations, query_profiler, seasonality, units)
+
+BUCKETS = ('raw', 'hour', 'day', 'week', 'month')
+
+# IDs per "WHERE id IN (...)" lookup, under SQLite's bound-parameter limit
+_ID_CHUNK = 500
+
+# Per-unit price of an inserted row, from its price, pack_size and product_id
+# parameters and the product's normalized quantity (NULL if unknown)
+_UNIT_PRICE_SQL = "? / (? * (SELECT quantity FROM products WHERE id = ?))"
+
+# SQL expression giving the ISO start of each bucket; weeks start on Monday
+_BUCKET_SQL = {
+    'hour': "substr(timestamp, 1, 13) || ':00:00'",
+    'day': "substr(timestamp, 1, 10)",
+    'week': "date(substr(timestamp, 1, 10), '-6 days', 'weekday 1')",
+    'month': "substr(timestamp, 1, 7) || '-01'",
+}
+
+
+def _bucket_start(timestamp: str, bucket: str) -> str:
+    """Python equivalent of _BUCKET_SQL, for rows decoded from sealed blocks."""
+    if bucket == 'hour':
+        return timestamp[:13] + ':00:00'
+    if bucket == 'day':
+        return timestamp[:10]
+    if bucket == 'week':
+        day = date.fromisoformat(timestamp[:10])
+        return (day - timedelta(days=day.weekday())).isoformat()
+    if bucket == 'month':
+        return timestamp[:7] + '-01'
+    return timestamp
 
 
 class PriceDatabase:
     """Handles all database operations for price tracking."""
     
-    def __init__(self, db_path: str = "data/prices.db"):
-        """Initialize database connection and create tables if needed."""
+    def __init__(self, db_path: str = "data/prices.db", profile: Optional[bool] = None):
+        """
+        Initialize database connection and create tables if needed.
+        
+        Args:
+            db_path: Path to the SQLite database file
+            profile: Record per-query timings (defaults to the PRICE_DB_PROFILE
+                     environment variable, see query_profiler.py)
+        """
         self.db_path = db_path
         Path(db_path).parent.mkdir(parents=True, exist_ok=True)
-        self.conn = sqlite3.connect(db_path)
+        self.conn = query_profiler.connect(db_path, profile)
         self.conn.row_factory = sqlite3.Row
+        # Lets sealing hand freed pages back to the filesystem. Only takes
+        # effect on a new, empty file; existing databases switch with
+        # `python -m src.history_blocks vacuum`
+        self.conn.execute("PRAGMA auto_vacuum = INCREMENTAL")
+        # Write-ahead logging lets the dashboard keep reading while the
+        # collector writes. It is a persistent property of the database
+        # file; set PRICE_DB_WAL=0 on filesystems without shared memory
+        # support (e.g. network mounts)
+        if os.environ.get('PRICE_DB_WAL', '1') != '0':
+            self.conn.execute("PRAGMA journal_mode = WAL")
         self._create_tables()
     
+    @classmethod
+    def from_connection(cls, conn: sqlite3.Connection) -> 'PriceDatabase':
+        """
+        Wrap an already-open connection (e.g. the dashboard's read-only
+        ones) without running migrations; the schema must be current.
+        """
+        db = cls.__new__(cls)
+        db.db_path = None
+        db.conn = conn
+        return db
+    
     def _create_tables(self):
-        """Create database schema."""
-        cursor = self.conn.cursor()
-        
-        # Products table
-        cursor.execute("""
-            CREATE TABLE IF NOT EXISTS products (
-                id TEXT PRIMARY KEY,
-                name TEXT NOT NULL,
-                size TEXT NOT NULL,
-                category TEXT NOT NULL,
-                brand TEXT,
-                upc TEXT,
-                target_url TEXT,
-                walmart_url TEXT,
-                cvs_url TEXT,
-                walgreens_url TEXT,
-                amazon_url TEXT,
-                created_at TEXT NOT NULL,
-                updated_at TEXT NOT NULL
-            )
-        """)
-        
-        # Retailers table
-        cursor.execute("""
-            CREATE TABLE IF NOT EXISTS retailers (
-                id TEXT PRIMARY KEY,
-                name TEXT NOT NULL,
-                base_url TEXT NOT NULL
-            )
-        """)
-        
-        # Price history table
-        cursor.execute("""
-            CREATE TABLE IF NOT EXISTS price_history (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                product_id TEXT NOT NULL,
-                retailer_id TEXT NOT NULL,
-                price REAL NOT NULL,
-                timestamp TEXT NOT NULL,
-                url TEXT NOT NULL,
-                pack_size INTEGER DEFAULT 1,
-                advertised_savings REAL,
-                FOREIGN KEY (product_id) REFERENCES products(id),
-                FOREIGN KEY (retailer_id) REFERENCES retailers(id)
-            )
-        """)
-        
-        # Create index for faster queries
-        cursor.execute("""
-            CREATE INDEX IF NOT EXISTS idx_price_history_lookup 
-            ON price_history(product_id, retailer_id, timestamp DESC)
-        """)
-        
-        self.conn.commit()
+        """Create or upgrade the database schema (see migrations.py)."""
+        migrations.migrate(self.conn)
     
     def add_product(self, product: Product):
         """Add or update a product in the database."""
-        cursor = self.conn.cursor()
+        self.add_products([product])
+    
+    def add_products(self, products: Iterable[Product], commit: bool = True) -> int:
+        """
+        Add or update many products with one statement.
+        
+        Existing products keep their original created_at. The size is
+        parsed into products.quantity and unit (see src/units.py); when it
+        changes, the product's stored per-unit prices are recomputed,
+        including those in sealed blocks.
+        
+        Args:
+            products: Products to upsert
+            commit: Commit afterwards (pass False to group with other writes)
+        
+        Returns:
+            Number of products written
+        """
+        products = list(products)
         now = datetime.now().isoformat()
-
-        # Check if product exists to preserve created_at
-        cursor.execute("SELECT created_at FROM products WHERE id = ?", (product.id,))
-        existing = cursor.fetchone()
-        created_at = existing['created_at'] if existing else (product.created_at.isoformat() if product.created_at else now)
-
-        cursor.execute("""
-            INSERT OR REPLACE INTO products
+        sizes = {product.id: units.parse_size(product.size) for product in products}
+        cursor = self.conn.cursor()
+        # Sizes before the upsert, for only the products being written
+        ids = list(sizes)
+        previous = {}
+        for start in range(0, len(ids), _ID_CHUNK):
+            chunk = ids[start:start + _ID_CHUNK]
+            previous.update((row[0], row[1]) for row in cursor.execute(
+                f"SELECT id, size FROM products WHERE id IN ({', '.join('?' for _ in chunk)})", chunk))
+        cursor.executemany("""
+            INSERT INTO products
             (id, name, size, category, brand, upc, target_url, walmart_url, cvs_url,
-             walgreens_url, amazon_url, created_at, updated_at)
-            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+             walgreens_url, amazon_url, created_at, updated_at, active, quantity, unit)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+            ON CONFLICT(id) DO UPDATE SET
+                name = excluded.name,
+                size = excluded.size,
+                category = excluded.category,
+                brand = excluded.brand,
+                upc = excluded.upc,
+                target_url = excluded.target_url,
+                walmart_url = excluded.walmart_url,
+                cvs_url = excluded.cvs_url,
+                walgreens_url = excluded.walgreens_url,
+                amazon_url = excluded.amazon_url,
+                updated_at = excluded.updated_at,
+                active = excluded.active,
+                quantity = excluded.quantity,
+                unit = excluded.unit
         """, (
-            product.id,
-            product.name,
-            product.size,
-            product.category,
-            product.brand,
-            product.upc,
-            product.target_url,
-            product.walmart_url,
-            product.cvs_url,
-            product.walgreens_url,
-            product.amazon_url,
-            created_at,
-            now
+            (
+                product.id,
+                product.name,
+                product.size,
+                product.category,
+                product.brand,
+                product.upc,
+                product.target_url,
+                product.walmart_url,
+                product.cvs_url,
+                product.walgreens_url,
+                product.amazon_url,
+                product.created_at.isoformat() if product.created_at else now,
+                now,
+                1 if product.active else 0,
+                sizes[product.id].quantity if sizes[product.id] else None,
+                sizes[product.id].base_unit if sizes[product.id] else None
+            )
+            for product in products
         ))
-        self.conn.commit()
+        written = cursor.rowcount
+        # A new size changes the per-unit price of every stored observation
+        resized = [product.id for product in products if previous.get(product.id) != product.size]
+        cursor.executemany("""
+            UPDATE price_history
+            SET unit_price = price / (pack_size * (SELECT quantity FROM products
+                                                   WHERE products.id = price_history.product_id))
+            WHERE product_id = ?
+        """, [(product_id,) for product_id in resized])
+        cursor.executemany("""
+            UPDATE latest_unit_prices
+            SET unit_price = price / (pack_size * (SELECT quantity FROM products
+                                                   WHERE products.id = latest_unit_prices.product_id))
+            WHERE product_id = ?
+        """, [(product_id,) for product_id in resized])
+        if resized and history_blocks.has_blocks(self.conn):
+            for product_id in resized:
+                history_blocks.reencode_blocks(self.conn, product_id)
+        if commit:
+            self.conn.commit()
+        return written
+    
+    def set_products_active(self, product_ids: Iterable[str], active: bool,
+                            commit: bool = True) -> int:
+        """Activate or deactivate products without touching their history."""
+        now = datetime.now().isoformat()
+        cursor = self.conn.cursor()
+        cursor.executemany(
+            "UPDATE products SET active = ?, updated_at = ? WHERE id = ?",
+            ((1 if active else 0, now, product_id) for product_id in product_ids)
+        )
+        if commit:
+            self.conn.commit()
+        return cursor.rowcount
     
     def add_retailer(self, retailer: Retailer):
         """Add or update a retailer in the database."""
@@ -119,22 +208,154 @@ class PriceDatabase:
         self.conn.commit()
     
     def add_price_point(self, price_point: PricePoint):
-        """Record a new price observation."""
+        """
+        Record a new price observation.
+
+        If the new price flips the product's deal flag at this retailer
+        (see PriceStats.is_good_deal), a 'deal' event is added to the
+        change feed for live dashboards.
+        """
+        self.add_price_points([price_point])
+    
+    def add_price_points(self, price_points: Iterable[PricePoint], commit: bool = True) -> int:
+        """
+        Record many price observations in one statement.
+        
+        Series whose deal flag (see PriceStats.is_good_deal) flips with the
+        new rows get a 'deal' event on the change feed, like single inserts.
+        
+        Args:
+            price_points: Observations to insert
+            commit: Commit afterwards (pass False to batch several calls
+                    into one transaction)
+        
+        Returns:
+            Number of rows inserted
+        """
+        price_points = list(price_points)
         cursor = self.conn.cursor()
-        cursor.execute("""
+        cutoff = cursor.execute("SELECT datetime('now', '-30 days')").fetchone()[0]
+        windows = {
+            key: self._deal_window(*key, cutoff)
+            for key in {(p.product_id, p.retailer_id) for p in price_points}
+        }
+        cursor.executemany(f"""
             INSERT INTO price_history 
-            (product_id, retailer_id, price, timestamp, url, pack_size, advertised_savings)
-            VALUES (?, ?, ?, ?, ?, ?, ?)
+            (product_id, retailer_id, price, timestamp, url, pack_size, advertised_savings, unit_price)
+            VALUES (?, ?, ?, ?, ?, ?, ?, {_UNIT_PRICE_SQL})
         """, (
-            price_point.product_id,
-            price_point.retailer_id,
-            price_point.price,
-            price_point.timestamp.isoformat(),
-            price_point.url,
-            price_point.pack_size,
-            price_point.advertised_savings
+            (
+                p.product_id,
+                p.retailer_id,
+                p.price,
+                p.timestamp.isoformat(),
+                p.url,
+                p.pack_size,
+                p.advertised_savings,
+                p.price,
+                p.pack_size,
+                p.product_id
+            )
+            for p in price_points
         ))
-        self.conn.commit()
+        inserted = cursor.rowcount
+        self._update_latest_unit_prices(price_points)
+        self._record_deal_flips(windows, price_points, cutoff)
+        if commit:
+            self.conn.commit()
+        return inserted
+    
+    def _update_latest_unit_prices(self, price_points: List[PricePoint]):
+        """Upsert each series' newest point of the batch into latest_unit_prices."""
+        latest = {}
+        for p in price_points:
+            key = (p.product_id, p.retailer_id)
+            if key not in latest or p.timestamp >= latest[key].timestamp:
+                latest[key] = p
+        # Out-of-order backfills leave a newer stored price in place
+        self.conn.executemany(f"""
+            INSERT INTO latest_unit_prices
+            (product_id, retailer_id, timestamp, price, pack_size, unit_price)
+            VALUES (?, ?, ?, ?, ?, {_UNIT_PRICE_SQL})
+            ON CONFLICT(product_id, retailer_id) DO UPDATE SET
+                timestamp = excluded.timestamp,
+                price = excluded.price,
+                pack_size = excluded.pack_size,
+                unit_price = excluded.unit_price
+            WHERE excluded.timestamp >= latest_unit_prices.timestamp
+        """, [
+            (p.product_id, p.retailer_id, p.timestamp.isoformat(), p.price, p.pack_size,
+             p.price, p.pack_size, p.product_id)
+            for p in latest.values()
+        ])
+    
+    def _deal_window(self, product_id: str, retailer_id: str, cutoff: str) -> Optional[list]:
+        """
+        [price total, count, latest timestamp, latest price] of a series over
+        get_price_stats' default 30-day window, or None if it is empty.
+        
+        One aggregate over live rows; sealed blocks are only read when the
+        window reaches back into them.
+        """
+        cursor = self.conn.cursor()
+        cursor.row_factory = None
+        # The bare price column comes from the row with the MAX(timestamp)
+        total, count, latest, current = cursor.execute("""
+            SELECT SUM(price), COUNT(*), MAX(timestamp), price
+            FROM price_history
+            WHERE product_id = ? AND retailer_id = ? AND timestamp >= ?
+        """, (product_id, retailer_id, cutoff)).fetchone()
+        window = [total or 0.0, count, latest, current]
+        if history_blocks.has_blocks(self.conn):
+            for block in history_blocks.block_summaries(self.conn, product_id, retailer_id):
+                if block['last_timestamp'] < cutoff:
+                    break
+                if block['first_timestamp'] >= cutoff and latest is not None \
+                        and block['last_timestamp'] <= latest:
+                    window[0] += block['sum_price']
+                    window[1] += block['row_count']
+                    continue
+                for row in history_blocks.iter_block_rows(self.conn, product_id, retailer_id,
+                                                          months=[block['month']]):
+                    self._fold_deal_window(window, row[4], row[3], cutoff)
+        return window if window[1] else None
+    
+    @staticmethod
+    def _fold_deal_window(window: list, timestamp: str, price: float, cutoff: str):
+        if timestamp < cutoff:
+            return
+        window[0] += price
+        window[1] += 1
+        if window[2] is None or timestamp >= window[2]:
+            window[2], window[3] = timestamp, price
+    
+    def _record_deal_flips(self, windows: dict, price_points: List[PricePoint], cutoff: str):
+        """Add 'deal' events for series whose deal flag the new rows flipped."""
+        touched = {}
+        for p in sorted(price_points, key=lambda p: p.timestamp):
+            touched.setdefault((p.product_id, p.retailer_id), []).append(p)
+        for (product_id, retailer_id), points in touched.items():
+            window = windows[(product_id, retailer_id)]
+            if window is None:
+                # No prices in the window yet, so no flag to flip
+                continue
+            was_deal = self._window_stats(product_id, retailer_id, window).is_good_deal()
+            for p in points:
+                self._fold_deal_window(window, p.timestamp.isoformat(), p.price, cutoff)
+            stats = self._window_stats(product_id, retailer_id, window)
+            if stats.is_good_deal() != was_deal:
+                change_feed.record_event(self.conn, 'deal', {
+                    'isDeal': stats.is_good_deal(),
+                    'price': stats.current_price,
+                    'avg': stats.avg_price,
+                }, product_id, retailer_id, commit=False)
+    
+    @staticmethod
+    def _window_stats(product_id: str, retailer_id: str, window: list) -> PriceStatsRecord:
+        """The part of get_price_stats() that is_good_deal() needs, from a deal window."""
+        total, count, latest, current = window
+        return PriceStatsRecord(product_id, retailer_id, current, None, None, total / count,
+                                count, None, latest)
     
     def get_price_stats(self, product_id: str, retailer_id: str, 
                        days: int = 30) -> Optional[PriceStats]:
@@ -150,110 +371,639 @@ class PriceDatabase:
             PriceStats object or None if no data exists
         """
         cursor = self.conn.cursor()
+        cursor.execute("SELECT datetime('now', '-' || ? || ' days')", (days,))
+        cutoff = cursor.fetchone()[0]
         
         # Get stats for the specified time period
         cursor.execute("""
             SELECT 
-                product_id,
-                retailer_id,
                 MIN(price) as min_price,
                 MAX(price) as max_price,
-                AVG(price) as avg_price,
+                SUM(price) as sum_price,
                 COUNT(*) as observation_count,
                 MIN(timestamp) as first_seen,
                 MAX(timestamp) as last_updated
             FROM price_history
             WHERE product_id = ? 
                 AND retailer_id = ?
-                AND timestamp >= datetime('now', '-' || ? || ' days')
-            GROUP BY product_id, retailer_id
-        """, (product_id, retailer_id, days))
+                AND timestamp >= ?
+        """, (product_id, retailer_id, cutoff))
         
         row = cursor.fetchone()
-        if not row or row['observation_count'] == 0:
+        parts = [dict(row)] if row['observation_count'] else []
+        
+        # Fold in sealed blocks that overlap the window
+        for block in history_blocks.block_summaries(self.conn, product_id, retailer_id):
+            if block['last_timestamp'] < cutoff:
+                break
+            if block['first_timestamp'] >= cutoff:
+                parts.append({
+                    'min_price': block['min_price'],
+                    'max_price': block['max_price'],
+                    'sum_price': block['sum_price'],
+                    'observation_count': block['row_count'],
+                    'first_seen': block['first_timestamp'],
+                    'last_updated': block['last_timestamp']
+                })
+                continue
+            prices = []
+            timestamps = []
+            for block_row in history_blocks.iter_block_rows(
+                    self.conn, product_id, retailer_id, months=[block['month']]):
+                if block_row[4] >= cutoff:
+                    prices.append(block_row[3])
+                    timestamps.append(block_row[4])
+            if prices:
+                parts.append({
+                    'min_price': min(prices),
+                    'max_price': max(prices),
+                    'sum_price': sum(prices),
+                    'observation_count': len(prices),
+                    'first_seen': min(timestamps),
+                    'last_updated': max(timestamps)
+                })
+        
+        if not parts:
             return None
         
-        # Get most recent price
-        cursor.execute("""
-            SELECT price
-            FROM price_history
-            WHERE product_id = ? AND retailer_id = ?
-            ORDER BY timestamp DESC
-            LIMIT 1
-        """, (product_id, retailer_id))
+        observation_count = sum(p['observation_count'] for p in parts)
+        avg_price = sum(p['sum_price'] for p in parts) / observation_count
         
-        current_row = cursor.fetchone()
-        current_price = current_row['price'] if current_row else row['avg_price']
+        # Get most recent price
+        recent = self.get_recent_prices(product_id, retailer_id, limit=1)
+        current_price = recent[0].price if recent else avg_price
         
-        return PriceStats(
-            product_id=row['product_id'],
-            retailer_id=row['retailer_id'],
+        return PriceStatsRecord(
+            product_id=product_id,
+            retailer_id=retailer_id,
             current_price=current_price,
-            min_price=row['min_price'],
-            max_price=row['max_price'],
-            avg_price=row['avg_price'],
-            observation_count=row['observation_count'],
-            first_seen=datetime.fromisoformat(row['first_seen']),
-            last_updated=datetime.fromisoformat(row['last_updated'])
+            min_price=min(p['min_price'] for p in parts),
+            max_price=max(p['max_price'] for p in parts),
+            avg_price=avg_price,
+            observation_count=observation_count,
+            first_seen=min(p['first_seen'] for p in parts),
+            last_updated=max(p['last_updated'] for p in parts)
         )
     
     def get_recent_prices(self, product_id: str, retailer_id: str, 
                          limit: int = 30) -> List[PricePoint]:
         """Get recent price history for a product at a retailer."""
         cursor = self.conn.cursor()
-        cursor.execute("""
-            SELECT *
+        cursor.execute(f"""
+            SELECT {', '.join(history_blocks.ROW_COLUMNS)}
             FROM price_history
             WHERE product_id = ? AND retailer_id = ?
             ORDER BY timestamp DESC
             LIMIT ?
         """, (product_id, retailer_id, limit))
         
-        rows = cursor.fetchall()
+        rows = [tuple(row) for row in cursor.fetchall()]
+        
+        # Blocks are only decoded while the live rows come up short or a
+        # block ends after the oldest row kept. Sealed months are disjoint,
+        # so blocks come newest first and the first one ending before that
+        # row ends the walk; usually that is the first block
+        for block in history_blocks.block_summaries(self.conn, product_id, retailer_id):
+            if len(rows) >= limit and (not rows or block['last_timestamp'] < rows[limit - 1][4]):
+                break
+            rows.extend(history_blocks.iter_block_rows(
+                self.conn, product_id, retailer_id, months=[block['month']]))
+            rows.sort(key=lambda r: (r[4], r[0]), reverse=True)
+            rows = rows[:limit]
+        
+        return [self._price_point_from_row(row) for row in rows]
+    
+    def get_price_buckets(self, product_id: str, retailer_id: Optional[str] = None,
+                          start: Optional[str] = None, end: Optional[str] = None,
+                          bucket: str = 'day') -> List[PriceBucket]:
+        """
+        Aggregate a product's price history into time buckets.
+        
+        Live rows are aggregated in SQL on the idx_price_history_series
+        index (open/close come from index seeks on each bucket's first and
+        last timestamp); sealed blocks overlapping the range are decoded and
+        merged in.
+        
+        Args:
+            product_id: Product identifier
+            retailer_id: Only this retailer (all retailers if None)
+            start: Only observations on or after this ISO date/time
+            end: Only observations on or before this ISO date/time (a date
+                 covers that whole day)
+            bucket: One of BUCKETS; 'raw' returns every observation
+        
+        Returns:
+            PriceBuckets ordered by retailer, then time
+        """
+        if bucket not in BUCKETS:
+            raise ValueError(f"bucket must be one of {', '.join(BUCKETS)}")
+        
+        clauses = ["product_id = ?"]
+        params = [product_id]
+        if retailer_id is not None:
+            clauses.append("retailer_id = ?")
+            params.append(retailer_id)
+        if start:
+            clauses.append("timestamp >= ?")
+            params.append(start)
+        end_exclusive = None
+        if end:
+            if len(end) == 10:
+                end_exclusive = (date.fromisoformat(end) + timedelta(days=1)).isoformat()
+                clauses.append("timestamp < ?")
+                params.append(end_exclusive)
+            else:
+                clauses.append("timestamp <= ?")
+                params.append(end)
+        where = " AND ".join(clauses)
+        
+        # (retailer, bucket start) -> [first ts, open, last ts, close, low, high, total, count]
+        buckets = {}
+        
+        def merge(key, first_ts, open_price, last_ts, close_price, low, high, total, count):
+            entry = buckets.get(key)
+            if entry is None:
+                buckets[key] = [first_ts, open_price, last_ts, close_price, low, high, total, count]
+                return
+            if first_ts < entry[0]:
+                entry[0], entry[1] = first_ts, open_price
+            if last_ts > entry[2]:
+                entry[2], entry[3] = last_ts, close_price
+            entry[4] = min(entry[4], low)
+            entry[5] = max(entry[5], high)
+            entry[6] += total
+            entry[7] += count
+        
+        cursor = self.conn.cursor()
+        cursor.row_factory = None
+        if bucket == 'raw':
+            cursor.execute(f"""
+                SELECT retailer_id, timestamp, price
+                FROM price_history
+                WHERE {where}
+                ORDER BY retailer_id, timestamp, id
+            """, params)
+            raw = [(row[0], row[1], row[2]) for row in cursor]
+        else:
+            cursor.execute(f"""
+                WITH buckets AS (
+                    SELECT retailer_id, {_BUCKET_SQL[bucket]} AS start,
+                           MIN(timestamp) AS first_ts, MAX(timestamp) AS last_ts,
+                           MIN(price) AS low, MAX(price) AS high,
+                           SUM(price) AS total, COUNT(*) AS count
+                    FROM price_history
+                    WHERE {where}
+                    GROUP BY retailer_id, start
+                )
+                SELECT b.retailer_id, b.start, b.first_ts,
+                       (SELECT price FROM price_history
+                        WHERE product_id = ? AND retailer_id = b.retailer_id
+                            AND timestamp = b.first_ts
+                        ORDER BY id LIMIT 1),
+                       b.last_ts,
+                       (SELECT price FROM price_history
+                        WHERE product_id = ? AND retailer_id = b.retailer_id
+                            AND timestamp = b.last_ts
+                        ORDER BY id DESC LIMIT 1),
+                       b.low, b.high, b.total, b.count
+                FROM buckets b
+            """, params + [product_id, product_id])
+            for row in cursor:
+                merge((row[0], row[1]), *row[2:])
+            raw = []
+        
+        # Sealed blocks that overlap the range
+        if history_blocks.has_blocks(self.conn):
+            block_clauses = ["product_id = ?"]
+            block_params = [product_id]
+            if retailer_id is not None:
+                block_clauses.append("retailer_id = ?")
+                block_params.append(retailer_id)
+            if start:
+                block_clauses.append("last_timestamp >= ?")
+                block_params.append(start)
+            if end:
+                block_clauses.append("first_timestamp < ?" if end_exclusive else "first_timestamp <= ?")
+                block_params.append(end_exclusive or end)
+            cursor.execute(f"""
+                SELECT product_id, retailer_id, payload
+                FROM price_history_blocks
+                WHERE {' AND '.join(block_clauses)}
+            """, block_params)
+            for block_product, block_retailer, payload in cursor.fetchall():
+                for row in history_blocks.decode_block(block_product, block_retailer, payload):
+                    timestamp, price = row[4], row[3]
+                    if start and timestamp < start:
+                        continue
+                    if end and (timestamp >= end_exclusive if end_exclusive else timestamp > end):
+                        continue
+                    if bucket == 'raw':
+                        raw.append((block_retailer, timestamp, price))
+                    else:
+                        merge((block_retailer, _bucket_start(timestamp, bucket)),
+                              timestamp, price, timestamp, price, price, price, price, 1)
+        
+        if bucket == 'raw':
+            raw.sort(key=lambda r: (r[0], r[1]))
+            return [PriceBucket(retailer, datetime.fromisoformat(timestamp),
+                                price, price, price, price, price, 1)
+                    for retailer, timestamp, price in raw]
+        
         return [
-            PricePoint(
-                product_id=row['product_id'],
-                retailer_id=row['retailer_id'],
-                price=row['price'],
-                timestamp=datetime.fromisoformat(row['timestamp']),
-                url=row['url'],
-                pack_size=row['pack_size'],
-                advertised_savings=row['advertised_savings']
+            PriceBucket(
+                retailer_id=key[0],
+                start=datetime.fromisoformat(key[1]),
+                open=entry[1],
+                high=entry[5],
+                low=entry[4],
+                close=entry[3],
+                avg=entry[6] / entry[7],
+                count=entry[7]
             )
-            for row in rows
+            for key, entry in sorted(buckets.items())
         ]
     
-    def get_all_products(self) -> List[Product]:
-        """Get all tracked products."""
+    def get_retailer_comparison(self, product_id: str, bucket: str = 'day',
+                                start: Optional[str] = None,
+                                end: Optional[str] = None) -> Optional[RetailerComparison]:
+        """
+        Best price and retailer over time, with the spread and each
+        retailer's share of time as the cheapest (see src/comparison.py).
+        
+        Every retailer's last known price is carried forward onto a shared
+        grid of time buckets. The joined grid is cached per product until
+        the product gets new rows.
+        
+        Args:
+            product_id: Product identifier
+            bucket: One of BUCKETS; 'raw' puts a point at every observation
+            start: Only points on or after this ISO date/time
+            end: Only points on or before this ISO date/time (a date covers
+                 that whole day)
+        
+        Returns:
+            RetailerComparison, or None if the product has no prices
+        """
+        if bucket not in BUCKETS:
+            raise ValueError(f"bucket must be one of {', '.join(BUCKETS)}")
+        return comparison.compare_retailers(self.conn, product_id, bucket, start, end)
+    
+    def get_price_history(self, product_id: str, retailer_id: str) -> List[PricePoint]:
+        """Get the full price history for a product at a retailer, oldest first."""
+        return list(self.iter_price_history(product_id, retailer_id))
+    
+    def iter_price_history(self, product_id: Optional[str] = None,
+                           retailer_id: Optional[str] = None) -> Iterator[PricePoint]:
+        """
+        Stream price history without materializing it.
+        
+        Sealed blocks and live rows are merged on the fly, ordered by
+        product, retailer and timestamp.
+        
+        Args:
+            product_id: Restrict to one product (all products if None)
+            retailer_id: Restrict to one retailer (all retailers if None)
+        
+        Yields:
+            PricePointRecord objects
+        """
+        clauses = []
+        params = []
+        if product_id is not None:
+            clauses.append("product_id = ?")
+            params.append(product_id)
+        if retailer_id is not None:
+            clauses.append("retailer_id = ?")
+            params.append(retailer_id)
+        where = f"WHERE {' AND '.join(clauses)}" if clauses else ""
+        
+        cursor = self.conn.cursor()
+        cursor.execute(f"""
+            SELECT {', '.join(history_blocks.ROW_COLUMNS)}
+            FROM price_history
+            {where}
+            ORDER BY product_id, retailer_id, timestamp, id
+        """, params)
+        
+        rows = heapq.merge(
+            history_blocks.iter_block_rows(self.conn, product_id, retailer_id),
+            cursor,
+            key=lambda r: (r[1], r[2], r[4], r[0])
+        )
+        for row in rows:
+            yield self._price_point_from_row(row)
+    
+    def seal_history_blocks(self, before_month: Optional[str] = None) -> dict:
+        """
+        Compress completed months of price history into sealed blocks.
+        
+        Args:
+            before_month: Seal months strictly before this 'YYYY-MM'
+                          (defaults to the current month)
+        
+        Returns:
+            Summary dict with 'blocks', 'rows_moved' and 'rows_skipped'
+        """
+        return history_blocks.seal_completed_months(self.conn, before_month)
+    
+    def refresh_analytics(self, full: bool = False, engine: Optional[str] = None) -> dict:
+        """
+        Recompute the price_analytics table for series with new data.
+        
+        Args:
+            full: Recompute every series, not just changed products
+            engine: 'numpy' or 'python' (NumPy when installed)
+        
+        Returns:
+            Summary dict with 'series', 'products', 'full', 'engine' and 'seconds'
+        """
+        return analytics.refresh_analytics(self.conn, full, engine)
+    
+    def get_price_analytics(self, product_id: Optional[str] = None,
+                            retailer_id: Optional[str] = None,
+                            cheap_only: bool = False) -> List[PriceAnalytics]:
+        """
+        Stored analytics, ordered by product and retailer.
+        
+        Args:
+            product_id: Only this product
+            retailer_id: Only this retailer
+            cheap_only: Only series whose current price is within their
+                        cheapest 10% of days
+        """
+        clauses = []
+        params = []
+        if product_id is not None:
+            clauses.append("product_id = ?")
+            params.append(product_id)
+        if retailer_id is not None:
+            clauses.append("retailer_id = ?")
+            params.append(retailer_id)
+        if cheap_only:
+            clauses.append("current_price <= p10")
+        where = ("WHERE " + " AND ".join(clauses)) if clauses else ""
         cursor = self.conn.cursor()
-        cursor.execute("SELECT * FROM products")
+        cursor.execute(f"""
+            SELECT * FROM price_analytics {where}
+            ORDER BY product_id, retailer_id
+        """, params)
+        return [self._analytics_from_row(row) for row in cursor]
+    
+    @staticmethod
+    def _analytics_from_row(row) -> PriceAnalytics:
+        values = {name: row[name] for name in analytics.COLUMNS if name != 'cursor'}
+        values['first_day'] = date.fromisoformat(values['first_day'])
+        values['last_day'] = date.fromisoformat(values['last_day'])
+        values['computed_at'] = datetime.fromisoformat(values['computed_at'])
+        return PriceAnalytics(**values)
+    
+    def refresh_sale_verdicts(self, full: bool = False) -> dict:
+        """
+        Check advertised discounts added since the last refresh (see src/fake_sales.py).
+        
+        Args:
+            full: Re-check every claim in the history
+        
+        Returns:
+            Summary dict with 'evaluated', 'verdicts', 'full' and 'seconds'
+        """
+        return fake_sales.refresh_verdicts(self.conn, full)
+    
+    def get_sale_verdicts(self, product_id: Optional[str] = None,
+                          retailer_id: Optional[str] = None,
+                          verdict: Optional[str] = None,
+                          limit: Optional[int] = None) -> List[SaleVerdict]:
+        """
+        Checked discount claims, newest first.
+        
+        Args:
+            product_id: Only this product
+            retailer_id: Only this retailer
+            verdict: Only this verdict (see fake_sales.VERDICTS)
+            limit: Max number of claims
+        """
+        clauses = []
+        params = []
+        for column, value in (('product_id', product_id), ('retailer_id', retailer_id),
+                              ('verdict', verdict)):
+            if value is not None:
+                clauses.append(f"{column} = ?")
+                params.append(value)
+        where = ("WHERE " + " AND ".join(clauses)) if clauses else ""
+        if limit is not None:
+            params.append(limit)
+        cursor = self.conn.cursor()
+        cursor.execute(f"""
+            SELECT * FROM sale_verdicts {where}
+            ORDER BY timestamp DESC, price_id DESC
+            {"LIMIT ?" if limit is not None else ""}
+        """, params)
+        return [self._verdict_from_row(row) for row in cursor]
+    
+    def get_sale_verdict_counts(self, product_id: Optional[str] = None,
+                                retailer_id: Optional[str] = None) -> dict:
+        """Number of checked claims per retailer and verdict: {retailer: {verdict: count}}."""
+        clauses = []
+        params = []
+        for column, value in (('product_id', product_id), ('retailer_id', retailer_id)):
+            if value is not None:
+                clauses.append(f"{column} = ?")
+                params.append(value)
+        where = ("WHERE " + " AND ".join(clauses)) if clauses else ""
+        counts = {}
+        for row in self.conn.execute(f"""
+            SELECT retailer_id, verdict, COUNT(*) FROM sale_verdicts {where}
+            GROUP BY retailer_id, verdict
+        """, params):
+            counts.setdefault(row[0], dict.fromkeys(fake_sales.VERDICTS, 0))[row[1]] = row[2]
+        return counts
+    
+    @staticmethod
+    def _verdict_from_row(row) -> SaleVerdict:
+        values = {name: row[name] for name in fake_sales.COLUMNS}
+        values['timestamp'] = datetime.fromisoformat(values['timestamp'])
+        values['computed_at'] = datetime.fromisoformat(values['computed_at'])
+        return SaleVerdict(**values)
+    
+    def refresh_seasonality(self, full: bool = False) -> dict:
+        """
+        Recompute seasonality for series with new data (see src/seasonality.py).
+        
+        Args:
+            full: Recompute every series and category
+        
+        Returns:
+            Summary dict with 'series', 'products', 'categories', 'full' and 'seconds'
+        """
+        return seasonality.refresh_seasonality(self.conn, full)
+    
+    def get_seasonality(self, product_id: Optional[str] = None,
+                        retailer_id: Optional[str] = None,
+                        category: Optional[str] = None) -> List[SeriesSeasonality]:
+        """
+        Stored series seasonality, ordered by product and retailer.
+        
+        Args:
+            product_id: Only this product
+            retailer_id: Only this retailer
+            category: Only products in this category
+        """
+        clauses = []
+        params = []
+        for column, value in (('s.product_id', product_id), ('s.retailer_id', retailer_id),
+                              ('p.category', category)):
+            if value is not None:
+                clauses.append(f"{column} = ?")
+                params.append(value)
+        where = ("WHERE " + " AND ".join(clauses)) if clauses else ""
+        cursor = self.conn.cursor()
+        cursor.execute(f"""
+            SELECT s.* FROM series_seasonality s
+            JOIN products p ON p.id = s.product_id
+            {where}
+            ORDER BY s.product_id, s.retailer_id
+        """, params)
+        return [self._seasonality_from_row(row, SeriesSeasonality) for row in cursor]
+    
+    def get_category_seasonality(self, category: Optional[str] = None) -> List[CategorySeasonality]:
+        """Stored category seasonality, ordered by category."""
+        cursor = self.conn.cursor()
+        cursor.execute(f"""
+            SELECT * FROM category_seasonality
+            {"WHERE category = ?" if category is not None else ""}
+            ORDER BY category
+        """, (category,) if category is not None else ())
+        return [self._seasonality_from_row(row, CategorySeasonality) for row in cursor]
+    
+    @staticmethod
+    def _seasonality_from_row(row, cls):
+        values = {name: row[name] for name in row.keys() if name != 'cursor'}
+        for name in ('month_index', 'weekday_index', 'low_months', 'low_weekdays'):
+            values[name] = json.loads(values[name])
+        values['computed_at'] = datetime.fromisoformat(values['computed_at'])
+        return cls(**values)
+    
+    def refresh_forecasts(self, full: bool = False) -> dict:
+        """
+        Update buy-or-wait forecasts for series with new data (see src/forecasts.py).
+        
+        Args:
+            full: Refit every series from scratch
+        
+        Returns:
+            Summary dict with 'series', 'refits', 'full' and 'seconds'
+        """
+        return forecasts.refresh_forecasts(self.conn, full)
+    
+    def get_forecasts(self, product_id: Optional[str] = None,
+                      retailer_id: Optional[str] = None,
+                      horizon: Optional[int] = None,
+                      recommendation: Optional[str] = None) -> List[PriceForecast]:
+        """
+        Current forecasts, ordered by product, retailer and horizon.
+        
+        Args:
+            product_id: Only this product
+            retailer_id: Only this retailer
+            horizon: Only this horizon in days (see forecasts.HORIZONS)
+            recommendation: Only 'buy' or 'wait'
+        """
+        clauses = []
+        params = []
+        for column, value in (('product_id', product_id), ('retailer_id', retailer_id),
+                              ('horizon', horizon), ('recommendation', recommendation)):
+            if value is not None:
+                clauses.append(f"{column} = ?")
+                params.append(value)
+        where = ("WHERE " + " AND ".join(clauses)) if clauses else ""
+        cursor = self.conn.cursor()
+        cursor.execute(f"""
+            SELECT * FROM price_forecasts {where}
+            ORDER BY product_id, retailer_id, horizon
+        """, params)
+        return [self._forecast_from_row(row) for row in cursor]
+    
+    @staticmethod
+    def _forecast_from_row(row) -> PriceForecast:
+        values = {name: row[name] for name in forecasts.COLUMNS}
+        values['as_of'] = date.fromisoformat(values['as_of'])
+        values['computed_at'] = datetime.fromisoformat(values['computed_at'])
+        return PriceForecast(**values)
+    
+    def get_best_unit_prices(self, unit: str = 'oz', category: Optional[str] = None,
+                             since: Optional[datetime] = None, active_only: bool = True,
+                             limit: int = 20) -> List[UnitPrice]:
+        """
+        Cheapest current offers per unit of size, across all products and retailers.
+        
+        Each product × retailer is ranked by its latest observation's
+        unit_price, kept in latest_unit_prices at insert time (see
+        add_price_points). A series' latest price stays there after its
+        month is sealed; pass since to skip series no longer collected.
+        
+        Args:
+            unit: Display unit, a key of units.UNITS ('oz', 'fl oz', 'ml', 'ct', ...);
+                  products measured in other dimensions are skipped
+            category: Only this category
+            since: Only series observed at or after this time
+            active_only: Skip products removed from the catalog
+            limit: Number of offers to return
+        """
+        base_unit, factor = units.UNITS[unit]
+        clauses = ["latest.unit_price IS NOT NULL", "p.unit = ?"]
+        params = [base_unit]
+        if category is not None:
+            clauses.append("p.category = ?")
+            params.append(category)
+        if active_only:
+            clauses.append("p.active = 1")
+        if since is not None:
+            clauses.append("latest.timestamp >= ?")
+            params.append(since.isoformat())
+        cursor = self.conn.cursor()
+        # Walks idx_latest_unit_prices_rank cheapest first and stops at limit
+        cursor.execute(f"""
+            SELECT latest.product_id, p.name, p.size, latest.retailer_id, latest.timestamp,
+                   latest.price, latest.pack_size, latest.unit_price
+            FROM latest_unit_prices latest
+            JOIN products p ON p.id = latest.product_id
+            WHERE {" AND ".join(clauses)}
+            ORDER BY latest.unit_price, latest.product_id, latest.retailer_id
+            LIMIT ?
+        """, params + [limit])
         return [
-            Product(
-                id=row['id'],
+            UnitPrice(
+                product_id=row['product_id'],
                 name=row['name'],
                 size=row['size'],
-                category=row['category'],
-                brand=row['brand'] if 'brand' in row.keys() else None,
-                upc=row['upc'],
-                target_url=row['target_url'],
-                walmart_url=row['walmart_url'],
-                cvs_url=row['cvs_url'],
-                walgreens_url=row['walgreens_url'],
-                amazon_url=row['amazon_url'],
-                created_at=datetime.fromisoformat(row['created_at']) if row['created_at'] else None,
-                updated_at=datetime.fromisoformat(row['updated_at']) if row['updated_at'] else None
+                retailer_id=row['retailer_id'],
+                timestamp=datetime.fromisoformat(row['timestamp']),
+                price=row['price'],
+                pack_size=row['pack_size'],
+                unit=unit,
+                unit_price=round(row['unit_price'] * factor, 6)
             )
-            for row in cursor.fetchall()
+            for row in cursor
         ]
-
-    def get_product(self, product_id: str) -> Optional[Product]:
-        """Get a specific product by ID."""
-        cursor = self.conn.cursor()
-        cursor.execute("SELECT * FROM products WHERE id = ?", (product_id,))
-        row = cursor.fetchone()
-        if not row:
-            return None
-        return Product(
+    
+    def record_event(self, kind: str, payload: dict, product_id: Optional[str] = None,
+                     retailer_id: Optional[str] = None) -> int:
+        """Publish an event (e.g. collection run progress) on the change feed."""
+        return change_feed.record_event(self.conn, kind, payload, product_id, retailer_id)
+    
+    def prune_events(self, keep_days: int = change_feed.DEFAULT_KEEP_DAYS) -> int:
+        """Delete change feed events older than keep_days."""
+        return change_feed.prune_events(self.conn, keep_days)
+    
+    @staticmethod
+    def _price_point_from_row(row) -> PricePoint:
+        """Build a PricePoint from a row tuple in ROW_COLUMNS order."""
+        return PricePointRecord(row[1], row[2], row[3], row[4], row[5], row[6], row[7])
+    
+    @staticmethod
+    def _product_from_row(row) -> Product:
+        """Build a Product from a products table row."""
+        return ProductRecord(
             id=row['id'],
             name=row['name'],
             size=row['size'],
@@ -265,10 +1015,32 @@ class PriceDatabase:
             cvs_url=row['cvs_url'],
             walgreens_url=row['walgreens_url'],
             amazon_url=row['amazon_url'],
-            created_at=datetime.fromisoformat(row['created_at']) if row['created_at'] else None,
-            updated_at=datetime.fromisoformat(row['updated_at']) if row['updated_at'] else None
+            created_at=row['created_at'] or None,
+            updated_at=row['updated_at'] or None,
+            active=bool(row['active']) if 'active' in row.keys() else True
         )
     
+    def get_all_products(self, active_only: bool = False) -> List[Product]:
+        """Get all tracked products (only active ones if active_only)."""
+        return list(self.iter_products(active_only))
+    
+    def iter_products(self, active_only: bool = False) -> Iterator[Product]:
+        """Stream tracked products as ProductRecord objects."""
+        cursor = self.conn.cursor()
+        cursor.execute("SELECT * FROM products WHERE active = 1" if active_only
+                       else "SELECT * FROM products")
+        for row in cursor:
+            yield self._product_from_row(row)
+
+    def get_product(self, product_id: str) -> Optional[Product]:
+        """Get a specific product by ID."""
+        cursor = self.conn.cursor()
+        cursor.execute("SELECT * FROM products WHERE id = ?", (product_id,))
+        row = cursor.fetchone()
+        if not row:
+            return None
+        return self._product_from_row(row)
+    
     def get_all_retailers(self) -> List[Retailer]:
         """Get all configured retailers."""
         cursor = self.conn.cursor()
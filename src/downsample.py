@@ -0,0 +1,92 @@
+"""
+Chart downsampling.
+
+Largest-Triangle-Three-Buckets (LTTB) keeps the visual shape of a series
+with a fixed number of points. The true high and low of the series are
+always kept, so a downsampled chart never hides a price extreme.
+"""
+from datetime import datetime
+from typing import List, Optional, Sequence
+
+MIN_POINTS = 3
+MIN_BUDGET = MIN_POINTS + 2
+
+
+def lttb_indices(xs: Sequence[float], ys: Sequence[float], threshold: int) -> List[int]:
+    """
+    Select indices of points to keep using LTTB.
+
+    Args:
+        xs: X values, ascending
+        ys: Y values
+        threshold: Number of points to keep (at least 3)
+
+    Returns:
+        Sorted list of indices, always including the first and last point
+    """
+    n = len(xs)
+    if threshold >= n or threshold < MIN_POINTS:
+        return list(range(n))
+
+    selected = [0]
+    bucket_size = (n - 2) / (threshold - 2)
+    a = 0
+
+    for i in range(threshold - 2):
+        # Average of the next bucket is the third triangle vertex
+        next_start = int((i + 1) * bucket_size) + 1
+        next_end = min(int((i + 2) * bucket_size) + 1, n)
+        count = next_end - next_start
+        avg_x = sum(xs[next_start:next_end]) / count
+        avg_y = sum(ys[next_start:next_end]) / count
+
+        start = int(i * bucket_size) + 1
+        end = int((i + 1) * bucket_size) + 1
+        ax, ay = xs[a], ys[a]
+        best_area = -1.0
+        best = start
+        for j in range(start, end):
+            area = abs((ax - avg_x) * (ys[j] - ay) - (ax - xs[j]) * (avg_y - ay))
+            if area > best_area:
+                best_area = area
+                best = j
+        selected.append(best)
+        a = best
+
+    selected.append(n - 1)
+    return selected
+
+
+def downsample_prices(prices: List[dict], budget: int) -> List[dict]:
+    """
+    Downsample a chart series of {'date', 'price'} dicts.
+
+    The result has at most `budget` points (budgets below MIN_BUDGET are
+    raised to it) and always includes the first high and first low of the
+    series.
+    """
+    budget = max(budget, MIN_BUDGET)
+    if budget >= len(prices):
+        return prices
+
+    ys = [p['price'] for p in prices]
+    xs = [datetime.fromisoformat(p['date']).timestamp() for p in prices]
+
+    # LTTB gets two fewer points so the extremes always fit in the budget
+    keep = set(lttb_indices(xs, ys, budget - 2))
+    keep.add(ys.index(max(ys)))
+    keep.add(ys.index(min(ys)))
+    return [prices[i] for i in sorted(keep)]
+
+
+def in_range(date: str, start: Optional[str], end: Optional[str]) -> bool:
+    """
+    Check an ISO timestamp against an inclusive date range.
+
+    `end` may be a date ('2025-01-31') and then covers that whole day.
+    """
+    if start and date < start:
+        return False
+    if end and date[:len(end)] > end:
+        return False
+    return True
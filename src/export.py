@@ -1,82 +1,578 @@
 """
-Export price data to JSON for use in the HTML display.
+Export price data for the HTML display, spreadsheets and other tools.
+
+Usage:
+    python -m src.export [--type json|ndjson|csv] [--format rows|columnar]
+                         [--pretty] [--gzip] [--output data/prices_export.json]
+                         [--db data/prices.db]
+    python -m src.export --shards [--full] [--format rows|columnar]
+                         [--output data/prices_export] [--db data/prices.db]
+
+Output types:
+    json    prices_export.json for templates/index.html: per product and
+            retailer, 30-day stats and the 30 most recent prices. The
+            default 'rows' format lists each price as an object;
+            'columnar' stores parallel arrays with epoch-millisecond times
+            (see src/serialization.py), which is much smaller; it is meant
+            for display and can't be read back by src/import_prices.py.
+    ndjson  Every observation, one JSON object per line
+    csv     Every observation, one row per line with a header
+
+NDJSON and CSV use the fields src/import_prices.py reads, so they can be
+imported into another database.
+
+--shards writes the json export as one file per product plus index.json,
+and on later runs re-renders only the products whose data changed (see
+export_shards()).
+
+All types are written in one ordered pass over the history (see
+history_blocks.iter_history_rows), a product at a time, so memory stays
+flat however large the catalog is. Output goes to a temporary file that is
+renamed into place once complete, so readers never see a partial export.
 """
+import argparse
+import csv
+import gzip
+import itertools
 import json
+import os
+import sys
+import time
+from collections import deque
 from datetime import datetime
-from database import PriceDatabase
+from pathlib import Path
+from typing import BinaryIO, Dict, Iterator, Optional, Tuple
+from urllib.parse import quote
+
+# Allow running as a script from src/ as well as with -m
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from src.database import PriceDatabase
+from src.history_blocks import iter_history_rows, latest_cursor
+from src.models import PriceStatsRecord
+from src.serialization import FORMATS, GZIP_LEVEL, columnar, dumps
+
+EXPORT_TYPES = ('json', 'ndjson', 'csv')
+
+# Observation fields for NDJSON and CSV, as read by src/import_prices.py;
+# history rows in ROW_COLUMNS order carry them after the row ID
+OBSERVATION_FIELDS = ('product_id', 'retailer_id', 'price', 'timestamp',
+                      'url', 'pack_size', 'advertised_savings')
+
+STATS_DAYS = 30
+RECENT_PRICES = 30
+PROGRESS_SECONDS = 2.0
+
 
+class ExportProgress:
+    """Counts what an export has written and reports throughput."""
 
-def export_to_json(output_path: str = "data/prices_export.json"):
-    """Export all price data to JSON format."""
-    db = PriceDatabase()
-    
-    products = db.get_all_products()
-    retailers = db.get_all_retailers()
-    
-    export_data = {
+    def __init__(self, report: bool = True, every: float = PROGRESS_SECONDS):
+        self.report = report
+        self.every = every
+        self.rows = 0
+        self.products = 0
+        self.series = 0
+        self.started = time.perf_counter()
+        self._next_report = self.started + every
+
+    def count_rows(self, rows: Iterator[tuple]) -> Iterator[tuple]:
+        """Pass history rows through, counting them."""
+        for row in rows:
+            self.rows += 1
+            if self.report and not self.rows % 4096 and time.perf_counter() >= self._next_report:
+                print(f"  {self.rows:,} rows, {self.products:,} products "
+                      f"({self.rows_per_second:,.0f} rows/s)")
+                self._next_report = time.perf_counter() + self.every
+            yield row
+
+    @property
+    def seconds(self) -> float:
+        return time.perf_counter() - self.started
+
+    @property
+    def rows_per_second(self) -> float:
+        return self.rows / max(self.seconds, 1e-9)
+
+
+def _stats_cutoff(db: PriceDatabase, days: int = STATS_DAYS) -> str:
+    """The same window start as PriceDatabase.get_price_stats()."""
+    return db.conn.execute("SELECT datetime('now', '-' || ? || ' days')", (days,)).fetchone()[0]
+
+
+def _export_header(db: PriceDatabase, fmt: str) -> dict:
+    if fmt not in FORMATS:
+        raise ValueError(f"Unknown format {fmt}; expected one of {', '.join(FORMATS)}")
+    return {
         "generated_at": datetime.now().isoformat(),
-        "products": [],
+        "format": fmt,
         "retailers": [
             {
                 "id": r.id,
                 "name": r.name,
                 "base_url": r.base_url
             }
-            for r in retailers
+            for r in db.get_all_retailers()
         ]
     }
-    
-    # Gather price data for each product
-    for product in products:
-        product_data = {
-            "id": product.id,
-            "name": product.name,
-            "size": product.size,
-            "category": product.category,
-            "prices": []
+
+
+def _price_info(product_id: str, retailer_id: str, rows: Iterator[tuple],
+                cutoff: str, fmt: str) -> Tuple[Optional[dict], Optional[str]]:
+    """
+    Stats and recent history for one series, from its rows in timestamp order.
+
+    Returns:
+        (price info, timestamp of the oldest observation in the window), or
+        (None, None) if the series has no observations since `cutoff`,
+        like get_price_stats()
+    """
+    recent = deque(maxlen=RECENT_PRICES)
+    count = 0
+    total = 0.0
+    low = high = first_seen = last_updated = None
+    for row in rows:
+        recent.append(row)
+        timestamp = row[4]
+        if timestamp >= cutoff:
+            price = row[3]
+            count += 1
+            total += price
+            low = price if low is None else min(low, price)
+            high = price if high is None else max(high, price)
+            first_seen = first_seen or timestamp
+            last_updated = timestamp
+    if not count:
+        return None, None
+
+    stats = PriceStatsRecord(product_id, retailer_id, recent[-1][3], low, high,
+                             total / count, count, first_seen, last_updated)
+    history = [
+        {
+            "price": row[3],
+            "timestamp": datetime.fromisoformat(row[4]).isoformat(),
+            "pack_size": row[6],
+            "advertised_savings": row[7]
         }
-        
-        for retailer in retailers:
-            stats = db.get_price_stats(product.id, retailer.id, days=30)
-            recent_prices = db.get_recent_prices(product.id, retailer.id, limit=30)
-            
-            if stats:
-                price_info = {
-                    "retailer_id": retailer.id,
-                    "current_price": stats.current_price,
-                    "min_price": stats.min_price,
-                    "max_price": stats.max_price,
-                    "avg_price": stats.avg_price,
-                    "is_good_deal": stats.is_good_deal(),
-                    "savings_vs_avg": stats.savings_vs_average(),
-                    "observation_count": stats.observation_count,
-                    "last_updated": stats.last_updated.isoformat(),
-                    "history": [
-                        {
-                            "price": p.price,
-                            "timestamp": p.timestamp.isoformat(),
-                            "pack_size": p.pack_size,
-                            "advertised_savings": p.advertised_savings
-                        }
-                        for p in reversed(recent_prices)  # Chronological order
-                    ]
-                }
-                product_data["prices"].append(price_info)
-        
-        if product_data["prices"]:  # Only include products with price data
-            export_data["products"].append(product_data)
-    
-    # Write to JSON file
-    with open(output_path, 'w') as f:
-        json.dump(export_data, f, indent=2)
-    
-    print(f"✓ Exported price data to {output_path}")
-    print(f"  Products: {len(export_data['products'])}")
-    print(f"  Retailers: {len(export_data['retailers'])}")
-    
-    db.close()
+        for row in recent  # Chronological order
+    ]
+    return {
+        "retailer_id": retailer_id,
+        "current_price": stats.current_price,
+        "min_price": stats.min_price,
+        "max_price": stats.max_price,
+        "avg_price": stats.avg_price,
+        "is_good_deal": stats.is_good_deal(),
+        "savings_vs_avg": stats.savings_vs_average(),
+        "observation_count": stats.observation_count,
+        "last_updated": stats.last_updated.isoformat(),
+        "history": columnar(history, 'timestamp') if fmt == 'columnar' else history
+    }, first_seen
+
+
+def iter_export_products(db: PriceDatabase, fmt: str = 'rows',
+                         progress: Optional[ExportProgress] = None) -> Iterator[dict]:
+    """
+    Yield export entries for products with recent prices, ordered by ID.
+
+    Products and history are both read in product ID order and merged, so
+    only one product's rows are held at a time.
+    """
+    if fmt not in FORMATS:
+        raise ValueError(f"Unknown format {fmt}; expected one of {', '.join(FORMATS)}")
+    progress = progress or ExportProgress(report=False)
+    cutoff = _stats_cutoff(db)
+    # The display looks retailers up in the export's retailer list
+    retailer_ids = {r.id for r in db.get_all_retailers()}
+    products = db.conn.execute("SELECT id, name, size, category FROM products ORDER BY id")
+    product = products.fetchone()
+
+    rows = progress.count_rows(iter_history_rows(db.conn, all_columns=True))
+    for product_id, product_rows in itertools.groupby(rows, key=lambda r: r[1]):
+        while product is not None and product['id'] < product_id:
+            product = products.fetchone()
+        if product is None or product['id'] != product_id:
+            continue  # History for a product no longer in the catalog
+
+        entry, _ = _product_entry(product, product_rows, cutoff, retailer_ids, fmt, progress)
+        if entry:
+            yield entry
+
+
+def _product_entry(product, rows: Iterator[tuple], cutoff: str, retailer_ids: set,
+                   fmt: str, progress: ExportProgress) -> Tuple[Optional[dict], Optional[str]]:
+    """
+    One product's export entry from its history rows (ordered by retailer
+    and timestamp).
+
+    Returns:
+        (entry, oldest observation timestamp in the stats window), or
+        (None, None) if no retailer has recent prices
+    """
+    prices = []
+    window_start = None
+    for retailer_id, series_rows in itertools.groupby(rows, key=lambda r: r[2]):
+        if retailer_id not in retailer_ids:
+            continue
+        progress.series += 1
+        price_info, first_seen = _price_info(product['id'], retailer_id, series_rows, cutoff, fmt)
+        if price_info:
+            prices.append(price_info)
+            window_start = min(window_start or first_seen, first_seen)
+
+    if not prices:  # Only include products with price data
+        return None, None
+    progress.products += 1
+    return {
+        "id": product['id'],
+        "name": product['name'],
+        "size": product['size'],
+        "category": product['category'],
+        "prices": prices
+    }, window_start
+
+
+def build_export(db: PriceDatabase, fmt: str = 'rows') -> dict:
+    """Build the whole JSON export payload in memory ('rows' or 'columnar' history)."""
+    export_data = _export_header(db, fmt)
+    export_data["products"] = list(iter_export_products(db, fmt))
     return export_data
 
 
+def iter_observations(db: PriceDatabase,
+                      progress: Optional[ExportProgress] = None) -> Iterator[tuple]:
+    """Every observation as a tuple of OBSERVATION_FIELDS, ordered by series."""
+    progress = progress or ExportProgress(report=False)
+    for row in progress.count_rows(iter_history_rows(db.conn, all_columns=True)):
+        yield row[1:]
+
+
+def write_export(db: PriceDatabase, out: BinaryIO, export_type: str = 'json',
+                 fmt: str = 'rows', pretty: bool = False,
+                 progress: Optional[ExportProgress] = None):
+    """
+    Stream an export to a binary file object.
+
+    Args:
+        db: Database to export
+        out: Destination
+        export_type: One of EXPORT_TYPES
+        fmt: History layout for 'json' ('rows' or 'columnar')
+        pretty: Indent 'json' output
+        progress: Counters to update (and report)
+    """
+    if export_type == 'json':
+        header = dumps(_export_header(db, fmt), pretty=pretty).rstrip()[:-1].rstrip()
+        out.write(header + (b',\n  "products": [' if pretty else b',"products":['))
+        for index, product in enumerate(iter_export_products(db, fmt, progress)):
+            if index:
+                out.write(b',')
+            if pretty:
+                out.write(b'\n    ' + dumps(product, pretty=True).replace(b'\n', b'\n    '))
+            else:
+                out.write(dumps(product))
+        out.write(b'\n  ]\n}\n' if pretty else b']}')
+
+    elif export_type == 'ndjson':
+        for observation in iter_observations(db, progress):
+            out.write(dumps(dict(zip(OBSERVATION_FIELDS, observation))) + b'\n')
+
+    elif export_type == 'csv':
+        writer = csv.writer(_Utf8Writer(out))
+        writer.writerow(OBSERVATION_FIELDS)
+        writer.writerows(iter_observations(db, progress))
+
+    else:
+        raise ValueError(f"Unknown export type {export_type}; expected one of {', '.join(EXPORT_TYPES)}")
+
+
+class _Utf8Writer:
+    """Text adapter for csv.writer over a binary output."""
+
+    def __init__(self, out: BinaryIO):
+        self.out = out
+
+    def write(self, text: str) -> int:
+        return self.out.write(text.encode('utf-8'))
+
+
+class _AtomicOutput:
+    """Writes to temporary files and renames them into place on commit()."""
+
+    def __init__(self, paths):
+        self.paths = [Path(p) for p in paths]
+        self.tmp_paths = [p.with_name(f'.{p.name}.tmp') for p in self.paths]
+        self.files = []
+        self.bytes = 0
+        for path, tmp_path in zip(self.paths, self.tmp_paths):
+            path.parent.mkdir(parents=True, exist_ok=True)
+            if path.suffix == '.gz':
+                self.files.append(gzip.open(tmp_path, 'wb', compresslevel=GZIP_LEVEL))
+            else:
+                self.files.append(open(tmp_path, 'wb'))
+
+    def write(self, data: bytes) -> int:
+        for f in self.files:
+            f.write(data)
+        self.bytes += len(data)
+        return len(data)
+
+    def commit(self):
+        for f in self.files:
+            f.close()
+        for path, tmp_path in zip(self.paths, self.tmp_paths):
+            os.replace(tmp_path, path)
+
+    def discard(self):
+        for f, tmp_path in zip(self.files, self.tmp_paths):
+            f.close()
+            if tmp_path.exists():
+                tmp_path.unlink()
+
+
+def export_prices(output_path: str = "data/prices_export.json", export_type: str = 'json',
+                  fmt: str = 'rows', pretty: bool = False, gzip_copy: bool = False,
+                  db: Optional[PriceDatabase] = None, report: bool = True) -> dict:
+    """
+    Stream an export to a file, replacing it atomically.
+
+    Args:
+        output_path: File to write
+        export_type: 'json', 'ndjson' or 'csv'
+        fmt: 'rows' or 'columnar' price history (json only)
+        pretty: Indent the JSON (larger; compact by default)
+        gzip_copy: Also write a compressed <output_path>.gz
+        db: Database to export (opens the default database if None)
+        report: Print progress and a throughput summary
+
+    Returns:
+        Dict with 'products', 'series', 'rows', 'bytes' and 'seconds'
+    """
+    if export_type not in EXPORT_TYPES:
+        raise ValueError(f"Unknown export type {export_type}; expected one of {', '.join(EXPORT_TYPES)}")
+    owns_db = db is None
+    db = db or PriceDatabase()
+    progress = ExportProgress(report)
+    out = _AtomicOutput([output_path] + ([output_path + '.gz'] if gzip_copy else []))
+    try:
+        write_export(db, out, export_type, fmt, pretty, progress)
+        out.commit()
+    except BaseException:
+        out.discard()
+        raise
+    finally:
+        if owns_db:
+            db.close()
+
+    summary = {
+        'products': progress.products,
+        'series': progress.series,
+        'rows': progress.rows,
+        'bytes': out.bytes,
+        'seconds': progress.seconds,
+    }
+    if report:
+        label = f"{export_type}, {fmt}" if export_type == 'json' else export_type
+        print(f"✓ Exported price data to {output_path} ({out.bytes:,} bytes, {label})")
+        if export_type == 'json':
+            print(f"  Products: {progress.products}")
+        print(f"  Rows read: {progress.rows:,} in {progress.seconds:.2f}s "
+              f"({progress.rows_per_second:,.0f} rows/s, "
+              f"{out.bytes / max(progress.seconds, 1e-9) / 1e6:.1f} MB/s)")
+    return summary
+
+
+def export_to_json(output_path: str = "data/prices_export.json", fmt: str = 'rows',
+                   pretty: bool = False, gzip_copy: bool = False,
+                   db: Optional[PriceDatabase] = None) -> dict:
+    """Export prices_export.json for the HTML display (see export_prices())."""
+    return export_prices(output_path, 'json', fmt, pretty, gzip_copy, db)
+
+
+SHARD_INDEX = 'index.json'
+
+
+def _read_shard_index(output_dir: Path) -> Optional[dict]:
+    try:
+        return json.loads((output_dir / SHARD_INDEX).read_bytes())
+    except (OSError, ValueError):
+        return None
+
+
+def _write_file(path: Path, body: bytes):
+    out = _AtomicOutput([path])
+    out.write(body)
+    out.commit()
+
+
+def export_shards(output_dir: str = "data/prices_export", fmt: str = 'rows',
+                  db: Optional[PriceDatabase] = None, full: bool = False,
+                  report: bool = True) -> dict:
+    """
+    Incrementally export one JSON shard per product plus an index.
+
+    Each shard holds the product's prices_export.json entry. index.json
+    holds the export header (retailers, format), the price_history cursor
+    the export was taken at, and for every catalog product its shard file,
+    watermark (the highest rowid the shard was rendered from), updated_at
+    and the oldest observation inside the stats window.
+
+    A shard is re-rendered only when the product has rows above its
+    watermark, its catalog entry changed, or an observation has aged out
+    of the 30-day stats window. New rows are found with a rowid range scan
+    from the previous cursor, over live rows and blocks sealed since, so
+    the cost follows the new data rather than the size of the history.
+    Only shard files the previous index listed are ever deleted. A different format or retailer list re-renders
+    everything.
+
+    Args:
+        output_dir: Shard directory (created if missing)
+        fmt: 'rows' or 'columnar' price history
+        db: Database to export (opens the default database if None)
+        full: Re-render every shard
+        report: Print a summary
+
+    Returns:
+        Dict with 'products' (shards), 'rendered', 'removed', 'rows' and
+        'seconds'
+    """
+    if fmt not in FORMATS:
+        raise ValueError(f"Unknown format {fmt}; expected one of {', '.join(FORMATS)}")
+    owns_db = db is None
+    db = db or PriceDatabase()
+    output = Path(output_dir)
+    output.mkdir(parents=True, exist_ok=True)
+    progress = ExportProgress(report=False)
+    rendered = 0
+    try:
+        conn = db.conn
+        header = _export_header(db, fmt)
+        cursor = latest_cursor(conn)
+        cutoff = _stats_cutoff(db)
+        retailer_ids = {r['id'] for r in header['retailers']}
+
+        previous = _read_shard_index(output)
+        previous_files = ({entry['file'] for entry in previous['products'].values()}
+                          if previous is not None else set())
+        rebuild = (full or previous is None or previous.get('format') != fmt
+                   or previous.get('retailers') != header['retailers'])
+        entries: Dict[str, dict] = {} if rebuild else previous['products']
+
+        changed = set()
+        if not rebuild:
+            # Rows sealed into blocks since the last export count as new too
+            for product_id, max_id in conn.execute("""
+                SELECT product_id, MAX(id) FROM price_history
+                WHERE id > ?
+                GROUP BY product_id
+                UNION ALL
+                SELECT product_id, MAX(last_id) FROM price_history_blocks
+                WHERE last_id > ?
+                GROUP BY product_id
+            """, (previous['cursor'], previous['cursor'])):
+                if max_id > entries.get(product_id, {}).get('watermark', 0):
+                    changed.add(product_id)
+
+        products = {}
+        for product in conn.execute("SELECT id, name, size, category, updated_at FROM products"):
+            products[product['id']] = product
+            entry = entries.get(product['id'])
+            if (entry is None or entry['updated_at'] != product['updated_at']
+                    or (entry['window_start'] is not None and entry['window_start'] < cutoff)):
+                changed.add(product['id'])
+
+        for product_id in sorted(changed & products.keys()):
+            watermark = 0
+
+            def tracked(rows):
+                nonlocal watermark
+                for row in rows:
+                    watermark = max(watermark, row[0])
+                    yield row
+
+            rows = tracked(progress.count_rows(iter_history_rows(conn, product_id, all_columns=True)))
+            entry, window_start = _product_entry(products[product_id], rows, cutoff,
+                                                 retailer_ids, fmt, progress)
+            name = None
+            if entry is not None:
+                name = quote(product_id, safe='') + '.json'
+                _write_file(output / name, dumps(entry))
+                rendered += 1
+            entries[product_id] = {
+                'file': name,
+                'watermark': watermark,
+                'updated_at': products[product_id]['updated_at'],
+                'window_start': window_start,
+            }
+
+        for product_id in set(entries) - products.keys():
+            del entries[product_id]
+        _write_file(output / SHARD_INDEX, dumps({**header, 'cursor': cursor, 'products': entries}))
+
+        # Shards of products that left the catalog or have no recent prices.
+        # Only files the previous index listed are removed, so other files
+        # in the directory are left alone
+        files = {entry['file'] for entry in entries.values()}
+        removed = 0
+        for name in previous_files - files - {None}:
+            path = output / name
+            if path.exists():
+                path.unlink()
+                removed += 1
+    finally:
+        if owns_db:
+            db.close()
+
+    summary = {
+        'products': len(files - {None}),
+        'rendered': rendered,
+        'removed': removed,
+        'rows': progress.rows,
+        'seconds': progress.seconds,
+    }
+    if report:
+        print(f"✓ Exported {summary['products']} product shard(s) to {output_dir} "
+              f"in {summary['seconds']:.2f}s{' (full rebuild)' if rebuild else ''}")
+        print(f"  Re-rendered: {rendered}, removed: {removed}, rows read: {progress.rows:,}")
+    return summary
+
+
+def main():
+    """CLI entry point."""
+    parser = argparse.ArgumentParser(description="Export price data.")
+    parser.add_argument('--type', choices=EXPORT_TYPES,
+                        help="Output type (default: from the output file's extension, else json)")
+    parser.add_argument('--output', help="Output file (default: data/prices_export.<type>)")
+    parser.add_argument('--format', choices=FORMATS, default='rows', help="Price history layout (json)")
+    parser.add_argument('--pretty', action='store_true', help="Indent the JSON")
+    parser.add_argument('--gzip', action='store_true', help="Also write a .gz copy")
+    parser.add_argument('--shards', action='store_true',
+                        help="Incremental export: one JSON file per product plus index.json "
+                             "in the --output directory (default: data/prices_export)")
+    parser.add_argument('--full', action='store_true', help="With --shards, re-render every shard")
+    parser.add_argument('--db', default="data/prices.db", help="Database path")
+    args = parser.parse_args()
+
+    if args.shards:
+        db = PriceDatabase(args.db)
+        try:
+            export_shards(args.output or "data/prices_export", args.format, db=db, full=args.full)
+        finally:
+            db.close()
+        return
+
+    export_type = args.type
+    if export_type is None:
+        suffix = Path(args.output).suffix.lower().lstrip('.') if args.output else ''
+        export_type = {'jsonl': 'ndjson'}.get(suffix, suffix if suffix in EXPORT_TYPES else 'json')
+    output = args.output or f"data/prices_export.{export_type}"
+
+    db = PriceDatabase(args.db)
+    try:
+        export_prices(output, export_type, args.format, args.pretty, args.gzip, db=db)
+    finally:
+        db.close()
+
+
 if __name__ == "__main__":
-    export_to_json()
+    main()
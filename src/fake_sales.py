@@ -0,0 +1,329 @@
+"""
+Fake-sale detection: was that "$X off" actually a discount?
+
+Every observation with advertised_savings implies a "was" price (price +
+savings). It is checked against what the retailer actually charged before
+it: the median and modal daily price over the trailing 30, 60 and 90 days
+(daily closes carried forward, as in src/analytics.py, excluding the
+observation's own day).
+
+The reference price is the highest of those six figures - the most
+generous "usual price" the retailer could fairly cite - and the claim gets
+one of these verdicts:
+
+    genuine       The claimed "was" price is within TOLERANCE of the
+                  reference: the discount is real and as advertised
+    inflated      The price is below the reference, but by less than
+                  claimed: the "was" price is exaggerated
+    fictitious    The price isn't below the reference at all: the "sale"
+                  price is the usual price
+    unverified    No history before the observation to compare with
+
+Verdicts are stored in sale_verdicts, one per observation. Refreshes are
+incremental: only series with new rows are read, and only their claims
+from the earliest new timestamp onwards are re-checked (a backfilled row
+can change the trailing windows of later claims). Each refresh that
+changes anything is logged in sale_verdict_runs, which also holds the
+price cursor for the next refresh.
+
+Usage:
+    python -m src.fake_sales refresh [db_path]   # check new observations
+    python -m src.fake_sales full [db_path]      # re-check all history
+"""
+import sqlite3
+import sys
+import time
+from collections import Counter
+from datetime import date, datetime
+from functools import lru_cache
+from itertools import repeat
+from statistics import median
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+from src.history_blocks import iter_history_rows, latest_cursor
+
+CREATE_VERDICTS_TABLE = """
+    CREATE TABLE IF NOT EXISTS sale_verdicts (
+        price_id INTEGER PRIMARY KEY,
+        product_id TEXT NOT NULL,
+        retailer_id TEXT NOT NULL,
+        timestamp TEXT NOT NULL,
+        price REAL NOT NULL,
+        advertised_savings REAL NOT NULL,
+        claimed_was REAL NOT NULL,
+        median_30d REAL,
+        median_60d REAL,
+        median_90d REAL,
+        mode_30d REAL,
+        mode_60d REAL,
+        mode_90d REAL,
+        reference_price REAL,
+        actual_savings REAL,
+        verdict TEXT NOT NULL,
+        computed_at TEXT NOT NULL
+    )
+"""
+
+CREATE_VERDICTS_INDEX = """
+    CREATE INDEX IF NOT EXISTS idx_sale_verdicts_series
+    ON sale_verdicts(product_id, retailer_id, timestamp)
+"""
+
+CREATE_RUNS_TABLE = """
+    CREATE TABLE IF NOT EXISTS sale_verdict_runs (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        cursor INTEGER NOT NULL,
+        full INTEGER NOT NULL,
+        evaluated INTEGER NOT NULL,
+        computed_at TEXT NOT NULL
+    )
+"""
+
+WINDOWS = (30, 60, 90)
+VERDICTS = ('genuine', 'inflated', 'fictitious', 'unverified')
+# Slack for rounding in "$X off" claims
+TOLERANCE = 0.02
+BATCH_SIZE = 5000
+
+COLUMNS = ('price_id', 'product_id', 'retailer_id', 'timestamp', 'price', 'advertised_savings',
+           'claimed_was', 'median_30d', 'median_60d', 'median_90d', 'mode_30d', 'mode_60d',
+           'mode_90d', 'reference_price', 'actual_savings', 'verdict', 'computed_at')
+
+
+def classify(price: float, savings: float, reference: Optional[float]) -> str:
+    """Verdict for a claim of `savings` off `price`, given the reference price."""
+    if reference is None:
+        return 'unverified'
+    if price >= reference * (1 - TOLERANCE):
+        return 'fictitious'
+    if price + savings <= reference * (1 + TOLERANCE):
+        return 'genuine'
+    return 'inflated'
+
+
+@lru_cache(maxsize=4096)
+def _day(timestamp_date: str) -> int:
+    return date.fromisoformat(timestamp_date).toordinal()
+
+
+def _mode(values: List[float]) -> float:
+    """Most frequent value; ties go to the higher price."""
+    return max(Counter(values).items(), key=lambda item: (item[1], item[0]))[0]
+
+
+class _Series:
+    """One product × retailer history as daily closes, for trailing windows."""
+
+    def __init__(self, rows: List[tuple]):
+        self.first_day = None
+        self.filled: List[float] = []
+        self._references: Dict[int, tuple] = {}
+        last_day = None
+        for row in rows:
+            day = _day(row[4][:10])
+            if last_day is None:
+                self.first_day = day
+            elif day > last_day:
+                # Carry the previous close over days without observations
+                self.filled.extend(repeat(self.filled[-1], day - last_day - 1))
+            if day == last_day:
+                self.filled[-1] = row[3]
+            else:
+                self.filled.append(row[3])
+            last_day = day
+
+    def references(self, day: int) -> tuple:
+        """(median_30d, median_60d, median_90d, mode_30d, ...) before `day`."""
+        cached = self._references.get(day)
+        if cached is None:
+            end = day - self.first_day
+            medians, modes = [], []
+            for window in WINDOWS:
+                values = self.filled[max(0, end - window):end]
+                medians.append(median(values) if values else None)
+                modes.append(_mode(values) if values else None)
+            cached = self._references[day] = tuple(medians + modes)
+        return cached
+
+
+def evaluate_series(rows: List[tuple], since: Optional[str] = None,
+                    computed_at: str = '') -> Iterator[tuple]:
+    """
+    Verdicts for one series' claims.
+
+    Args:
+        rows: The series' rows in history_blocks.ROW_COLUMNS order, by timestamp
+        since: Only claims at or after this timestamp
+        computed_at: Stored with each verdict
+
+    Yields:
+        Tuples in COLUMNS order
+    """
+    series = None
+    for row in rows:
+        savings = row[7]
+        if not savings or savings <= 0 or (since is not None and row[4] < since):
+            continue
+        if series is None:
+            series = _Series(rows)
+        price = row[3]
+        references = series.references(_day(row[4][:10]))
+        known = [value for value in references if value is not None]
+        reference = max(known) if known else None
+        yield (row[0], row[1], row[2], row[4], price, savings, round(price + savings, 2),
+               *references, reference,
+               round(reference - price, 2) if reference is not None else None,
+               classify(price, savings, reference), computed_at)
+
+
+def _iter_series_rows(rows: Iterable[tuple]) -> Iterator[List[tuple]]:
+    """Group rows ordered by product, retailer and timestamp into series."""
+    current = []
+    for row in rows:
+        if current and (row[1], row[2]) != (current[0][1], current[0][2]):
+            yield current
+            current = []
+        current.append(row)
+    if current:
+        yield current
+
+
+def last_run_cursor(conn: sqlite3.Connection) -> Optional[int]:
+    """Price cursor of the last refresh (None before the first)."""
+    row = conn.execute("SELECT cursor FROM sale_verdict_runs ORDER BY id DESC LIMIT 1").fetchone()
+    return row[0] if row else None
+
+
+def changed_series(conn: sqlite3.Connection, since: int) -> Dict[Tuple[str, str], str]:
+    """Series with rows above a cursor, mapped to their earliest new timestamp."""
+    cursor = conn.cursor()
+    cursor.row_factory = None
+    cursor.execute("""
+        SELECT product_id, retailer_id, MIN(timestamp) FROM price_history
+        WHERE id > ? GROUP BY product_id, retailer_id
+        UNION ALL
+        SELECT product_id, retailer_id, first_timestamp FROM price_history_blocks
+        WHERE last_id > ?
+    """, (since, since))
+    changed = {}
+    for product_id, retailer_id, timestamp in cursor:
+        key = (product_id, retailer_id)
+        if key not in changed or timestamp < changed[key]:
+            changed[key] = timestamp
+    return changed
+
+
+def refresh_verdicts(conn: sqlite3.Connection, full: bool = False) -> dict:
+    """
+    Check claims added since the last refresh (or all claims).
+
+    Args:
+        conn: Writable database connection
+        full: Re-check all history instead of only changed series
+
+    Returns:
+        Summary dict with 'evaluated', 'verdicts' (count per verdict),
+        'full' and 'seconds'
+    """
+    started = time.perf_counter()
+    computed_at = datetime.now().isoformat()
+    cursor = latest_cursor(conn)
+    previous = last_run_cursor(conn)
+    full = full or previous is None
+
+    if full:
+        changed = None
+        groups = _iter_series_rows(iter_history_rows(conn, all_columns=True))
+    else:
+        changed = changed_series(conn, previous)
+        product_ids = sorted({product_id for product_id, _ in changed})
+        groups = (series for product_id in product_ids
+                  for series in _iter_series_rows(iter_history_rows(conn, product_id, all_columns=True))
+                  if (series[0][1], series[0][2]) in changed)
+
+    insert = f"""
+        INSERT OR REPLACE INTO sale_verdicts ({', '.join(COLUMNS)})
+        VALUES ({', '.join('?' * len(COLUMNS))})
+    """
+    counts = Counter()
+    batch = []
+    for rows in groups:
+        since = changed[(rows[0][1], rows[0][2])] if changed is not None else None
+        for record in evaluate_series(rows, since, computed_at):
+            batch.append(record)
+            counts[record[-2]] += 1
+            if len(batch) >= BATCH_SIZE:
+                conn.executemany(insert, batch)
+                conn.commit()
+                batch.clear()
+    conn.executemany(insert, batch)
+    if full:
+        # Claims whose rows no longer exist
+        conn.execute("DELETE FROM sale_verdicts WHERE computed_at != ?", (computed_at,))
+
+    evaluated = sum(counts.values())
+    if full or evaluated or cursor != previous:
+        conn.execute("""
+            INSERT INTO sale_verdict_runs (cursor, full, evaluated, computed_at)
+            VALUES (?, ?, ?, ?)
+        """, (cursor, int(full), evaluated, computed_at))
+    conn.commit()
+
+    return {
+        'evaluated': evaluated,
+        'verdicts': {verdict: counts[verdict] for verdict in VERDICTS},
+        'full': full,
+        'seconds': time.perf_counter() - started,
+    }
+
+
+def latest_verdicts(conn: sqlite3.Connection,
+                    product_id: Optional[str] = None) -> Dict[str, Dict[str, dict]]:
+    """
+    Each series' most recent checked claim, for dashboard payloads.
+
+    Returns:
+        {product_id: {retailer_id: {'timestamp', 'price',
+        'advertisedSavings', 'claimedWas', 'referencePrice', 'verdict'}}}
+    """
+    where = "WHERE product_id = ?" if product_id is not None else ""
+    cursor = conn.cursor()
+    cursor.row_factory = None
+    # SQLite returns the bare columns from the row holding MAX(timestamp)
+    cursor.execute(f"""
+        SELECT product_id, retailer_id, MAX(timestamp), price, advertised_savings,
+               claimed_was, reference_price, verdict
+        FROM sale_verdicts {where}
+        GROUP BY product_id, retailer_id
+    """, (product_id,) if product_id is not None else ())
+    verdicts = {}
+    for product, retailer, timestamp, price, savings, was, reference, verdict in cursor:
+        verdicts.setdefault(product, {})[retailer] = {
+            'timestamp': timestamp,
+            'price': price,
+            'advertisedSavings': savings,
+            'claimedWas': was,
+            'referencePrice': reference,
+            'verdict': verdict,
+        }
+    return verdicts
+
+
+def main():
+    """CLI entry point."""
+    from src.database import PriceDatabase
+
+    command = sys.argv[1] if len(sys.argv) > 1 else 'refresh'
+    if command not in ('refresh', 'full'):
+        print("Usage: python -m src.fake_sales [refresh|full] [db_path]")
+        return
+    db = PriceDatabase(sys.argv[2] if len(sys.argv) > 2 else "data/prices.db")
+    summary = refresh_verdicts(db.conn, command == 'full')
+    db.close()
+    counts = ', '.join(f"{n} {verdict}" for verdict, n in summary['verdicts'].items())
+    print(f"✓ Checked {summary['evaluated']} advertised discount(s) in {summary['seconds']:.2f}s"
+          f" ({counts})")
+
+
+if __name__ == "__main__":
+    main()
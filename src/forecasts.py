@@ -0,0 +1,433 @@
+"""
+"Buy now or wait?" forecasts per product × retailer.
+
+Each series has a small model, updated one daily close at a time (days
+without observations carry the previous close forward, as in
+src/analytics.py):
+
+    Trend          Damped Holt smoothing of the daily close (level ALPHA,
+                   trend BETA, damping PHI); the expected price H days out
+                   is level + damped trend, scaled by the seasonal ratio
+                   between the target month and today's month from
+                   series_seasonality (see src/seasonality.py).
+    Lower price    Survival-style counts: for every past day, whether a
+                   price more than TOLERANCE below it appeared within H
+                   days. Days are grouped by price position (below, near
+                   or above their trailing 30-day mean), and the chance of
+                   a lower price is the Laplace-smoothed share for today's
+                   group.
+    Accuracy       Each day's forecasts are kept until their target day
+                   arrives and then scored: mean absolute error and MAPE
+                   for the expected price, Brier score for the chance of a
+                   lower price.
+
+The recommendation for a horizon is 'wait' when a lower price within it is
+at least WAIT_PROBABILITY likely, 'buy' otherwise.
+
+Model state is stored in forecast_models, so a refresh only applies the
+days that arrived since the last one; a series is refit from scratch only
+when rows land on days its model has already settled (backfills). The
+last observed day stays unsettled, since later collection runs may still
+change its close. Current forecasts and accuracy are written to
+price_forecasts, and each refresh is logged in forecast_runs.
+
+Usage:
+    python -m src.forecasts refresh [db_path]   # update changed series
+    python -m src.forecasts full [db_path]      # refit every series
+    python -m src.forecasts bench [count]       # fit synthetic series
+"""
+import json
+import sqlite3
+import sys
+import time
+from datetime import date, datetime
+from functools import lru_cache
+from itertools import chain
+from typing import Dict, List, Optional, Tuple
+
+from src.analytics import changed_products, fill_days, iter_daily_series, synthetic_series
+from src.fake_sales import changed_series
+from src.history_blocks import iter_history_rows, latest_cursor
+
+CREATE_MODELS_TABLE = """
+    CREATE TABLE IF NOT EXISTS forecast_models (
+        product_id TEXT NOT NULL,
+        retailer_id TEXT NOT NULL,
+        first_day TEXT NOT NULL,
+        settled_day TEXT NOT NULL,
+        state TEXT NOT NULL,
+        computed_at TEXT NOT NULL,
+        PRIMARY KEY (product_id, retailer_id)
+    )
+"""
+
+CREATE_FORECASTS_TABLE = """
+    CREATE TABLE IF NOT EXISTS price_forecasts (
+        product_id TEXT NOT NULL,
+        retailer_id TEXT NOT NULL,
+        horizon INTEGER NOT NULL,
+        as_of TEXT NOT NULL,
+        current_price REAL NOT NULL,
+        expected_price REAL NOT NULL,
+        p_lower REAL NOT NULL,
+        recommendation TEXT NOT NULL,
+        evaluated INTEGER NOT NULL,
+        mae REAL,
+        mape REAL,
+        brier REAL,
+        computed_at TEXT NOT NULL,
+        PRIMARY KEY (product_id, retailer_id, horizon)
+    )
+"""
+
+CREATE_RUNS_TABLE = """
+    CREATE TABLE IF NOT EXISTS forecast_runs (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        cursor INTEGER NOT NULL,
+        full INTEGER NOT NULL,
+        series INTEGER NOT NULL,
+        refits INTEGER NOT NULL,
+        computed_at TEXT NOT NULL
+    )
+"""
+
+HORIZONS = (7, 30, 60)
+ALPHA = 0.1
+BETA = 0.02
+PHI = 0.98
+# A later price counts as lower when it is at least 1% below
+TOLERANCE = 0.01
+# Price position relative to the trailing mean: below, near or above
+POSITION_WINDOW = 30
+POSITION_BAND = 0.02
+WAIT_PROBABILITY = 0.6
+RECOMMENDATIONS = ('buy', 'wait')
+BATCH_SIZE = 1000
+
+# Closes kept in the model: enough to resolve the longest horizon and the
+# trailing mean
+TAIL = max(max(HORIZONS), POSITION_WINDOW) + 1
+# Sum of PHI^k for k = 1..h: how much of the trend a damped forecast adds
+DAMPING = {h: sum(PHI ** k for k in range(1, h + 1)) for h in HORIZONS}
+
+COLUMNS = ('product_id', 'retailer_id', 'horizon', 'as_of', 'current_price', 'expected_price',
+           'p_lower', 'recommendation', 'evaluated', 'mae', 'mape', 'brier', 'computed_at')
+
+
+@lru_cache(maxsize=4096)
+def _month(day: int) -> int:
+    return date.fromordinal(day).month
+
+
+def _seasonal_factors(day: int, month_index: List[Optional[float]]) -> List[float]:
+    """Ratio of the target month's seasonal index to `day`'s, per horizon."""
+    now = month_index[_month(day) - 1]
+    factors = []
+    for horizon in HORIZONS:
+        then = month_index[_month(day + horizon) - 1]
+        factors.append(then / now if now and then else 1.0)
+    return factors
+
+
+class Model:
+    """Incrementally updated forecast state of one daily series."""
+    __slots__ = ('first_day', 'settled_day', 'level', 'trend', 'closes', 'positions',
+                 'issued', 'counts', 'scores')
+
+    def __init__(self, first_day: int):
+        self.first_day = first_day
+        self.settled_day = first_day - 1
+        self.level: Optional[float] = None
+        self.trend = 0.0
+        # Last TAIL days: close, price position and the forecasts issued that
+        # day ([expected price, events, exposures] per horizon)
+        self.closes: List[float] = []
+        self.positions: List[int] = []
+        self.issued: List[list] = []
+        # [events, exposures] per position and horizon
+        self.counts = [[[0, 0] for _ in HORIZONS] for _ in range(3)]
+        # [scored, abs error, abs % error, squared probability error] per horizon
+        self.scores = [[0, 0.0, 0.0, 0.0] for _ in HORIZONS]
+
+    def advance(self, closes: List[float], month_index: Optional[List[Optional[float]]] = None):
+        """Apply consecutive daily closes, starting the day after settled_day."""
+        tail, positions, issued, counts, scores = (self.closes, self.positions, self.issued,
+                                                   self.counts, self.scores)
+        level, trend, day = self.level, self.trend, self.settled_day
+        horizons = list(enumerate(HORIZONS))
+        damping = [DAMPING[h] for h in HORIZONS]
+        for close in closes:
+            day += 1
+            n = len(tail)
+
+            # Resolve the windows (and score the forecasts) that end today
+            for i, horizon in horizons:
+                if n < horizon:
+                    break
+                origin = n - horizon
+                threshold = tail[origin] * (1 - TOLERANCE)
+                lower = close < threshold or (horizon > 1 and min(tail[origin + 1:]) < threshold)
+                window = counts[positions[origin]][i]
+                window[0] += lower
+                window[1] += 1
+                expected, events, exposures = issued[origin][i]
+                error = abs(expected - close)
+                score = scores[i]
+                score[0] += 1
+                score[1] += error
+                score[2] += error / close
+                score[3] += ((events + 1) / (exposures + 2) - lower) ** 2
+
+            if level is None:
+                level = close
+            else:
+                previous = level
+                level = ALPHA * close + (1 - ALPHA) * (previous + PHI * trend)
+                trend = BETA * (level - previous) + (1 - BETA) * PHI * trend
+
+            recent = tail[1 - POSITION_WINDOW:]
+            ratio = close * (len(recent) + 1) / (sum(recent) + close)
+            position = 0 if ratio <= 1 - POSITION_BAND else 2 if ratio >= 1 + POSITION_BAND else 1
+
+            # Today's forecasts per horizon: expected price and the lower-price
+            # counts behind its probability
+            seasonal = _seasonal_factors(day, month_index) if month_index is not None else None
+            today = []
+            for i, horizon in horizons:
+                expected = level + trend * damping[i]
+                if seasonal is not None:
+                    expected *= seasonal[i]
+                today.append([round(expected, 4), *counts[position][i]])
+
+            tail.append(close)
+            positions.append(position)
+            issued.append(today)
+            if n >= TAIL:
+                del tail[0], positions[0], issued[0]
+        self.level, self.trend, self.settled_day = level, trend, day
+
+    def latest(self) -> List[Tuple[float, float]]:
+        """(expected price, chance of a lower price) per horizon, from the last day applied."""
+        return [(expected, round((events + 1) / (exposures + 2), 4))
+                for expected, events, exposures in self.issued[-1]]
+
+    def accuracy(self) -> List[Tuple[int, Optional[float], Optional[float], Optional[float]]]:
+        """(scored, MAE, MAPE, Brier score) per horizon."""
+        return [(n, round(abs_error / n, 4), round(pct_error / n, 4), round(brier / n, 4)) if n
+                else (0, None, None, None)
+                for n, abs_error, pct_error, brier in self.scores]
+
+    def copy(self) -> 'Model':
+        model = Model.__new__(Model)
+        model.first_day, model.settled_day = self.first_day, self.settled_day
+        model.level, model.trend = self.level, self.trend
+        model.closes, model.positions, model.issued = list(self.closes), list(self.positions), list(self.issued)
+        model.counts = [[list(c) for c in by_horizon] for by_horizon in self.counts]
+        model.scores = [list(s) for s in self.scores]
+        return model
+
+    def dumps(self) -> str:
+        return json.dumps([self.level, self.trend, self.closes, self.positions, self.issued,
+                           self.counts, self.scores], separators=(',', ':'))
+
+    @classmethod
+    def loads(cls, first_day: int, settled_day: int, state: str) -> 'Model':
+        model = cls(first_day)
+        model.settled_day = settled_day
+        (model.level, model.trend, model.closes, model.positions, model.issued,
+         model.counts, model.scores) = json.loads(state)
+        return model
+
+
+def update_model(model: Optional[Model], days: List[int], closes: List[float],
+                 month_index: Optional[List[Optional[float]]] = None) -> Tuple[Model, Model, bool]:
+    """
+    Bring a series' model up to date with its observations.
+
+    Args:
+        model: Stored model, or None
+        days: Day ordinals with observations (see analytics.iter_daily_series)
+        closes: Closing price of each of those days
+        month_index: Seasonal month profile of the series, if any
+
+    Returns:
+        (settled model through the day before the last observation, model
+        including the last day for current forecasts, whether it was refit)
+    """
+    refit = model is None or model.first_day != days[0] or model.settled_day >= days[-1]
+    if refit:
+        model = Model(days[0])
+    filled = fill_days(days, closes)
+    model.advance(filled[model.settled_day + 1 - days[0]:-1], month_index)
+    current = model.copy()
+    current.advance(filled[-1:], month_index)
+    return model, current, refit
+
+
+# ---------------------------------------------------------------------------
+# Storage
+# ---------------------------------------------------------------------------
+
+def last_run_cursor(conn: sqlite3.Connection) -> Optional[int]:
+    """Price cursor of the last refresh (None before the first)."""
+    row = conn.execute("SELECT cursor FROM forecast_runs ORDER BY id DESC LIMIT 1").fetchone()
+    return row[0] if row else None
+
+
+def forecast_version(conn: sqlite3.Connection) -> str:
+    """Fingerprint of the forecasts, for response caching."""
+    row = conn.execute("SELECT MAX(id) FROM forecast_runs").fetchone()
+    return str(row[0] or 0)
+
+
+def _backfilled(conn: sqlite3.Connection, since: int) -> Dict[Tuple[str, str], int]:
+    """Earliest new observation day per series with rows above a cursor."""
+    return {key: date.fromisoformat(timestamp[:10]).toordinal()
+            for key, timestamp in changed_series(conn, since).items()}
+
+
+def _stored_models(conn: sqlite3.Connection, product_id: str) -> Dict[str, Model]:
+    cursor = conn.cursor()
+    cursor.row_factory = None
+    cursor.execute("""
+        SELECT retailer_id, first_day, settled_day, state FROM forecast_models WHERE product_id = ?
+    """, (product_id,))
+    return {retailer_id: Model.loads(date.fromisoformat(first).toordinal(),
+                                     date.fromisoformat(settled).toordinal(), state)
+            for retailer_id, first, settled, state in cursor}
+
+
+def _month_indexes(conn: sqlite3.Connection) -> Dict[Tuple[str, str], list]:
+    cursor = conn.cursor()
+    cursor.row_factory = None
+    cursor.execute("SELECT product_id, retailer_id, month_index FROM series_seasonality")
+    return {(product_id, retailer_id): json.loads(index) for product_id, retailer_id, index in cursor}
+
+
+def refresh_forecasts(conn: sqlite3.Connection, full: bool = False) -> dict:
+    """
+    Update forecasts for series with new data (or refit all series).
+
+    Args:
+        conn: Writable database connection
+        full: Refit every series from scratch
+
+    Returns:
+        Summary dict with 'series', 'refits', 'full' and 'seconds'
+    """
+    started = time.perf_counter()
+    computed_at = datetime.now().isoformat()
+    cursor = latest_cursor(conn)
+    previous = last_run_cursor(conn)
+    full = full or previous is None
+
+    if full:
+        product_ids = None
+        new_days = {}
+        rows = iter_history_rows(conn)
+    else:
+        product_ids = changed_products(conn, previous)
+        new_days = _backfilled(conn, previous)
+        rows = chain.from_iterable(iter_history_rows(conn, pid) for pid in product_ids)
+    month_indexes = _month_indexes(conn)
+
+    insert_model = """
+        INSERT OR REPLACE INTO forecast_models
+            (product_id, retailer_id, first_day, settled_day, state, computed_at)
+        VALUES (?, ?, ?, ?, ?, ?)
+    """
+    insert_forecast = f"""
+        INSERT OR REPLACE INTO price_forecasts ({', '.join(COLUMNS)})
+        VALUES ({', '.join('?' * len(COLUMNS))})
+    """
+    written = refits = 0
+    models, forecasts = [], []
+    stored: Dict[str, Model] = {}
+    stored_product = None
+    for product_id, retailer_id, (days, closes) in iter_daily_series(rows):
+        model = None
+        if not full:
+            if product_id != stored_product:
+                stored, stored_product = _stored_models(conn, product_id), product_id
+            model = stored.get(retailer_id)
+            new_day = new_days.get((product_id, retailer_id))
+            if model is not None and new_day is not None and new_day <= model.settled_day:
+                model = None
+        model, current, refit = update_model(model, days, closes,
+                                             month_indexes.get((product_id, retailer_id)))
+        refits += refit
+        models.append((product_id, retailer_id, date.fromordinal(model.first_day).isoformat(),
+                       date.fromordinal(model.settled_day).isoformat(), model.dumps(), computed_at))
+        as_of = date.fromordinal(days[-1]).isoformat()
+        for horizon, (expected, p_lower), accuracy in zip(HORIZONS, current.latest(), model.accuracy()):
+            recommendation = 'wait' if p_lower >= WAIT_PROBABILITY else 'buy'
+            forecasts.append((product_id, retailer_id, horizon, as_of, closes[-1], expected, p_lower,
+                              recommendation, *accuracy, computed_at))
+        if len(models) >= BATCH_SIZE:
+            conn.executemany(insert_model, models)
+            conn.executemany(insert_forecast, forecasts)
+            conn.commit()
+            written += len(models)
+            models.clear()
+            forecasts.clear()
+    conn.executemany(insert_model, models)
+    conn.executemany(insert_forecast, forecasts)
+    written += len(models)
+
+    # Drop series that no longer have any rows
+    for table in ('forecast_models', 'price_forecasts'):
+        if product_ids is None:
+            conn.execute(f"DELETE FROM {table} WHERE computed_at != ?", (computed_at,))
+        else:
+            for product_id in product_ids:
+                conn.execute(f"DELETE FROM {table} WHERE product_id = ? AND computed_at != ?",
+                             (product_id, computed_at))
+
+    if full or written or cursor != previous:
+        conn.execute("""
+            INSERT INTO forecast_runs (cursor, full, series, refits, computed_at)
+            VALUES (?, ?, ?, ?, ?)
+        """, (cursor, int(full), written, refits, computed_at))
+    conn.commit()
+
+    return {
+        'series': written,
+        'refits': refits,
+        'full': full,
+        'seconds': time.perf_counter() - started,
+    }
+
+
+def main():
+    """CLI entry point."""
+    command = sys.argv[1] if len(sys.argv) > 1 else 'refresh'
+    if command == 'bench':
+        count = int(sys.argv[2]) if len(sys.argv) > 2 else 5000
+        batch = synthetic_series(count, 365)
+        started = time.perf_counter()
+        models = [update_model(None, days[:-1], closes[:-1])[0] for days, closes in batch]
+        fit = time.perf_counter() - started
+        started = time.perf_counter()
+        for model, (days, closes) in zip(models, batch):
+            update_model(model, days, closes)
+        update = time.perf_counter() - started
+        print(f"{count:,} series × 365 observations")
+        print(f"  full fit:      {fit:6.2f}s ({count / fit:,.0f} series/s)")
+        print(f"  one-day update: {update:6.2f}s ({count / update:,.0f} series/s)")
+        return
+    if command not in ('refresh', 'full'):
+        print("Usage: python -m src.forecasts [refresh|full|bench] [db_path|count]")
+        return
+
+    from src.database import PriceDatabase
+
+    db = PriceDatabase(sys.argv[2] if len(sys.argv) > 2 else "data/prices.db")
+    summary = refresh_forecasts(db.conn, command == 'full')
+    db.close()
+    kind = "full" if summary['full'] else "incremental"
+    print(f"✓ Forecasts ({kind}): {summary['series']:,} series updated, {summary['refits']:,} refit, "
+          f"in {summary['seconds']:.2f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,556 @@
+"""
+Compressed monthly storage for price history.
+
+Once a month is over, the rows for each product × retailer in that month can
+be sealed into a single block: a zlib-compressed blob holding delta-encoded
+row ids, timestamps and prices (in cents), plus a small URL dictionary.
+The current month always stays in the regular price_history table.
+
+Sealing is lossless - decoding a block yields exactly the rows that went in,
+and rows that can't be reproduced exactly (prices with fractional cents,
+non-canonical timestamps) are simply left in the row table. Per-unit prices
+(see src/units.py) are derived from price, pack_size and the product's
+quantity, so a block stores that quantity once and decoding recomputes each
+row's unit_price bit for bit. Version 1 blocks, from before unit prices,
+decode with unit_price None.
+
+Sealing frees the moved rows' pages; with incremental auto_vacuum (the
+default for new databases, see vacuum()) they are handed back to the
+filesystem after each seal.
+
+Usage:
+    python -m src.history_blocks seal      # seal all completed months
+    python -m src.history_blocks stats     # show block/row counts
+    python -m src.history_blocks vacuum    # switch to incremental auto_vacuum
+"""
+import heapq
+import sqlite3
+import struct
+import sys
+import zlib
+from datetime import datetime, timedelta
+from typing import Iterable, Iterator, List, Optional, Tuple
+
+FORMAT_VERSION = 2
+EPOCH = datetime(1970, 1, 1)
+ONE_MICROSECOND = timedelta(microseconds=1)
+
+# Column order shared by price_history rows and decoded block rows
+ROW_COLUMNS = ('id', 'product_id', 'retailer_id', 'price', 'timestamp',
+               'url', 'pack_size', 'advertised_savings', 'unit_price')
+
+CREATE_BLOCKS_TABLE = """
+    CREATE TABLE IF NOT EXISTS price_history_blocks (
+        product_id TEXT NOT NULL,
+        retailer_id TEXT NOT NULL,
+        month TEXT NOT NULL,
+        row_count INTEGER NOT NULL,
+        first_id INTEGER NOT NULL,
+        last_id INTEGER NOT NULL,
+        first_timestamp TEXT NOT NULL,
+        last_timestamp TEXT NOT NULL,
+        min_price REAL NOT NULL,
+        max_price REAL NOT NULL,
+        sum_price REAL NOT NULL,
+        payload BLOB NOT NULL,
+        PRIMARY KEY (product_id, retailer_id, month)
+    )
+"""
+
+
+# ---------------------------------------------------------------------------
+# Varint helpers
+# ---------------------------------------------------------------------------
+
+def _zigzag(value: int) -> int:
+    return (value << 1) if value >= 0 else ((-value << 1) - 1)
+
+
+def _unzigzag(value: int) -> int:
+    return (value >> 1) if not value & 1 else -((value + 1) >> 1)
+
+
+def _write_varint(out: bytearray, value: int):
+    while value > 0x7F:
+        out.append((value & 0x7F) | 0x80)
+        value >>= 7
+    out.append(value)
+
+
+def _read_varint(data: bytes, pos: int) -> Tuple[int, int]:
+    result = 0
+    shift = 0
+    while True:
+        byte = data[pos]
+        pos += 1
+        result |= (byte & 0x7F) << shift
+        if not byte & 0x80:
+            return result, pos
+        shift += 7
+
+
+def _write_deltas(out: bytearray, values: List[int]):
+    previous = 0
+    for value in values:
+        _write_varint(out, _zigzag(value - previous))
+        previous = value
+
+
+def _read_deltas(data: bytes, pos: int, count: int) -> Tuple[List[int], int]:
+    values = []
+    previous = 0
+    for _ in range(count):
+        delta, pos = _read_varint(data, pos)
+        previous += _unzigzag(delta)
+        values.append(previous)
+    return values, pos
+
+
+# ---------------------------------------------------------------------------
+# Value conversions
+# ---------------------------------------------------------------------------
+
+def _to_cents(value: float) -> Optional[int]:
+    """Convert a price to integer cents, or None if that would lose precision."""
+    cents = round(value * 100)
+    return cents if cents / 100 == value else None
+
+
+def _to_micros(timestamp: str) -> Optional[int]:
+    """Convert an ISO timestamp to epoch microseconds, or None if not reversible."""
+    try:
+        dt = datetime.fromisoformat(timestamp)
+    except (TypeError, ValueError):
+        return None
+    if dt.tzinfo is not None or dt.isoformat() != timestamp:
+        return None
+    return (dt - EPOCH) // ONE_MICROSECOND
+
+
+def _from_micros(micros: int) -> str:
+    return (EPOCH + timedelta(microseconds=micros)).isoformat()
+
+
+def unit_price(price: float, pack_size: int, quantity: Optional[float]) -> Optional[float]:
+    """Per-unit price as price_history stores it (NULL for an unknown size)."""
+    if not quantity or not pack_size:
+        return None
+    return price / (pack_size * quantity)
+
+
+def can_encode(row, quantity: Optional[float] = None) -> bool:
+    """
+    Check whether a price_history row survives a block round trip exactly.
+
+    Args:
+        row: Mapping with the ROW_COLUMNS keys
+        quantity: The product's quantity, from which unit_price is rebuilt
+    """
+    if _to_cents(row['price']) is None or _to_micros(row['timestamp']) is None:
+        return False
+    if row['unit_price'] != unit_price(row['price'], row['pack_size'], quantity):
+        return False
+    if row['advertised_savings'] is not None and _to_cents(row['advertised_savings']) is None:
+        return False
+    pack_size = row['pack_size']
+    return isinstance(pack_size, int) and pack_size >= 0 and isinstance(row['url'], str)
+
+
+# ---------------------------------------------------------------------------
+# Block codec
+# ---------------------------------------------------------------------------
+
+def encode_block(rows: List, quantity: Optional[float] = None) -> bytes:
+    """
+    Encode price_history rows for one product × retailer into a block payload.
+
+    Args:
+        rows: Rows (sqlite3.Row or tuples in ROW_COLUMNS order) sorted by
+              timestamp, all passing can_encode() with this quantity
+        quantity: The product's quantity (None if its size is unknown)
+
+    Returns:
+        Compressed payload bytes
+    """
+    urls = []
+    url_index = {}
+    for row in rows:
+        if row[5] not in url_index:
+            url_index[row[5]] = len(urls)
+            urls.append(row[5])
+
+    out = bytearray()
+    _write_varint(out, FORMAT_VERSION)
+    _write_varint(out, len(rows))
+    _write_varint(out, 0 if quantity is None else 1)
+    if quantity is not None:
+        out.extend(struct.pack('<d', quantity))
+
+    _write_varint(out, len(urls))
+    for url in urls:
+        encoded = url.encode('utf-8')
+        _write_varint(out, len(encoded))
+        out.extend(encoded)
+
+    _write_deltas(out, [row[0] for row in rows])
+    _write_deltas(out, [_to_micros(row[4]) for row in rows])
+    _write_deltas(out, [_to_cents(row[3]) for row in rows])
+    for row in rows:
+        _write_varint(out, row[6])
+    for row in rows:
+        savings = row[7]
+        _write_varint(out, 0 if savings is None else _zigzag(_to_cents(savings)) + 1)
+    for row in rows:
+        _write_varint(out, url_index[row[5]])
+
+    return zlib.compress(bytes(out), 9)
+
+
+def decode_block(product_id: str, retailer_id: str, payload: bytes) -> List[tuple]:
+    """
+    Decode a block payload back into price_history rows.
+
+    Returns:
+        List of tuples in ROW_COLUMNS order, in timestamp order
+    """
+    data = zlib.decompress(payload)
+    version, pos = _read_varint(data, 0)
+    if version not in (1, FORMAT_VERSION):
+        raise ValueError(f"Unsupported history block version: {version}")
+    count, pos = _read_varint(data, pos)
+    quantity = None
+    if version >= 2:
+        has_quantity, pos = _read_varint(data, pos)
+        if has_quantity:
+            quantity = struct.unpack_from('<d', data, pos)[0]
+            pos += 8
+
+    url_count, pos = _read_varint(data, pos)
+    urls = []
+    for _ in range(url_count):
+        length, pos = _read_varint(data, pos)
+        urls.append(data[pos:pos + length].decode('utf-8'))
+        pos += length
+
+    ids, pos = _read_deltas(data, pos, count)
+    micros, pos = _read_deltas(data, pos, count)
+    cents, pos = _read_deltas(data, pos, count)
+
+    pack_sizes = []
+    for _ in range(count):
+        value, pos = _read_varint(data, pos)
+        pack_sizes.append(value)
+
+    savings = []
+    for _ in range(count):
+        value, pos = _read_varint(data, pos)
+        savings.append(None if value == 0 else _unzigzag(value - 1) / 100)
+
+    url_ids = []
+    for _ in range(count):
+        value, pos = _read_varint(data, pos)
+        url_ids.append(value)
+
+    return [
+        (ids[i], product_id, retailer_id, cents[i] / 100, _from_micros(micros[i]),
+         urls[url_ids[i]], pack_sizes[i], savings[i],
+         unit_price(cents[i] / 100, pack_sizes[i], quantity))
+        for i in range(count)
+    ]
+
+
+# ---------------------------------------------------------------------------
+# Storage operations
+# ---------------------------------------------------------------------------
+
+def _sort_key(row):
+    return (row[4], row[0])
+
+
+def _store_block(cursor: sqlite3.Cursor, product_id: str, retailer_id: str,
+                 month: str, rows: List, quantity: Optional[float]):
+    prices = [row[3] for row in rows]
+    cursor.execute("""
+        INSERT OR REPLACE INTO price_history_blocks
+        (product_id, retailer_id, month, row_count, first_id, last_id,
+         first_timestamp, last_timestamp, min_price, max_price, sum_price, payload)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+    """, (
+        product_id,
+        retailer_id,
+        month,
+        len(rows),
+        min(row[0] for row in rows),
+        max(row[0] for row in rows),
+        rows[0][4],
+        rows[-1][4],
+        min(prices),
+        max(prices),
+        sum(prices),
+        encode_block(rows, quantity)
+    ))
+
+
+def seal_completed_months(conn: sqlite3.Connection,
+                          before_month: Optional[str] = None) -> dict:
+    """
+    Move completed months from price_history into compressed blocks.
+
+    Args:
+        conn: Open database connection
+        before_month: Seal months strictly before this 'YYYY-MM' (defaults
+                      to the current month)
+
+    Returns:
+        Summary dict with counts of sealed blocks, moved and skipped rows
+    """
+    before_month = before_month or datetime.now().strftime('%Y-%m')
+    conn.execute(CREATE_BLOCKS_TABLE)
+    cursor = conn.cursor()
+
+    cursor.execute("""
+        SELECT DISTINCT product_id, retailer_id, substr(timestamp, 1, 7) AS month
+        FROM price_history
+        WHERE substr(timestamp, 1, 7) < ?
+        ORDER BY product_id, retailer_id, month
+    """, (before_month,))
+    groups = cursor.fetchall()
+
+    summary = {'blocks': 0, 'rows_moved': 0, 'rows_skipped': 0}
+
+    for product_id, retailer_id, month in groups:
+        cursor.execute(f"""
+            SELECT {', '.join(ROW_COLUMNS)}
+            FROM price_history
+            WHERE product_id = ? AND retailer_id = ? AND substr(timestamp, 1, 7) = ?
+            ORDER BY timestamp, id
+        """, (product_id, retailer_id, month))
+        rows = cursor.fetchall()
+        quantity = _quantity(cursor, product_id)
+
+        if not all(can_encode(dict(zip(ROW_COLUMNS, row)), quantity) for row in rows):
+            summary['rows_skipped'] += len(rows)
+            continue
+
+        # Late rows for an already-sealed month are merged into its block
+        cursor.execute("""
+            SELECT payload FROM price_history_blocks
+            WHERE product_id = ? AND retailer_id = ? AND month = ?
+        """, (product_id, retailer_id, month))
+        existing = cursor.fetchone()
+        merged = [tuple(row) for row in rows]
+        if existing:
+            merged.extend(decode_block(product_id, retailer_id, existing[0]))
+        merged.sort(key=_sort_key)
+
+        _store_block(cursor, product_id, retailer_id, month, merged, quantity)
+        cursor.executemany("DELETE FROM price_history WHERE id = ?",
+                           [(row[0],) for row in rows])
+        conn.commit()
+
+        summary['blocks'] += 1
+        summary['rows_moved'] += len(rows)
+
+    if summary['rows_moved']:
+        # A no-op unless auto_vacuum is incremental. executescript() steps
+        # the pragma to completion; execute() would free a single page
+        conn.executescript("PRAGMA incremental_vacuum;")
+    return summary
+
+
+def _quantity(cursor: sqlite3.Cursor, product_id: str) -> Optional[float]:
+    row = cursor.execute("SELECT quantity FROM products WHERE id = ?", (product_id,)).fetchone()
+    return row[0] if row else None
+
+
+def reencode_blocks(conn: sqlite3.Connection, product_id: Optional[str] = None) -> int:
+    """
+    Re-encode sealed blocks in the current format with their product's
+    current quantity, e.g. after a size change.
+
+    Args:
+        conn: Open database connection
+        product_id: Only this product's blocks (all blocks if None)
+
+    Returns:
+        Number of blocks rewritten
+    """
+    cursor = conn.cursor()
+    where = "WHERE product_id = ?" if product_id is not None else ""
+    blocks = cursor.execute(f"""
+        SELECT product_id, retailer_id, month, payload
+        FROM price_history_blocks
+        {where}
+    """, (product_id,) if product_id is not None else ()).fetchall()
+    for block_product, block_retailer, month, payload in blocks:
+        rows = decode_block(block_product, block_retailer, payload)
+        cursor.execute("""
+            UPDATE price_history_blocks SET payload = ?
+            WHERE product_id = ? AND retailer_id = ? AND month = ?
+        """, (encode_block(rows, _quantity(cursor, block_product)),
+              block_product, block_retailer, month))
+    return len(blocks)
+
+
+def vacuum(conn: sqlite3.Connection) -> bool:
+    """
+    Switch the database to incremental auto_vacuum and rebuild it.
+
+    VACUUM rewrites the whole file and holds an exclusive lock until it
+    is done, so this is a maintenance step to run while the collector and
+    dashboard are stopped, never from a migration.
+
+    Returns:
+        True if the database was rebuilt, False if it already used
+        incremental auto_vacuum
+    """
+    if conn.execute("PRAGMA auto_vacuum").fetchone()[0] == 2:
+        return False
+    conn.execute("PRAGMA auto_vacuum = INCREMENTAL")
+    conn.execute("VACUUM")
+    return True
+
+
+def block_summaries(conn: sqlite3.Connection, product_id: str,
+                    retailer_id: str) -> List[sqlite3.Row]:
+    """Get block metadata (without payloads) for a series, newest month first."""
+    cursor = conn.cursor()
+    cursor.execute("""
+        SELECT month, row_count, first_timestamp, last_timestamp,
+               min_price, max_price, sum_price
+        FROM price_history_blocks
+        WHERE product_id = ? AND retailer_id = ?
+        ORDER BY month DESC
+    """, (product_id, retailer_id))
+    return cursor.fetchall()
+
+
+def iter_block_rows(conn: sqlite3.Connection, product_id: Optional[str] = None,
+                    retailer_id: Optional[str] = None,
+                    months: Optional[Iterable[str]] = None,
+                    newest_first: bool = False) -> Iterator[tuple]:
+    """
+    Yield decoded rows from sealed blocks.
+
+    Rows are grouped by block; within a block they are in timestamp order.
+    Blocks are visited by product, retailer and month.
+    """
+    clauses = []
+    params = []
+    if product_id is not None:
+        clauses.append("product_id = ?")
+        params.append(product_id)
+    if retailer_id is not None:
+        clauses.append("retailer_id = ?")
+        params.append(retailer_id)
+    if months is not None:
+        months = list(months)
+        if not months:
+            return
+        clauses.append(f"month IN ({', '.join('?' for _ in months)})")
+        params.extend(months)
+
+    where = f"WHERE {' AND '.join(clauses)}" if clauses else ""
+    order = "DESC" if newest_first else "ASC"
+    cursor = conn.cursor()
+    cursor.execute(f"""
+        SELECT product_id, retailer_id, payload
+        FROM price_history_blocks
+        {where}
+        ORDER BY product_id, retailer_id, month {order}
+    """, params)
+    for block_product, block_retailer, payload in cursor:
+        yield from decode_block(block_product, block_retailer, payload)
+
+
+def has_blocks(conn: sqlite3.Connection) -> bool:
+    """Check whether any history has been sealed into blocks."""
+    try:
+        row = conn.execute("SELECT 1 FROM price_history_blocks LIMIT 1").fetchone()
+    except sqlite3.OperationalError:
+        return False
+    return row is not None
+
+
+def iter_history_rows(conn: sqlite3.Connection,
+                      product_id: Optional[str] = None,
+                      all_columns: bool = False) -> Iterator[tuple]:
+    """
+    Stream price history ordered by product, retailer and timestamp.
+
+    Args:
+        conn: Open database connection
+        product_id: Restrict to one product (all products if None)
+        all_columns: Yield every column in ROW_COLUMNS order (the index
+                     then no longer covers the query, but still provides
+                     the order)
+
+    Yields:
+        Tuples starting (id, product_id, retailer_id, price, timestamp)
+    """
+    # Plain tuples and the covering idx_price_history_series index keep
+    # this a sequential scan with no sort step
+    cursor = conn.cursor()
+    cursor.row_factory = None
+    where = "WHERE product_id = ?" if product_id is not None else ""
+    columns = (', '.join(ROW_COLUMNS) if all_columns
+               else 'id, product_id, retailer_id, price, timestamp')
+    cursor.execute(f"""
+        SELECT {columns}
+        FROM price_history
+        {where}
+        ORDER BY product_id, retailer_id, timestamp
+    """, (product_id,) if product_id is not None else ())
+    if not has_blocks(conn):
+        return cursor
+    return heapq.merge(
+        iter_block_rows(conn, product_id),
+        cursor,
+        key=lambda r: (r[1], r[2], r[4])
+    )
+
+
+def latest_cursor(conn: sqlite3.Connection) -> int:
+    """Highest price_history rowid ever assigned (0 for an empty database)."""
+    row = conn.execute(
+        "SELECT seq FROM sqlite_sequence WHERE name = 'price_history'"
+    ).fetchone()
+    return row[0] if row else 0
+
+
+def main():
+    """CLI entry point."""
+    from src.database import PriceDatabase
+
+    command = sys.argv[1] if len(sys.argv) > 1 else 'stats'
+    db_path = sys.argv[2] if len(sys.argv) > 2 else "data/prices.db"
+    db = PriceDatabase(db_path)
+
+    if command == 'seal':
+        summary = db.seal_history_blocks()
+        print(f"✓ Sealed {summary['blocks']} block(s)")
+        print(f"  Rows moved: {summary['rows_moved']}")
+        print(f"  Rows left in table (not exactly encodable): {summary['rows_skipped']}")
+    elif command == 'stats':
+        rows = db.conn.execute("SELECT COUNT(*) FROM price_history").fetchone()[0]
+        blocks, block_rows, block_bytes = db.conn.execute("""
+            SELECT COUNT(*), COALESCE(SUM(row_count), 0), COALESCE(SUM(length(payload)), 0)
+            FROM price_history_blocks
+        """).fetchone()
+        print(f"Row table: {rows} observation(s)")
+        print(f"Blocks:    {blocks} block(s), {block_rows} observation(s), {block_bytes} bytes")
+    elif command == 'vacuum':
+        pages = db.conn.execute("PRAGMA page_count").fetchone()[0]
+        if vacuum(db.conn):
+            after = db.conn.execute("PRAGMA page_count").fetchone()[0]
+            print(f"✓ Switched to incremental auto_vacuum ({pages} -> {after} pages)")
+        else:
+            print("Already using incremental auto_vacuum")
+    else:
+        print("Usage: python -m src.history_blocks [seal|stats|vacuum] [db_path]")
+
+    db.close()
+
+
+if __name__ == "__main__":
+    main()
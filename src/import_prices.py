@@ -0,0 +1,371 @@
+"""
+Bulk import of historical prices.
+
+Streams observations from a file and inserts them in large transactions,
+instead of one committed add_price_point() per price. Supported inputs:
+
+    csv     Header row with product_id (or upc), retailer_id, price,
+            timestamp and optionally url, pack_size, advertised_savings
+    ndjson  One JSON object per line with the same fields
+    export  The prices_export.json shape written by export.py
+
+Rows are validated, products are resolved by id or UPC, and observations
+already in the database (same product, retailer and timestamp) are skipped.
+CSV and NDJSON are read line by line, so memory stays flat for any file
+size. The export shape is streamed one product at a time when the optional
+`ijson` package is installed.
+
+Usage:
+    python -m src.import_prices <file> [--format csv|ndjson|export]
+                                [--db data/prices.db] [--dry-run]
+"""
+import argparse
+import csv
+import json
+import sys
+import time
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, Iterator, Optional, Tuple
+
+from src.database import PriceDatabase
+from src.models import PricePoint
+from src import history_blocks
+
+DEFAULT_BATCH_SIZE = 1000
+DEFAULT_COMMIT_EVERY = 50000
+MAX_REPORTED_ERRORS = 20
+
+
+# ---------------------------------------------------------------------------
+# Readers - each yields (location, record dict)
+# ---------------------------------------------------------------------------
+
+def iter_csv(path: str) -> Iterator[Tuple[str, dict]]:
+    """Stream records from a CSV file with a header row."""
+    with open(path, newline='', encoding='utf-8') as f:
+        for line_number, record in enumerate(csv.DictReader(f), start=2):
+            yield f"line {line_number}", record
+
+
+def iter_ndjson(path: str) -> Iterator[Tuple[str, dict]]:
+    """Stream records from a newline-delimited JSON file."""
+    with open(path, encoding='utf-8') as f:
+        for line_number, line in enumerate(f, start=1):
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError as e:
+                yield f"line {line_number}", {'_error': f"invalid JSON ({e.msg})"}
+                continue
+            yield f"line {line_number}", record
+
+
+def _iter_export_products(path: str) -> Iterator[dict]:
+    try:
+        import ijson
+    except ImportError:
+        ijson = None
+
+    with open(path, 'rb') as f:
+        if ijson is not None:
+            yield from ijson.items(f, 'products.item', use_float=True)
+        else:
+            # Without ijson the whole document has to be parsed at once
+            yield from json.load(f).get('products', [])
+
+
+def iter_export_json(path: str) -> Iterator[Tuple[str, dict]]:
+    """Stream records from a prices_export.json file."""
+    for product in _iter_export_products(path):
+        for price_info in product.get('prices', []):
+            history = price_info.get('history', [])
+            if isinstance(history, dict):
+                yield (f"{product.get('id')}/{price_info.get('retailer_id')}",
+                       {'_error': "columnar history can't be imported; export with --format rows"})
+                continue
+            for index, point in enumerate(history):
+                yield (
+                    f"{product.get('id')}/{price_info.get('retailer_id')}[{index}]",
+                    {
+                        'product_id': product.get('id'),
+                        'retailer_id': price_info.get('retailer_id'),
+                        'price': point.get('price'),
+                        'timestamp': point.get('timestamp'),
+                        'pack_size': point.get('pack_size'),
+                        'advertised_savings': point.get('advertised_savings'),
+                    }
+                )
+
+
+READERS = {
+    'csv': iter_csv,
+    'ndjson': iter_ndjson,
+    'export': iter_export_json,
+}
+
+
+def detect_format(path: str) -> str:
+    """Guess the input format from the file extension."""
+    suffix = Path(path).suffix.lower()
+    if suffix == '.csv':
+        return 'csv'
+    if suffix in ('.ndjson', '.jsonl'):
+        return 'ndjson'
+    if suffix == '.json':
+        return 'export'
+    raise ValueError(f"Can't detect format of {path}; pass --format")
+
+
+# ---------------------------------------------------------------------------
+# Validation
+# ---------------------------------------------------------------------------
+
+def _blank(value) -> bool:
+    return value is None or (isinstance(value, str) and not value.strip())
+
+
+def _optional_float(value) -> Optional[float]:
+    return None if _blank(value) else float(value)
+
+
+class RecordValidator:
+    """Turns raw records into PricePoints, resolving products by id or UPC."""
+
+    def __init__(self, db: PriceDatabase):
+        self.products: Dict[str, object] = {}
+        self.by_upc: Dict[str, str] = {}
+        for product in db.iter_products():
+            self.products[product.id] = product
+            if product.upc:
+                self.by_upc[product.upc.strip()] = product.id
+
+    def to_price_point(self, record: dict) -> PricePoint:
+        """
+        Validate a record.
+
+        Raises:
+            ValueError: describing the first problem found
+        """
+        if '_error' in record:
+            raise ValueError(record['_error'])
+
+        product_id = record.get('product_id')
+        if _blank(product_id):
+            upc = record.get('upc')
+            if _blank(upc):
+                raise ValueError("missing product_id or upc")
+            product_id = self.by_upc.get(str(upc).strip())
+            if product_id is None:
+                raise ValueError(f"unknown UPC {upc}")
+        product_id = str(product_id).strip()
+        product = self.products.get(product_id)
+        if product is None:
+            raise ValueError(f"unknown product {product_id}")
+
+        retailer_id = record.get('retailer_id')
+        if _blank(retailer_id):
+            raise ValueError("missing retailer_id")
+        retailer_id = str(retailer_id).strip().lower()
+
+        try:
+            price = float(record.get('price'))
+        except (TypeError, ValueError):
+            raise ValueError(f"invalid price {record.get('price')!r}")
+        if not price > 0:
+            raise ValueError(f"price must be positive, got {price}")
+
+        try:
+            timestamp = datetime.fromisoformat(str(record.get('timestamp')).strip())
+        except ValueError:
+            raise ValueError(f"invalid timestamp {record.get('timestamp')!r}")
+
+        try:
+            pack_size = 1 if _blank(record.get('pack_size')) else int(record.get('pack_size'))
+            advertised_savings = _optional_float(record.get('advertised_savings'))
+        except (TypeError, ValueError) as e:
+            raise ValueError(str(e))
+        if pack_size < 1:
+            raise ValueError(f"pack_size must be at least 1, got {pack_size}")
+
+        url = record.get('url')
+        if _blank(url):
+            url = product.get_retailer_url(retailer_id) or ''
+
+        return PricePoint(
+            product_id=product_id,
+            retailer_id=retailer_id,
+            price=price,
+            timestamp=timestamp,
+            url=url,
+            pack_size=pack_size,
+            advertised_savings=advertised_savings
+        )
+
+
+# ---------------------------------------------------------------------------
+# Import
+# ---------------------------------------------------------------------------
+
+class _ExistingObservations:
+    """Answers "is this observation already stored?" for rows and sealed blocks."""
+
+    MAX_CACHED_BLOCKS = 256
+
+    def __init__(self, db: PriceDatabase):
+        self.conn = db.conn
+        self.block_cache: Dict[tuple, set] = {}
+
+    def _sealed(self, product_id: str, retailer_id: str, month: str) -> set:
+        key = (product_id, retailer_id, month)
+        if key not in self.block_cache:
+            if len(self.block_cache) >= self.MAX_CACHED_BLOCKS:
+                self.block_cache.clear()
+            self.block_cache[key] = {
+                row[4] for row in history_blocks.iter_block_rows(
+                    self.conn, product_id, retailer_id, months=[month])
+            }
+        return self.block_cache[key]
+
+    def contains(self, product_id: str, retailer_id: str, timestamp: str) -> bool:
+        row = self.conn.execute("""
+            SELECT 1 FROM price_history
+            WHERE product_id = ? AND retailer_id = ? AND timestamp = ?
+            LIMIT 1
+        """, (product_id, retailer_id, timestamp)).fetchone()
+        return row is not None or timestamp in self._sealed(product_id, retailer_id, timestamp[:7])
+
+
+def import_prices(path: str, fmt: Optional[str] = None, db: Optional[PriceDatabase] = None,
+                  batch_size: int = DEFAULT_BATCH_SIZE,
+                  commit_every: int = DEFAULT_COMMIT_EVERY,
+                  dry_run: bool = False, verbose: bool = True) -> dict:
+    """
+    Import price observations from a file.
+
+    Args:
+        path: Input file
+        fmt: 'csv', 'ndjson' or 'export' (detected from the extension if None)
+        db: Database to import into (opens the default database if None)
+        batch_size: Rows per INSERT statement
+        commit_every: Rows per transaction
+        dry_run: Validate and de-duplicate without writing
+        verbose: Print progress and a summary
+
+    Returns:
+        Summary dict with read/inserted/duplicate/invalid counts and timing
+    """
+    fmt = fmt or detect_format(path)
+    if fmt not in READERS:
+        raise ValueError(f"Unknown format {fmt}; expected one of {', '.join(READERS)}")
+
+    owns_db = db is None
+    db = db or PriceDatabase()
+    validator = RecordValidator(db)
+    existing = _ExistingObservations(db)
+
+    summary = {'read': 0, 'inserted': 0, 'duplicates': 0, 'invalid': 0, 'errors': []}
+    started = time.perf_counter()
+    batch = []
+    batch_keys = set()
+    uncommitted = 0
+
+    def flush():
+        nonlocal uncommitted
+        if batch and not dry_run:
+            db.add_price_points(batch, commit=False)
+            uncommitted += len(batch)
+        summary['inserted'] += len(batch)
+        batch.clear()
+        batch_keys.clear()
+        if uncommitted >= commit_every:
+            db.conn.commit()
+            uncommitted = 0
+            if verbose:
+                _print_progress(summary, started)
+
+    try:
+        for location, record in READERS[fmt](path):
+            summary['read'] += 1
+            try:
+                point = validator.to_price_point(record)
+            except ValueError as e:
+                summary['invalid'] += 1
+                if len(summary['errors']) < MAX_REPORTED_ERRORS:
+                    summary['errors'].append(f"{location}: {e}")
+                continue
+
+            key = (point.product_id, point.retailer_id, point.timestamp.isoformat())
+            if key in batch_keys or existing.contains(*key):
+                summary['duplicates'] += 1
+                continue
+
+            batch.append(point)
+            batch_keys.add(key)
+            if len(batch) >= batch_size:
+                flush()
+
+        flush()
+        db.conn.commit()
+    except BaseException:
+        db.conn.rollback()
+        raise
+    finally:
+        summary['seconds'] = time.perf_counter() - started
+        if owns_db:
+            db.close()
+
+    if verbose:
+        _print_summary(path, summary, dry_run)
+    return summary
+
+
+def _print_progress(summary: dict, started: float):
+    elapsed = time.perf_counter() - started
+    rate = summary['read'] / elapsed if elapsed > 0 else 0
+    print(f"  {summary['read']:,} read, {summary['inserted']:,} inserted "
+          f"({rate:,.0f} rows/s)")
+
+
+def _print_summary(path: str, summary: dict, dry_run: bool):
+    seconds = summary['seconds']
+    rate = summary['read'] / seconds if seconds > 0 else 0
+    verb = "Would insert" if dry_run else "Inserted"
+    print(f"\n✓ Imported {path}" if not dry_run else f"\n✓ Dry run of {path}")
+    print(f"  Rows read:  {summary['read']:,}")
+    print(f"  {verb}:   {summary['inserted']:,}")
+    print(f"  Duplicates: {summary['duplicates']:,}")
+    print(f"  Invalid:    {summary['invalid']:,}")
+    print(f"  Time:       {seconds:.2f}s ({rate:,.0f} rows/s)")
+    for error in summary['errors']:
+        print(f"    ✗ {error}")
+    if summary['invalid'] > len(summary['errors']):
+        print(f"    ... and {summary['invalid'] - len(summary['errors'])} more")
+
+
+def main():
+    """CLI entry point."""
+    parser = argparse.ArgumentParser(description="Bulk import historical prices.")
+    parser.add_argument('path', help="CSV, NDJSON or prices_export.json file")
+    parser.add_argument('--format', choices=sorted(READERS), help="Input format (default: from extension)")
+    parser.add_argument('--db', default="data/prices.db", help="Database path")
+    parser.add_argument('--batch-size', type=int, default=DEFAULT_BATCH_SIZE)
+    parser.add_argument('--commit-every', type=int, default=DEFAULT_COMMIT_EVERY)
+    parser.add_argument('--dry-run', action='store_true', help="Validate without writing")
+    args = parser.parse_args()
+
+    db = PriceDatabase(args.db)
+    try:
+        import_prices(args.path, args.format, db=db, batch_size=args.batch_size,
+                      commit_every=args.commit_every, dry_run=args.dry_run)
+    except (OSError, ValueError) as e:
+        print(f"✗ Error: {e}")
+        sys.exit(1)
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,437 @@
+"""
+Versioned schema migrations.
+
+Each migration has a version number and is applied exactly once, in order;
+applied versions are recorded in the schema_version table. PriceDatabase
+runs pending migrations when it opens the database, so adding a migration
+here is all it takes to ship a schema change.
+
+Migrations should be idempotent (CREATE ... IF NOT EXISTS, check columns
+before ALTER TABLE) so a migration interrupted before it was recorded can
+simply run again. Large data rewrites should use backfill(), which works
+through a table in committed batches and resumes where it left off, so the
+collector is never blocked for longer than one batch.
+
+Usage:
+    python -m src.migrations status [db_path]   # list applied/pending
+    python -m src.migrations up [db_path]       # apply pending migrations
+"""
+import logging
+import sqlite3
+import sys
+import time
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Callable, List, Optional
+
+from src import analytics, change_feed, fake_sales, forecasts, history_blocks, seasonality, units
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_BATCH_SIZE = 5000
+
+# Progress messages go to the log by default; the CLI passes print
+Reporter = Callable[[str], None]
+
+
+@dataclass
+class Migration:
+    """A single schema change."""
+    version: int
+    name: str
+    apply: Callable[[sqlite3.Connection, Reporter], None]
+
+
+MIGRATIONS: List[Migration] = []
+
+
+def migration(version: int, name: str):
+    """Register a function as the migration for `version`."""
+    def decorator(fn):
+        if any(m.version == version for m in MIGRATIONS):
+            raise ValueError(f"Duplicate migration version: {version}")
+        MIGRATIONS.append(Migration(version, name, fn))
+        MIGRATIONS.sort(key=lambda m: m.version)
+        return fn
+    return decorator
+
+
+# ---------------------------------------------------------------------------
+# Bookkeeping
+# ---------------------------------------------------------------------------
+
+def _ensure_version_tables(conn: sqlite3.Connection):
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS schema_version (
+            version INTEGER PRIMARY KEY,
+            name TEXT NOT NULL,
+            applied_at TEXT NOT NULL,
+            duration_seconds REAL NOT NULL
+        )
+    """)
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS migration_progress (
+            version INTEGER PRIMARY KEY,
+            last_rowid INTEGER NOT NULL,
+            rows_done INTEGER NOT NULL,
+            updated_at TEXT NOT NULL
+        )
+    """)
+    conn.commit()
+
+
+def applied_versions(conn: sqlite3.Connection) -> set:
+    """Get the set of migration versions already applied."""
+    _ensure_version_tables(conn)
+    return {row[0] for row in conn.execute("SELECT version FROM schema_version")}
+
+
+def current_version(conn: sqlite3.Connection) -> int:
+    """Get the highest applied migration version (0 for a fresh database)."""
+    return max(applied_versions(conn), default=0)
+
+
+def pending_migrations(conn: sqlite3.Connection) -> List[Migration]:
+    """Get migrations not yet applied, in order."""
+    applied = applied_versions(conn)
+    return [m for m in MIGRATIONS if m.version not in applied]
+
+
+def migrate(conn: sqlite3.Connection, target: Optional[int] = None,
+            report: Reporter = logger.info) -> List[int]:
+    """
+    Apply pending migrations in order.
+
+    Args:
+        conn: Open database connection
+        target: Stop after this version (defaults to the latest)
+        report: Callable receiving progress messages
+
+    Returns:
+        List of versions applied
+    """
+    applied = []
+    for m in pending_migrations(conn):
+        if target is not None and m.version > target:
+            break
+        report(f"Applying schema migration {m.version}: {m.name}")
+        started = time.perf_counter()
+        m.apply(conn, report)
+        duration = time.perf_counter() - started
+        conn.execute("""
+            INSERT INTO schema_version (version, name, applied_at, duration_seconds)
+            VALUES (?, ?, ?, ?)
+        """, (m.version, m.name, datetime.now().isoformat(), duration))
+        conn.execute("DELETE FROM migration_progress WHERE version = ?", (m.version,))
+        conn.commit()
+        report(f"  ✓ Migration {m.version} done in {duration:.2f}s")
+        applied.append(m.version)
+    return applied
+
+
+def backfill(conn: sqlite3.Connection, version: int, table: str,
+             process_batch: Callable[[sqlite3.Connection, list], None],
+             report: Reporter = logger.info, batch_size: int = DEFAULT_BATCH_SIZE,
+             columns: str = "*"):
+    """
+    Rewrite a table in rowid order, committing after every batch.
+
+    Progress is stored in migration_progress, so an interrupted backfill
+    resumes after the last committed batch instead of starting over.
+
+    Args:
+        conn: Open database connection
+        version: Version of the migration running the backfill
+        table: Table to walk
+        process_batch: Called with each batch of rows (rowid first); should
+                       issue its writes on `conn` without committing
+        report: Callable receiving progress messages
+        batch_size: Rows per committed batch
+        columns: Columns to select after the rowid
+    """
+    row = conn.execute(
+        "SELECT last_rowid, rows_done FROM migration_progress WHERE version = ?",
+        (version,)
+    ).fetchone()
+    last_rowid, rows_done = (row[0], row[1]) if row else (0, 0)
+    if row:
+        report(f"  Resuming backfill of {table} after rowid {last_rowid}")
+
+    remaining = conn.execute(
+        f"SELECT COUNT(*) FROM {table} WHERE rowid > ?", (last_rowid,)
+    ).fetchone()[0]
+    total = rows_done + remaining
+    started = time.perf_counter()
+    done_this_run = 0
+
+    while True:
+        rows = conn.execute(f"""
+            SELECT rowid, {columns} FROM {table}
+            WHERE rowid > ?
+            ORDER BY rowid
+            LIMIT ?
+        """, (last_rowid, batch_size)).fetchall()
+        if not rows:
+            break
+
+        process_batch(conn, rows)
+        last_rowid = rows[-1][0]
+        rows_done += len(rows)
+        done_this_run += len(rows)
+        conn.execute("""
+            INSERT OR REPLACE INTO migration_progress (version, last_rowid, rows_done, updated_at)
+            VALUES (?, ?, ?, ?)
+        """, (version, last_rowid, rows_done, datetime.now().isoformat()))
+        conn.commit()
+
+        elapsed = time.perf_counter() - started
+        rate = done_this_run / elapsed if elapsed > 0 else 0
+        report(f"  {table}: {rows_done}/{total} rows ({rate:,.0f} rows/s)")
+
+
+def _columns(conn: sqlite3.Connection, table: str) -> set:
+    return {row[1] for row in conn.execute(f"PRAGMA table_info({table})")}
+
+
+# ---------------------------------------------------------------------------
+# Migrations
+# ---------------------------------------------------------------------------
+
+@migration(1, "initial schema")
+def _initial_schema(conn, report):
+    cursor = conn.cursor()
+
+    # Products table
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS products (
+            id TEXT PRIMARY KEY,
+            name TEXT NOT NULL,
+            size TEXT NOT NULL,
+            category TEXT NOT NULL,
+            brand TEXT,
+            upc TEXT,
+            target_url TEXT,
+            walmart_url TEXT,
+            cvs_url TEXT,
+            walgreens_url TEXT,
+            amazon_url TEXT,
+            created_at TEXT NOT NULL,
+            updated_at TEXT NOT NULL
+        )
+    """)
+
+    # Retailers table
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS retailers (
+            id TEXT PRIMARY KEY,
+            name TEXT NOT NULL,
+            base_url TEXT NOT NULL
+        )
+    """)
+
+    # Price history table
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS price_history (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            product_id TEXT NOT NULL,
+            retailer_id TEXT NOT NULL,
+            price REAL NOT NULL,
+            timestamp TEXT NOT NULL,
+            url TEXT NOT NULL,
+            pack_size INTEGER DEFAULT 1,
+            advertised_savings REAL,
+            FOREIGN KEY (product_id) REFERENCES products(id),
+            FOREIGN KEY (retailer_id) REFERENCES retailers(id)
+        )
+    """)
+
+    # Create index for faster queries
+    cursor.execute("""
+        CREATE INDEX IF NOT EXISTS idx_price_history_lookup
+        ON price_history(product_id, retailer_id, timestamp DESC)
+    """)
+    conn.commit()
+
+
+@migration(2, "product brand, UPC and retailer URL columns")
+def _product_columns(conn, report):
+    # Databases created before these columns existed (formerly handled by
+    # migrate_add_product_urls.py)
+    existing = _columns(conn, 'products')
+    now = datetime.now().isoformat()
+    for column in ('brand', 'upc', 'target_url', 'walmart_url', 'cvs_url',
+                   'walgreens_url', 'amazon_url', 'created_at', 'updated_at'):
+        if column not in existing:
+            report(f"  Adding products.{column}")
+            conn.execute(f"ALTER TABLE products ADD COLUMN {column} TEXT")
+    conn.execute("UPDATE products SET created_at = ? WHERE created_at IS NULL", (now,))
+    conn.execute("UPDATE products SET updated_at = ? WHERE updated_at IS NULL", (now,))
+    conn.commit()
+
+
+@migration(3, "compressed price history blocks")
+def _history_blocks(conn, report):
+    conn.execute(history_blocks.CREATE_BLOCKS_TABLE)
+    conn.commit()
+
+
+@migration(4, "product active flag")
+def _product_active(conn, report):
+    if 'active' not in _columns(conn, 'products'):
+        conn.execute("ALTER TABLE products ADD COLUMN active INTEGER NOT NULL DEFAULT 1")
+    conn.commit()
+
+
+@migration(5, "covering index for ordered full-history scans")
+def _series_index(conn, report):
+    report("  Building idx_price_history_series (one-off, may take a while on large databases)")
+    conn.execute("""
+        CREATE INDEX IF NOT EXISTS idx_price_history_series
+        ON price_history(product_id, retailer_id, timestamp, price)
+    """)
+    # Serves every lookup the old index did (SQLite walks it backwards for
+    # newest-first queries), so keeping both only slows writes
+    conn.execute("DROP INDEX IF EXISTS idx_price_history_lookup")
+    conn.commit()
+
+
+@migration(6, "change events feed")
+def _change_events(conn, report):
+    conn.execute(change_feed.CREATE_EVENTS_TABLE)
+    conn.commit()
+
+
+@migration(7, "price analytics table")
+def _price_analytics(conn, report):
+    conn.execute(analytics.CREATE_ANALYTICS_TABLE)
+    conn.commit()
+
+
+@migration(8, "sale verdicts")
+def _sale_verdicts(conn, report):
+    conn.execute(fake_sales.CREATE_VERDICTS_TABLE)
+    conn.execute(fake_sales.CREATE_VERDICTS_INDEX)
+    conn.execute(fake_sales.CREATE_RUNS_TABLE)
+    conn.commit()
+
+
+@migration(9, "seasonality tables")
+def _seasonality(conn, report):
+    conn.execute(seasonality.CREATE_SERIES_TABLE)
+    conn.execute(seasonality.CREATE_CATEGORY_TABLE)
+    conn.execute(seasonality.CREATE_RUNS_TABLE)
+    conn.commit()
+
+
+@migration(10, "price forecasts")
+def _price_forecasts(conn, report):
+    conn.execute(forecasts.CREATE_MODELS_TABLE)
+    conn.execute(forecasts.CREATE_FORECASTS_TABLE)
+    conn.execute(forecasts.CREATE_RUNS_TABLE)
+    conn.commit()
+
+
+@migration(11, "normalized product sizes and per-unit prices")
+def _unit_prices(conn, report):
+    if 'quantity' not in _columns(conn, 'products'):
+        conn.execute("ALTER TABLE products ADD COLUMN quantity REAL")
+        conn.execute("ALTER TABLE products ADD COLUMN unit TEXT")
+    if 'unit_price' not in _columns(conn, 'price_history'):
+        conn.execute("ALTER TABLE price_history ADD COLUMN unit_price REAL")
+
+    quantities = {}
+    for product_id, size in conn.execute("SELECT id, size FROM products").fetchall():
+        parsed = units.parse_size(size)
+        if parsed is None:
+            report(f"  Size of {product_id} not understood: {size!r}")
+            continue
+        quantities[product_id] = parsed.quantity
+        conn.execute("UPDATE products SET quantity = ?, unit = ? WHERE id = ?",
+                     (parsed.quantity, parsed.base_unit, product_id))
+    conn.commit()
+
+    def process_batch(conn, rows):
+        conn.executemany(
+            "UPDATE price_history SET unit_price = ? WHERE id = ?",
+            [(price / (pack_size * quantities[product_id]), rowid)
+             for rowid, product_id, price, pack_size in rows
+             if product_id in quantities and pack_size]
+        )
+
+    backfill(conn, 11, 'price_history', process_batch, report,
+             columns="product_id, price, pack_size")
+
+
+@migration(12, "latest unit prices")
+def _latest_unit_prices(conn, report):
+    # Unit prices are ranked from this small table rather than from another
+    # index on price_history
+    conn.execute(units.CREATE_LATEST_TABLE)
+    conn.execute(units.CREATE_LATEST_INDEX)
+
+    report("  Collecting each series' latest price")
+    # Bare columns come from the row holding MAX(timestamp)
+    conn.execute("""
+        INSERT OR REPLACE INTO latest_unit_prices
+        (product_id, retailer_id, timestamp, price, pack_size, unit_price)
+        SELECT product_id, retailer_id, MAX(timestamp), price, pack_size, unit_price
+        FROM price_history
+        GROUP BY product_id, retailer_id
+    """)
+    # Series with no live rows: the last row of their newest sealed month
+    sealed = conn.execute("""
+        SELECT b.product_id, b.retailer_id, b.payload, p.quantity
+        FROM price_history_blocks b
+        LEFT JOIN products p ON p.id = b.product_id
+        WHERE b.month = (SELECT MAX(month) FROM price_history_blocks
+                         WHERE product_id = b.product_id AND retailer_id = b.retailer_id)
+          AND NOT EXISTS (SELECT 1 FROM latest_unit_prices
+                          WHERE product_id = b.product_id AND retailer_id = b.retailer_id)
+    """).fetchall() if history_blocks.has_blocks(conn) else []
+    for product_id, retailer_id, payload, quantity in sealed:
+        row = dict(zip(history_blocks.ROW_COLUMNS,
+                       history_blocks.decode_block(product_id, retailer_id, payload)[-1]))
+        price, timestamp, pack_size = row['price'], row['timestamp'], row['pack_size']
+        conn.execute("""
+            INSERT INTO latest_unit_prices
+            (product_id, retailer_id, timestamp, price, pack_size, unit_price)
+            VALUES (?, ?, ?, ?, ?, ?)
+        """, (product_id, retailer_id, timestamp, price, pack_size,
+              price / (pack_size * quantity) if quantity and pack_size else None))
+    conn.commit()
+
+
+@migration(13, "history blocks with unit prices")
+def _block_unit_prices(conn, report):
+    if history_blocks.has_blocks(conn):
+        report("  Re-encoding sealed blocks with unit prices")
+        history_blocks.reencode_blocks(conn)
+        conn.commit()
+
+
+def main():
+    """CLI entry point."""
+    command = sys.argv[1] if len(sys.argv) > 1 else 'status'
+    db_path = sys.argv[2] if len(sys.argv) > 2 else "data/prices.db"
+    conn = sqlite3.connect(db_path)
+
+    if command == 'status':
+        applied = applied_versions(conn)
+        print(f"Database: {db_path}")
+        print(f"Schema version: {current_version(conn)}\n")
+        for m in MIGRATIONS:
+            mark = "✓" if m.version in applied else "·"
+            print(f"  {mark} {m.version:>3}  {m.name}")
+        for row in conn.execute("SELECT version, rows_done FROM migration_progress"):
+            print(f"\n  Migration {row[0]} backfill in progress ({row[1]} rows done)")
+    elif command == 'up':
+        applied = migrate(conn, report=print)
+        print(f"\n✓ Applied {len(applied)} migration(s); schema version {current_version(conn)}")
+    else:
+        print("Usage: python -m src.migrations [status|up] [db_path]")
+
+    conn.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -1,13 +1,67 @@
 """
 Data models for the price tracking system.
 """
-from dataclasses import dataclass
-from datetime import datetime
-from typing import Optional
+from dataclasses import dataclass, fields
+from datetime import date, datetime
+from typing import Dict, List, Optional
+
+
+class _ProductMethods:
+    """Behaviour shared by Product and ProductRecord."""
+    __slots__ = ()
+
+    def __str__(self):
+        return f"{self.name} ({self.size})"
+
+    def get_retailer_url(self, retailer_id: str) -> Optional[str]:
+        """Get the URL for a specific retailer."""
+        url_map = {
+            'target': self.target_url,
+            'walmart': self.walmart_url,
+            'cvs': self.cvs_url,
+            'walgreens': self.walgreens_url,
+            'amazon': self.amazon_url
+        }
+        return url_map.get(retailer_id)
+
+
+class _PricePointMethods:
+    """Behaviour shared by PricePoint and PricePointRecord."""
+    __slots__ = ()
+
+    @property
+    def price_per_unit(self) -> float:
+        """Calculate price per individual unit."""
+        return self.price / self.pack_size
+    
+    def __str__(self):
+        pack_info = f"{self.pack_size}-pack" if self.pack_size > 1 else "single"
+        return f"${self.price:.2f} ({pack_info}) @ {self.retailer_id}"
+
+
+class _PriceStatsMethods:
+    """Behaviour shared by PriceStats and PriceStatsRecord."""
+    __slots__ = ()
+
+    def is_good_deal(self, threshold: float = 0.95) -> bool:
+        """
+        Determine if current price is a good deal.
+        
+        Args:
+            threshold: Price must be below (avg * threshold) to be considered a deal
+        
+        Returns:
+            True if current price is significantly below average
+        """
+        return self.current_price < (self.avg_price * threshold)
+    
+    def savings_vs_average(self) -> float:
+        """Calculate savings compared to historical average."""
+        return self.avg_price - self.current_price
 
 
 @dataclass
-class Product:
+class Product(_ProductMethods):
     """Represents a product being tracked."""
     id: str  # Unique identifier (e.g., 'eucerin-eczema-5oz')
     name: str
@@ -22,20 +76,7 @@ class Product:
     amazon_url: Optional[str] = None
     created_at: Optional[datetime] = None
     updated_at: Optional[datetime] = None
-
-    def __str__(self):
-        return f"{self.name} ({self.size})"
-
-    def get_retailer_url(self, retailer_id: str) -> Optional[str]:
-        """Get the URL for a specific retailer."""
-        url_map = {
-            'target': self.target_url,
-            'walmart': self.walmart_url,
-            'cvs': self.cvs_url,
-            'walgreens': self.walgreens_url,
-            'amazon': self.amazon_url
-        }
-        return url_map.get(retailer_id)
+    active: bool = True  # False once removed from the catalog (history is kept)
 
 
 @dataclass
@@ -50,7 +91,7 @@ class Retailer:
 
 
 @dataclass
-class PricePoint:
+class PricePoint(_PricePointMethods):
     """A single price observation at a specific time."""
     product_id: str
     retailer_id: str
@@ -59,19 +100,10 @@ class PricePoint:
     url: str  # Product URL at the retailer
     pack_size: int = 1  # For multi-packs (1 for single items)
     advertised_savings: Optional[float] = None  # If retailer claims "$X off"
-    
-    @property
-    def price_per_unit(self) -> float:
-        """Calculate price per individual unit."""
-        return self.price / self.pack_size
-    
-    def __str__(self):
-        pack_info = f"{self.pack_size}-pack" if self.pack_size > 1 else "single"
-        return f"${self.price:.2f} ({pack_info}) @ {self.retailer_id}"
 
 
 @dataclass
-class PriceStats:
+class PriceStats(_PriceStatsMethods):
     """Statistical summary of price history for a product at a retailer."""
     product_id: str
     retailer_id: str
@@ -82,19 +114,286 @@ class PriceStats:
     observation_count: int
     first_seen: datetime
     last_updated: datetime
-    
-    def is_good_deal(self, threshold: float = 0.95) -> bool:
-        """
-        Determine if current price is a good deal.
-        
-        Args:
-            threshold: Price must be below (avg * threshold) to be considered a deal
-        
-        Returns:
-            True if current price is significantly below average
-        """
-        return self.current_price < (self.avg_price * threshold)
-    
-    def savings_vs_average(self) -> float:
-        """Calculate savings compared to historical average."""
-        return self.avg_price - self.current_price
+
+
+@dataclass
+class PriceBucket:
+    """Open/high/low/close summary of one retailer's prices over a time bucket."""
+    retailer_id: str
+    start: datetime  # Start of the bucket (the observation time for 'raw')
+    open: float
+    high: float
+    low: float
+    close: float
+    avg: float
+    count: int
+
+
+@dataclass
+class BestPrice:
+    """The cheapest retailer at one point of a cross-retailer comparison."""
+    time: datetime  # Grid point: bucket start, or the observation time for 'raw'
+    price: Optional[float]  # None when no retailer had a current price
+    retailer_id: Optional[str]  # First of `cheapest`
+    cheapest: List[str]  # Every retailer at the best price
+    spread: Optional[float]  # Dearest minus cheapest, None with fewer than two prices
+    retailers: int  # Retailers with a current price
+
+
+@dataclass
+class RetailerComparison:
+    """A product's retailers as-of joined on a shared time grid (see src/comparison.py)."""
+    product_id: str
+    bucket: str
+    retailers: List[str]
+    points: List[BestPrice]
+    cheapest_share: Dict[str, float]  # Share of time each retailer was cheapest, largest first
+
+    def most_often_cheapest(self) -> Optional[str]:
+        """The retailer that was cheapest for the largest share of time."""
+        return next(iter(self.cheapest_share), None)
+
+
+@dataclass
+class PriceAnalytics:
+    """Daily-resampled statistics for a product at a retailer (see src/analytics.py)."""
+    product_id: str
+    retailer_id: str
+    first_day: date
+    last_day: date
+    days: int
+    current_price: float
+    mean_7d: float
+    mean_30d: float
+    min_30d: float
+    max_30d: float
+    volatility_30d: Optional[float]  # None with a single day of history
+    p10: float
+    p25: float
+    p50: float
+    p90: float
+    share_cheaper: float
+    days_at_current: int
+    share_at_low: float
+    computed_at: datetime
+
+    def is_cheap(self) -> bool:
+        """Whether the current price is within the cheapest 10% of days."""
+        return self.current_price <= self.p10
+
+
+@dataclass
+class SaleVerdict:
+    """Whether an advertised discount held up against prior prices (see src/fake_sales.py)."""
+    price_id: int
+    product_id: str
+    retailer_id: str
+    timestamp: datetime
+    price: float
+    advertised_savings: float
+    claimed_was: float
+    median_30d: Optional[float]
+    median_60d: Optional[float]
+    median_90d: Optional[float]
+    mode_30d: Optional[float]
+    mode_60d: Optional[float]
+    mode_90d: Optional[float]
+    reference_price: Optional[float]  # None when there was no earlier history
+    actual_savings: Optional[float]
+    verdict: str  # genuine, inflated, fictitious or unverified
+    computed_at: datetime
+
+
+@dataclass
+class PriceForecast:
+    """Expected price and chance of a lower one, H days out (see src/forecasts.py)."""
+    product_id: str
+    retailer_id: str
+    horizon: int  # Days ahead
+    as_of: date  # Last observed day
+    current_price: float
+    expected_price: float
+    p_lower: float  # Chance of a price at least 1% lower within the horizon
+    recommendation: str  # buy or wait
+    evaluated: int  # Past forecasts scored so far
+    mae: Optional[float]  # None until a forecast has been scored
+    mape: Optional[float]
+    brier: Optional[float]
+    computed_at: datetime
+
+    def expected_savings(self) -> float:
+        """How much cheaper the expected price is than the current one (negative if dearer)."""
+        return round(self.current_price - self.expected_price, 2)
+
+
+@dataclass
+class UnitPrice:
+    """Latest price of a product × retailer per unit of size (see src/units.py)."""
+    product_id: str
+    name: str
+    size: str
+    retailer_id: str
+    timestamp: datetime
+    price: float
+    pack_size: int
+    unit: str  # Display unit, e.g. 'oz'
+    unit_price: float  # Price per `unit`
+
+    def __str__(self):
+        return f"${self.unit_price:.4f}/{self.unit} @ {self.retailer_id}"
+
+
+@dataclass
+class SeriesSeasonality:
+    """Recurring low-price months and weekdays of one product × retailer (see src/seasonality.py)."""
+    product_id: str
+    retailer_id: str
+    days: int
+    month_index: List[Optional[float]]  # Mean relative price for Jan..Dec, None if unobserved
+    weekday_index: List[Optional[float]]  # Mon..Sun
+    low_months: List[int]  # 1-12, lowest first
+    low_weekdays: List[int]  # 0 = Monday
+    month_confidence: Optional[float]  # None without low months
+    weekday_confidence: Optional[float]
+    cycle_days: Optional[int]  # Strongest autocorrelation peak, if any
+    cycle_strength: Optional[float]
+    computed_at: datetime
+
+
+@dataclass
+class CategorySeasonality:
+    """Seasonality combined over a category's series (see src/seasonality.py)."""
+    category: str
+    series: int
+    month_index: List[Optional[float]]
+    weekday_index: List[Optional[float]]
+    low_months: List[int]
+    low_weekdays: List[int]
+    month_confidence: Optional[float]  # Share of series agreeing on the low months
+    weekday_confidence: Optional[float]
+    computed_at: datetime
+
+
+# ---------------------------------------------------------------------------
+# Compact records
+#
+# PriceDatabase returns these instead of the dataclasses above. They expose
+# the same attributes and methods, but use __slots__ and keep timestamps as
+# the stored ISO strings until they are first accessed.
+# ---------------------------------------------------------------------------
+
+def _lazy_timestamp(slot: str) -> property:
+    """Property that parses an ISO string stored in `slot` on first access."""
+    def getter(self):
+        value = getattr(self, slot)
+        if isinstance(value, str):
+            value = datetime.fromisoformat(value)
+            setattr(self, slot, value)
+        return value
+
+    def setter(self, value):
+        setattr(self, slot, value)
+
+    return property(getter, setter)
+
+
+class _Record:
+    """Base for slotted records mirroring a dataclass model."""
+    __slots__ = ()
+    _model = None
+
+    def _values(self) -> tuple:
+        return tuple(getattr(self, f.name) for f in fields(self._model))
+
+    def to_model(self):
+        """Convert to the equivalent dataclass model."""
+        return self._model(*self._values())
+
+    def __eq__(self, other):
+        if other.__class__ in (self.__class__, self._model):
+            return self._values() == tuple(getattr(other, f.name) for f in fields(self._model))
+        return NotImplemented
+
+    __hash__ = None
+
+    def __repr__(self):
+        args = ', '.join(f"{f.name}={getattr(self, f.name)!r}" for f in fields(self._model))
+        return f"{self.__class__.__name__}({args})"
+
+
+class ProductRecord(_Record, _ProductMethods):
+    """Slotted Product loaded from the database."""
+    __slots__ = ('id', 'name', 'size', 'category', 'brand', 'upc', 'target_url',
+                 'walmart_url', 'cvs_url', 'walgreens_url', 'amazon_url',
+                 '_created_at', '_updated_at', 'active')
+    _model = Product
+
+    def __init__(self, id, name, size, category, brand=None, upc=None,
+                 target_url=None, walmart_url=None, cvs_url=None,
+                 walgreens_url=None, amazon_url=None, created_at=None, updated_at=None,
+                 active=True):
+        self.id = id
+        self.name = name
+        self.size = size
+        self.category = category
+        self.brand = brand
+        self.upc = upc
+        self.target_url = target_url
+        self.walmart_url = walmart_url
+        self.cvs_url = cvs_url
+        self.walgreens_url = walgreens_url
+        self.amazon_url = amazon_url
+        self._created_at = created_at
+        self._updated_at = updated_at
+        self.active = active
+
+    created_at = _lazy_timestamp('_created_at')
+    updated_at = _lazy_timestamp('_updated_at')
+
+
+class PricePointRecord(_Record, _PricePointMethods):
+    """Slotted PricePoint loaded from the database."""
+    __slots__ = ('product_id', 'retailer_id', 'price', '_timestamp', 'url',
+                 'pack_size', 'advertised_savings')
+    _model = PricePoint
+
+    def __init__(self, product_id, retailer_id, price, timestamp, url,
+                 pack_size=1, advertised_savings=None):
+        self.product_id = product_id
+        self.retailer_id = retailer_id
+        self.price = price
+        self._timestamp = timestamp
+        self.url = url
+        self.pack_size = pack_size
+        self.advertised_savings = advertised_savings
+
+    timestamp = _lazy_timestamp('_timestamp')
+
+    @property
+    def timestamp_iso(self) -> str:
+        """The timestamp as an ISO string, without parsing it."""
+        value = self._timestamp
+        return value if isinstance(value, str) else value.isoformat()
+
+
+class PriceStatsRecord(_Record, _PriceStatsMethods):
+    """Slotted PriceStats computed by the database."""
+    __slots__ = ('product_id', 'retailer_id', 'current_price', 'min_price',
+                 'max_price', 'avg_price', 'observation_count',
+                 '_first_seen', '_last_updated')
+    _model = PriceStats
+
+    def __init__(self, product_id, retailer_id, current_price, min_price,
+                 max_price, avg_price, observation_count, first_seen, last_updated):
+        self.product_id = product_id
+        self.retailer_id = retailer_id
+        self.current_price = current_price
+        self.min_price = min_price
+        self.max_price = max_price
+        self.avg_price = avg_price
+        self.observation_count = observation_count
+        self._first_seen = first_seen
+        self._last_updated = last_updated
+
+    first_seen = _lazy_timestamp('_first_seen')
+    last_updated = _lazy_timestamp('_last_updated')
@@ -0,0 +1,233 @@
+"""
+Opt-in SQL query profiling for SQLite connections.
+
+When enabled, connections are opened with a wrapping cursor that records,
+per distinct statement, how often it ran, total and max latency (including
+fetching) and how many rows it returned. Statements slower than a threshold
+are logged together with their EXPLAIN QUERY PLAN, which makes N+1 loops and
+missing indexes easy to spot.
+
+Enable with environment variables:
+    PRICE_DB_PROFILE=1          # turn profiling on
+    PRICE_DB_SLOW_MS=50         # slow-query threshold in milliseconds
+
+A summary is printed at interpreter exit, and the dashboard API exposes it
+at /api/debug/query-stats.
+"""
+import atexit
+import logging
+import os
+import re
+import sqlite3
+import sys
+import threading
+import time
+from typing import List, Optional
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_SLOW_MS = 50.0
+
+
+def _normalize(sql: str) -> str:
+    """Collapse whitespace so the same statement always maps to one key."""
+    return re.sub(r'\s+', ' ', sql).strip()
+
+
+class QueryProfiler:
+    """Accumulates per-statement timing and row counts."""
+
+    def __init__(self, slow_ms: float = DEFAULT_SLOW_MS):
+        self.slow_ms = slow_ms
+        self._stats = {}
+        self._lock = threading.Lock()
+
+    def record(self, conn: sqlite3.Connection, sql: str, params, elapsed: float, rows: int):
+        """Record one finished execution of a statement."""
+        key = _normalize(sql)
+        with self._lock:
+            entry = self._stats.get(key)
+            if entry is None:
+                entry = self._stats[key] = {
+                    'sql': key,
+                    'count': 0,
+                    'total_ms': 0.0,
+                    'max_ms': 0.0,
+                    'rows': 0,
+                }
+            elapsed_ms = elapsed * 1000
+            entry['count'] += 1
+            entry['total_ms'] += elapsed_ms
+            entry['max_ms'] = max(entry['max_ms'], elapsed_ms)
+            entry['rows'] += rows
+
+        if elapsed_ms >= self.slow_ms:
+            logger.warning("Slow query (%.1f ms, %d rows): %s\n%s",
+                           elapsed_ms, rows, key, self.explain(conn, sql, params))
+
+    @staticmethod
+    def explain(conn: sqlite3.Connection, sql: str, params) -> str:
+        """Get the EXPLAIN QUERY PLAN output for a statement as text."""
+        if params is None:
+            return "  (plan unavailable for executemany)"
+        try:
+            cursor = sqlite3.Cursor(conn)
+            cursor.execute(f"EXPLAIN QUERY PLAN {sql}", params)
+            return '\n'.join(f"  {row[-1]}" for row in cursor.fetchall())
+        except sqlite3.Error as e:
+            return f"  (plan unavailable: {e})"
+
+    def summary(self) -> List[dict]:
+        """Get per-statement stats, most expensive first."""
+        with self._lock:
+            entries = [dict(entry) for entry in self._stats.values()]
+        for entry in entries:
+            entry['avg_ms'] = entry['total_ms'] / entry['count']
+        return sorted(entries, key=lambda e: e['total_ms'], reverse=True)
+
+    def reset(self):
+        """Discard all recorded stats."""
+        with self._lock:
+            self._stats.clear()
+
+    def report(self, limit: int = 20, file=None):
+        """Print a table of the most expensive statements."""
+        file = file or sys.stderr
+        entries = self.summary()
+        if not entries:
+            return
+        print("\n=== SQL Query Profile ===", file=file)
+        print(f"{'count':>7} {'total ms':>10} {'avg ms':>8} {'max ms':>8} {'rows':>8}  statement",
+              file=file)
+        for entry in entries[:limit]:
+            print(f"{entry['count']:>7} {entry['total_ms']:>10.1f} {entry['avg_ms']:>8.2f} "
+                  f"{entry['max_ms']:>8.2f} {entry['rows']:>8}  {entry['sql'][:100]}",
+                  file=file)
+
+
+class ProfilingCursor(sqlite3.Cursor):
+    """Cursor that reports each statement, including fetch time, to the profiler."""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._pending = None
+
+    def _finish(self):
+        pending = self._pending
+        if pending is not None:
+            self._pending = None
+            sql, params, elapsed, rows = pending
+            get_profiler().record(self.connection, sql, params, elapsed, rows)
+
+    def _track(self, started: float, rows: int, done: bool = False):
+        if self._pending is not None:
+            sql, params, elapsed, total = self._pending
+            self._pending = (sql, params, elapsed + time.perf_counter() - started, total + rows)
+            if done:
+                self._finish()
+
+    def execute(self, sql, parameters=()):
+        self._finish()
+        started = time.perf_counter()
+        super().execute(sql, parameters)
+        self._pending = (sql, parameters, time.perf_counter() - started, 0)
+        if self.description is None:
+            self._finish()
+        return self
+
+    def executemany(self, sql, seq_of_parameters):
+        self._finish()
+        started = time.perf_counter()
+        super().executemany(sql, seq_of_parameters)
+        self._pending = (sql, None, time.perf_counter() - started, max(self.rowcount, 0))
+        self._finish()
+        return self
+
+    def fetchone(self):
+        started = time.perf_counter()
+        row = super().fetchone()
+        self._track(started, 0 if row is None else 1, done=row is None)
+        return row
+
+    def fetchmany(self, size=None):
+        started = time.perf_counter()
+        rows = super().fetchmany(self.arraysize if size is None else size)
+        self._track(started, len(rows), done=not rows)
+        return rows
+
+    def fetchall(self):
+        started = time.perf_counter()
+        rows = super().fetchall()
+        self._track(started, len(rows), done=True)
+        return rows
+
+    def __next__(self):
+        started = time.perf_counter()
+        try:
+            row = super().__next__()
+        except StopIteration:
+            self._track(started, 0, done=True)
+            raise
+        self._track(started, 1)
+        return row
+
+    def close(self):
+        self._finish()
+        super().close()
+
+    def __del__(self):
+        try:
+            self._finish()
+        except Exception:
+            pass
+
+
+class ProfilingConnection(sqlite3.Connection):
+    """Connection whose cursors (including execute shortcuts) are profiled."""
+
+    def cursor(self, factory=ProfilingCursor):
+        return super().cursor(factory)
+
+    def execute(self, sql, parameters=()):
+        return self.cursor().execute(sql, parameters)
+
+    def executemany(self, sql, seq_of_parameters):
+        return self.cursor().executemany(sql, seq_of_parameters)
+
+
+_profiler: Optional[QueryProfiler] = None
+
+
+def profiling_enabled() -> bool:
+    """Check whether profiling was requested through the environment."""
+    return os.environ.get('PRICE_DB_PROFILE', '').lower() in ('1', 'true', 'yes')
+
+
+def get_profiler() -> QueryProfiler:
+    """Get the process-wide profiler, creating it on first use."""
+    global _profiler
+    if _profiler is None:
+        slow_ms = float(os.environ.get('PRICE_DB_SLOW_MS', DEFAULT_SLOW_MS))
+        _profiler = QueryProfiler(slow_ms=slow_ms)
+        atexit.register(_profiler.report)
+    return _profiler
+
+
+def connect(db_path: str, profile: Optional[bool] = None, **kwargs) -> sqlite3.Connection:
+    """
+    Open a SQLite connection, profiled if requested.
+
+    Args:
+        db_path: Path to the database file
+        profile: Force profiling on/off (defaults to PRICE_DB_PROFILE)
+        **kwargs: Passed through to sqlite3.connect
+
+    Returns:
+        sqlite3.Connection (a ProfilingConnection when profiling)
+    """
+    if profile is None:
+        profile = profiling_enabled()
+    if profile:
+        get_profiler()
+        kwargs['factory'] = ProfilingConnection
+    return sqlite3.connect(db_path, **kwargs)
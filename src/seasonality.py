@@ -0,0 +1,477 @@
+"""
+Seasonality: when do prices reliably drop?
+
+For every product × retailer series, daily-resampled prices (see
+src/analytics.py) are divided by a centered moving average - 365 days for
+the yearly pattern, 7 days for the weekly one - so trends and price levels
+cancel out and only the recurring shape remains. Then:
+
+    Calendar aggregation   Mean relative price per calendar month (each
+                           year's month weighted equally; months need 14
+                           observed days) and per weekday. Months at least
+                           2% below typical, and weekdays at least 1% below,
+                           are the low season (at most 3 months, 2 weekdays).
+    Confidence             How often the low months / weekdays were actually
+                           below typical in each year / week they were seen,
+                           scaled down until two years (eight weeks) of
+                           history back it up.
+    Autocorrelation        At candidate cycle lengths (CYCLE_LAGS days); the
+                           strongest lag that is a peak (stronger than at
+                           half the lag, which rules out plain persistence)
+                           with ACF >= 0.3 is reported as the series' cycle.
+
+Per category, the series' monthly and weekday profiles are averaged
+(weighted by days of history), and confidence is the share of the
+category's series that agree.
+
+Results live in series_seasonality and category_seasonality. Refreshes
+recompute only products with new rows, then the categories they belong
+to; each refresh is logged in seasonality_runs with the price cursor for
+the next one. Dashboard payloads carry the stored result as lowSeason, so
+nothing is computed per request.
+
+Usage:
+    python -m src.seasonality refresh [db_path]   # recompute changed series
+    python -m src.seasonality full [db_path]      # recompute everything
+"""
+import json
+import sqlite3
+import sys
+import time
+from datetime import date, datetime
+from itertools import accumulate, chain, islice, repeat
+from operator import mul, sub, truediv
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from src.analytics import DailySeries, changed_products, fill_days, iter_daily_series
+from src.history_blocks import iter_history_rows, latest_cursor
+
+CREATE_SERIES_TABLE = """
+    CREATE TABLE IF NOT EXISTS series_seasonality (
+        product_id TEXT NOT NULL,
+        retailer_id TEXT NOT NULL,
+        days INTEGER NOT NULL,
+        month_index TEXT NOT NULL,
+        weekday_index TEXT NOT NULL,
+        low_months TEXT NOT NULL,
+        low_weekdays TEXT NOT NULL,
+        month_confidence REAL,
+        weekday_confidence REAL,
+        cycle_days INTEGER,
+        cycle_strength REAL,
+        cursor INTEGER NOT NULL,
+        computed_at TEXT NOT NULL,
+        PRIMARY KEY (product_id, retailer_id)
+    )
+"""
+
+CREATE_CATEGORY_TABLE = """
+    CREATE TABLE IF NOT EXISTS category_seasonality (
+        category TEXT PRIMARY KEY,
+        series INTEGER NOT NULL,
+        month_index TEXT NOT NULL,
+        weekday_index TEXT NOT NULL,
+        low_months TEXT NOT NULL,
+        low_weekdays TEXT NOT NULL,
+        month_confidence REAL,
+        weekday_confidence REAL,
+        computed_at TEXT NOT NULL
+    )
+"""
+
+CREATE_RUNS_TABLE = """
+    CREATE TABLE IF NOT EXISTS seasonality_runs (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        cursor INTEGER NOT NULL,
+        full INTEGER NOT NULL,
+        series INTEGER NOT NULL,
+        computed_at TEXT NOT NULL
+    )
+"""
+
+YEAR_WINDOW = 365
+WEEK_WINDOW = 7
+MIN_MONTH_DAYS = 14
+MIN_MONTHS = 3
+MIN_WEEKS = 4
+MONTH_THRESHOLD = 0.02
+WEEKDAY_THRESHOLD = 0.01
+MAX_LOW_MONTHS = 3
+MAX_LOW_WEEKDAYS = 2
+# History that earns full confidence
+FULL_CONFIDENCE_YEARS = 2
+FULL_CONFIDENCE_WEEKS = 8
+# Least confidence for a low season to be shown on the dashboard
+MIN_CONFIDENCE = 0.5
+CYCLE_LAGS = (7, 14, 28, 30, 91, 182, 365)
+MIN_CYCLE_ACF = 0.3
+BATCH_SIZE = 1000
+
+MONTH_NAMES = ('Jan', 'Feb', 'Mar', 'Apr', 'May', 'Jun',
+               'Jul', 'Aug', 'Sep', 'Oct', 'Nov', 'Dec')
+WEEKDAY_NAMES = ('Mon', 'Tue', 'Wed', 'Thu', 'Fri', 'Sat', 'Sun')
+
+SERIES_COLUMNS = ('product_id', 'retailer_id', 'days', 'month_index', 'weekday_index',
+                  'low_months', 'low_weekdays', 'month_confidence', 'weekday_confidence',
+                  'cycle_days', 'cycle_strength', 'cursor', 'computed_at')
+CATEGORY_COLUMNS = ('category', 'series', 'month_index', 'weekday_index', 'low_months',
+                    'low_weekdays', 'month_confidence', 'weekday_confidence', 'computed_at')
+
+
+# ---------------------------------------------------------------------------
+# Per-series analysis
+# ---------------------------------------------------------------------------
+
+def _relative(values: List[float], window: int) -> List[float]:
+    """Each value divided by the mean of a centered window (clipped at the ends)."""
+    n = len(values)
+    half = window // 2
+    prefix = list(accumulate(values, initial=0.0))
+    # Window bounds [lo, hi) for each position
+    his = list(islice(chain(range(half + 1, n + 1), repeat(n, half)), n))
+    los = list(islice(chain(repeat(0, half), range(n)), n))
+    sums = map(sub, map(prefix.__getitem__, his), map(prefix.__getitem__, los))
+    means = map(truediv, sums, map(sub, his, los))
+    return [value / mean if mean else 1.0 for value, mean in zip(values, means)]
+
+
+def _month_segments(first_day: int, n: int) -> Iterable[Tuple[int, int, int, int]]:
+    """(year, month, start index, end index) of each calendar month in n days."""
+    start = 0
+    while start < n:
+        current = date.fromordinal(first_day + start)
+        following = date(current.year + current.month // 12, current.month % 12 + 1, 1)
+        end = min(n, following.toordinal() - first_day)
+        yield current.year, current.month, start, end
+        start = end
+
+
+def _low(index: List[Optional[float]], threshold: float, limit: int) -> List[int]:
+    """Positions whose index is at least `threshold` below 1, lowest first."""
+    low = [i for i, value in enumerate(index) if value is not None and value <= 1 - threshold]
+    return sorted(low, key=lambda i: index[i])[:limit]
+
+
+def _acf(deviations: List[float], lag: int, energy: float) -> float:
+    return sum(map(mul, deviations, deviations[lag:])) / energy
+
+
+def _cycle(deviations: List[float]) -> Tuple[Optional[int], Optional[float]]:
+    """Strongest autocorrelation peak among CYCLE_LAGS: (days, ACF) or (None, None)."""
+    energy = sum(map(mul, deviations, deviations))
+    best = (None, None)
+    if not energy:
+        return best
+    for lag in CYCLE_LAGS:
+        if len(deviations) < 2 * lag:
+            break
+        strength = _acf(deviations, lag, energy)
+        if (strength >= MIN_CYCLE_ACF and strength > _acf(deviations, lag // 2, energy)
+                and (best[1] is None or strength > best[1])):
+            best = (lag, strength)
+    return best
+
+
+def _rounded(values: List[Optional[float]]) -> List[Optional[float]]:
+    return [round(v, 4) if v is not None else None for v in values]
+
+
+def analyze_series(series: DailySeries) -> tuple:
+    """
+    Seasonality of one daily series.
+
+    Returns:
+        (days, month_index, weekday_index, low_months, low_weekdays,
+        month_confidence, weekday_confidence, cycle_days, cycle_strength);
+        indexes are lists of mean relative prices (None where not
+        observed), months numbered 1-12 and weekdays 0-6 (Monday first)
+    """
+    days, closes = series
+    first_day = days[0]
+    filled = fill_days(days, closes)
+    n = len(filled)
+
+    # Calendar months, each year's month weighted equally
+    yearly = _relative(filled, YEAR_WINDOW)
+    month_means: Dict[int, Dict[int, float]] = {}
+    for year, month, start, end in _month_segments(first_day, n):
+        if end - start >= MIN_MONTH_DAYS:
+            month_means.setdefault(month, {})[year] = sum(yearly[start:end]) / (end - start)
+    month_index = [sum(month_means[m].values()) / len(month_means[m]) if m in month_means else None
+                   for m in range(1, 13)]
+    low_months, month_confidence = [], None
+    if len(month_means) >= MIN_MONTHS:
+        low_months = [i + 1 for i in _low(month_index, MONTH_THRESHOLD, MAX_LOW_MONTHS)]
+        if low_months:
+            seen = [mean for m in low_months for mean in month_means[m].values()]
+            agreeing = sum(1 for mean in seen if mean < 1) / len(seen)
+            support = min(1.0, len(seen) / (FULL_CONFIDENCE_YEARS * len(low_months)))
+            month_confidence = round(agreeing * support, 3)
+
+    # Weekdays, relative to the surrounding week; ordinal 1 was a Monday
+    weekday_index = [None] * 7
+    low_weekdays, weekday_confidence = [], None
+    if n >= MIN_WEEKS * 7:
+        weekly = _relative(filled, WEEK_WINDOW)
+        by_weekday = [weekly[(w - (first_day - 1)) % 7::7] for w in range(7)]
+        weekday_index = [sum(values) / len(values) for values in by_weekday]
+        low_weekdays = _low(weekday_index, WEEKDAY_THRESHOLD, MAX_LOW_WEEKDAYS)
+        if low_weekdays:
+            seen = [value for w in low_weekdays for value in by_weekday[w]]
+            agreeing = sum(1 for value in seen if value < 1) / len(seen)
+            support = min(1.0, n / 7 / FULL_CONFIDENCE_WEEKS)
+            weekday_confidence = round(agreeing * support, 3)
+
+    cycle_days, cycle_strength = _cycle([value - 1.0 for value in yearly])
+    return (n, _rounded(month_index), _rounded(weekday_index), low_months, low_weekdays,
+            month_confidence, weekday_confidence, cycle_days,
+            round(cycle_strength, 3) if cycle_strength is not None else None)
+
+
+def combine_profiles(profiles: List[Tuple[int, List[Optional[float]], List[Optional[float]],
+                                          List[int], List[int]]]) -> tuple:
+    """
+    Category seasonality from its series' profiles.
+
+    Args:
+        profiles: (days, month_index, weekday_index, low_months, low_weekdays)
+                  per series
+
+    Returns:
+        (month_index, weekday_index, low_months, low_weekdays,
+        month_confidence, weekday_confidence)
+    """
+    def weighted(position, size):
+        index = []
+        for i in range(size):
+            pairs = [(p[0], p[position][i]) for p in profiles if p[position][i] is not None]
+            weight = sum(days for days, _ in pairs)
+            index.append(sum(days * value for days, value in pairs) / weight if weight else None)
+        return index
+
+    def agreement(low, position, offset):
+        # Share of series observing each low bucket that also had it low
+        shares = []
+        for bucket in low:
+            observed = [p for p in profiles if p[position][bucket - offset] is not None]
+            shares.append(sum(1 for p in observed if bucket in p[position + 2]) / len(observed))
+        return round(sum(shares) / len(shares), 3) if shares else None
+
+    month_index = weighted(1, 12)
+    weekday_index = weighted(2, 7)
+    covered = sum(1 for value in month_index if value is not None)
+    low_months = ([i + 1 for i in _low(month_index, MONTH_THRESHOLD, MAX_LOW_MONTHS)]
+                  if covered >= MIN_MONTHS else [])
+    low_weekdays = _low(weekday_index, WEEKDAY_THRESHOLD, MAX_LOW_WEEKDAYS)
+    return (_rounded(month_index), _rounded(weekday_index), low_months, low_weekdays,
+            agreement(low_months, 1, 1), agreement(low_weekdays, 2, 0))
+
+
+# ---------------------------------------------------------------------------
+# Storage
+# ---------------------------------------------------------------------------
+
+def last_run_cursor(conn: sqlite3.Connection) -> Optional[int]:
+    """Price cursor of the last refresh (None before the first)."""
+    row = conn.execute("SELECT cursor FROM seasonality_runs ORDER BY id DESC LIMIT 1").fetchone()
+    return row[0] if row else None
+
+
+def _insert(table: str, columns: Tuple[str, ...]) -> str:
+    return f"""
+        INSERT OR REPLACE INTO {table} ({', '.join(columns)})
+        VALUES ({', '.join('?' * len(columns))})
+    """
+
+
+def _refresh_categories(conn: sqlite3.Connection, categories: Iterable[str], computed_at: str) -> int:
+    """Recombine the given categories from stored series results."""
+    written = 0
+    for category in categories:
+        cursor = conn.cursor()
+        cursor.row_factory = None
+        profiles = [
+            (days, json.loads(months), json.loads(weekdays), json.loads(low_months), json.loads(low_weekdays))
+            for days, months, weekdays, low_months, low_weekdays in cursor.execute("""
+                SELECT s.days, s.month_index, s.weekday_index, s.low_months, s.low_weekdays
+                FROM series_seasonality s
+                JOIN products p ON p.id = s.product_id
+                WHERE p.category = ?
+            """, (category,))
+        ]
+        if not profiles:
+            conn.execute("DELETE FROM category_seasonality WHERE category = ?", (category,))
+            continue
+        month_index, weekday_index, low_months, low_weekdays, month_conf, weekday_conf = \
+            combine_profiles(profiles)
+        conn.execute(_insert('category_seasonality', CATEGORY_COLUMNS), (
+            category, len(profiles), json.dumps(month_index), json.dumps(weekday_index),
+            json.dumps(low_months), json.dumps(low_weekdays), month_conf, weekday_conf, computed_at))
+        written += 1
+    return written
+
+
+def refresh_seasonality(conn: sqlite3.Connection, full: bool = False) -> dict:
+    """
+    Recompute seasonality for series with new data, then their categories.
+
+    Args:
+        conn: Writable database connection
+        full: Recompute every series and category
+
+    Returns:
+        Summary dict with 'series', 'categories', 'full' and 'seconds'
+    """
+    started = time.perf_counter()
+    computed_at = datetime.now().isoformat()
+    cursor = latest_cursor(conn)
+    previous = last_run_cursor(conn)
+    full = full or previous is None
+
+    if full:
+        product_ids = None
+        rows = iter_history_rows(conn)
+    else:
+        product_ids = changed_products(conn, previous)
+        rows = (row for product_id in product_ids for row in iter_history_rows(conn, product_id))
+
+    insert = _insert('series_seasonality', SERIES_COLUMNS)
+    written = 0
+    seen_products = set()
+    batch = []
+    for product_id, retailer_id, series in iter_daily_series(rows):
+        seen_products.add(product_id)
+        n, month_index, weekday_index, low_months, low_weekdays, *rest = analyze_series(series)
+        batch.append((product_id, retailer_id, n, json.dumps(month_index), json.dumps(weekday_index),
+                      json.dumps(low_months), json.dumps(low_weekdays), *rest, cursor, computed_at))
+        if len(batch) >= BATCH_SIZE:
+            conn.executemany(insert, batch)
+            conn.commit()
+            written += len(batch)
+            batch.clear()
+    conn.executemany(insert, batch)
+    written += len(batch)
+
+    # Drop series that no longer have rows, then recombine affected categories
+    if product_ids is None:
+        conn.execute("DELETE FROM series_seasonality WHERE computed_at != ?", (computed_at,))
+        conn.execute("DELETE FROM category_seasonality")
+        categories = {row[0] for row in conn.execute(
+            "SELECT DISTINCT category FROM products WHERE category IS NOT NULL")}
+    else:
+        for product_id in product_ids:
+            conn.execute("DELETE FROM series_seasonality WHERE product_id = ? AND computed_at != ?",
+                         (product_id, computed_at))
+        changed = set(product_ids)
+        categories = {row[1] for row in conn.execute("SELECT id, category FROM products")
+                      if row[0] in changed and row[1] is not None}
+    category_count = _refresh_categories(conn, sorted(categories), computed_at)
+
+    if full or written or cursor != previous:
+        conn.execute("""
+            INSERT INTO seasonality_runs (cursor, full, series, computed_at)
+            VALUES (?, ?, ?, ?)
+        """, (cursor, int(full), written, computed_at))
+    conn.commit()
+
+    return {
+        'series': written,
+        'products': len(seen_products),
+        'categories': category_count,
+        'full': full,
+        'seconds': time.perf_counter() - started,
+    }
+
+
+def describe_season(months: List[int], weekdays: List[int]) -> str:
+    """Human-readable low season, e.g. 'Nov, Dec · Tue'."""
+    parts = []
+    if months:
+        parts.append(', '.join(MONTH_NAMES[m - 1] for m in sorted(months)))
+    if weekdays:
+        parts.append(', '.join(WEEKDAY_NAMES[w] for w in sorted(weekdays)))
+    return ' · '.join(parts)
+
+
+def low_seasons(conn: sqlite3.Connection, product_id: Optional[str] = None) -> Dict[str, dict]:
+    """
+    Each product's typical low season, for dashboard payloads.
+
+    Uses the product's most confident series, falling back to its
+    category's result when no series has a low season of its own. Low
+    months or weekdays below MIN_CONFIDENCE are left out.
+
+    Returns:
+        {product_id: {'months', 'weekdays', 'monthConfidence',
+        'weekdayConfidence', 'retailer', 'source', 'label'}}
+    """
+    where = "WHERE product_id = ?" if product_id is not None else ""
+    params = (product_id,) if product_id is not None else ()
+    cursor = conn.cursor()
+    cursor.row_factory = None
+
+    def confident(months, weekdays, month_conf, weekday_conf):
+        if month_conf is None or month_conf < MIN_CONFIDENCE:
+            months, month_conf = '[]', None
+        if weekday_conf is None or weekday_conf < MIN_CONFIDENCE:
+            weekdays, weekday_conf = '[]', None
+        return json.loads(months), json.loads(weekdays), month_conf, weekday_conf
+
+    best = {}
+    for pid, retailer, *profile in cursor.execute(f"""
+        SELECT product_id, retailer_id, low_months, low_weekdays, month_confidence, weekday_confidence
+        FROM series_seasonality {where}
+    """, params):
+        months, weekdays, month_conf, weekday_conf = confident(*profile)
+        if month_conf is None and weekday_conf is None:
+            continue
+        rank = (month_conf or 0.0, weekday_conf or 0.0)
+        if pid not in best or rank > best[pid][0]:
+            best[pid] = (rank, retailer, 'series', months, weekdays, month_conf, weekday_conf)
+
+    categories = {}
+    for category, *profile in cursor.execute("""
+        SELECT category, low_months, low_weekdays, month_confidence, weekday_confidence
+        FROM category_seasonality
+    """):
+        months, weekdays, month_conf, weekday_conf = confident(*profile)
+        if month_conf is not None or weekday_conf is not None:
+            categories[category] = (months, weekdays, month_conf, weekday_conf)
+    if categories:
+        product_where = "WHERE id = ?" if product_id is not None else ""
+        for pid, category in cursor.execute(f"SELECT id, category FROM products {product_where}", params):
+            if pid not in best and category in categories:
+                best[pid] = (None, None, 'category', *categories[category])
+
+    return {
+        pid: {
+            'months': months,
+            'weekdays': weekdays,
+            'monthConfidence': month_conf,
+            'weekdayConfidence': weekday_conf,
+            'retailer': retailer,
+            'source': source,
+            'label': describe_season(months, weekdays),
+        }
+        for pid, (_, retailer, source, months, weekdays, month_conf, weekday_conf) in best.items()
+    }
+
+
+def main():
+    """CLI entry point."""
+    from src.database import PriceDatabase
+
+    command = sys.argv[1] if len(sys.argv) > 1 else 'refresh'
+    if command not in ('refresh', 'full'):
+        print("Usage: python -m src.seasonality [refresh|full] [db_path]")
+        return
+    db = PriceDatabase(sys.argv[2] if len(sys.argv) > 2 else "data/prices.db")
+    summary = refresh_seasonality(db.conn, command == 'full')
+    db.close()
+    kind = "full" if summary['full'] else "incremental"
+    print(f"✓ Seasonality ({kind}): {summary['series']:,} series, {summary['categories']} "
+          f"categor{'y' if summary['categories'] == 1 else 'ies'} in {summary['seconds']:.2f}s")
+
+
+if __name__ == "__main__":
+    main()
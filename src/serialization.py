@@ -0,0 +1,141 @@
+"""
+Compact JSON serialization for API responses and exports.
+
+Two things make price payloads large: every chart point repeats its keys
+and a 26-character ISO date, and exports were pretty-printed. This module
+provides:
+
+    dumps()          Compact JSON bytes, using orjson when it is installed
+    compress()       gzip / brotli (optional `brotli` package) encodings
+    columnar()       A list of point dicts as parallel arrays, with dates
+                     as epoch milliseconds
+
+Timestamps in the database are naive local times. Epoch values encode them
+as if they were UTC, so they round-trip exactly to the same wall-clock
+time on any server; clients should display them in UTC.
+
+Run `python -m src.serialization [db_path]` to compare sizes and encode
+times of the row and columnar formats on a real database.
+"""
+import gzip
+import json
+import sys
+import time
+from datetime import datetime, timezone
+from typing import Dict, Iterable, List
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+FORMATS = ('rows', 'columnar')
+GZIP_LEVEL = 6
+BROTLI_QUALITY = 5
+
+_EPOCH = datetime(1970, 1, 1)
+
+
+def dumps(obj, pretty: bool = False) -> bytes:
+    """Serialize to UTF-8 JSON bytes, compact unless `pretty`."""
+    if orjson is not None:
+        return orjson.dumps(obj, option=orjson.OPT_INDENT_2 if pretty else 0)
+    if pretty:
+        return json.dumps(obj, indent=2).encode('utf-8')
+    return json.dumps(obj, separators=(',', ':')).encode('utf-8')
+
+
+def encodings() -> List[str]:
+    """Content encodings compress() supports here, best first."""
+    return (['br'] if brotli is not None else []) + ['gzip']
+
+
+def compress(body: bytes, encoding: str) -> bytes:
+    """Compress a body with 'gzip' or 'br'."""
+    if encoding == 'gzip':
+        return gzip.compress(body, GZIP_LEVEL)
+    if encoding == 'br' and brotli is not None:
+        return brotli.compress(body, quality=BROTLI_QUALITY)
+    raise ValueError(f"Unsupported encoding: {encoding}")
+
+
+def epoch_ms(timestamp) -> int:
+    """Naive ISO timestamp (or datetime) as epoch milliseconds, read as UTC."""
+    if isinstance(timestamp, str):
+        timestamp = datetime.fromisoformat(timestamp)
+    if timestamp.tzinfo is not None:
+        timestamp = timestamp.astimezone(timezone.utc).replace(tzinfo=None)
+    delta = timestamp - _EPOCH
+    return (delta.days * 86400 + delta.seconds) * 1000 + delta.microseconds // 1000
+
+
+def columnar(points: Iterable[dict], time_key: str = 'date') -> Dict[str, list]:
+    """
+    Turn a list of point dicts into parallel arrays.
+
+    The time field becomes 't' (epoch milliseconds); every other field
+    keeps its name.
+
+    >>> columnar([{'date': '2025-01-01T00:00:00', 'price': 9.99}])
+    {'t': [1735689600000], 'price': [9.99]}
+    """
+    points = list(points)
+    columns = {'t': [epoch_ms(p[time_key]) for p in points]}
+    for key in (points[0] if points else {}):
+        if key != time_key:
+            columns[key] = [p[key] for p in points]
+    return columns
+
+
+# ---------------------------------------------------------------------------
+# Measurement
+# ---------------------------------------------------------------------------
+
+def _measure(label: str, build, repeat: int = 3) -> dict:
+    """Encode a payload with each serializer and report bytes and times."""
+    payload = build()
+    results = []
+    for name, encode in (('json indent=2', lambda o: json.dumps(o, indent=2).encode('utf-8')),
+                         ('json compact', lambda o: json.dumps(o, separators=(',', ':')).encode('utf-8')),
+                         ('dumps()', dumps)):
+        started = time.perf_counter()
+        for _ in range(repeat):
+            body = encode(payload)
+        seconds = (time.perf_counter() - started) / repeat
+        results.append((name, len(body), seconds))
+
+    sizes = {encoding: len(compress(body, encoding)) for encoding in encodings()}
+    print(f"\n{label}")
+    for name, size, seconds in results:
+        print(f"  {name:<14} {size:>12,} bytes  {seconds * 1000:8.1f} ms")
+    for encoding, size in sizes.items():
+        print(f"  dumps() + {encoding:<4} {size:>12,} bytes")
+    return {'label': label, 'encoders': results, 'compressed': sizes}
+
+
+def main():
+    """Compare row and columnar payload sizes and encode times."""
+    from src.dashboard_data import build_dashboard_data
+    from src.database import PriceDatabase
+    from src.export import build_export
+
+    db_path = sys.argv[1] if len(sys.argv) > 1 else "data/prices.db"
+    db = PriceDatabase(db_path)
+    print(f"Database: {db_path} (fast encoder: {'orjson' if orjson else 'none, using json'})")
+
+    for fmt in FORMATS:
+        columnar_charts = fmt == 'columnar'
+        _measure(f"/api/dashboard-data ({fmt})",
+                 lambda: build_dashboard_data(db.conn, columnar=columnar_charts))
+    for fmt in FORMATS:
+        _measure(f"prices_export.json ({fmt})", lambda: build_export(db, fmt))
+    db.close()
+
+
+if __name__ == "__main__":
+    main()
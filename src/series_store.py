@@ -0,0 +1,317 @@
+"""
+In-memory price series for the dashboard API process.
+
+Without it, every request that builds charts or stats re-reads and
+re-groups price_history. With the store enabled (DASHBOARD_SERIES_STORE=1
+for dashboard/api.py), each process loads every product × retailer series
+once into two compact sorted arrays - epoch microseconds (array('q')) and
+prices (array('d')), about 16 bytes per observation - plus running totals
+and the first-seen high and low. Before serving, it tails price_history (and
+any blocks sealed since) for rowids above the last one it has seen, so it
+stays current while the collector writes from another process.
+
+    latest price, summary stats    O(1)
+    date range slice               O(log n) to locate, O(k) to copy
+    new observation                append (insert if it was backfilled)
+
+Timestamps are rendered back in canonical ISO form; the rare stored
+timestamp that doesn't round-trip is kept verbatim.
+
+Run `python -m src.series_store [db_path]` to report load time, memory and
+query times on a real database.
+"""
+import sqlite3
+import sys
+import threading
+import time
+from array import array
+from bisect import bisect_left, bisect_right
+from datetime import datetime, timedelta, timezone
+from typing import Dict, List, Optional, Tuple
+
+from src.downsample import downsample_prices
+from src.history_blocks import EPOCH, ONE_MICROSECOND, decode_block, iter_history_rows, latest_cursor
+
+# Resolution of an ISO string by length, for inclusive end bounds
+_END_STEPS = {
+    10: timedelta(days=1),      # 2025-01-31
+    13: timedelta(hours=1),     # 2025-01-31T10
+    16: timedelta(minutes=1),   # 2025-01-31T10:30
+    19: timedelta(seconds=1),   # 2025-01-31T10:30:00
+}
+
+
+def _parse(timestamp: str) -> datetime:
+    dt = datetime.fromisoformat(timestamp)
+    if dt.tzinfo is not None:
+        dt = dt.astimezone(timezone.utc).replace(tzinfo=None)
+    return dt
+
+
+def _micros(dt: datetime) -> int:
+    return (dt - EPOCH) // ONE_MICROSECOND
+
+
+def _iso(micros: int) -> str:
+    return (EPOCH + timedelta(microseconds=micros)).isoformat()
+
+
+def range_bounds(start: Optional[str], end: Optional[str]) -> Tuple[Optional[int], Optional[int]]:
+    """
+    Epoch-microsecond bounds [low, high) matching downsample.in_range().
+
+    An `end` covers everything it is a prefix of: a date covers that whole
+    day, a minute the whole minute, and so on.
+    """
+    low = _micros(_parse(start)) if start else None
+    high = None
+    if end:
+        step = _END_STEPS.get(len(end))
+        if step is None:
+            fraction_digits = max(0, len(end) - 20)
+            step = timedelta(microseconds=10 ** max(0, 6 - fraction_digits))
+        high = _micros(_parse(end) + step)
+    return low, high
+
+
+class StoredSeries:
+    """
+    One product × retailer series: sorted times and prices plus running stats.
+
+    Exposes the attributes build_product_data() reads from SeriesStats.
+    """
+    __slots__ = ('retailer_id', 'times', 'prices', 'high', 'high_time',
+                 'low', 'low_time', 'total', 'odd_dates')
+
+    def __init__(self, retailer_id: str):
+        self.retailer_id = retailer_id
+        self.times = array('q')
+        self.prices = array('d')
+        self.high = self.low = None
+        self.high_time = self.low_time = None
+        self.total = 0.0
+        self.odd_dates = None  # micros -> stored text, for non-canonical timestamps
+
+    def add(self, timestamp: str, price: float):
+        """Add an observation, keeping time order."""
+        micros = _micros(_parse(timestamp))
+        if _iso(micros) != timestamp:
+            if self.odd_dates is None:
+                self.odd_dates = {}
+            self.odd_dates[micros] = timestamp
+
+        times = self.times
+        if not times or micros >= times[-1]:
+            times.append(micros)
+            self.prices.append(price)
+        else:
+            index = bisect_right(times, micros)
+            times.insert(index, micros)
+            self.prices.insert(index, price)
+
+        # Ties keep the earliest date, like SeriesStats
+        if self.high is None or price > self.high or (price == self.high and micros < self.high_time):
+            self.high, self.high_time = price, micros
+        if self.low is None or price < self.low or (price == self.low and micros < self.low_time):
+            self.low, self.low_time = price, micros
+        self.total += price
+
+    def date(self, micros: int) -> str:
+        if self.odd_dates and micros in self.odd_dates:
+            return self.odd_dates[micros]
+        return _iso(micros)
+
+    @property
+    def count(self) -> int:
+        return len(self.times)
+
+    @property
+    def avg(self) -> float:
+        return self.total / len(self.times)
+
+    @property
+    def high_date(self) -> str:
+        return self.date(self.high_time)
+
+    @property
+    def low_date(self) -> str:
+        return self.date(self.low_time)
+
+    @property
+    def first_date(self) -> str:
+        return self.date(self.times[0])
+
+    @property
+    def latest(self) -> Tuple[str, float]:
+        """(date, price) of the newest observation."""
+        return self.date(self.times[-1]), self.prices[-1]
+
+    def index_range(self, start: Optional[str] = None, end: Optional[str] = None) -> Tuple[int, int]:
+        """Slice indices of the observations within an inclusive date range."""
+        low, high = range_bounds(start, end)
+        lo = bisect_left(self.times, low) if low is not None else 0
+        hi = bisect_left(self.times, high) if high is not None else len(self.times)
+        return lo, max(lo, hi)
+
+    def chart(self, points: Optional[int] = None, start: Optional[str] = None,
+              end: Optional[str] = None) -> list:
+        """Chart points ({'date', 'price'}) within a range, downsampled to `points`."""
+        lo, hi = self.index_range(start, end)
+        prices = [{'date': self.date(t), 'price': p}
+                  for t, p in zip(self.times[lo:hi], self.prices[lo:hi])]
+        if points:
+            prices = downsample_prices(prices, points)
+        return prices
+
+    def memory_bytes(self) -> int:
+        size = sys.getsizeof(self) + sys.getsizeof(self.times) + sys.getsizeof(self.prices)
+        if self.odd_dates:
+            size += sys.getsizeof(self.odd_dates) + sum(sys.getsizeof(s) for s in self.odd_dates.values())
+        return size
+
+
+class SeriesStore:
+    """
+    Every price series in memory, kept current by tailing new rowids.
+
+    Callers hold `lock` while refreshing and reading, since request
+    threads share one store.
+    """
+
+    def __init__(self):
+        self.products: Dict[str, Dict[str, StoredSeries]] = {}
+        self.cursor = 0
+        self.observations = 0
+        self.load_seconds = 0.0
+        self.lock = threading.RLock()
+
+    @classmethod
+    def load(cls, conn: sqlite3.Connection) -> 'SeriesStore':
+        """Load all history (rows and sealed blocks) from a connection."""
+        store = cls()
+        started = time.perf_counter()
+        # Rows committed during the scan are picked up by the first refresh()
+        store.cursor = latest_cursor(conn)
+        for row in iter_history_rows(conn):
+            if row[0] <= store.cursor:
+                store._add(row[1], row[2], row[3], row[4])
+        store.load_seconds = time.perf_counter() - started
+        return store
+
+    def _add(self, product_id: str, retailer_id: str, price: float, timestamp: str):
+        retailers = self.products.get(product_id)
+        if retailers is None:
+            retailers = self.products[product_id] = {}
+        series = retailers.get(retailer_id)
+        if series is None:
+            series = retailers[retailer_id] = StoredSeries(retailer_id)
+        series.add(timestamp, price)
+        self.observations += 1
+
+    def refresh(self, conn: sqlite3.Connection) -> int:
+        """
+        Add observations inserted since the last refresh; returns how many.
+
+        Rows sealed into blocks since then are no longer in price_history,
+        so blocks with newer rows are decoded too, keeping only those rows.
+        """
+        with self.lock:
+            cursor = conn.cursor()
+            cursor.row_factory = None
+            rows = {row[0]: row for row in cursor.execute("""
+                SELECT id, product_id, retailer_id, price, timestamp
+                FROM price_history
+                WHERE id > ?
+            """, (self.cursor,))}
+            # A row sealed between the two reads is in both; keyed by id it is added once
+            blocks = cursor.execute("""
+                SELECT product_id, retailer_id, payload
+                FROM price_history_blocks
+                WHERE last_id > ?
+            """, (self.cursor,)).fetchall()
+            for product_id, retailer_id, payload in blocks:
+                for row in decode_block(product_id, retailer_id, payload):
+                    if row[0] > self.cursor:
+                        rows[row[0]] = row[:5]
+            for row_id in sorted(rows):
+                _, product_id, retailer_id, price, timestamp = rows[row_id]
+                self._add(product_id, retailer_id, price, timestamp)
+                self.cursor = row_id
+            return len(rows)
+
+    def product_series(self, product_id: str) -> List[StoredSeries]:
+        """A product's series, or an empty list."""
+        return list(self.products.get(product_id, {}).values())
+
+    def series_by_product(self) -> Dict[str, List[StoredSeries]]:
+        """Same shape as dashboard_data.aggregate_series()."""
+        return {product_id: list(retailers.values())
+                for product_id, retailers in self.products.items()}
+
+    def totals(self) -> Dict[str, Dict[str, list]]:
+        """Same shape as dashboard_data.series_totals()."""
+        return {product_id: {retailer_id: [s.total, s.count] for retailer_id, s in retailers.items()}
+                for product_id, retailers in self.products.items()}
+
+    def memory_bytes(self) -> int:
+        """Approximate memory held by the series and their indexes."""
+        size = sys.getsizeof(self.products)
+        for retailers in self.products.values():
+            size += sys.getsizeof(retailers)
+            size += sum(series.memory_bytes() for series in retailers.values())
+        return size
+
+    def describe(self) -> dict:
+        """Load time and memory, for logs and reports."""
+        memory = self.memory_bytes()
+        return {
+            'series': sum(len(r) for r in self.products.values()),
+            'observations': self.observations,
+            'loadSeconds': self.load_seconds,
+            'memoryBytes': memory,
+            'bytesPerObservation': memory / self.observations if self.observations else 0,
+            'cursor': self.cursor,
+        }
+
+
+def main():
+    """Report load time, memory and query times against the SQL path."""
+    from src.dashboard_data import build_product_detail
+    from src.database import PriceDatabase
+
+    db_path = sys.argv[1] if len(sys.argv) > 1 else "data/prices.db"
+    db = PriceDatabase(db_path)
+    store = SeriesStore.load(db.conn)
+    info = store.describe()
+    per_million = 1_000_000 / info['observations'] if info['observations'] else 0
+    print(f"Database: {db_path}")
+    print(f"  {info['observations']:,} observations in {info['series']:,} series")
+    print(f"  Load: {info['loadSeconds']:.2f}s ({info['loadSeconds'] * per_million:.1f}s per million)")
+    print(f"  Memory: {info['memoryBytes'] / 1e6:.1f} MB "
+          f"({info['bytesPerObservation']:.1f} bytes/observation, "
+          f"{info['memoryBytes'] * per_million / 1e6:.0f} MB per million)")
+
+    product_ids = list(store.products)
+    if product_ids:
+        started = time.perf_counter()
+        for product_id in product_ids:
+            for series in store.product_series(product_id):
+                series.latest
+                series.avg
+        latest_us = (time.perf_counter() - started) / len(product_ids) * 1e6
+        print(f"  Latest + summary: {latest_us:.1f} µs per product")
+
+        for label, build in (
+            ('SQL', lambda pid: build_product_detail(db.conn, pid, 200, columnar=True)),
+            ('store', lambda pid: build_product_detail(db.conn, pid, 200, columnar=True, store=store)),
+        ):
+            started = time.perf_counter()
+            for product_id in product_ids:
+                build(product_id)
+            per_product = (time.perf_counter() - started) / len(product_ids) * 1000
+            print(f"  Product detail ({label}): {per_product:.2f} ms per product")
+    db.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -50,8 +50,8 @@ def setup_database():
     
     # Add products to database
     print("\nSetting up products...")
+    db.add_products(products)
     for product in products:
-        db.add_product(product)
         print(f"  ✓ {product}")
     
     print("\n✓ Database setup complete!")
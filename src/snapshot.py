@@ -0,0 +1,200 @@
+"""
+Pre-rendered static snapshot of the dashboard data.
+
+Prices only change when collect_prices.py runs, so the collector calls
+write_snapshot() at the end of each run. The snapshot holds the JSON
+payloads the dashboards would otherwise request from the API:
+
+    catalog.<hash>.json              Every product summary (/api/catalog)
+    dashboard.<hash>.json            Full payload (/api/dashboard-data)
+    export.<hash>.json               prices_export.json for templates/index.html
+    products/<id>.<hash>.json        Per-product detail (/api/products/<id>), the ID
+                                     percent-encoded as in export shards
+    manifest.json                    Maps each payload to its current file
+
+Data files are named by a hash of their content, so they never change once
+written: a product whose data didn't change keeps its file, and web
+servers can cache everything but manifest.json forever. Each file is also
+written precompressed (.gz, and .br when the `brotli` package is
+installed) for servers that serve precompressed siblings. All writes go
+through a temporary file and a rename, and manifest.json is replaced last,
+so readers never see a partial snapshot. Files referenced by neither the
+new nor the previous manifest are then removed.
+
+dashboard/index.html reads the snapshot when it is present and no API is
+needed; when the API is running too it only streams changes made since
+the snapshot.
+
+Usage:
+    python -m src.snapshot [--output dashboard/snapshot] [--db data/prices.db]
+"""
+import argparse
+import hashlib
+import json
+import os
+import sys
+import time
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, Optional
+from urllib.parse import quote
+
+# Allow running as a script from src/ as well as with -m
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from src.dashboard_data import build_catalog, build_dashboard_data
+from src.database import PriceDatabase
+from src.export import build_export
+from src.serialization import compress, dumps, encodings
+
+DEFAULT_SNAPSHOT_DIR = str(Path(__file__).parent.parent / 'dashboard' / 'snapshot')
+MANIFEST = 'manifest.json'
+
+# Chart points per series; matches CHART_POINTS_BUDGET in dashboard/app.js
+SNAPSHOT_POINTS = 200
+
+_SUFFIXES = {'gzip': '.gz', 'br': '.br'}
+
+
+def _atomic_write(path: Path, body: bytes):
+    """Write a file via a temporary sibling and a rename."""
+    tmp_path = path.with_name(f'.{path.name}.tmp')
+    with open(tmp_path, 'wb') as f:
+        f.write(body)
+    os.replace(tmp_path, path)
+
+
+def _write_hashed(output_dir: Path, stem: str, payload) -> tuple:
+    """
+    Write a payload as <stem>.<hash>.json plus compressed copies.
+
+    Returns:
+        (relative file name, whether anything was written)
+    """
+    body = dumps(payload)
+    name = f"{stem}.{hashlib.sha1(body).hexdigest()[:12]}.json"
+    path = output_dir / name
+    if path.exists():
+        return name, False
+
+    path.parent.mkdir(parents=True, exist_ok=True)
+    for encoding in encodings():
+        _atomic_write(path.with_name(path.name + _SUFFIXES[encoding]), compress(body, encoding))
+    _atomic_write(path, body)
+    return name, True
+
+
+def _referenced_files(manifest: dict) -> set:
+    """Data files (and compressed copies) a manifest points at."""
+    names = list(manifest.get('files', {}).values()) + list(manifest.get('products', {}).values())
+    return {name + suffix for name in names for suffix in ('',) + tuple(_SUFFIXES.values())}
+
+
+def read_manifest(output_dir: str = DEFAULT_SNAPSHOT_DIR) -> Optional[dict]:
+    """The current snapshot manifest, or None if there is no snapshot."""
+    try:
+        with open(Path(output_dir) / MANIFEST, 'rb') as f:
+            return json.loads(f.read())
+    except (OSError, ValueError):
+        return None
+
+
+def write_snapshot(db: PriceDatabase, output_dir: str = DEFAULT_SNAPSHOT_DIR,
+                   points: int = SNAPSHOT_POINTS) -> dict:
+    """
+    Write a static snapshot of the dashboard data.
+
+    Args:
+        db: Database to read
+        output_dir: Snapshot directory (created if missing)
+        points: Chart points per retailer series
+
+    Returns:
+        The new manifest, plus 'written', 'unchanged' and 'removed' file
+        counts and 'seconds' under 'stats'
+    """
+    started = time.perf_counter()
+    output = Path(output_dir)
+    output.mkdir(parents=True, exist_ok=True)
+    previous = read_manifest(output_dir) or {}
+
+    conn = db.conn
+    catalog = build_catalog(conn, per_page=max(1, conn.execute(
+        "SELECT COUNT(*) FROM products").fetchone()[0]))
+    written = unchanged = 0
+
+    def add(stem, payload):
+        nonlocal written, unchanged
+        name, fresh = _write_hashed(output, stem, payload)
+        if fresh:
+            written += 1
+        else:
+            unchanged += 1
+        return name
+
+    # One pass over the history; each product in it is exactly what
+    # /api/products/<id> would return
+    dashboard = build_dashboard_data(conn, points, columnar=True)
+    files = {
+        'catalog': add('catalog', catalog),
+        'dashboard': add('dashboard', dashboard),
+        'export': add('export', build_export(db, 'columnar')),
+    }
+    products: Dict[str, str] = {}
+    for brand in dashboard['brands']:
+        for product in brand['products']:
+            # Quoted like export shards, so any ID is one safe file name
+            products[product['id']] = add(f"products/{quote(product['id'], safe='')}",
+                                          {'product': product})
+
+    manifest = {
+        'generatedAt': datetime.now().isoformat(),
+        'cursor': catalog['cursor'],
+        'points': points,
+        'encodings': encodings(),
+        'files': files,
+        'products': products,
+    }
+    _atomic_write(output / MANIFEST, dumps(manifest, pretty=True))
+
+    # Keep the previous snapshot's files for pages that loaded its manifest
+    keep = _referenced_files(manifest) | _referenced_files(previous)
+    removed = 0
+    for path in list(output.glob('*.json*')) + list(output.glob('products/*.json*')):
+        name = path.relative_to(output).as_posix()
+        if name != MANIFEST and name not in keep:
+            path.unlink()
+            removed += 1
+
+    manifest['stats'] = {
+        'written': written,
+        'unchanged': unchanged,
+        'removed': removed,
+        'seconds': time.perf_counter() - started,
+    }
+    return manifest
+
+
+def main():
+    """CLI entry point."""
+    parser = argparse.ArgumentParser(description="Write a static dashboard snapshot.")
+    parser.add_argument('--output', default=DEFAULT_SNAPSHOT_DIR, help="Snapshot directory")
+    parser.add_argument('--points', type=int, default=SNAPSHOT_POINTS, help="Chart points per series")
+    parser.add_argument('--db', default="data/prices.db", help="Database path")
+    args = parser.parse_args()
+
+    db = PriceDatabase(args.db)
+    try:
+        manifest = write_snapshot(db, args.output, args.points)
+    finally:
+        db.close()
+
+    stats = manifest['stats']
+    print(f"✓ Wrote snapshot to {args.output} in {stats['seconds']:.2f}s")
+    print(f"  Products: {len(manifest['products'])}")
+    print(f"  Files written: {stats['written']}, unchanged: {stats['unchanged']}, "
+          f"removed: {stats['removed']}")
+
+
+if __name__ == "__main__":
+    main()
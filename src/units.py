@@ -0,0 +1,148 @@
+"""
+Product size parsing and unit conversion.
+
+Product.size is free text as retailers print it: "16.9 fl oz (pump bottle)",
+"5 oz", "2x2.5 mL", "2.5ml (2 count twin pack)", "30 ct". parse_size()
+turns it into a count of items, the amount per item and a total quantity
+in a base unit:
+
+    mass      g   (mg, g, kg, oz, lb)
+    volume    ml  (ml, l, fl oz)
+    count     ct  (ct, count, each, pieces, ...)
+
+As on US labels, a bare "oz" is weight (net wt.) and "fl oz" is volume.
+
+PriceDatabase stores the total quantity and base unit on each product and
+keeps price_history.unit_price (price per base unit, after dividing by the
+row's pack_size) up to date at insert time. Prices per a display unit are
+unit_price * UNITS[unit][1].
+
+The latest observation of every product × retailer is also kept in
+latest_unit_prices, upserted by each insert, so ranking current offers by
+value walks a small index instead of grouping the whole history.
+"""
+import re
+from typing import NamedTuple, Optional
+
+CREATE_LATEST_TABLE = """
+    CREATE TABLE IF NOT EXISTS latest_unit_prices (
+        product_id TEXT NOT NULL,
+        retailer_id TEXT NOT NULL,
+        timestamp TEXT NOT NULL,
+        price REAL NOT NULL,
+        pack_size INTEGER,
+        unit_price REAL,
+        PRIMARY KEY (product_id, retailer_id)
+    )
+"""
+
+CREATE_LATEST_INDEX = """
+    CREATE INDEX IF NOT EXISTS idx_latest_unit_prices_rank
+    ON latest_unit_prices(unit_price, product_id, retailer_id)
+"""
+
+# Unit -> (base unit, base units per unit)
+UNITS = {
+    'mg': ('g', 0.001),
+    'g': ('g', 1.0),
+    'kg': ('g', 1000.0),
+    'oz': ('g', 28.349523125),
+    'lb': ('g', 453.59237),
+    'ml': ('ml', 1.0),
+    'l': ('ml', 1000.0),
+    'fl oz': ('ml', 29.5735295625),
+    'ct': ('ct', 1.0),
+}
+
+BASE_UNITS = ('g', 'ml', 'ct')
+
+_ALIASES = {
+    'milligram': 'mg', 'milligrams': 'mg',
+    'gram': 'g', 'grams': 'g', 'gr': 'g',
+    'kilogram': 'kg', 'kilograms': 'kg',
+    'ounce': 'oz', 'ounces': 'oz', 'wt oz': 'oz', 'net wt oz': 'oz',
+    'lbs': 'lb', 'pound': 'lb', 'pounds': 'lb',
+    'milliliter': 'ml', 'milliliters': 'ml', 'millilitre': 'ml', 'millilitres': 'ml',
+    'liter': 'l', 'liters': 'l', 'litre': 'l', 'litres': 'l', 'ltr': 'l',
+    'floz': 'fl oz', 'fl. oz': 'fl oz', 'fl.oz': 'fl oz', 'fluid ounce': 'fl oz',
+    'fluid ounces': 'fl oz',
+    'count': 'ct', 'each': 'ct', 'ea': 'ct', 'pc': 'ct', 'pcs': 'ct', 'piece': 'ct',
+    'pieces': 'ct', 'tablets': 'ct', 'capsules': 'ct', 'caplets': 'ct', 'softgels': 'ct',
+}
+
+_NUMBER = r'(\d+(?:\.\d+)?|\.\d+)'
+_UNIT = (r'(fl\.?\s*oz|fluid\s+ounces?|net\s+wt\.?\s*oz|wt\.?\s*oz|ounces?|oz|milligrams?|mg|'
+         r'kilograms?|kg|grams?|gr|g|pounds?|lbs?|millilit(?:er|re)s?|ml|lit(?:er|re)s?|ltr|l|'
+         r'count|ct|each|ea|pcs?|pieces?|tablets|capsules|caplets|softgels)\b')
+_AMOUNT = re.compile(_NUMBER + r'\s*' + _UNIT)
+_MULTIPLIED = re.compile(r'(\d+)\s*x\s*' + _NUMBER + r'\s*' + _UNIT)
+_PACK = re.compile(r'(?:(\d+)\s*-?\s*(?:pack|pk|count|ct)\b|pack\s+of\s+(\d+))')
+_NAMED_PACKS = {'twin pack': 2, 'two pack': 2, 'triple pack': 3, 'three pack': 3}
+
+
+class Size(NamedTuple):
+    """A parsed product size."""
+    count: int  # Items in the package (2 for "2x2.5 mL")
+    amount: float  # Per item, in `unit`
+    unit: str  # As written, normalized (a key of UNITS)
+    quantity: float  # Whole package, in `base_unit`
+    base_unit: str  # g, ml or ct
+
+    def __str__(self):
+        amount = f"{self.amount:g} {self.unit}"
+        return f"{self.count}x{amount}" if self.count > 1 else amount
+
+
+def normalize_unit(text: str) -> Optional[str]:
+    """Canonical unit (a key of UNITS) for a written unit, or None."""
+    unit = re.sub(r'\s+', ' ', text.strip().lower().rstrip('.'))
+    unit = _ALIASES.get(unit, unit)
+    if unit not in UNITS:
+        unit = _ALIASES.get(unit.replace('.', '').replace(' ', ''), unit.replace('.', ''))
+    return unit if unit in UNITS else None
+
+
+def parse_size(text: Optional[str]) -> Optional[Size]:
+    """
+    Parse a free-text product size.
+
+    Returns:
+        Size, or None when no amount and unit can be found
+    """
+    if not text:
+        return None
+    text = text.lower().replace('×', 'x')
+
+    multiplied = _MULTIPLIED.search(text)
+    if multiplied:
+        count, amount, unit = int(multiplied.group(1)), float(multiplied.group(2)), multiplied.group(3)
+    else:
+        # The first amount that isn't just a count, else a count on its own
+        matches = [(float(m.group(1)), normalize_unit(m.group(2)), m) for m in _AMOUNT.finditer(text)]
+        measured = [match for match in matches if match[1] not in (None, 'ct')]
+        if measured:
+            amount, unit, found = measured[0]
+            rest = text[:found.start()] + ' ' + text[found.end():]
+            count = 1
+            pack = _PACK.search(rest)
+            if pack:
+                count = int(pack.group(1) or pack.group(2))
+            else:
+                count = next((n for name, n in _NAMED_PACKS.items() if name in rest), 1)
+        elif matches and matches[0][1] == 'ct':
+            count, amount, unit = 1, matches[0][0], 'ct'
+        else:
+            return None
+
+    unit = normalize_unit(unit)
+    if unit is None or amount <= 0 or count < 1:
+        return None
+    base_unit, factor = UNITS[unit]
+    return Size(count, amount, unit, round(count * amount * factor, 6), base_unit)
+
+
+def per_unit(unit_price: Optional[float], unit: str) -> Optional[float]:
+    """Convert a price per base unit to a price per `unit` (e.g. 'oz')."""
+    if unit_price is None:
+        return None
+    return unit_price * UNITS[unit][1]
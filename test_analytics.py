@@ -0,0 +1,89 @@
+"""Test the batch analytics engines and the price_analytics table"""
+import sys
+import tempfile
+from datetime import date, datetime, timedelta
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent))
+
+from conftest import api_client
+from src import analytics
+from src.analytics import compute_batch, refresh_analytics
+from src.database import PriceDatabase
+from src.models import Product, PricePoint
+
+
+def _engines():
+    return [engine for engine in analytics.ENGINES if engine != 'numpy' or analytics.np is not None]
+
+
+def test_engines_compute_daily_statistics():
+    """Both engines resample to daily closes and agree on every statistic"""
+    day = date(2025, 1, 1).toordinal()
+    batch = [
+        ([day, day + 2, day + 3], [10.0, 8.0, 8.0]),  # Daily: 10, 10, 8, 8
+        ([day], [5.0]),
+        ([day + i for i in range(0, 90, 3)], [9.0 + (i % 4) for i in range(30)]),
+    ]
+    results = [compute_batch(batch, engine) for engine in _engines()]
+    assert all(r == results[0] for r in results)
+
+    stats = dict(zip(analytics.METRIC_COLUMNS, results[0][0]))
+    assert stats == {
+        'days': 4, 'current_price': 8.0, 'mean_7d': 9.0, 'mean_30d': 9.0,
+        'min_30d': 8.0, 'max_30d': 10.0, 'volatility_30d': 0.094281,
+        'p10': 8.0, 'p25': 8.0, 'p50': 9.0, 'p90': 10.0,
+        'share_cheaper': 0.0, 'days_at_current': 2, 'share_at_low': 0.5,
+    }
+    single = dict(zip(analytics.METRIC_COLUMNS, results[0][1]))
+    assert single['volatility_30d'] is None and single['days'] == 1
+    long = dict(zip(analytics.METRIC_COLUMNS, results[0][2]))
+    assert long['days'] == 88 and long['days_at_current'] == 1
+
+
+def test_refresh_is_incremental_and_served_by_api():
+    """Only products with new rows are recomputed; the API and queries read the table"""
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        db = PriceDatabase(str(Path(tmp_dir) / "prices.db"))
+        for product_id in ("eucerin-cream", "cerave-lotion"):
+            db.add_product(Product(id=product_id, name=product_id.title(), size="8 oz", category="skincare"))
+        db.add_price_points([
+            PricePoint(product_id, retailer_id, 8.0 + (i % 5) * 0.5,
+                       datetime(2025, 1, 1, 9) + timedelta(days=i), "https://example.com")
+            for product_id in ("eucerin-cream", "cerave-lotion")
+            for retailer_id in ("walmart", "target")
+            for i in range(60)
+        ])
+        db.seal_history_blocks(before_month="2025-02")
+
+        first = refresh_analytics(db.conn)
+        assert (first['full'], first['series'], first['products']) == (True, 4, 2)
+        before = {(a.product_id, a.retailer_id): a for a in db.get_price_analytics()}
+        assert before[("cerave-lotion", "target")].days == 60
+
+        assert refresh_analytics(db.conn)['series'] == 0
+
+        db.add_price_point(PricePoint("eucerin-cream", "walmart", 7.0, datetime(2025, 3, 5),
+                                      "https://example.com"))
+        second = db.refresh_analytics()
+        assert (second['full'], second['series'], second['products']) == (False, 2, 1)
+        after = {(a.product_id, a.retailer_id): a for a in db.get_price_analytics()}
+        assert after[("cerave-lotion", "target")] == before[("cerave-lotion", "target")]
+        walmart = after[("eucerin-cream", "walmart")]
+        assert (walmart.days, walmart.current_price, walmart.share_cheaper) == (64, 7.0, 0.0)
+        assert walmart.is_cheap()
+        assert [a.retailer_id for a in db.get_price_analytics(cheap_only=True)] == ["walmart"]
+
+        with api_client(db.db_path) as client:
+            payload = client.get('/api/analytics?product=eucerin-cream').get_json()
+            assert [s['retailer'] for s in payload['series']] == ["target", "walmart"]
+            assert payload['series'][1]['percentiles']['p10'] == walmart.p10
+            assert client.get('/api/analytics?cheap=1').get_json()['series'][0]['isCheap']
+            assert client.get('/api/analytics?product=missing').status_code == 404
+            db.close()
+
+
+if __name__ == "__main__":
+    test_engines_compute_daily_statistics()
+    test_refresh_is_incremental_and_served_by_api()
+    print("✓ All analytics tests passed")
@@ -0,0 +1,65 @@
+"""Test syncing the product catalog from a manifest"""
+import json
+import sys
+import tempfile
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent))
+
+from src.catalog_sync import sync_catalog
+from src.database import PriceDatabase
+from src.models import Product
+
+
+def test_sync_inserts_updates_and_deactivates():
+    """One sync applies all three kinds of change"""
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        db = PriceDatabase(str(Path(tmp_dir) / "prices.db"))
+        db.add_products([
+            Product(id="eucerin-eczema-5oz", name="Eucerin Eczema Relief Cream",
+                    size="5 oz", category="skincare"),
+            Product(id="pataday-max-strength", name="Pataday Extra Strength",
+                    size="2.5 mL", category="eye-drops"),
+        ])
+        created_at = db.get_product("eucerin-eczema-5oz").created_at
+        manifest = Path(tmp_dir) / "products.json"
+        manifest.write_text(json.dumps({"products": [
+            {"id": "eucerin-eczema-5oz", "name": "Eucerin Eczema Relief Cream",
+             "size": "5 oz", "category": "skincare", "brand": "Eucerin"},
+            {"id": "albolene-12oz", "name": "Albolene Moisturizing Cleanser",
+             "size": "12 oz", "category": "cleanser", "upc": "889476316125"},
+        ]}))
+
+        plan = sync_catalog(str(manifest), db, verbose=False)
+
+        assert [p.id for p in plan['insert']] == ["albolene-12oz"]
+        assert plan['changes'] == {"eucerin-eczema-5oz": ["brand"]}
+        assert plan['deactivate'] == ["pataday-max-strength"]
+        assert db.get_product("eucerin-eczema-5oz").created_at == created_at
+        assert [p.id for p in db.get_all_products(active_only=True)] == \
+            ["eucerin-eczema-5oz", "albolene-12oz"]
+
+        again = sync_catalog(str(manifest), db, verbose=False)
+        assert (len(again['insert']), len(again['update']), again['unchanged']) == (0, 0, 2)
+        db.close()
+
+
+def test_dry_run_leaves_catalog_untouched():
+    """A dry run reports changes without writing"""
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        db = PriceDatabase(str(Path(tmp_dir) / "prices.db"))
+        manifest = Path(tmp_dir) / "products.csv"
+        manifest.write_text("id,name,size,category\n"
+                            "albolene-12oz,Albolene Moisturizing Cleanser,12 oz,cleanser\n")
+
+        plan = sync_catalog(str(manifest), db, dry_run=True, verbose=False)
+
+        assert len(plan['insert']) == 1
+        assert db.get_all_products() == []
+        db.close()
+
+
+if __name__ == "__main__":
+    test_sync_inserts_updates_and_deactivates()
+    test_dry_run_leaves_catalog_untouched()
+    print("✓ All catalog sync tests passed")
@@ -0,0 +1,137 @@
+"""Test the cross-retailer as-of comparison"""
+import random
+import sys
+import tempfile
+from datetime import datetime, timedelta
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent))
+
+from conftest import api_client
+from src import comparison
+from src.database import PriceDatabase
+from src.models import Product, PricePoint
+
+START = datetime(2025, 3, 3, 9)
+
+
+def _reference(series, moment, max_age=comparison.MAX_AGE):
+    """Quadratic as-of lookup: each retailer's last price at or before moment."""
+    prices = {}
+    for retailer, rows in series.items():
+        seen = [(t, p) for t, p in rows if t <= moment.isoformat() and t >= (moment - max_age).isoformat()]
+        if seen:
+            prices[retailer] = seen[-1][1]
+    return prices
+
+
+def test_as_of_join_forward_fills_and_matches_reference():
+    """Each point carries every retailer's last price; ties split, stale prices drop out"""
+    series = {
+        'target': [((START + timedelta(days=d)).isoformat(), p) for d, p in ((0, 10.0), (2, 8.0), (3, 9.0))],
+        'walmart': [((START + timedelta(days=1, hours=2)).isoformat(), 9.0),
+                    ((START + timedelta(days=60)).isoformat(), 7.0)],
+    }
+    grid = comparison.as_of_join(series, 'day')
+    assert grid.times[:5] == [(START + timedelta(days=d)).date().isoformat() + "T00:00:00" for d in range(5)]
+    assert grid.prices[:5] == [10.0, 9.0, 8.0, 9.0, 9.0]
+    assert grid.cheapest[:5] == [('target',), ('walmart',), ('target',), ('target', 'walmart'),
+                                 ('target', 'walmart')]
+    assert grid.spreads[:4] == [None, 1.0, 1.0, 0.0]
+    # Both prices are over 30 days old before walmart's next observation
+    assert grid.prices[40] is None and grid.counts[40] == 0
+    assert (grid.prices[-1], grid.cheapest[-1], len(grid.times)) == (7.0, ('walmart',), 61)
+
+    rng = random.Random(7)
+    series = {
+        retailer: sorted(((START + timedelta(hours=rng.randrange(24 * 90))).isoformat(),
+                          round(rng.uniform(5, 10), 2)) for _ in range(40))
+        for retailer in ('amazon', 'cvs', 'target')
+    }
+    raw = comparison.as_of_join(series, 'raw')
+    for i, time_text in enumerate(raw.times):
+        expected = _reference(series, datetime.fromisoformat(time_text))
+        assert raw.prices[i] == min(expected.values())
+        assert raw.counts[i] == len(expected)
+    assert sum(raw.spans) == (datetime.fromisoformat(raw.times[-1])
+                              - datetime.fromisoformat(raw.times[0])).total_seconds()
+
+
+def test_stale_retailers_drop_out():
+    """A retailer's last price stops counting MAX_AGE after it was seen, however cheap"""
+    series = {
+        'target': [(START.isoformat(), 5.0)],
+        'walmart': [((START + timedelta(days=d)).isoformat(), 9.0) for d in range(0, 45, 5)],
+    }
+    grid = comparison.as_of_join(series, 'day')
+    # Day points take prices as of the end of the day
+    assert (grid.prices[29], grid.cheapest[29], grid.counts[29]) == (5.0, ('target',), 2)
+    assert (grid.prices[30], grid.cheapest[30], grid.counts[30]) == (9.0, ('walmart',), 1)
+    assert grid.spreads[30] is None
+    raw = comparison.as_of_join(series, 'raw', max_age=timedelta(days=7))
+    assert [(t[:10], c) for t, c in zip(raw.times, raw.cheapest)][:3] == [
+        ("2025-03-03", ('target',)), ("2025-03-08", ('target',)), ("2025-03-13", ('walmart',))]
+
+    # Every retailer stale: points remain, with no price
+    gap = comparison.as_of_join({'target': [(START.isoformat(), 5.0),
+                                            ((START + timedelta(days=40)).isoformat(), 6.0)]}, 'day')
+    assert (gap.prices[35], gap.cheapest[35], gap.counts[35]) == (None, (), 0)
+    assert comparison.as_of_join({}, 'day').times == []
+    assert comparison.as_of_join({'target': []}, 'raw').times == []
+
+
+def test_comparison_is_cached_per_product_and_served_by_api():
+    """Grids are reused until the product gets new rows; shares and spreads reach the API"""
+    comparison.clear_cache()
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        db = PriceDatabase(str(Path(tmp_dir) / "prices.db"))
+        for product_id in ("eucerin-cream", "cerave-lotion"):
+            db.add_product(Product(id=product_id, name=product_id.title(), size="8 oz", category="skincare"))
+        # Target is cheaper on weekends (Mar 8-9, 15-16), Walmart otherwise
+        db.add_price_points([
+            PricePoint("eucerin-cream", retailer_id, price, START + timedelta(days=i), "https://example.com")
+            for i in range(14)
+            for retailer_id, price in (("walmart", 9.0),
+                                       ("target", 8.0 if (START + timedelta(days=i)).weekday() >= 5 else 10.0))
+        ] + [
+            PricePoint("cerave-lotion", "cvs", 12.0, START + timedelta(days=i), "https://example.com")
+            for i in range(14)
+        ])
+        db.seal_history_blocks(before_month="2025-04")
+
+        result = db.get_retailer_comparison("eucerin-cream")
+        assert (result.retailers, len(result.points)) == (["target", "walmart"], 14)
+        assert result.cheapest_share == {"walmart": 0.7143, "target": 0.2857}
+        assert result.most_often_cheapest() == "walmart"
+        weekend = result.points[5]
+        assert (weekend.price, weekend.retailer_id, weekend.spread) == (8.0, "target", 1.0)
+        assert db.get_retailer_comparison("eucerin-cream", "week", "2025-03-10", "2025-03-16").points[0].time \
+            == datetime(2025, 3, 10)
+        assert db.get_retailer_comparison("missing") is None
+
+        # New rows for one product rebuild its grid only
+        lotion = comparison.product_grid(db.conn, "cerave-lotion")
+        cream = comparison.product_grid(db.conn, "eucerin-cream")
+        db.add_price_point(PricePoint("eucerin-cream", "walmart", 7.0, START + timedelta(days=14),
+                                      "https://example.com"))
+        assert comparison.product_grid(db.conn, "cerave-lotion") is lotion
+        assert comparison.product_grid(db.conn, "eucerin-cream") is not cream
+        assert db.get_retailer_comparison("eucerin-cream").points[-1].price == 7.0
+
+        with api_client(db.db_path) as client:
+            payload = client.get('/api/products/eucerin-cream/best-price?from=2025-03-08&to=2025-03-09').get_json()
+            assert payload['cheapestShare'] == {"target": 1.0, "walmart": 0.0}
+            assert [(p['price'], p['retailer'], p['spread']) for p in payload['points']] == [
+                (8.0, "target", 1.0), (8.0, "target", 1.0)]
+            columnar = client.get('/api/products/eucerin-cream/best-price?format=columnar').get_json()
+            assert columnar['mostOftenCheapest'] == "walmart" and len(columnar['points']['t']) == 15
+            assert client.get('/api/products/eucerin-cream/best-price?bucket=year').status_code == 400
+            assert client.get('/api/products/missing/best-price').status_code == 404
+            db.close()
+
+
+if __name__ == "__main__":
+    test_as_of_join_forward_fills_and_matches_reference()
+    test_stale_retailers_drop_out()
+    test_comparison_is_cached_per_product_and_served_by_api()
+    print("✓ All comparison tests passed")
@@ -0,0 +1,346 @@
+"""Test the dashboard API endpoints"""
+import gzip
+import json
+import sqlite3
+import sys
+import tempfile
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent))
+
+from conftest import api_client
+from dashboard import api
+from src.database import PriceDatabase
+from src.models import Product, PricePoint
+
+
+@contextmanager
+def _serving_db():
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        db = PriceDatabase(str(Path(tmp_dir) / "prices.db"))
+        db.add_product(Product(id="eucerin-cream", name="Eucerin Eczema Relief Cream",
+                               size="8 oz", category="skincare", brand="Eucerin"))
+        db.add_price_point(PricePoint("eucerin-cream", "target", 8.99,
+                                      datetime(2025, 1, 1), "https://example.com"))
+        with api_client(db.db_path) as client:
+            yield db, client
+
+
+def test_dashboard_data_etag_and_invalidation():
+    """Repeat requests get a 304 until new prices land"""
+    with _serving_db() as (db, client):
+
+        first = client.get('/api/dashboard-data', headers={'Accept-Encoding': 'gzip'})
+        assert first.status_code == 200
+        assert first.headers['Content-Encoding'] == 'gzip'
+        payload = json.loads(gzip.decompress(first.data))
+        assert payload['brands'][0]['products'][0]['id'] == "eucerin-cream"
+
+        etag = first.headers['ETag']
+        repeat = client.get('/api/dashboard-data', headers={'If-None-Match': etag})
+        assert repeat.status_code == 304
+
+        db.add_price_point(PricePoint("eucerin-cream", "target", 7.99,
+                                      datetime(2025, 1, 2), "https://example.com"))
+        changed = client.get('/api/dashboard-data', headers={'If-None-Match': etag})
+        assert changed.status_code == 200
+        assert changed.headers['ETag'] != etag
+        assert len(changed.get_json()['brands'][0]['products'][0]['chartData'][0]['prices']) == 2
+        db.close()
+
+
+def test_content_encoding_honours_q_values():
+    """Accept-Encoding is parsed: q=0 refuses an encoding, higher q-values win"""
+    from src.serialization import encodings
+
+    best = encodings()[0]
+    with _serving_db() as (db, client):
+        for header, expected in (
+            ('gzip', 'gzip'),
+            ('br;q=0, gzip', 'gzip'),
+            ('gzip;q=0', None),
+            ('gzip;q=0.5, identity', None),
+            ('x-gzip-like', None),
+            ('*', best),
+            ('gzip;q=0, *;q=0.3', best if best != 'gzip' else None),
+        ):
+            response = client.get('/api/dashboard-data', headers={'Accept-Encoding': header})
+            assert response.headers.get('Content-Encoding') == expected, header
+        db.close()
+
+
+def test_dashboard_data_points_and_range():
+    """Chart series honour the points budget and date range"""
+    with _serving_db() as (db, client):
+        db.add_price_points([
+            PricePoint("eucerin-cream", "target", 8.0 + (day % 5), datetime(2025, 2, 1) + timedelta(hours=day),
+                       "https://example.com")
+            for day in range(500)
+        ])
+
+        sampled = client.get('/api/dashboard-data?points=20&from=2025-02-01').get_json()
+        prices = sampled['brands'][0]['products'][0]['chartData'][0]['prices']
+        assert len(prices) <= 20
+        assert all(p['date'] >= '2025-02-01' for p in prices)
+        assert {p['price'] for p in prices} >= {8.0, 12.0}
+
+        columnar = client.get('/api/dashboard-data?points=20&from=2025-02-01&format=columnar').get_json()
+        series = columnar['brands'][0]['products'][0]['chartData'][0]
+        assert series['price'] == [p['price'] for p in prices]
+        assert len(series['t']) == len(prices)
+
+        assert client.get('/api/dashboard-data?points=abc').status_code == 400
+        assert client.get('/api/dashboard-data?format=xml').status_code == 400
+        assert client.get('/api/dashboard-data?to=yesterday').status_code == 400
+        db.close()
+
+
+def test_catalog_and_product_detail():
+    """Catalog lists summaries only; details come per product"""
+    with _serving_db() as (db, client):
+        db.add_product(Product(id="cerave-lotion", name="CeraVe Daily Lotion",
+                               size="12 oz", category="skincare", brand="CeraVe", upc="301871"))
+        db.add_price_points([
+            PricePoint("eucerin-cream", "walmart", 12.99, datetime(2025, 1, 1), "https://example.com"),
+            PricePoint("cerave-lotion", "target", 14.49, datetime(2025, 1, 1), "https://example.com"),
+        ])
+
+        catalog = client.get('/api/catalog').get_json()
+        assert [p['id'] for p in catalog['products']] == ["eucerin-cream", "cerave-lotion"]
+        assert catalog['products'][0]['savings'] == 4.0
+        assert catalog['products'][0]['bestRetailer'] == "Target"
+        assert 'chartData' not in catalog['products'][0]
+        assert catalog['total'] == 2
+        assert {b['name'] for b in catalog['brands']} == {"Eucerin", "CeraVe"}
+
+        by_price = client.get('/api/catalog?sort=price&per_page=1&page=2').get_json()
+        assert [p['id'] for p in by_price['products']] == ["cerave-lotion"]
+        assert by_price['pages'] == 2
+        assert client.get('/api/catalog?brand=cerave').get_json()['total'] == 1
+        assert client.get('/api/catalog?q=301871').get_json()['products'][0]['id'] == "cerave-lotion"
+        assert client.get('/api/catalog?sort=rating').status_code == 400
+
+        detail = client.get('/api/products/eucerin-cream?points=10').get_json()['product']
+        assert [r['name'] for r in detail['retailers']] == ["target", "walmart"]
+        assert len(detail['chartData']) == 2
+        assert client.get('/api/products/missing').status_code == 404
+        db.close()
+
+
+def test_product_history_buckets():
+    """History is aggregated per bucket, retailer and range"""
+    with _serving_db() as (db, client):
+        db.add_price_points([
+            PricePoint("eucerin-cream", "walmart", price, datetime(2025, 1, 6) + timedelta(days=day),
+                       "https://example.com")
+            for day, price in enumerate([9.0, 7.0, 8.0, 10.0, 8.5, 9.5, 9.0, 6.0])
+        ])
+
+        weekly = client.get('/api/products/eucerin-cream/history?bucket=week&retailer=walmart').get_json()
+        buckets = weekly['series'][0]['buckets']
+        assert weekly['series'][0]['retailer'] == "walmart"
+        assert buckets[0] == {'start': "2025-01-06T00:00:00", 'open': 9.0, 'high': 10.0, 'low': 7.0,
+                              'close': 9.0, 'avg': 61.0 / 7, 'count': 7}
+        assert buckets[1]['count'] == 1
+
+        ranged = client.get('/api/products/eucerin-cream/history?bucket=raw&from=2025-01-08&to=2025-01-09'
+                            '&format=columnar').get_json()
+        assert ranged['series'][0]['close'] == [8.0, 10.0]
+        assert ranged['series'][0]['count'] == [1, 1]
+
+        everything = client.get('/api/products/eucerin-cream/history?bucket=month').get_json()
+        assert sorted(s['retailer'] for s in everything['series']) == ["target", "walmart"]
+
+        assert client.get('/api/products/eucerin-cream/history?bucket=year').status_code == 400
+        assert client.get('/api/products/missing/history').status_code == 404
+        db.close()
+
+
+def test_updates_since_cursor():
+    """Delta sync returns only new observations, then catches up"""
+    with _serving_db() as (db, client):
+        cursor = client.get('/api/catalog').get_json()['cursor']
+
+        empty = client.get(f'/api/updates?since={cursor}').get_json()
+        assert empty == {'cursor': cursor, 'more': False, 'series': [], 'products': []}
+
+        db.add_price_points([
+            PricePoint("eucerin-cream", "target", 6.99, datetime(2025, 1, 3), "https://example.com"),
+            PricePoint("eucerin-cream", "walmart", 9.99, datetime(2025, 1, 3), "https://example.com"),
+            PricePoint("eucerin-cream", "target", 7.49, datetime(2025, 1, 2), "https://example.com"),
+        ])
+        first = client.get(f'/api/updates?since={cursor}&limit=2').get_json()
+        assert first['more'] is True
+        assert sum(len(s['prices']) for s in first['series']) == 2
+        assert first['products'][0]['retailers'][0]['low'] == 6.99
+        assert 'chartData' not in first['products'][0]
+
+        rest = client.get(f"/api/updates?since={first['cursor']}").get_json()
+        assert rest['more'] is False
+        assert rest['series'] == [{'productId': "eucerin-cream", 'retailer': "target",
+                                   'prices': [{'date': "2025-01-02T00:00:00", 'price': 7.49}]}]
+
+        by_time = client.get('/api/updates?since=2025-01-02T12:00:00').get_json()
+        assert sorted(s['retailer'] for s in by_time['series']) == ["target", "walmart"]
+        assert by_time['cursor'] == rest['cursor']
+
+        assert client.get('/api/updates').status_code == 400
+        db.close()
+
+
+def test_updates_cursor_skips_no_rows_committed_mid_request():
+    """A row committed while a poll is being built arrives on the next poll"""
+    from src import dashboard_data
+
+    with _serving_db() as (db, client):
+        cursor = client.get('/api/catalog').get_json()['cursor']
+        read_rows = dashboard_data._rows_since
+
+        def rows_then_insert(*args):
+            # The collector commits right after the poll has read the rows
+            rows = read_rows(*args)
+            db.add_price_point(PricePoint("eucerin-cream", "walmart", 9.49, datetime(2025, 1, 4),
+                                          "https://example.com"))
+            return rows
+
+        dashboard_data._rows_since = rows_then_insert
+        try:
+            racing = client.get(f'/api/updates?since={cursor}').get_json()
+        finally:
+            dashboard_data._rows_since = read_rows
+        assert (racing['cursor'], racing['series']) == (cursor, [])
+
+        caught_up = client.get(f"/api/updates?since={racing['cursor']}").get_json()
+        assert caught_up['series'][0]['prices'] == [{'date': "2025-01-04T00:00:00", 'price': 9.49}]
+        assert caught_up['cursor'] == cursor + 1
+        db.close()
+
+
+def test_stream_pushes_prices_and_events():
+    """The SSE stream replays changes after the client's cursor"""
+    with _serving_db() as (db, client):
+        cursor = client.get('/api/catalog').get_json()['cursor']
+
+        now = datetime.now()
+        for hours, price in ((3, 10.0), (2, 10.0), (1, 8.0)):
+            db.add_price_point(PricePoint("eucerin-cream", "walmart", price,
+                                          now - timedelta(hours=hours), "https://example.com"))
+        db.record_event('run', {'status': 'finished', 'successes': 3})
+
+        response = client.get(f'/api/stream?since={cursor}', headers={'Last-Event-ID': f'{cursor}-0'},
+                              buffered=False)
+        assert response.mimetype == 'text/event-stream'
+        chunks = iter(response.response)
+        assert next(chunks).startswith(b'retry:')
+        messages = [next(chunks).decode() for _ in range(3)]
+        response.close()
+
+        events = [dict(line.split(': ', 1) for line in m.strip().split('\n')) for m in messages]
+        assert [e['event'] for e in events] == ['prices', 'deal', 'run']
+        assert len(json.loads(events[0]['data'])['series'][0]['prices']) == 3
+        deal = json.loads(events[1]['data'])
+        assert (deal['productId'], deal['retailer'], deal['isDeal']) == ("eucerin-cream", "walmart", True)
+        assert events[2]['id'] == f"{cursor + 3}-2"
+        db.close()
+
+
+def test_batch_inserts_record_deal_flips():
+    """add_price_points flags deals like single inserts, with a few statements per series"""
+    from src import query_profiler
+    from src.change_feed import read_events
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        db = PriceDatabase(str(Path(tmp_dir) / "prices.db"), profile=True)
+        db.add_product(Product(id="eucerin-cream", name="Eucerin Eczema Relief Cream",
+                               size="8 oz", category="skincare"))
+        now = datetime.now()
+        db.add_price_points([PricePoint("eucerin-cream", "walmart", 10.0, now - timedelta(days=days),
+                                        "https://example.com") for days in range(5, 0, -1)])
+        assert read_events(db.conn, 0) == []
+
+        db.add_price_points([
+            PricePoint("eucerin-cream", "walmart", 9.0, now - timedelta(hours=2), "https://example.com"),
+            PricePoint("eucerin-cream", "walmart", 8.0, now - timedelta(hours=1), "https://example.com"),
+        ])
+        profiler = query_profiler.get_profiler()
+        profiler.reset()
+        db.add_price_point(PricePoint("eucerin-cream", "walmart", 10.0, now, "https://example.com"))
+        assert sum(entry['count'] for entry in profiler.summary()) <= 6
+
+        flips = [(e['isDeal'], e['price']) for e in read_events(db.conn, 0) if e['kind'] == 'deal']
+        assert flips == [(True, 8.0), (False, 10.0)]
+        stats = db.get_price_stats("eucerin-cream", "walmart")
+        event = read_events(db.conn, 0)[-1]
+        assert abs(event['avg'] - stats.avg_price) < 1e-9
+        profiler.reset()
+        db.close()
+
+
+def test_endpoints_with_empty_history():
+    """A catalogued product without prices yields empty payloads, never an error"""
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        db = PriceDatabase(str(Path(tmp_dir) / "prices.db"))
+        db.add_product(Product(id="eucerin-cream", name="Eucerin Eczema Relief Cream",
+                               size="8 oz", category="skincare"))
+        with api_client(db.db_path) as client:
+            assert client.get('/api/dashboard-data').get_json() == {'brands': []}
+            assert client.get('/api/catalog').get_json()['total'] == 0
+            assert client.get('/api/products/eucerin-cream').status_code == 404
+            assert client.get('/api/products/eucerin-cream/history').get_json()['series'] == []
+            best = client.get('/api/products/eucerin-cream/best-price').get_json()
+            assert (best['points'], best['cheapestShare'], best['mostOftenCheapest']) == ([], {}, None)
+            assert client.get('/api/updates?since=0').get_json() == {
+                'cursor': 0, 'more': False, 'products': [], 'series': []}
+            assert client.get('/api/unit-prices').get_json()['offers'] == []
+            assert client.get('/api/sales').get_json()['claims'] == []
+            for path in ('/api/analytics', '/api/seasonality', '/api/forecasts'):
+                assert client.get(path).get_json()['series'] == [], path
+
+        assert db.refresh_analytics()['series'] == 0
+        assert db.refresh_sale_verdicts()['evaluated'] == 0
+        assert db.refresh_seasonality()['series'] == 0
+        assert db.refresh_forecasts()['series'] == 0
+        assert db.get_price_stats("eucerin-cream", "target") is None
+        assert db.get_price_history("eucerin-cream", "target") == []
+        db.close()
+
+
+def test_production_connections_and_static_caching():
+    """Threads reuse one read-only connection; hashed assets are cached long"""
+    with _serving_db() as (db, client):
+        conn = api.get_db_connection()
+        assert api.get_db_connection() is conn
+        try:
+            conn.execute("DELETE FROM products")
+            assert False, "connection should be read-only"
+        except sqlite3.OperationalError:
+            pass
+        assert db.conn.execute("PRAGMA journal_mode").fetchone()[0] == "wal"
+
+        index = client.get('/')
+        assert index.headers['Cache-Control'] == 'no-cache'
+        html = index.get_data(as_text=True)
+        asset = html.split('src="app.js?v=')[1].split('"')[0]
+
+        versioned = client.get(f'/app.js?v={asset}')
+        assert 'immutable' in versioned.headers['Cache-Control']
+        assert 'max-age=31536000' in versioned.headers['Cache-Control']
+        assert 'max-age=86400' in client.get('/styles.css').headers['Cache-Control']
+        db.close()
+
+
+if __name__ == "__main__":
+    test_dashboard_data_etag_and_invalidation()
+    test_content_encoding_honours_q_values()
+    test_dashboard_data_points_and_range()
+    test_catalog_and_product_detail()
+    test_product_history_buckets()
+    test_updates_since_cursor()
+    test_updates_cursor_skips_no_rows_committed_mid_request()
+    test_stream_pushes_prices_and_events()
+    test_batch_inserts_record_deal_flips()
+    test_endpoints_with_empty_history()
+    test_production_connections_and_static_caching()
+    print("✓ All dashboard API tests passed")
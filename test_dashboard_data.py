@@ -0,0 +1,104 @@
+"""Test the single-pass dashboard payload builder"""
+import sys
+import tempfile
+from datetime import datetime
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent))
+
+from src.dashboard_data import aggregate_series, build_dashboard_data, series_summaries
+from src.database import PriceDatabase
+from src.history_blocks import iter_history_rows
+from src.models import Product, PricePoint
+
+
+def _point(product_id, retailer_id, price, day):
+    return PricePoint(product_id, retailer_id, price, datetime(2025, 1, day), "https://example.com")
+
+
+def test_dashboard_payload():
+    """Products are grouped by brand with per-retailer high/low/avg"""
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        db = PriceDatabase(str(Path(tmp_dir) / "prices.db"))
+        db.add_products([
+            Product(id="eucerin-lotion", name="Eucerin Advanced Repair Lotion", size="16.9 oz",
+                    category="skincare", brand="Eucerin", walmart_url="https://walmart.com/e"),
+            Product(id="eucerin-cream", name="Eucerin Eczema Relief Cream", size="8 oz",
+                    category="skincare"),
+            Product(id="no-prices", name="Albolene Cleanser", size="12 oz", category="cleanser"),
+        ])
+        db.add_price_points([
+            _point("eucerin-lotion", "walmart", 12.97, 1),
+            _point("eucerin-lotion", "walmart", 10.00, 2),
+            _point("eucerin-lotion", "walmart", 12.97, 3),
+            _point("eucerin-lotion", "walmart", 10.00, 4),
+            _point("eucerin-lotion", "amazon", 9.74, 2),
+            _point("eucerin-cream", "target", 8.99, 5),
+        ])
+        db.seal_history_blocks(before_month="2025-01")
+
+        data = build_dashboard_data(db.conn)
+
+        assert [b['name'] for b in data['brands']] == ["Eucerin"]
+        lotion, cream = data['brands'][0]['products']
+        assert data['brands'][0]['bestRetailer'] == "Amazon"
+        assert [c['retailer'] for c in lotion['chartData']] == ["walmart", "amazon"]
+        walmart = next(r for r in lotion['retailers'] if r['name'] == "walmart")
+        assert walmart['highDate'] == "2025-01-01T00:00:00"
+        assert walmart['lowDate'] == "2025-01-02T00:00:00"
+        assert abs(walmart['avg'] - 11.485) < 1e-9
+        assert walmart['url'] == "https://walmart.com/e"
+        assert cream['retailers'][0]['url'] == "#"
+        db.close()
+
+
+def test_dashboard_includes_sealed_history():
+    """Sealed months show up in the payload like live rows"""
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        db = PriceDatabase(str(Path(tmp_dir) / "prices.db"))
+        db.add_product(Product(id="eucerin-cream", name="Eucerin Eczema Relief Cream",
+                               size="8 oz", category="skincare"))
+        db.add_price_points([_point("eucerin-cream", "target", 8.99 + day, day) for day in range(1, 6)])
+        before = build_dashboard_data(db.conn)
+
+        db.seal_history_blocks(before_month="2025-02")
+
+        assert build_dashboard_data(db.conn) == before
+        db.close()
+
+
+def test_series_summaries_match_full_aggregation():
+    """Set-based stats equal a pass over every row, with the high/low first seen in blocks"""
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        db = PriceDatabase(str(Path(tmp_dir) / "prices.db"))
+        db.add_product(Product(id="eucerin-cream", name="Eucerin Eczema Relief Cream",
+                               size="8 oz", category="skincare"))
+        db.add_price_points([
+            PricePoint("eucerin-cream", retailer_id, price, datetime(2025, month, day), "https://example.com")
+            for retailer_id, month, day, price in (
+                ("walmart", 1, 3, 9.0), ("walmart", 1, 9, 7.5), ("walmart", 2, 2, 11.0),
+                ("walmart", 2, 20, 7.5), ("walmart", 3, 1, 11.0), ("walmart", 3, 4, 8.0),
+                ("target", 3, 2, 8.25),
+            )
+        ])
+        db.seal_history_blocks(before_month="2025-03")
+        # A late row for a sealed month, still in the row table
+        db.add_price_point(PricePoint("eucerin-cream", "walmart", 11.0, datetime(2025, 1, 30),
+                                      "https://example.com"))
+
+        expected = {s.retailer_id: (s.high, s.high_date, s.low, s.low_date, s.first_date)
+                    for s in aggregate_series(iter_history_rows(db.conn))["eucerin-cream"]}
+        summaries = {s.retailer_id: s for s in series_summaries(db.conn, "eucerin-cream")}
+        assert {r: (s.high, s.high_date, s.low, s.low_date, s.first_date)
+                for r, s in summaries.items()} == expected
+        assert expected["walmart"][1] == "2025-01-30T00:00:00"
+        assert abs(summaries["walmart"].avg - (9.0 + 7.5 + 11.0 + 7.5 + 11.0 + 8.0 + 11.0) / 7) < 1e-9
+        assert series_summaries(db.conn, "missing") == []
+        db.close()
+
+
+if __name__ == "__main__":
+    test_dashboard_payload()
+    test_dashboard_includes_sealed_history()
+    test_series_summaries_match_full_aggregation()
+    print("✓ All dashboard data tests passed")
@@ -0,0 +1,60 @@
+"""Test chart downsampling"""
+import random
+import sys
+from datetime import datetime, timedelta
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent))
+
+from src.downsample import downsample_prices, in_range, lttb_indices
+
+
+def _series(count, seed=7):
+    rng = random.Random(seed)
+    start = datetime(2024, 1, 1)
+    return [
+        {'date': (start + timedelta(hours=i)).isoformat(), 'price': round(12 + rng.gauss(0, 1.5), 2)}
+        for i in range(count)
+    ]
+
+
+def test_lttb_keeps_endpoints_and_budget():
+    """LTTB returns exactly the threshold, including both ends"""
+    xs = list(range(1000))
+    ys = [x % 17 for x in xs]
+    indices = lttb_indices(xs, ys, 50)
+
+    assert len(indices) == 50
+    assert indices[0] == 0 and indices[-1] == 999
+    assert indices == sorted(indices)
+
+
+def test_downsample_keeps_true_extremes():
+    """Downsampled series stay within budget and keep the high and low"""
+    prices = _series(5000)
+    for budget in (5, 40, 300):
+        sampled = downsample_prices(prices, budget)
+        assert len(sampled) <= budget
+        assert max(p['price'] for p in sampled) == max(p['price'] for p in prices)
+        assert min(p['price'] for p in sampled) == min(p['price'] for p in prices)
+
+
+def test_short_series_untouched():
+    """Series within budget are returned as-is"""
+    prices = _series(10)
+    assert downsample_prices(prices, 200) is prices
+
+
+def test_in_range_end_date_covers_whole_day():
+    """A date-only end bound includes that day's observations"""
+    assert in_range('2025-01-31T23:59:00', '2025-01-01', '2025-01-31')
+    assert not in_range('2025-02-01T00:00:00', '2025-01-01', '2025-01-31')
+    assert not in_range('2024-12-31T23:59:00', '2025-01-01', None)
+
+
+if __name__ == "__main__":
+    test_lttb_keeps_endpoints_and_budget()
+    test_downsample_keeps_true_extremes()
+    test_short_series_untouched()
+    test_in_range_end_date_covers_whole_day()
+    print("✓ All downsampling tests passed")
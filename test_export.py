@@ -0,0 +1,164 @@
+"""Test the streaming exporter"""
+import json
+import sys
+import tempfile
+from datetime import datetime, timedelta
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent))
+
+from src.database import PriceDatabase
+from src.export import build_export, export_prices, export_shards
+from src.import_prices import import_prices
+from src.models import Product, PricePoint
+
+
+def _make_db(path):
+    db = PriceDatabase(str(path))
+    db.conn.execute("INSERT INTO retailers (id, name, base_url) VALUES ('target', 'Target', 'https://target.com')")
+    db.conn.execute("INSERT INTO retailers (id, name, base_url) VALUES ('walmart', 'Walmart', 'https://walmart.com')")
+    for product_id in ("eucerin-cream", "cerave-lotion", "aveeno-wash"):
+        db.add_product(Product(id=product_id, name=product_id.title(), size="8 oz", category="skincare"))
+    return db
+
+
+def _add_history(db, now):
+    db.add_price_points([
+        PricePoint(product_id, retailer_id, 8.0 + (i % 9) / 4, now - timedelta(days=60, hours=-7 * i),
+                   "https://example.com", pack_size=1 + i % 2,
+                   advertised_savings=None if i % 3 else 1.5)
+        for product_id in ("eucerin-cream", "cerave-lotion")
+        for retailer_id in ("walmart", "target")
+        for i in range(200)
+    ])
+
+
+def test_streamed_json_matches_export_payload():
+    """Streamed JSON (compact or pretty) equals the in-memory payload"""
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        db = _make_db(Path(tmp_dir) / "prices.db")
+        _add_history(db, datetime.now())
+        db.seal_history_blocks(before_month=(datetime.now() - timedelta(days=40)).strftime('%Y-%m'))
+
+        expected = build_export(db, 'rows')
+        assert [p['id'] for p in expected['products']] == ["cerave-lotion", "eucerin-cream"]
+        first = expected['products'][0]['prices'][0]
+        assert len(first['history']) == 30
+        assert first['current_price'] == first['history'][-1]['price']
+        expected.pop('generated_at')
+
+        for pretty in (False, True):
+            path = Path(tmp_dir) / "prices_export.json"
+            summary = export_prices(str(path), 'json', pretty=pretty, gzip_copy=True, db=db, report=False)
+            assert summary['products'] == 2 and summary['rows'] == 800
+            exported = json.loads(path.read_bytes())
+            exported.pop('generated_at')
+            assert exported == expected
+        assert not list(Path(tmp_dir).glob('.*.tmp'))
+        db.close()
+
+
+def test_observation_exports_round_trip_through_import():
+    """CSV and NDJSON exports import into an empty database unchanged"""
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        db = _make_db(Path(tmp_dir) / "prices.db")
+        _add_history(db, datetime(2025, 6, 1))
+        original = [(p.price, p.timestamp, p.url, p.pack_size, p.advertised_savings)
+                    for p in db.get_price_history("cerave-lotion", "target")]
+
+        for export_type in ('csv', 'ndjson'):
+            path = Path(tmp_dir) / f"prices.{export_type}"
+            assert export_prices(str(path), export_type, db=db, report=False)['rows'] == 800
+
+            copy = _make_db(Path(tmp_dir) / f"copy-{export_type}.db")
+            summary = import_prices(str(path), db=copy, verbose=False)
+            assert (summary['inserted'], summary['invalid']) == (800, 0)
+            assert [(p.price, p.timestamp, p.url, p.pack_size, p.advertised_savings)
+                    for p in copy.get_price_history("cerave-lotion", "target")] == original
+            copy.close()
+        db.close()
+
+
+def test_failed_export_keeps_previous_file():
+    """An export that fails midway leaves the old file in place"""
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        db = _make_db(Path(tmp_dir) / "prices.db")
+        _add_history(db, datetime.now())
+        path = Path(tmp_dir) / "prices_export.json"
+        path.write_text('{"products": []}')
+
+        try:
+            export_prices(str(path), 'json', fmt='xml', db=db, report=False)
+            assert False, "unknown format should fail"
+        except ValueError:
+            pass
+        assert path.read_text() == '{"products": []}'
+        assert not list(Path(tmp_dir).glob('.*.tmp'))
+
+        db.close()
+
+
+def test_shards_rerender_only_changed_products():
+    """Incremental shards follow new rows, catalog edits and the stats window"""
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        db = _make_db(Path(tmp_dir) / "prices.db")
+        now = datetime.now()
+        _add_history(db, now)
+        output = Path(tmp_dir) / "shards"
+
+        first = export_shards(str(output), db=db, report=False)
+        assert (first['products'], first['rendered'], first['rows']) == (2, 2, 800)
+        index = json.loads((output / "index.json").read_bytes())
+        assert index['cursor'] == 800
+        assert index['products']["aveeno-wash"]['file'] is None
+        assert sorted(p.name for p in output.glob('*.json')) == [
+            "cerave-lotion.json", "eucerin-cream.json", "index.json"]
+
+        assert export_shards(str(output), db=db, report=False)['rendered'] == 0
+
+        db.add_price_point(PricePoint("eucerin-cream", "target", 6.0, now, "https://example.com"))
+        second = export_shards(str(output), db=db, report=False)
+        assert (second['rendered'], second['rows']) == (1, 401)
+        expected = {p['id']: p for p in build_export(db)['products']}
+        for product_id in expected:
+            assert json.loads((output / f"{product_id}.json").read_bytes()) == expected[product_id]
+
+        db.add_product(Product(id="cerave-lotion", name="CeraVe Lotion", size="12 oz", category="skincare"))
+        assert export_shards(str(output), db=db, report=False)['rendered'] == 1
+        assert json.loads((output / "cerave-lotion.json").read_bytes())['size'] == "12 oz"
+
+        # An observation leaving the 30-day window changes the stats
+        index = json.loads((output / "index.json").read_bytes())
+        index['products']["eucerin-cream"]['window_start'] = "2000-01-01T00:00:00"
+        (output / "index.json").write_text(json.dumps(index))
+        assert export_shards(str(output), db=db, report=False)['rendered'] == 1
+
+        # Rows added and sealed between two exports still re-render the shard
+        db.add_price_point(PricePoint("eucerin-cream", "walmart", 5.0, now - timedelta(days=45),
+                                      "https://example.com"))
+        db.seal_history_blocks(before_month=now.strftime("%Y-%m"))
+        assert db.conn.execute("SELECT COUNT(*) FROM price_history_blocks").fetchone()[0]
+        assert export_shards(str(output), db=db, report=False)['rendered'] == 1
+        shard = json.loads((output / "eucerin-cream.json").read_bytes())
+        assert shard == {p['id']: p for p in build_export(db)['products']}["eucerin-cream"]
+
+        # Files the export didn't write are never removed
+        (output / "prices_export.json").write_text("{}")
+        db.conn.execute("DELETE FROM products WHERE id = 'cerave-lotion'")
+        db.conn.commit()
+        removed = export_shards(str(output), db=db, report=False)
+        assert (removed['rendered'], removed['removed'], removed['products']) == (0, 1, 1)
+        assert "cerave-lotion" not in json.loads((output / "index.json").read_bytes())['products']
+        assert sorted(p.name for p in output.glob('*.json')) == [
+            "eucerin-cream.json", "index.json", "prices_export.json"]
+
+        assert export_shards(str(output), 'columnar', db=db, report=False)['rendered'] == 1
+        db.close()
+
+
+if __name__ == "__main__":
+    test_streamed_json_matches_export_payload()
+    test_observation_exports_round_trip_through_import()
+    test_failed_export_keeps_previous_file()
+    test_shards_rerender_only_changed_products()
+    print("✓ All export tests passed")
@@ -0,0 +1,141 @@
+"""Test fake-sale detection"""
+import sys
+import tempfile
+from datetime import datetime, timedelta
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent))
+
+from conftest import api_client
+from src.database import PriceDatabase
+from src.fake_sales import classify, refresh_verdicts
+from src.models import Product, PricePoint
+
+START = datetime(2025, 1, 1, 9)
+
+
+def _make_db(tmp_dir):
+    db = PriceDatabase(str(Path(tmp_dir) / "prices.db"))
+    db.add_product(Product(id="eucerin-cream", name="Eucerin Cream", size="8 oz", category="skincare"))
+    points = []
+    for retailer_id, usual in (("walmart", 10.0), ("target", 8.0), ("cvs", 10.0)):
+        points += [PricePoint("eucerin-cream", retailer_id, usual, START + timedelta(days=i),
+                              "https://example.com") for i in range(60)]
+    # Usual price 10, "$2 off" at 8: real. Always 8, "$2 off" at 8: theater.
+    # Usual price 10, "$5 off" at 7: discounted, but not from 12
+    sale_day = START + timedelta(days=60)
+    points += [
+        PricePoint("eucerin-cream", "walmart", 8.0, sale_day, "https://example.com", advertised_savings=2.0),
+        PricePoint("eucerin-cream", "target", 8.0, sale_day, "https://example.com", advertised_savings=2.0),
+        PricePoint("eucerin-cream", "cvs", 7.0, sale_day, "https://example.com", advertised_savings=5.0),
+        PricePoint("eucerin-cream", "amazon", 6.0, sale_day, "https://example.com", advertised_savings=1.0),
+    ]
+    db.add_price_points(points)
+    return db
+
+
+def _verdicts(db):
+    return {(v.retailer_id, v.timestamp): (v.verdict, v.reference_price)
+            for v in db.get_sale_verdicts()}
+
+
+def test_classify():
+    """Claims are judged against the reference price, with a little slack"""
+    assert classify(8.0, 2.0, None) == 'unverified'
+    assert classify(8.0, 2.0, 10.0) == 'genuine'
+    assert classify(8.0, 2.1, 10.0) == 'genuine'
+    assert classify(8.0, 3.0, 10.0) == 'inflated'
+    assert classify(9.9, 3.0, 10.0) == 'fictitious'
+
+
+def test_verdicts_full_and_incremental():
+    """Claims are checked once, re-checked after backfills, and match a full run"""
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        db = _make_db(tmp_dir)
+        db.seal_history_blocks(before_month="2025-02")
+        sale_day = START + timedelta(days=60)
+
+        first = refresh_verdicts(db.conn)
+        assert first['full'] and first['verdicts'] == {
+            'genuine': 1, 'inflated': 1, 'fictitious': 1, 'unverified': 1}
+        assert _verdicts(db)[("cvs", sale_day)] == ('inflated', 10.0)
+        claim = db.get_sale_verdicts(retailer_id="walmart")[0]
+        assert (claim.claimed_was, claim.median_30d, claim.mode_90d, claim.actual_savings) == (
+            10.0, 10.0, 10.0, 2.0)
+        assert refresh_verdicts(db.conn)['evaluated'] == 0
+
+        # Target briefly charges 12, then claims "$4 off" its usual 8
+        db.add_price_points([
+            PricePoint("eucerin-cream", "target", 12.0, sale_day + timedelta(days=1), "https://example.com"),
+            PricePoint("eucerin-cream", "target", 8.0, sale_day + timedelta(days=2), "https://example.com",
+                       advertised_savings=4.0),
+        ])
+        second = db.refresh_sale_verdicts()
+        assert (second['full'], second['evaluated']) == (False, 1)
+        assert _verdicts(db)[("target", sale_day + timedelta(days=2))] == ('fictitious', 8.0)
+
+        # A backfilled observation re-checks that series' later claims only
+        db.add_price_point(PricePoint("eucerin-cream", "walmart", 14.0, sale_day - timedelta(days=1, hours=-5),
+                                      "https://example.com"))
+        assert db.refresh_sale_verdicts()['evaluated'] == 1
+
+        incremental = _verdicts(db)
+        assert db.refresh_sale_verdicts(full=True)['evaluated'] == 5
+        assert _verdicts(db) == incremental
+        counts = db.get_sale_verdict_counts()
+        assert counts["target"] == {'genuine': 0, 'inflated': 0, 'fictitious': 2, 'unverified': 0}
+        db.close()
+
+
+def test_first_day_claims_are_unverified():
+    """With no earlier day to compare against, a claim can't be checked"""
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        db = PriceDatabase(str(Path(tmp_dir) / "prices.db"))
+        db.add_product(Product(id="eucerin-cream", name="Eucerin Cream", size="8 oz", category="skincare"))
+        db.add_price_points([
+            PricePoint("eucerin-cream", "walmart", 10.0, START, "https://example.com"),
+            # Same day: the earlier observation isn't a history yet
+            PricePoint("eucerin-cream", "walmart", 8.0, START + timedelta(hours=3), "https://example.com",
+                       advertised_savings=2.0),
+            PricePoint("eucerin-cream", "walmart", 8.0, START + timedelta(days=1), "https://example.com",
+                       advertised_savings=2.0),
+            PricePoint("eucerin-cream", "target", 8.0, START, "https://example.com", advertised_savings=2.0),
+        ])
+        refresh_verdicts(db.conn)
+        assert _verdicts(db) == {
+            ("walmart", START + timedelta(hours=3)): ('unverified', None),
+            # The first day closed at 8, so "$2 off" at 8 the next day isn't a discount
+            ("walmart", START + timedelta(days=1)): ('fictitious', 8.0),
+            ("target", START): ('unverified', None),
+        }
+        db.close()
+
+
+def test_api_reports_verdicts():
+    """The sales report and product retailer entries carry verdicts"""
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        db = _make_db(tmp_dir)
+        with api_client(db.db_path) as client:
+            product = client.get('/api/products/eucerin-cream').get_json()['product']
+            assert all(r['saleVerdict'] is None for r in product['retailers'])
+
+            db.refresh_sale_verdicts()
+            product = client.get('/api/products/eucerin-cream').get_json()['product']
+            verdicts = {r['name']: r['saleVerdict']['verdict'] for r in product['retailers']}
+            assert verdicts == {'walmart': 'genuine', 'target': 'fictitious', 'cvs': 'inflated',
+                                'amazon': 'unverified'}
+
+            report = client.get('/api/sales?verdict=fictitious').get_json()
+            assert [c['retailer'] for c in report['claims']] == ["target"]
+            assert report['claims'][0]['medians']['90d'] == 8.0
+            assert report['summary']['cvs']['inflated'] == 1
+            assert client.get('/api/sales?verdict=bogus').status_code == 400
+            db.close()
+
+
+if __name__ == "__main__":
+    test_classify()
+    test_verdicts_full_and_incremental()
+    test_first_day_claims_are_unverified()
+    test_api_reports_verdicts()
+    print("✓ All fake sale tests passed")
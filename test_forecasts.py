@@ -0,0 +1,107 @@
+"""Test buy-or-wait forecasts"""
+import sys
+import tempfile
+from datetime import date, datetime, timedelta
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent))
+
+from conftest import api_client
+from src.database import PriceDatabase
+from src.forecasts import Model, refresh_forecasts, update_model
+from src.models import Product, PricePoint
+
+START = datetime(2025, 1, 1, 9)
+
+
+def _cycle_price(i: int) -> float:
+    # 20 days at 10, then a 10-day sale at 8, every month
+    return 8.0 if i % 30 >= 20 else 10.0
+
+
+def test_incremental_updates_match_refit():
+    """Applying days in chunks gives the same model as one pass; sales make waiting pay"""
+    closes = [_cycle_price(i) for i in range(200)]
+    whole = Model(1000)
+    whole.advance(closes)
+
+    chunked = Model(1000)
+    for start in range(0, 200, 37):
+        chunked.advance(closes[start:start + 37])
+        chunked = Model.loads(chunked.first_day, chunked.settled_day, chunked.dumps())
+    assert chunked.dumps() == whole.dumps()
+    assert chunked.settled_day == 1199
+
+    # Day 199 is at the usual price, a day before a sale: waiting pays. Day
+    # 204 is mid-sale: a lower price within 30 days is unlikely
+    assert dict(zip((7, 30, 60), whole.latest()))[30][1] > 0.9
+    at_sale = Model(1000)
+    at_sale.advance([_cycle_price(i) for i in range(205)])
+    assert dict(zip((7, 30, 60), at_sale.latest()))[30][1] < 0.1
+    evaluated, mae, mape, brier = at_sale.accuracy()[1]
+    assert evaluated == 175 and 0 < mape < 0.2 and brier < 0.25
+
+    # The last observed day stays unsettled; a later close for it needs no refit
+    days = [date(2025, 1, 1).toordinal() + i for i in range(10)]
+    settled, current, refit = update_model(None, days, closes[:10])
+    assert refit and settled.settled_day == days[-2] and current.settled_day == days[-1]
+    assert update_model(settled, days, closes[:9] + [9.0])[2] is False
+    assert update_model(settled, days[:5], closes[:5])[2] is True
+
+
+def test_refresh_is_incremental_and_served_by_api():
+    """Refreshes apply only new days, refit backfilled series, and match a full refit"""
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        db = PriceDatabase(str(Path(tmp_dir) / "prices.db"))
+        for product_id in ("eucerin-cream", "cerave-lotion"):
+            db.add_product(Product(id=product_id, name=product_id.title(), size="8 oz", category="skincare"))
+        db.add_price_points([
+            PricePoint(product_id, retailer_id, _cycle_price(i), START + timedelta(days=i), "https://example.com")
+            for product_id, retailer_id in (("eucerin-cream", "walmart"), ("eucerin-cream", "target"),
+                                            ("cerave-lotion", "walmart"))
+            for i in range(120)
+        ])
+        db.seal_history_blocks(before_month="2025-03")
+
+        first = refresh_forecasts(db.conn)
+        assert (first['full'], first['series'], first['refits']) == (True, 3, 3)
+        assert refresh_forecasts(db.conn)['series'] == 0
+
+        # A new day is applied to the stored model; a backfill forces a refit
+        db.add_price_point(PricePoint("eucerin-cream", "walmart", 8.0, START + timedelta(days=120),
+                                      "https://example.com"))
+        second = db.refresh_forecasts()
+        assert (second['full'], second['series'], second['refits']) == (False, 2, 0)
+        db.add_price_point(PricePoint("eucerin-cream", "target", 9.0, START + timedelta(days=50, hours=3),
+                                      "https://example.com"))
+        third = db.refresh_forecasts()
+        assert (third['series'], third['refits']) == (2, 1)
+
+        def stored():
+            return [(f.product_id, f.retailer_id, f.horizon, f.expected_price, f.p_lower, f.evaluated,
+                     f.mape, f.brier) for f in db.get_forecasts()]
+
+        incremental = stored()
+        assert db.refresh_forecasts(full=True)['refits'] == 3
+        assert stored() == incremental
+
+        walmart = {f.horizon: f for f in db.get_forecasts("eucerin-cream", "walmart")}
+        assert walmart[30].as_of == date(2025, 5, 1) and walmart[30].current_price == 8.0
+        assert walmart[30].recommendation == 'buy' and walmart[30].evaluated == 90
+
+        with api_client(db.db_path) as client:
+            payload = client.get('/api/forecasts?product=eucerin-cream&horizon=30').get_json()
+            assert [s['retailer'] for s in payload['series']] == ["target", "walmart"]
+            forecast = payload['series'][1]['forecasts'][0]
+            assert (forecast['horizon'], forecast['pLower']) == (30, walmart[30].p_lower)
+            assert forecast['accuracy']['mape'] == walmart[30].mape
+            assert client.get('/api/forecasts?horizon=5').status_code == 400
+            assert client.get('/api/forecasts?recommendation=maybe').status_code == 400
+            assert client.get('/api/forecasts?product=missing').status_code == 404
+            db.close()
+
+
+if __name__ == "__main__":
+    test_incremental_updates_match_refit()
+    test_refresh_is_incremental_and_served_by_api()
+    print("✓ All forecast tests passed")
@@ -0,0 +1,255 @@
+"""Test sealing price history into compressed monthly blocks"""
+import sqlite3
+import sys
+import tempfile
+import zlib
+from datetime import datetime, timedelta
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent))
+
+from src.database import PriceDatabase
+from src.models import PricePoint, Product
+from src import history_blocks
+
+
+def _make_db(tmp_dir):
+    return PriceDatabase(str(Path(tmp_dir) / "prices.db"))
+
+
+def _add_history(db, start, count, product_id="eucerin-eczema-5oz", retailer_id="walmart"):
+    for i in range(count):
+        db.add_price_point(PricePoint(
+            product_id=product_id,
+            retailer_id=retailer_id,
+            price=round(12.97 + (i % 7) * 0.5 - (i % 3) * 1.01, 2),
+            timestamp=start + timedelta(hours=6 * i, microseconds=i * 137),
+            url=f"https://www.walmart.com/ip/example{i % 2}",
+            pack_size=1 + (i % 2),
+            advertised_savings=None if i % 4 else 1.25
+        ))
+
+
+def _all_rows(db, product_id="eucerin-eczema-5oz", retailer_id="walmart"):
+    return [
+        (p.price, p.timestamp, p.url, p.pack_size, p.advertised_savings)
+        for p in db.get_price_history(product_id, retailer_id)
+    ]
+
+
+def test_block_round_trip():
+    """Encoding then decoding a block reproduces the rows exactly"""
+    rows = [
+        (1, 'p', 'r', 12.97, '2025-01-01T08:00:00.123456', 'https://a', 1, None),
+        (5, 'p', 'r', 0.01, '2025-01-01T09:00:00', 'https://b', 3, 2.5),
+        (9, 'p', 'r', 1999.99, '2025-01-31T23:59:59.999999', 'https://a', 1, -0.1),
+    ]
+    payload = history_blocks.encode_block([row + (None,) for row in rows])
+    assert history_blocks.decode_block('p', 'r', payload) == [row + (None,) for row in rows]
+
+    # Unit prices are rebuilt from the stored quantity, bit for bit
+    quantity = 141.747616
+    priced = [row + (row[3] / (row[6] * quantity),) for row in rows]
+    payload = history_blocks.encode_block(priced, quantity)
+    assert history_blocks.decode_block('p', 'r', payload) == priced
+
+    # Version 1 blocks have no quantity and decode without unit prices
+    data = zlib.decompress(history_blocks.encode_block([row + (None,) for row in rows]))
+    assert data[:3] == bytes([2, 3, 0])
+    version_1 = zlib.compress(bytes([1, 3]) + data[3:])
+    assert history_blocks.decode_block('p', 'r', version_1) == [row + (None,) for row in rows]
+
+
+def test_seal_preserves_history():
+    """Sealed months read back identically through PriceDatabase"""
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        db = _make_db(tmp_dir)
+        _add_history(db, datetime(2025, 1, 1), 400)
+        before = _all_rows(db)
+        recent_before = db.get_recent_prices("eucerin-eczema-5oz", "walmart", limit=50)
+
+        summary = db.seal_history_blocks(before_month="2025-04")
+
+        assert summary['blocks'] == 3
+        assert summary['rows_skipped'] == 0
+        assert _all_rows(db) == before
+        assert db.get_recent_prices("eucerin-eczema-5oz", "walmart", limit=50) == recent_before
+        db.close()
+
+
+def test_late_rows_merge_into_sealed_month():
+    """Rows added to an already-sealed month are merged on the next seal"""
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        db = _make_db(tmp_dir)
+        _add_history(db, datetime(2025, 1, 1), 40)
+        db.seal_history_blocks(before_month="2025-03")
+        _add_history(db, datetime(2025, 1, 15, 1), 3)
+        before = _all_rows(db)
+
+        db.seal_history_blocks(before_month="2025-03")
+
+        assert _all_rows(db) == before
+        remaining = db.conn.execute("SELECT COUNT(*) FROM price_history").fetchone()[0]
+        assert remaining == 0
+        db.close()
+
+
+def test_seal_keeps_unit_prices_and_reclaims_pages():
+    """Sealed rows keep their unit prices through a resize; freed pages are returned"""
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        db = _make_db(tmp_dir)
+        db.add_product(Product(id="eucerin-eczema-5oz", name="Eucerin Eczema Relief Cream",
+                               size="5 oz", category="skincare"))
+        _add_history(db, datetime(2025, 1, 1), 2000)
+        before = list(history_blocks.iter_history_rows(db.conn, all_columns=True))
+        assert before[0][8] == before[0][3] / (before[0][6] * 141.747616)
+        pages = db.conn.execute("PRAGMA page_count").fetchone()[0]
+
+        summary = db.seal_history_blocks(before_month="2025-12")
+
+        assert summary['rows_skipped'] == 0
+        assert list(history_blocks.iter_history_rows(db.conn, all_columns=True)) == before
+        assert db.conn.execute("PRAGMA auto_vacuum").fetchone()[0] == 2
+        assert db.conn.execute("PRAGMA freelist_count").fetchone()[0] == 0
+        assert db.conn.execute("PRAGMA page_count").fetchone()[0] < pages
+
+        db.add_product(Product(id="eucerin-eczema-5oz", name="Eucerin Eczema Relief Cream",
+                               size="10 oz", category="skincare"))
+        quantity = db.conn.execute("SELECT quantity FROM products").fetchone()[0]
+        assert quantity == 283.495231
+        assert [row[8] for row in history_blocks.iter_history_rows(db.conn, all_columns=True)] == [
+            row[3] / (row[6] * quantity) for row in before]
+        db.close()
+
+
+def test_existing_databases_switch_to_incremental_vacuum_explicitly():
+    """Opening an older database never rewrites it; vacuum() does, once"""
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        db_path = str(Path(tmp_dir) / "prices.db")
+        conn = sqlite3.connect(db_path)
+        conn.execute("CREATE TABLE legacy (x)")
+        conn.close()
+        db = PriceDatabase(db_path)
+        assert db.conn.execute("PRAGMA auto_vacuum").fetchone()[0] == 0
+
+        assert history_blocks.vacuum(db.conn)
+        assert db.conn.execute("PRAGMA auto_vacuum").fetchone()[0] == 2
+        assert not history_blocks.vacuum(db.conn)
+        db.close()
+
+
+def test_recent_prices_decode_blocks_only_when_needed():
+    """Live rows covering the limit leave sealed blocks undecoded"""
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        db = _make_db(tmp_dir)
+        _add_history(db, datetime(2025, 1, 1), 300)
+        expected = db.get_recent_prices("eucerin-eczema-5oz", "walmart", limit=150)
+        db.seal_history_blocks(before_month="2025-03")
+        assert db.conn.execute("SELECT COUNT(*) FROM price_history").fetchone()[0] == 64
+
+        decoded = []
+        decode_block = history_blocks.decode_block
+
+        def counting_decode(*args):
+            decoded.append(args[:2])
+            return decode_block(*args)
+
+        history_blocks.decode_block = counting_decode
+        try:
+            assert db.get_recent_prices("eucerin-eczema-5oz", "walmart", limit=50) == expected[:50]
+            assert decoded == []
+            # Falls back to the newest blocks when the live rows come up short
+            assert db.get_recent_prices("eucerin-eczema-5oz", "walmart", limit=150) == expected
+            assert len(decoded) == 1
+            assert db.get_recent_prices("eucerin-eczema-5oz", "walmart", limit=0) == []
+        finally:
+            history_blocks.decode_block = decode_block
+        db.close()
+
+
+def test_inexact_rows_stay_in_table():
+    """Prices with fractional cents are never sealed"""
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        db = _make_db(tmp_dir)
+        db.add_price_point(PricePoint(
+            product_id="eucerin-eczema-5oz",
+            retailer_id="walmart",
+            price=12.975,
+            timestamp=datetime(2025, 1, 2),
+            url="https://www.walmart.com/ip/example"
+        ))
+
+        summary = db.seal_history_blocks(before_month="2025-02")
+
+        assert summary['blocks'] == 0
+        assert summary['rows_skipped'] == 1
+        assert db.get_price_history("eucerin-eczema-5oz", "walmart")[0].price == 12.975
+        db.close()
+
+
+def test_stats_combine_blocks_and_rows():
+    """Price stats over sealed and live data match the unsealed result"""
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        db = _make_db(tmp_dir)
+        now = datetime.utcnow()
+        _add_history(db, now - timedelta(days=80), 320)
+        before = db.get_price_stats("eucerin-eczema-5oz", "walmart", days=45)
+
+        db.seal_history_blocks(before_month=now.strftime('%Y-%m'))
+        after = db.get_price_stats("eucerin-eczema-5oz", "walmart", days=45)
+
+        assert after.observation_count == before.observation_count
+        assert after.min_price == before.min_price
+        assert after.max_price == before.max_price
+        assert abs(after.avg_price - before.avg_price) < 1e-9
+        assert after.current_price == before.current_price
+        assert after.first_seen == before.first_seen
+        assert after.last_updated == before.last_updated
+        db.close()
+
+
+def test_price_buckets_combine_blocks_and_rows():
+    """Bucketed history is the same before and after sealing"""
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        db = _make_db(tmp_dir)
+        _add_history(db, datetime(2025, 1, 1), 400)
+        _add_history(db, datetime(2025, 1, 1), 50, retailer_id="target")
+
+        weekly = db.get_price_buckets("eucerin-eczema-5oz", bucket='week')
+        first = weekly[0]
+        assert (first.retailer_id, first.start) == ("target", datetime(2024, 12, 30))
+        assert first.count == 20
+        assert first.open == 12.97
+        target_rows = [p for p in db.get_price_history("eucerin-eczema-5oz", "target")][:20]
+        assert first.close == target_rows[-1].price
+        assert first.low == min(p.price for p in target_rows)
+
+        ranged = db.get_price_buckets("eucerin-eczema-5oz", "walmart", "2025-02-01", "2025-02-28", 'month')
+        assert [(b.start, b.count) for b in ranged] == [(datetime(2025, 2, 1), 112)]
+        raw = db.get_price_buckets("eucerin-eczema-5oz", "walmart", end="2025-01-01", bucket='raw')
+        assert len(raw) == 4
+
+        def rounded(buckets):
+            # Sums over block and table rows may differ in the last bit
+            return [(b.retailer_id, b.start, b.open, b.high, b.low, b.close, round(b.avg, 9), b.count)
+                    for b in buckets]
+
+        day = db.get_price_buckets("eucerin-eczema-5oz", bucket='day')
+        db.seal_history_blocks(before_month="2025-03")
+        assert rounded(db.get_price_buckets("eucerin-eczema-5oz", bucket='week')) == rounded(weekly)
+        assert rounded(db.get_price_buckets("eucerin-eczema-5oz", bucket='day')) == rounded(day)
+        assert rounded(db.get_price_buckets("eucerin-eczema-5oz", "walmart", "2025-02-01", "2025-02-28",
+                                            'month')) == rounded(ranged)
+        db.close()
+
+
+if __name__ == "__main__":
+    test_block_round_trip()
+    test_seal_preserves_history()
+    test_late_rows_merge_into_sealed_month()
+    test_seal_keeps_unit_prices_and_reclaims_pages()
+    test_recent_prices_decode_blocks_only_when_needed()
+    test_inexact_rows_stay_in_table()
+    test_stats_combine_blocks_and_rows()
+    test_price_buckets_combine_blocks_and_rows()
+    print("✓ All history block tests passed")
@@ -0,0 +1,116 @@
+"""Test bulk price import from CSV, NDJSON and export files"""
+import json
+import sys
+import tempfile
+from datetime import datetime
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent))
+
+from src.database import PriceDatabase
+from src.import_prices import import_prices
+from src.models import Product, PricePoint
+
+
+def _make_db(tmp_dir):
+    db = PriceDatabase(str(Path(tmp_dir) / "prices.db"))
+    db.add_product(Product(
+        id="eucerin-eczema-5oz",
+        name="Eucerin Eczema Relief Cream",
+        size="5 oz",
+        category="skincare",
+        upc="072140634827",
+        walmart_url="https://www.walmart.com/ip/example"
+    ))
+    return db
+
+
+def test_csv_import_resolves_upc_and_skips_bad_rows():
+    """CSV rows resolve by UPC, invalid rows are reported, not inserted"""
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        db = _make_db(tmp_dir)
+        path = Path(tmp_dir) / "receipts.csv"
+        path.write_text(
+            "product_id,upc,retailer_id,price,timestamp,pack_size\n"
+            "eucerin-eczema-5oz,,walmart,12.97,2024-01-05T10:00:00,\n"
+            ",072140634827,Walmart,11.50,2024-02-05T10:00:00,2\n"
+            "unknown-product,,walmart,9.99,2024-02-05T10:00:00,\n"
+            "eucerin-eczema-5oz,,walmart,abc,2024-03-05T10:00:00,\n"
+        )
+
+        summary = import_prices(str(path), db=db, verbose=False)
+
+        assert summary['inserted'] == 2
+        assert summary['invalid'] == 2
+        history = db.get_price_history("eucerin-eczema-5oz", "walmart")
+        assert [p.price for p in history] == [12.97, 11.50]
+        assert history[1].pack_size == 2
+        assert history[0].url == "https://www.walmart.com/ip/example"
+        db.close()
+
+
+def test_import_deduplicates_against_rows_and_blocks():
+    """Re-importing the same observations inserts nothing"""
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        db = _make_db(tmp_dir)
+        db.add_price_point(PricePoint(
+            product_id="eucerin-eczema-5oz",
+            retailer_id="walmart",
+            price=12.97,
+            timestamp=datetime(2024, 1, 5, 10),
+            url="https://www.walmart.com/ip/example"
+        ))
+        db.seal_history_blocks(before_month="2024-02")
+        path = Path(tmp_dir) / "prices.ndjson"
+        lines = [
+            {"product_id": "eucerin-eczema-5oz", "retailer_id": "walmart",
+             "price": 12.97, "timestamp": "2024-01-05T10:00:00"},
+            {"product_id": "eucerin-eczema-5oz", "retailer_id": "target",
+             "price": 13.49, "timestamp": "2024-01-06T10:00:00"},
+            {"product_id": "eucerin-eczema-5oz", "retailer_id": "target",
+             "price": 13.49, "timestamp": "2024-01-06T10:00:00"},
+        ]
+        path.write_text('\n'.join(json.dumps(line) for line in lines) + '\n')
+
+        first = import_prices(str(path), db=db, verbose=False)
+        second = import_prices(str(path), db=db, verbose=False)
+
+        assert (first['inserted'], first['duplicates']) == (1, 2)
+        assert (second['inserted'], second['duplicates']) == (0, 3)
+        db.close()
+
+
+def test_export_json_round_trip():
+    """A prices_export.json file imports into an empty database"""
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        db = _make_db(tmp_dir)
+        path = Path(tmp_dir) / "prices_export.json"
+        path.write_text(json.dumps({
+            "generated_at": "2025-11-27T19:37:07.401762",
+            "products": [{
+                "id": "eucerin-eczema-5oz",
+                "prices": [{
+                    "retailer_id": "walmart",
+                    "history": [
+                        {"price": 12.97, "timestamp": "2025-11-16T19:05:05.302712",
+                         "pack_size": 1, "advertised_savings": None},
+                        {"price": 12.47, "timestamp": "2025-11-17T19:05:05.302712",
+                         "pack_size": 1, "advertised_savings": 0.5},
+                    ]
+                }]
+            }],
+            "retailers": []
+        }))
+
+        summary = import_prices(str(path), db=db, verbose=False)
+
+        assert summary['inserted'] == 2
+        assert db.get_recent_prices("eucerin-eczema-5oz", "walmart", 1)[0].advertised_savings == 0.5
+        db.close()
+
+
+if __name__ == "__main__":
+    test_csv_import_resolves_upc_and_skips_bad_rows()
+    test_import_deduplicates_against_rows_and_blocks()
+    test_export_json_round_trip()
+    print("✓ All import tests passed")
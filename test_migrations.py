@@ -0,0 +1,67 @@
+"""Test the versioned schema migrations"""
+import sqlite3
+import sys
+import tempfile
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent))
+
+from src import migrations
+from src.database import PriceDatabase
+
+
+def test_upgrades_legacy_products_table():
+    """A products table from before the URL columns is upgraded in place"""
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        db_path = str(Path(tmp_dir) / "prices.db")
+        conn = sqlite3.connect(db_path)
+        conn.execute("CREATE TABLE products (id TEXT PRIMARY KEY, name TEXT NOT NULL, "
+                     "size TEXT NOT NULL, category TEXT NOT NULL)")
+        conn.execute("INSERT INTO products VALUES ('p1', 'Lotion', '5 oz', 'skincare')")
+        conn.commit()
+        conn.close()
+
+        db = PriceDatabase(db_path)
+
+        assert migrations.current_version(db.conn) == migrations.MIGRATIONS[-1].version
+        product = db.get_product('p1')
+        assert product.brand is None and product.created_at is not None
+        assert migrations.migrate(db.conn) == []
+        db.close()
+
+
+def test_backfill_resumes_after_interruption():
+    """A failed backfill picks up after the last committed batch"""
+    conn = sqlite3.connect(":memory:")
+    conn.execute("CREATE TABLE items (value INTEGER, doubled INTEGER)")
+    conn.executemany("INSERT INTO items (value) VALUES (?)", [(i,) for i in range(25)])
+    conn.commit()
+    migrations._ensure_version_tables(conn)
+    seen = []
+
+    def process(conn, rows):
+        if rows[0][0] > 10 and not seen:
+            seen.append(True)
+            raise RuntimeError("interrupted")
+        conn.executemany("UPDATE items SET doubled = ? WHERE rowid = ?",
+                         [(row[1] * 2, row[0]) for row in rows])
+
+    try:
+        migrations.backfill(conn, 99, "items", process, report=lambda msg: None,
+                            batch_size=10, columns="value")
+    except RuntimeError:
+        conn.rollback()
+
+    assert conn.execute("SELECT COUNT(*) FROM items WHERE doubled IS NOT NULL").fetchone()[0] == 10
+
+    migrations.backfill(conn, 99, "items", process, report=lambda msg: None,
+                        batch_size=10, columns="value")
+
+    assert conn.execute("SELECT COUNT(*) FROM items WHERE doubled = value * 2").fetchone()[0] == 25
+    conn.close()
+
+
+if __name__ == "__main__":
+    test_upgrades_legacy_products_table()
+    test_backfill_resumes_after_interruption()
+    print("✓ All migration tests passed")
@@ -0,0 +1,71 @@
+"""Test the slotted record models returned by PriceDatabase"""
+import sys
+import tempfile
+from datetime import datetime
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent))
+
+from src.database import PriceDatabase
+from src.models import Product, PricePoint, PricePointRecord, ProductRecord
+
+
+def test_record_parses_timestamp_lazily():
+    """Timestamps stay as strings until first accessed"""
+    record = PricePointRecord('p', 'walmart', 12.97, '2025-01-02T03:04:05.000006', 'https://a', 2)
+
+    assert record._timestamp == '2025-01-02T03:04:05.000006'
+    assert record.timestamp == datetime(2025, 1, 2, 3, 4, 5, 6)
+    assert isinstance(record._timestamp, datetime)
+    assert record.price_per_unit == 6.485
+    assert str(record) == "$12.97 (2-pack) @ walmart"
+    assert not hasattr(record, '__dict__')
+
+
+def test_record_matches_dataclass():
+    """Records compare equal to the dataclass they mirror"""
+    record = PricePointRecord('p', 'walmart', 12.97, '2025-01-02T03:04:05', 'https://a')
+    model = PricePoint('p', 'walmart', 12.97, datetime(2025, 1, 2, 3, 4, 5), 'https://a')
+
+    assert record == model
+    assert model == record
+    assert record.to_model() == model
+
+
+def test_database_streams_records():
+    """PriceDatabase readers yield slotted records"""
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        db = PriceDatabase(str(Path(tmp_dir) / "prices.db"))
+        product = Product(
+            id="eucerin-eczema-5oz",
+            name="Eucerin Eczema Relief Cream",
+            size="5 oz",
+            category="skincare",
+            walmart_url="https://www.walmart.com/ip/example"
+        )
+        db.add_product(product)
+        for day in range(1, 4):
+            db.add_price_point(PricePoint(
+                product_id=product.id,
+                retailer_id="walmart",
+                price=12.97 + day,
+                timestamp=datetime(2025, 1, day),
+                url=product.walmart_url
+            ))
+
+        products = list(db.iter_products())
+        history = list(db.iter_price_history(product.id))
+
+        assert isinstance(products[0], ProductRecord)
+        assert products[0].get_retailer_url("walmart") == product.walmart_url
+        assert db.get_product(product.id).created_at is not None
+        assert [p.timestamp.day for p in history] == [1, 2, 3]
+        assert db.get_recent_prices(product.id, "walmart", limit=1)[0].price == 15.97
+        db.close()
+
+
+if __name__ == "__main__":
+    test_record_parses_timestamp_lazily()
+    test_record_matches_dataclass()
+    test_database_streams_records()
+    print("✓ All model tests passed")
@@ -0,0 +1,107 @@
+"""Test opt-in SQL query profiling"""
+import os
+import sqlite3
+import sys
+import tempfile
+from datetime import datetime
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent))
+
+from conftest import api_client
+from src import query_profiler
+from src.database import PriceDatabase
+from src.models import Product, PricePoint
+
+
+def test_profiling_connection_aggregates_per_statement():
+    """Runs of one statement share an entry with its count, timings and rows"""
+    profiler = query_profiler.get_profiler()
+    profiler.reset()
+    conn = query_profiler.connect(":memory:", profile=True)
+    assert isinstance(conn, query_profiler.ProfilingConnection)
+
+    conn.execute("CREATE TABLE prices (retailer TEXT, price REAL)")
+    conn.executemany("INSERT INTO prices VALUES (?, ?)",
+                     [("target", 8.99), ("walmart", 7.49), ("cvs", 9.99)])
+    for retailer in ("target", "walmart"):
+        assert conn.execute("SELECT price FROM prices WHERE retailer = ?", (retailer,)).fetchall()
+    # Iterated rows are counted when the cursor is exhausted, in the same
+    # entry as fetchall() after whitespace is collapsed
+    assert len(list(conn.cursor().execute("SELECT  price\n FROM prices WHERE retailer = ?", ("cvs",)))) == 1
+    assert len(list(conn.execute("SELECT * FROM prices"))) == 3
+    conn.close()
+
+    stats = {entry['sql']: entry for entry in profiler.summary()}
+    insert = stats["INSERT INTO prices VALUES (?, ?)"]
+    assert (insert['count'], insert['rows']) == (1, 3)
+    lookup = stats["SELECT price FROM prices WHERE retailer = ?"]
+    assert (lookup['count'], lookup['rows']) == (3, 3)
+    assert lookup['max_ms'] <= lookup['total_ms']
+    assert lookup['avg_ms'] == lookup['total_ms'] / 3
+    assert stats["SELECT * FROM prices"]['rows'] == 3
+
+    profiler.reset()
+    assert profiler.summary() == []
+
+
+def test_connections_unwrapped_when_profiling_is_off():
+    """Without PRICE_DB_PROFILE, connections are plain and nothing is recorded"""
+    previous = os.environ.pop('PRICE_DB_PROFILE', None)
+    try:
+        assert not query_profiler.profiling_enabled()
+        profiler = query_profiler.get_profiler()
+        profiler.reset()
+        conn = query_profiler.connect(":memory:")
+        assert type(conn) is sqlite3.Connection
+        conn.execute("SELECT 1").fetchall()
+        conn.close()
+        assert profiler.summary() == []
+
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            db = PriceDatabase(str(Path(tmp_dir) / "prices.db"))
+            assert type(db.conn) is sqlite3.Connection
+            db.close()
+    finally:
+        if previous is not None:
+            os.environ['PRICE_DB_PROFILE'] = previous
+
+
+def test_query_stats_endpoint():
+    """/api/debug/query-stats serves the profile when enabled and 404s otherwise"""
+    previous = os.environ.get('PRICE_DB_PROFILE')
+    profiler = query_profiler.get_profiler()
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        db = PriceDatabase(str(Path(tmp_dir) / "prices.db"))
+        db.add_product(Product(id="eucerin-cream", name="Eucerin Eczema Relief Cream",
+                               size="8 oz", category="skincare"))
+        db.add_price_point(PricePoint("eucerin-cream", "target", 8.99,
+                                      datetime(2025, 1, 1), "https://example.com"))
+        db.close()
+        with api_client(db.db_path) as client:
+            try:
+                # Connections opened while profiling is on are profiled
+                os.environ['PRICE_DB_PROFILE'] = '1'
+                profiler.reset()
+                assert client.get('/api/products/eucerin-cream').status_code == 200
+                payload = client.get('/api/debug/query-stats?reset=1').get_json()
+                assert payload['slowMs'] == profiler.slow_ms
+                assert payload['queries'] and all(q['count'] >= 1 for q in payload['queries'])
+                assert any('FROM products' in q['sql'] for q in payload['queries'])
+                assert profiler.summary() == []
+
+                os.environ['PRICE_DB_PROFILE'] = '0'
+                assert client.get('/api/debug/query-stats').status_code == 404
+            finally:
+                if previous is None:
+                    os.environ.pop('PRICE_DB_PROFILE', None)
+                else:
+                    os.environ['PRICE_DB_PROFILE'] = previous
+                profiler.reset()
+
+
+if __name__ == "__main__":
+    test_profiling_connection_aggregates_per_statement()
+    test_connections_unwrapped_when_profiling_is_off()
+    test_query_stats_endpoint()
+    print("✓ All query profiler tests passed")
@@ -0,0 +1,107 @@
+"""Test seasonal low-price detection"""
+import sys
+import tempfile
+from datetime import datetime, timedelta
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent))
+
+from conftest import api_client
+from src.database import PriceDatabase
+from src.models import Product, PricePoint
+from src.seasonality import low_seasons, refresh_seasonality
+
+START = datetime(2023, 1, 1, 9)
+
+
+def _seasonal_price(day: datetime) -> float:
+    # Holiday sale every November and December, small dip on Tuesdays
+    if day.month in (11, 12):
+        return 8.0
+    return 9.5 if day.weekday() == 1 else 10.0
+
+
+def _make_db(tmp_dir):
+    db = PriceDatabase(str(Path(tmp_dir) / "prices.db"))
+    for product_id in ("eucerin-cream", "cerave-lotion", "aveeno-lotion"):
+        db.add_product(Product(id=product_id, name=product_id.title(), size="8 oz", category="skincare"))
+    points = []
+    for i in range(730):
+        day = START + timedelta(days=i)
+        points += [
+            PricePoint("eucerin-cream", "walmart", _seasonal_price(day), day, "https://example.com"),
+            PricePoint("eucerin-cream", "target", 10.0, day, "https://example.com"),
+            PricePoint("cerave-lotion", "walmart", _seasonal_price(day) + 1.0, day, "https://example.com"),
+        ]
+    # Too little history of its own: falls back to the category
+    points += [PricePoint("aveeno-lotion", "cvs", 10.0, datetime(2025, 2, 1, 9) + timedelta(days=i),
+                          "https://example.com") for i in range(40)]
+    db.add_price_points(points)
+    return db
+
+
+def test_detects_low_months_weekdays_and_cycle():
+    """Recurring dips are found per series and combined per category"""
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        db = _make_db(tmp_dir)
+        db.seal_history_blocks(before_month="2024-06")
+
+        first = refresh_seasonality(db.conn)
+        assert (first['full'], first['series'], first['categories']) == (True, 4, 1)
+        series = {(s.product_id, s.retailer_id): s for s in db.get_seasonality()}
+        walmart = series[("eucerin-cream", "walmart")]
+        assert (walmart.low_months, walmart.low_weekdays) == ([11, 12], [1])
+        assert walmart.month_confidence == 1.0 and 0.5 < walmart.weekday_confidence < 1.0
+        assert walmart.cycle_days == 365
+        flat = series[("eucerin-cream", "target")]
+        assert (flat.low_months, flat.month_confidence, flat.cycle_days) == ([], None, None)
+
+        # Two of the three series observing Nov/Dec have them low
+        category = db.get_category_seasonality("skincare")[0]
+        assert (category.series, category.low_months, category.month_confidence) == (4, [11, 12], 0.667)
+
+        seasons = low_seasons(db.conn)
+        assert seasons["eucerin-cream"]["retailer"] == "walmart"
+        assert seasons["eucerin-cream"]["label"] == "Nov, Dec · Tue"
+        assert seasons["aveeno-lotion"]["source"] == "category"
+        db.close()
+
+
+def test_refresh_is_incremental_and_served_by_api():
+    """Only products with new rows are recomputed; payloads carry the stored result"""
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        db = _make_db(tmp_dir)
+        with api_client(db.db_path) as client:
+            assert client.get('/api/products/eucerin-cream').get_json()['product']['lowSeason'] is None
+
+            db.refresh_seasonality()
+            assert refresh_seasonality(db.conn)['series'] == 0
+            before = {(s.product_id, s.retailer_id): s for s in db.get_seasonality()}
+
+            db.add_price_point(PricePoint("aveeno-lotion", "cvs", 9.0, datetime(2025, 3, 15, 9),
+                                          "https://example.com"))
+            second = db.refresh_seasonality()
+            assert (second['full'], second['series'], second['categories']) == (False, 1, 1)
+            after = {(s.product_id, s.retailer_id): s for s in db.get_seasonality()}
+            assert after[("cerave-lotion", "walmart")] == before[("cerave-lotion", "walmart")]
+            assert after[("aveeno-lotion", "cvs")].days == 43
+
+            product = client.get('/api/products/eucerin-cream').get_json()['product']
+            assert product['lowSeason']['months'] == [11, 12]
+            assert product['lowSeason']['source'] == 'series'
+            dashboard = client.get('/api/dashboard-data').get_json()
+            sources = {p['id']: p['lowSeason']['source'] for b in dashboard['brands'] for p in b['products']}
+            assert sources == {"eucerin-cream": "series", "cerave-lotion": "series", "aveeno-lotion": "category"}
+
+            payload = client.get('/api/seasonality?product=cerave-lotion').get_json()
+            assert [s['retailer'] for s in payload['series']] == ["walmart"]
+            assert payload['series'][0]['cycleDays'] == 365
+            assert [c['category'] for c in payload['categories']] == ["skincare"]
+            assert client.get('/api/seasonality?product=missing').status_code == 404
+            db.close()
+
+
+if __name__ == "__main__":
+    test_detects_low_months_weekdays_and_cycle()
+    test_refresh_is_incremental_and_served_by_api()
+    print("✓ All seasonality tests passed")
@@ -0,0 +1,64 @@
+"""Test compact serialization and the columnar export"""
+import gzip
+import json
+import sys
+import tempfile
+from datetime import datetime, timedelta
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent))
+
+from src.database import PriceDatabase
+from src.export import build_export, export_to_json
+from src.models import Product, PricePoint
+from src.serialization import columnar, compress, dumps, epoch_ms
+
+
+def test_columnar_and_epoch_ms():
+    """Points become parallel arrays with exact wall-clock epoch times"""
+    points = [
+        {'date': '2025-01-01T00:00:00', 'price': 9.99},
+        {'date': '2025-01-01T10:57:50.970471', 'price': 8.49},
+    ]
+    columns = columnar(points)
+
+    assert columns == {'t': [1735689600000, 1735729070970], 'price': [9.99, 8.49]}
+    assert epoch_ms(datetime(2025, 1, 1, 10, 57, 50, 970999)) == 1735729070970
+    assert columnar([]) == {'t': []}
+    assert json.loads(dumps(columns)) == columns
+    assert b' ' not in dumps({'a': [1, 2]})
+    assert gzip.decompress(compress(b'abc', 'gzip')) == b'abc'
+
+
+def test_columnar_export_is_smaller():
+    """The columnar export carries the same prices in fewer bytes"""
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        db = PriceDatabase(str(Path(tmp_dir) / "prices.db"))
+        db.add_product(Product(id="eucerin-cream", name="Eucerin Eczema Relief Cream",
+                               size="8 oz", category="skincare"))
+        db.conn.execute("INSERT INTO retailers (id, name, base_url) VALUES ('target', 'Target', 'https://target.com')")
+        now = datetime.now()
+        db.add_price_points([
+            PricePoint("eucerin-cream", "target", 8.0 + i / 10, now - timedelta(days=1, hours=i),
+                       "https://example.com")
+            for i in range(20)
+        ])
+
+        rows = build_export(db, 'rows')['products'][0]['prices'][0]['history']
+        history = build_export(db, 'columnar')['products'][0]['prices'][0]['history']
+        assert history['price'] == [p['price'] for p in rows]
+        assert history['t'] == [epoch_ms(p['timestamp']) for p in rows]
+
+        rows_path = str(Path(tmp_dir) / "rows.json")
+        columnar_path = str(Path(tmp_dir) / "columnar.json")
+        export_to_json(rows_path, 'rows', db=db)
+        export_to_json(columnar_path, 'columnar', gzip_copy=True, db=db)
+        assert Path(columnar_path).stat().st_size < Path(rows_path).stat().st_size
+        assert json.loads(gzip.decompress(Path(columnar_path + '.gz').read_bytes()))['format'] == 'columnar'
+        db.close()
+
+
+if __name__ == "__main__":
+    test_columnar_and_epoch_ms()
+    test_columnar_export_is_smaller()
+    print("✓ All serialization tests passed")
@@ -0,0 +1,149 @@
+"""Test the in-memory series store against the SQL-backed builders"""
+import random
+import sys
+import tempfile
+from datetime import datetime, timedelta
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent))
+
+from conftest import api_client
+from dashboard import api
+from src.dashboard_data import build_catalog, build_dashboard_data, build_product_detail
+from src.database import PriceDatabase
+from src.downsample import in_range
+from src.models import Product, PricePoint
+from src.series_store import SeriesStore, StoredSeries
+
+PRODUCTS = ("eucerin-cream", "cerave-lotion", "aveeno-wash")
+
+
+def _make_db(tmp_dir):
+    db = PriceDatabase(str(Path(tmp_dir) / "prices.db"))
+    random.seed(7)
+    for product_id in PRODUCTS:
+        db.add_product(Product(id=product_id, name=product_id.title(), size="8 oz",
+                               category="skincare", brand=product_id.split('-')[0].title()))
+    db.add_price_points([
+        PricePoint(product_id, retailer_id, random.choice([7.99, 8.49, 8.99, 9.49]),
+                   datetime(2025, 1, 1) + timedelta(hours=5 * i, seconds=random.randint(0, 59),
+                                                    microseconds=random.choice([0, 123456])),
+                   "https://example.com")
+        for product_id in PRODUCTS[:2]
+        for retailer_id in ("walmart", "target")
+        for i in range(400)
+    ])
+    return db
+
+
+def _assert_same(db, store):
+    for points, start, end in ((None, None, None), (50, None, None),
+                               (None, "2025-01-15", "2025-02-03"),
+                               (40, "2025-01-10T07:30", "2025-02-01T12")):
+        assert (build_dashboard_data(db.conn, points, start, end, store=store)
+                == build_dashboard_data(db.conn, points, start, end))
+    for product_id in PRODUCTS:
+        assert (build_product_detail(db.conn, product_id, 100, columnar=True, store=store)
+                == build_product_detail(db.conn, product_id, 100, columnar=True))
+    # SQLite's SUM() is compensated; running sums differ in the last bits
+    assert _rounded(build_catalog(db.conn, store=store)) == _rounded(build_catalog(db.conn))
+
+
+def _rounded(value):
+    if isinstance(value, float):
+        return round(value, 9)
+    if isinstance(value, dict):
+        return {k: _rounded(v) for k, v in value.items()}
+    if isinstance(value, list):
+        return [_rounded(v) for v in value]
+    return value
+
+
+def test_store_matches_sql_and_tails_new_rows():
+    """Charts, stats and catalog totals match SQL, before and after new rows"""
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        db = _make_db(tmp_dir)
+        db.seal_history_blocks(before_month="2025-02")
+        store = SeriesStore.load(db.conn)
+        assert store.observations == 1600
+        assert store.describe()['bytesPerObservation'] > 0
+        _assert_same(db, store)
+
+        db.add_price_points([
+            PricePoint("eucerin-cream", "walmart", 6.49, datetime(2025, 6, 1), "https://example.com"),
+            # Backfilled: older than everything already loaded
+            PricePoint("eucerin-cream", "walmart", 6.49, datetime(2024, 12, 1), "https://example.com"),
+            PricePoint("aveeno-wash", "cvs", 5.99, datetime(2025, 6, 1, 9), "https://example.com"),
+        ])
+        assert store.refresh(db.conn) == 3
+        assert store.refresh(db.conn) == 0
+        series = {s.retailer_id: s for s in store.product_series("eucerin-cream")}['walmart']
+        assert series.latest == ("2025-06-01T00:00:00", 6.49)
+        assert (series.low, series.low_date) == (6.49, "2024-12-01T00:00:00")
+        _assert_same(db, store)
+
+        # Rows sealed before the next refresh are read from their blocks
+        db.add_price_points([
+            PricePoint("eucerin-cream", "target", 7.25, datetime(2025, 1, 20, 8), "https://example.com"),
+            PricePoint("aveeno-wash", "cvs", 5.49, datetime(2025, 6, 2, 9), "https://example.com"),
+        ])
+        db.seal_history_blocks(before_month="2025-02")
+        assert store.refresh(db.conn) == 2
+        assert store.refresh(db.conn) == 0
+        _assert_same(db, store)
+        db.close()
+
+
+def test_range_slices_match_in_range():
+    """Binary-searched ranges select exactly what in_range() does"""
+    series = StoredSeries("walmart")
+    dates = []
+    for i in range(300):
+        date = (datetime(2025, 1, 1) + timedelta(minutes=97 * i, microseconds=i % 3 * 500000)).isoformat()
+        dates.append(date)
+        series.add(date, 10.0)
+    series.add("2025-01-03 04:05:06", 9.0)  # Not canonical: kept verbatim
+    dates.append("2025-01-03 04:05:06")
+
+    for start, end in ((None, None), ("2025-01-05", "2025-01-09"), ("2025-01-05T10:00:00", None),
+                       (None, "2025-01-10T13"), ("2025-01-02T00:01", "2025-01-06T12:30:00.5"),
+                       ("2025-01-02", "2025-01-03T04:05:06")):
+        lo, hi = series.index_range(start, end)
+        got = [series.date(t) for t in series.times[lo:hi]]
+        assert sorted(got) == sorted(d for d in dates if in_range(d.replace(' ', 'T'), start, end))
+    assert "2025-01-03 04:05:06" in [p['date'] for p in series.chart()]
+
+
+def test_api_serves_from_store():
+    """With the store enabled the API returns the same payloads and stays current"""
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        db = _make_db(tmp_dir)
+        with api_client(db.db_path) as client:
+            from_sql = client.get('/api/dashboard-data?points=50').get_json()
+
+            api.SERIES_STORE_ENABLED = True
+            api._series_stores.clear()
+            api._response_cache.clear()
+            try:
+                assert client.get('/api/dashboard-data?points=50').get_json() == from_sql
+                assert client.get('/api/debug/series-store').get_json()['observations'] == 1600
+
+                db.add_price_point(PricePoint("cerave-lotion", "cvs", 4.99, datetime(2025, 6, 1),
+                                              "https://example.com"))
+                detail = client.get('/api/products/cerave-lotion').get_json()['product']
+                assert detail['retailers'][0] == {
+                    'name': "cvs", 'high': 4.99, 'highDate': "2025-06-01T00:00:00", 'low': 4.99,
+                    'lowDate': "2025-06-01T00:00:00", 'avg': 4.99, 'url': '#', 'saleVerdict': None}
+                catalog = client.get('/api/catalog').get_json()
+                assert catalog['products'][0]['id'] == "cerave-lotion"
+            finally:
+                api.SERIES_STORE_ENABLED = False
+                api._series_stores.clear()
+            db.close()
+
+
+if __name__ == "__main__":
+    test_store_matches_sql_and_tails_new_rows()
+    test_range_slices_match_in_range()
+    test_api_serves_from_store()
+    print("✓ All series store tests passed")
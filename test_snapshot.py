@@ -0,0 +1,111 @@
+"""Test the static dashboard snapshot"""
+import gzip
+import json
+import sys
+import tempfile
+from datetime import datetime, timedelta
+from pathlib import Path
+from urllib.parse import quote
+
+sys.path.insert(0, str(Path(__file__).parent))
+
+from dashboard import api
+from src.dashboard_data import build_product_detail
+from src.database import PriceDatabase
+from src.models import Product, PricePoint
+from src.snapshot import SNAPSHOT_POINTS, read_manifest, write_snapshot
+
+
+def _make_db(tmp_dir):
+    db = PriceDatabase(str(Path(tmp_dir) / "prices.db"))
+    for product_id, name in (("eucerin-cream", "Eucerin Eczema Relief Cream"),
+                             ("cerave-lotion", "CeraVe Daily Moisturizing Lotion")):
+        db.add_product(Product(id=product_id, name=name, size="8 oz", category="skincare"))
+        db.add_price_points([
+            PricePoint(product_id, "target", 8.0 + i / 10, datetime(2025, 1, 1) + timedelta(hours=i),
+                       "https://example.com")
+            for i in range(300)
+        ])
+    return db
+
+
+def test_snapshot_matches_api_and_rewrites_only_changes():
+    """Snapshot files hold the API's payloads; unchanged products keep their files"""
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        db = _make_db(tmp_dir)
+        output = Path(tmp_dir) / "snapshot"
+
+        first = write_snapshot(db, str(output))
+        assert read_manifest(str(output))['products'] == first['products']
+        assert first['cursor'] == 600
+        catalog = json.loads((output / first['files']['catalog']).read_bytes())
+        assert sorted(p['id'] for p in catalog['products']) == ["cerave-lotion", "eucerin-cream"]
+
+        detail = json.loads(gzip.decompress(
+            (output / (first['products']['eucerin-cream'] + '.gz')).read_bytes()))
+        expected = build_product_detail(db.conn, "eucerin-cream", SNAPSHOT_POINTS, columnar=True)
+        assert detail == json.loads(json.dumps({'product': expected}))
+        assert len(detail['product']['chartData'][0]['t']) <= SNAPSHOT_POINTS
+
+        db.add_price_point(PricePoint("eucerin-cream", "target", 6.5, datetime(2025, 2, 1),
+                                      "https://example.com"))
+        second = write_snapshot(db, str(output))
+        assert second['products']['cerave-lotion'] == first['products']['cerave-lotion']
+        assert second['products']['eucerin-cream'] != first['products']['eucerin-cream']
+        # The previous snapshot's files stay until the next run
+        assert (output / first['products']['eucerin-cream']).exists()
+
+        third = write_snapshot(db, str(output))
+        assert not (output / first['products']['eucerin-cream']).exists()
+        assert (output / third['products']['eucerin-cream']).exists()
+        assert not list(output.glob('**/*.tmp'))
+        db.close()
+
+
+def test_api_serves_precompressed_snapshot():
+    """Snapshot files are served precompressed and cached as immutable"""
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        db = _make_db(tmp_dir)
+        db.add_product(Product(id="../cerave/cream 8oz", name="CeraVe Cream", size="8 oz", category="skincare"))
+        db.add_price_point(PricePoint("../cerave/cream 8oz", "target", 9.0, datetime(2025, 1, 1),
+                                      "https://example.com"))
+        manifest = write_snapshot(db, str(Path(tmp_dir) / "snapshot"))
+        db.close()
+        # IDs are quoted into one file name inside products/
+        odd = manifest['products']["../cerave/cream 8oz"]
+        assert odd.startswith("products/..%2Fcerave%2Fcream%208oz.")
+        assert (Path(tmp_dir) / "snapshot" / odd).is_file()
+
+        static_dir = api.STATIC_DIR
+        api.STATIC_DIR = tmp_dir
+        try:
+            client = api.app.test_client()
+            index = client.get('/snapshot/manifest.json')
+            assert index.headers['Cache-Control'] == 'no-cache'
+            assert index.get_json()['products'] == manifest['products']
+
+            path = '/snapshot/' + manifest['products']['cerave-lotion']
+            compressed = client.get(path, headers={'Accept-Encoding': 'gzip'})
+            assert compressed.headers['Content-Encoding'] == 'gzip'
+            assert compressed.mimetype == 'application/json'
+            assert 'immutable' in compressed.headers['Cache-Control']
+            plain = client.get(path)
+            assert 'Content-Encoding' not in plain.headers
+            assert json.loads(gzip.decompress(compressed.data)) == plain.get_json()
+            refused = client.get(path, headers={'Accept-Encoding': 'gzip;q=0'})
+            assert 'Content-Encoding' not in refused.headers
+            detail = client.get('/snapshot/' + quote(odd))
+            assert detail.get_json()['product']['id'] == "../cerave/cream 8oz"
+            refused.close()
+            detail.close()
+            compressed.close()
+            plain.close()
+            index.close()
+        finally:
+            api.STATIC_DIR = static_dir
+
+
+if __name__ == "__main__":
+    test_snapshot_matches_api_and_rewrites_only_changes()
+    test_api_serves_precompressed_snapshot()
+    print("✓ All snapshot tests passed")
@@ -0,0 +1,141 @@
+"""Test product size parsing and per-unit prices"""
+import sys
+import tempfile
+from datetime import datetime, timedelta
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent))
+
+from conftest import api_client
+from dashboard import api
+from src.database import PriceDatabase
+from src.models import Product, PricePoint
+from src.units import Size, parse_size
+
+START = datetime(2025, 6, 1, 9)
+
+
+def test_parse_size():
+    """Free-text sizes become a count, an amount and a total in a base unit"""
+    assert parse_size("5 oz") == Size(1, 5.0, 'oz', 141.747616, 'g')
+    assert parse_size("16.9 fl oz (pump bottle)") == Size(1, 16.9, 'fl oz', 499.792650, 'ml')
+    assert parse_size("2x2.5 mL") == Size(2, 2.5, 'ml', 5.0, 'ml')
+    assert parse_size("2.5ml (2 count twin pack)") == parse_size("2x2.5 mL")
+    assert parse_size("Pack of 2, 8 oz").quantity == parse_size("16 oz").quantity
+    assert parse_size("1 Liter") == Size(1, 1.0, 'l', 1000.0, 'ml')
+    assert parse_size("30 ct") == Size(1, 30.0, 'ct', 30.0, 'ct')
+    assert str(parse_size("2x2.5 mL")) == "2x2.5 ml"
+    assert parse_size("Family size") is None and parse_size(None) is None
+
+
+def test_unit_prices_maintained_and_ranked():
+    """Inserts store per-unit prices; size changes and migrations recompute them"""
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        db_path = str(Path(tmp_dir) / "prices.db")
+        db = PriceDatabase(db_path)
+        db.add_products([
+            Product(id="cream-8oz", name="Cream", size="8 oz", category="skincare"),
+            Product(id="cream-16oz", name="Cream", size="16 oz", category="skincare"),
+            Product(id="lotion", name="Lotion", size="16.9 fl oz", category="skincare"),
+            Product(id="drops", name="Drops", size="2x2.5 mL", category="eye-drops"),
+            Product(id="mystery", name="Mystery", size="One jar", category="skincare"),
+        ])
+        db.add_price_points([
+            PricePoint(product_id, retailer_id, price, START + timedelta(days=i), "https://example.com")
+            for i in range(3)
+            for product_id, retailer_id, price in (
+                ("cream-8oz", "walmart", 8.0), ("cream-8oz", "target", 6.0 + i),
+                ("cream-16oz", "walmart", 12.0), ("lotion", "cvs", 10.0),
+                ("drops", "cvs", 10.0), ("mystery", "cvs", 1.0),
+            )
+        ])
+        # A two-pack of the 16 oz cream: the best value per ounce
+        db.add_price_point(PricePoint("cream-16oz", "amazon", 20.0, START + timedelta(days=3),
+                                      "https://example.com", pack_size=2))
+
+        best = db.get_best_unit_prices('oz')
+        assert [(o.product_id, o.retailer_id, o.unit_price) for o in best] == [
+            ("cream-16oz", "amazon", 0.625), ("cream-16oz", "walmart", 0.75),
+            ("cream-8oz", "target", 1.0), ("cream-8oz", "walmart", 1.0),
+        ]
+        assert best[0].price == 20.0 and best[0].pack_size == 2
+        assert [o.product_id for o in db.get_best_unit_prices('fl oz')] == ["lotion", "drops"]
+        assert db.get_best_unit_prices('ml', category="eye-drops")[0].unit_price == 2.0
+        assert db.get_best_unit_prices('oz', limit=1)[0].retailer_id == "amazon"
+
+        # Relabelled as 4 oz: stored observations are repriced
+        db.add_product(Product(id="cream-8oz", name="Cream", size="4 oz", category="skincare"))
+        assert {o.unit_price for o in db.get_best_unit_prices('oz', limit=10)
+                if o.product_id == "cream-8oz"} == {2.0}
+
+        # A late backfill of an older price doesn't replace the latest one
+        db.add_price_point(PricePoint("cream-16oz", "amazon", 40.0, START, "https://example.com"))
+        assert db.get_best_unit_prices('oz', limit=1)[0].price == 20.0
+
+        # Databases from before per-unit prices are backfilled on open,
+        # including series whose latest month is sealed
+        db.seal_history_blocks(before_month="2025-06")
+        db.add_price_point(PricePoint("cream-8oz", "cvs", 3.2, datetime(2025, 5, 1), "https://example.com"))
+        db.seal_history_blocks(before_month="2025-06")
+        db.conn.execute("UPDATE price_history SET unit_price = NULL")
+        db.conn.execute("UPDATE products SET quantity = NULL, unit = NULL")
+        db.conn.execute("DELETE FROM latest_unit_prices")
+        db.conn.execute("DELETE FROM schema_version WHERE version >= 11")
+        db.conn.execute("DELETE FROM migration_progress WHERE version >= 11")
+        db.conn.commit()
+        db.close()
+        db = PriceDatabase(db_path)
+        assert [(o.product_id, o.retailer_id, o.unit_price) for o in db.get_best_unit_prices('oz')] == [
+            ("cream-16oz", "amazon", 0.625), ("cream-16oz", "walmart", 0.75),
+            ("cream-8oz", "cvs", 0.8), ("cream-8oz", "target", 2.0), ("cream-8oz", "walmart", 2.0),
+        ]
+        assert "cvs" not in {o.retailer_id for o in db.get_best_unit_prices('oz', since=START)}
+        assert not db.conn.execute(
+            "SELECT 1 FROM sqlite_master WHERE name IN ('idx_price_history_unit_price', 'idx_price_history_lookup')"
+        ).fetchall()
+
+        with api_client(db.db_path) as client:
+            payload = client.get('/api/unit-prices?unit=oz&limit=2').get_json()
+            assert payload['unit'] == 'oz'
+            assert [(o['productId'], o['retailer'], o['packSize'], o['unitPrice']) for o in payload['offers']] == [
+                ("cream-16oz", "amazon", 2, 0.625), ("cream-16oz", "walmart", 1, 0.75)]
+            lotion = client.get('/api/unit-prices?unit=fl%20oz&category=skincare').get_json()['offers']
+            assert [o['productId'] for o in lotion] == ["lotion"]
+            assert client.get('/api/unit-prices?unit=gallon').status_code == 400
+            api.MAX_UNIT_PRICE_OFFERS = 3
+            try:
+                assert len(client.get('/api/unit-prices?unit=oz&limit=100').get_json()['offers']) == 3
+            finally:
+                api.MAX_UNIT_PRICE_OFFERS = 200
+            db.close()
+
+
+def test_resize_detection_reads_only_written_products():
+    """add_products looks up the old sizes of its own products, in chunks"""
+    from src import query_profiler
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        db = PriceDatabase(str(Path(tmp_dir) / "prices.db"), profile=True)
+        db.add_products(Product(id=f"cream-{i}", name="Cream", size="8 oz", category="skincare")
+                        for i in range(1200))
+        db.add_price_point(PricePoint("cream-700", "walmart", 8.0, START, "https://example.com"))
+
+        profiler = query_profiler.get_profiler()
+        profiler.reset()
+        db.add_product(Product(id="cream-1", name="Cream", size="8 oz", category="skincare"))
+        lookups = [q for q in profiler.summary() if q['sql'].startswith("SELECT id, size FROM products")]
+        assert [(q['count'], q['rows']) for q in lookups] == [(1, 1)]
+
+        # A resize past the first chunk still reprices the stored rows
+        db.add_products(Product(id=f"cream-{i}", name="Cream", size="16 oz" if i == 700 else "8 oz",
+                                category="skincare") for i in range(1200))
+        assert db.get_best_unit_prices('oz')[0].unit_price == 0.5
+        profiler.reset()
+        db.close()
+
+
+if __name__ == "__main__":
+    test_parse_size()
+    test_unit_prices_maintained_and_ranked()
+    test_resize_detection_reads_only_written_products()
+    print("✓ All unit price tests passed")
@@ -1,14 +1,31 @@
 #!/usr/bin/env python3
 """
 View collected prices from the database.
+
+Usage:
+    python view_prices.py
+    python view_prices.py history <product_id> [--bucket week] [--retailer target]
+                                               [--from 2025-01-01] [--to 2025-06-30]
+    python view_prices.py cheapest <product_id> [--bucket week] [--from 2025-01-01] [--to 2025-06-30]
+    python view_prices.py analytics [product_id] [--retailer target] [--cheap] [--refresh]
+    python view_prices.py sales [product_id] [--retailer target] [--verdict fictitious]
+                                [--limit 20] [--refresh]
+    python view_prices.py seasons [product_id] [--category skincare] [--refresh]
+    python view_prices.py forecast [product_id] [--retailer target] [--horizon 30] [--refresh]
+    python view_prices.py value [--unit "fl oz"] [--category skincare] [--limit 20]
 """
+import argparse
 import sys
 from pathlib import Path
 
 # Add src to path
 sys.path.insert(0, str(Path(__file__).parent))
 
-from src.database import PriceDatabase
+from src.database import BUCKETS, PriceDatabase
+from src.fake_sales import VERDICTS
+from src.forecasts import HORIZONS
+from src.seasonality import describe_season
+from src.units import UNITS
 
 
 def view_all_prices():
@@ -49,5 +66,301 @@ def view_all_prices():
     db.close()
 
 
+def view_history(product_id: str, bucket: str = 'week', retailer_id: str = None,
+                 start: str = None, end: str = None):
+    """Display a product's price history aggregated into time buckets."""
+    db = PriceDatabase()
+
+    product = db.get_product(product_id)
+    if not product:
+        print(f"✗ Product not found: {product_id}")
+        db.close()
+        return
+
+    buckets = db.get_price_buckets(product_id, retailer_id, start, end, bucket)
+    db.close()
+
+    print("=" * 70)
+    print(f"{product.name} ({product.size}) - {bucket} buckets")
+    print("=" * 70)
+
+    if not buckets:
+        print("No prices recorded in this range")
+        return
+
+    current_retailer = None
+    for b in buckets:
+        if b.retailer_id != current_retailer:
+            current_retailer = b.retailer_id
+            print(f"\n{current_retailer.capitalize()}:")
+            print(f"  {'Start':<19} {'Open':>8} {'High':>8} {'Low':>8} {'Close':>8} {'Avg':>8} {'Count':>6}")
+        start_text = b.start.strftime('%Y-%m-%d %H:%M:%S' if bucket in ('raw', 'hour') else '%Y-%m-%d')
+        print(f"  {start_text:<19} ${b.open:7.2f} ${b.high:7.2f} ${b.low:7.2f} "
+              f"${b.close:7.2f} ${b.avg:7.2f} {b.count:>6}")
+
+
+def view_cheapest(product_id: str, bucket: str = 'week', start: str = None, end: str = None):
+    """Display the cheapest retailer over time and each one's share of time as cheapest."""
+    db = PriceDatabase()
+
+    product = db.get_product(product_id)
+    if not product:
+        print(f"✗ Product not found: {product_id}")
+        db.close()
+        return
+
+    result = db.get_retailer_comparison(product_id, bucket, start, end)
+    db.close()
+
+    print("=" * 70)
+    print(f"{product.name} ({product.size}) - cheapest retailer per {bucket}")
+    print("=" * 70)
+
+    if result is None or not result.points:
+        print("No prices recorded in this range")
+        return
+
+    print(f"\n  {'Time':<19} {'Best':>8}  {'Retailer':<12} {'Spread':>7} {'Retailers':>9}")
+    for p in result.points:
+        time_text = p.time.strftime('%Y-%m-%d %H:%M:%S' if bucket in ('raw', 'hour') else '%Y-%m-%d')
+        if p.price is None:
+            print(f"  {time_text:<19} {'-':>8}")
+            continue
+        spread = f"${p.spread:6.2f}" if p.spread is not None else f"{'-':>7}"
+        print(f"  {time_text:<19} ${p.price:7.2f}  {', '.join(p.cheapest)[:12]:<12} {spread} {p.retailers:>9}")
+
+    print("\nShare of time cheapest:")
+    for retailer, share in result.cheapest_share.items():
+        print(f"  {retailer:<12} {share:6.1%}")
+
+
+def view_analytics(product_id: str = None, retailer_id: str = None,
+                   cheap_only: bool = False, refresh: bool = False):
+    """Display stored series analytics (see src/analytics.py)."""
+    db = PriceDatabase()
+
+    if refresh:
+        summary = db.refresh_analytics()
+        print(f"✓ Refreshed {summary['series']} series in {summary['seconds']:.2f}s\n")
+
+    rows = db.get_price_analytics(product_id, retailer_id, cheap_only)
+    db.close()
+
+    print("=" * 70)
+    print("PRICE ANALYTICS" + (" - cheapest 10% of days" if cheap_only else ""))
+    print("=" * 70)
+
+    if not rows:
+        print("No analytics yet (run with --refresh)" if not cheap_only else "No series at a low")
+        return
+
+    current_product = None
+    for a in rows:
+        if a.product_id != current_product:
+            current_product = a.product_id
+            print(f"\n{current_product}:")
+            print(f"  {'Retailer':<10} {'Now':>8} {'Mean 7d':>8} {'Mean 30d':>8} {'P10':>8} "
+                  f"{'P50':>8} {'Vol 30d':>8} {'Cheaper':>8} {'At now':>7}")
+        volatility = f"{a.volatility_30d:8.1%}" if a.volatility_30d is not None else f"{'-':>8}"
+        flag = "  ← low" if a.is_cheap() else ""
+        print(f"  {a.retailer_id:<10} ${a.current_price:7.2f} ${a.mean_7d:7.2f} ${a.mean_30d:7.2f} "
+              f"${a.p10:7.2f} ${a.p50:7.2f} {volatility} {a.share_cheaper:8.0%} "
+              f"{a.days_at_current:>6}d{flag}")
+
+
+def view_sales(product_id: str = None, retailer_id: str = None, verdict: str = None,
+               limit: int = 20, refresh: bool = False):
+    """Report advertised discounts and whether they held up (see src/fake_sales.py)."""
+    db = PriceDatabase()
+
+    if refresh:
+        summary = db.refresh_sale_verdicts()
+        print(f"✓ Checked {summary['evaluated']} claim(s) in {summary['seconds']:.2f}s\n")
+
+    counts = db.get_sale_verdict_counts(product_id, retailer_id)
+    claims = db.get_sale_verdicts(product_id, retailer_id, verdict, limit)
+    db.close()
+
+    print("=" * 70)
+    print("ADVERTISED DISCOUNTS")
+    print("=" * 70)
+
+    if not counts:
+        print("No checked claims yet (run with --refresh)")
+        return
+
+    print(f"\n  {'Retailer':<10}" + ''.join(f" {name.capitalize():>11}" for name in VERDICTS)
+          + f" {'Not genuine':>12}")
+    for retailer, by_verdict in sorted(counts.items()):
+        checked = sum(by_verdict.values()) - by_verdict['unverified']
+        misleading = by_verdict['inflated'] + by_verdict['fictitious']
+        share = f"{misleading / checked:12.0%}" if checked else f"{'-':>12}"
+        print(f"  {retailer:<10}" + ''.join(f" {by_verdict[name]:>11}" for name in VERDICTS) + f" {share}")
+
+    print(f"\n  {'Date':<10} {'Product':<24} {'Retailer':<10} {'Price':>8} {'Claimed':>8} "
+          f"{'Usual':>8}  Verdict")
+    for v in claims:
+        usual = f"${v.reference_price:7.2f}" if v.reference_price is not None else f"{'-':>8}"
+        print(f"  {v.timestamp.strftime('%Y-%m-%d'):<10} {v.product_id[:24]:<24} {v.retailer_id:<10} "
+              f"${v.price:7.2f} ${v.claimed_was:7.2f} {usual}  {v.verdict}")
+
+
+def view_seasons(product_id: str = None, category: str = None, refresh: bool = False):
+    """Display typical low seasons per category and series (see src/seasonality.py)."""
+    db = PriceDatabase()
+
+    if refresh:
+        summary = db.refresh_seasonality()
+        print(f"✓ Updated {summary['series']} series in {summary['seconds']:.2f}s\n")
+
+    series = db.get_seasonality(product_id, category=category)
+    categories = db.get_category_seasonality(category) if product_id is None else []
+    db.close()
+
+    print("=" * 70)
+    print("TYPICAL LOW SEASONS")
+    print("=" * 70)
+
+    if not series and not categories:
+        print("No seasonality yet (run with --refresh)")
+        return
+
+    def confidence(value):
+        return f"{value:6.0%}" if value is not None else f"{'-':>6}"
+
+    if categories:
+        print(f"\n  {'Category':<24} {'Series':>6}  {'Months':>6} {'Days':>6}  Low season")
+        for c in categories:
+            print(f"  {c.category[:24]:<24} {c.series:>6}  {confidence(c.month_confidence)} "
+                  f"{confidence(c.weekday_confidence)}  {describe_season(c.low_months, c.low_weekdays) or '-'}")
+
+    print(f"\n  {'Product':<24} {'Retailer':<10} {'Days':>5}  {'Months':>6} {'Days':>6} {'Cycle':>6}  Low season")
+    for s in series:
+        cycle = f"{s.cycle_days:>5}d" if s.cycle_days else f"{'-':>6}"
+        print(f"  {s.product_id[:24]:<24} {s.retailer_id:<10} {s.days:>5}  {confidence(s.month_confidence)} "
+              f"{confidence(s.weekday_confidence)} {cycle}  {describe_season(s.low_months, s.low_weekdays) or '-'}")
+
+
+def view_forecasts(product_id: str = None, retailer_id: str = None, horizon: int = None,
+                   refresh: bool = False):
+    """Display buy-or-wait forecasts (see src/forecasts.py)."""
+    db = PriceDatabase()
+
+    if refresh:
+        summary = db.refresh_forecasts()
+        print(f"✓ Updated {summary['series']} series ({summary['refits']} refit) "
+              f"in {summary['seconds']:.2f}s\n")
+
+    rows = db.get_forecasts(product_id, retailer_id, horizon)
+    db.close()
+
+    print("=" * 70)
+    print("BUY NOW OR WAIT?")
+    print("=" * 70)
+
+    if not rows:
+        print("No forecasts yet (run with --refresh)")
+        return
+
+    print(f"\n  {'Product':<24} {'Retailer':<10} {'Days':>4} {'Now':>8} {'Expected':>9} "
+          f"{'Lower':>6}  {'Advice':<6} {'MAPE':>6} {'Brier':>6}")
+    for f in rows:
+        mape = f"{f.mape:6.1%}" if f.mape is not None else f"{'-':>6}"
+        brier = f"{f.brier:6.3f}" if f.brier is not None else f"{'-':>6}"
+        print(f"  {f.product_id[:24]:<24} {f.retailer_id:<10} {f.horizon:>4} ${f.current_price:7.2f} "
+              f"${f.expected_price:8.2f} {f.p_lower:6.0%}  {f.recommendation:<6} {mape} {brier}")
+
+
+def view_unit_prices(unit: str = 'oz', category: str = None, limit: int = 20):
+    """Display the best value per unit of size across all retailers."""
+    db = PriceDatabase()
+    offers = db.get_best_unit_prices(unit, category, limit=limit)
+    db.close()
+
+    print("=" * 70)
+    print(f"BEST VALUE PER {unit.upper()}")
+    print("=" * 70)
+
+    if not offers:
+        print(f"No current prices for products sized in {unit}")
+        return
+
+    print(f"\n  {'Product':<28} {'Size':<16} {'Retailer':<10} {'Price':>8} {'Per ' + unit:>10}")
+    for o in offers:
+        pack = f" x{o.pack_size}" if o.pack_size > 1 else ""
+        print(f"  {o.name[:28]:<28} {(o.size + pack)[:16]:<16} {o.retailer_id:<10} "
+              f"${o.price:7.2f} ${o.unit_price:9.4f}")
+
+
+def main():
+    """CLI entry point."""
+    if len(sys.argv) > 1 and sys.argv[1] == 'history':
+        parser = argparse.ArgumentParser(prog="view_prices.py history",
+                                         description="Bucketed price history for a product.")
+        parser.add_argument('product_id')
+        parser.add_argument('--bucket', choices=BUCKETS, default='week')
+        parser.add_argument('--retailer', help="Only this retailer")
+        parser.add_argument('--from', dest='start', help="Start ISO date")
+        parser.add_argument('--to', dest='end', help="End ISO date (inclusive)")
+        args = parser.parse_args(sys.argv[2:])
+        view_history(args.product_id, args.bucket, args.retailer, args.start, args.end)
+    elif len(sys.argv) > 1 and sys.argv[1] == 'cheapest':
+        parser = argparse.ArgumentParser(prog="view_prices.py cheapest",
+                                         description="Cheapest retailer over time, carrying prices forward.")
+        parser.add_argument('product_id')
+        parser.add_argument('--bucket', choices=BUCKETS, default='week')
+        parser.add_argument('--from', dest='start', help="Start ISO date")
+        parser.add_argument('--to', dest='end', help="End ISO date (inclusive)")
+        args = parser.parse_args(sys.argv[2:])
+        view_cheapest(args.product_id, args.bucket, args.start, args.end)
+    elif len(sys.argv) > 1 and sys.argv[1] == 'analytics':
+        parser = argparse.ArgumentParser(prog="view_prices.py analytics",
+                                         description="Rolling stats, volatility and percentiles per series.")
+        parser.add_argument('product_id', nargs='?')
+        parser.add_argument('--retailer', help="Only this retailer")
+        parser.add_argument('--cheap', action='store_true',
+                            help="Only series priced within their cheapest 10%% of days")
+        parser.add_argument('--refresh', action='store_true', help="Recompute changed series first")
+        args = parser.parse_args(sys.argv[2:])
+        view_analytics(args.product_id, args.retailer, args.cheap, args.refresh)
+    elif len(sys.argv) > 1 and sys.argv[1] == 'sales':
+        parser = argparse.ArgumentParser(prog="view_prices.py sales",
+                                         description="Check advertised discounts against prior prices.")
+        parser.add_argument('product_id', nargs='?')
+        parser.add_argument('--retailer', help="Only this retailer")
+        parser.add_argument('--verdict', choices=VERDICTS, help="Only list claims with this verdict")
+        parser.add_argument('--limit', type=int, default=20, help="Claims listed (default 20)")
+        parser.add_argument('--refresh', action='store_true', help="Check new claims first")
+        args = parser.parse_args(sys.argv[2:])
+        view_sales(args.product_id, args.retailer, args.verdict, args.limit, args.refresh)
+    elif len(sys.argv) > 1 and sys.argv[1] == 'seasons':
+        parser = argparse.ArgumentParser(prog="view_prices.py seasons",
+                                         description="Recurring low-price months and weekdays.")
+        parser.add_argument('product_id', nargs='?')
+        parser.add_argument('--category', help="Only this category")
+        parser.add_argument('--refresh', action='store_true', help="Recompute changed series first")
+        args = parser.parse_args(sys.argv[2:])
+        view_seasons(args.product_id, args.category, args.refresh)
+    elif len(sys.argv) > 1 and sys.argv[1] == 'forecast':
+        parser = argparse.ArgumentParser(prog="view_prices.py forecast",
+                                         description="Expected prices and whether to buy now or wait.")
+        parser.add_argument('product_id', nargs='?')
+        parser.add_argument('--retailer', help="Only this retailer")
+        parser.add_argument('--horizon', type=int, choices=HORIZONS, help="Only this horizon in days")
+        parser.add_argument('--refresh', action='store_true', help="Update changed series first")
+        args = parser.parse_args(sys.argv[2:])
+        view_forecasts(args.product_id, args.retailer, args.horizon, args.refresh)
+    elif len(sys.argv) > 1 and sys.argv[1] == 'value':
+        parser = argparse.ArgumentParser(prog="view_prices.py value",
+                                         description="Cheapest current offers per unit of size.")
+        parser.add_argument('--unit', choices=UNITS, default='oz', help="Display unit (default oz)")
+        parser.add_argument('--category', help="Only this category")
+        parser.add_argument('--limit', type=int, default=20, help="Offers listed (default 20)")
+        args = parser.parse_args(sys.argv[2:])
+        view_unit_prices(args.unit, args.category, args.limit)
+    else:
+        view_all_prices()
+
+
 if __name__ == "__main__":
-    view_all_prices()
+    main()